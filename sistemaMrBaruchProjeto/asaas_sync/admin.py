@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import AsaasClienteSyncronizado, AsaasCobrancaSyncronizada, AsaasSyncronizacaoLog
+from .models import AsaasClienteSyncronizado, AsaasCobrancaSyncronizada, AsaasSyncronizacaoLog, AsaasSyncCheckpoint, AsaasSyncJob, AsaasSyncProgresso
 
 
 @admin.register(AsaasClienteSyncronizado)
@@ -67,7 +67,8 @@ class AsaasSyncronizacaoLogAdmin(admin.ModelAdmin):
     list_display = ['data_inicio', 'status', 'total_clientes', 'total_cobrancas', 'duracao_segundos', 'usuario']
     list_filter = ['status', 'data_inicio']
     readonly_fields = ['data_inicio', 'data_fim', 'duracao_segundos', 'total_clientes', 'clientes_novos', 
-                      'clientes_atualizados', 'total_cobrancas', 'cobrancas_novas', 'cobrancas_atualizadas']
+                      'clientes_atualizados', 'total_cobrancas', 'cobrancas_novas', 'cobrancas_atualizadas',
+                      'total_paginas', 'paginas_por_segundo']
     
     fieldsets = (
         ('Informações da Sincronização', {
@@ -79,6 +80,9 @@ class AsaasSyncronizacaoLogAdmin(admin.ModelAdmin):
         ('Estatísticas - Cobranças', {
             'fields': ('total_cobrancas', 'cobrancas_novas', 'cobrancas_atualizadas')
         }),
+        ('Desempenho', {
+            'fields': ('total_paginas', 'paginas_por_segundo')
+        }),
         ('Mensagens e Erros', {
             'fields': ('mensagem', 'erros')
         }),
@@ -86,3 +90,23 @@ class AsaasSyncronizacaoLogAdmin(admin.ModelAdmin):
     
     def has_add_permission(self, request):
         return False
+
+
+@admin.register(AsaasSyncCheckpoint)
+class AsaasSyncCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['conta', 'ultimo_date_created', 'ultima_sincronizacao', 'ultimo_webhook_em', 'ultima_reconciliacao_completa']
+    readonly_fields = ['atualizado_em']
+
+
+@admin.register(AsaasSyncProgresso)
+class AsaasSyncProgressoAdmin(admin.ModelAdmin):
+    list_display = ['conta', 'etapa', 'modo_global', 'offset_clientes', 'ultimo_cliente_concluido', 'janela_atual', 'offset_cobrancas', 'iniciado_em', 'atualizado_em']
+    readonly_fields = ['log', 'stats', 'iniciado_em', 'atualizado_em']
+
+
+@admin.register(AsaasSyncJob)
+class AsaasSyncJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tipo', 'status', 'usuario', 'tentativas', 'worker', 'criado_em', 'iniciado_em', 'batimento_em', 'finalizado_em']
+    list_filter = ['tipo', 'status', 'criado_em']
+    search_fields = ['usuario', 'worker']
+    readonly_fields = ['log', 'worker', 'tentativas', 'criado_em', 'iniciado_em', 'batimento_em', 'finalizado_em', 'erro']
@@ -0,0 +1,356 @@
+"""
+Fila de tarefas (jobs) do Asaas persistida no banco
+As views apenas enfileiram; o comando `processar_jobs_asaas` reivindica e executa
+as tarefas fora do ciclo HTTP, gravando o progresso no AsaasSyncronizacaoLog vinculado
+(o mesmo consultado por status_sincronizacao / status_operacao).
+"""
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import logging
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import AsaasSyncJob, AsaasSyncronizacaoLog
+
+logger = logging.getLogger(__name__)
+
+
+STATUS_ATIVOS = ('PENDENTE', 'EM_EXECUCAO')
+
+
+def identificar_worker():
+    """Identificação do processo worker (host:pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enfileirar_job(tipo, usuario=None, parametros=None, tipo_log=None, mensagem=None):
+    """
+    Enfileira uma tarefa e cria o log que a interface acompanha.
+
+    Se já existe uma tarefa igual pendente ou em execução, ela é reaproveitada
+    (evita duas sincronizações simultâneas da mesma conta por cliques repetidos).
+
+    Returns:
+        (job, criado)
+    """
+    parametros = parametros or {}
+
+    with transaction.atomic():
+        existente = AsaasSyncJob.objects.filter(
+            tipo=tipo, parametros=parametros, status__in=STATUS_ATIVOS
+        ).select_related('log').first()
+        if existente:
+            return existente, False
+
+        log = AsaasSyncronizacaoLog.objects.create(
+            tipo_sincronizacao=tipo_log or tipo,
+            status='EM_ANDAMENTO',
+            usuario=usuario or 'Sistema',
+            mensagem=mensagem or 'Na fila. Aguardando worker...'
+        )
+        job = AsaasSyncJob.objects.create(
+            tipo=tipo,
+            parametros=parametros,
+            usuario=usuario,
+            log=log,
+            max_tentativas=int(getattr(settings, 'ASAAS_JOBS_MAX_TENTATIVAS', 1)),
+        )
+
+    logger.info(f"📥 Job {job.id} ({tipo}) enfileirado por {usuario or 'Sistema'}")
+    return job, True
+
+
+def reivindicar_proximo_job(worker=None):
+    """
+    Reivindica a próxima tarefa pendente.
+
+    select_for_update(skip_locked=True) deixa cada worker pegar uma linha diferente
+    sem esperar pelos outros; o UPDATE condicional garante a exclusividade também
+    em bancos sem SELECT ... FOR UPDATE (SQLite).
+    """
+    worker = worker or identificar_worker()
+
+    with transaction.atomic():
+        job = (
+            AsaasSyncJob.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDENTE')
+            .order_by('criado_em')
+            .first()
+        )
+        if job is None:
+            return None
+
+        agora = timezone.now()
+        reivindicado = AsaasSyncJob.objects.filter(pk=job.pk, status='PENDENTE').update(
+            status='EM_EXECUCAO',
+            worker=worker,
+            iniciado_em=agora,
+            batimento_em=agora,
+            tentativas=job.tentativas + 1,
+        )
+        if not reivindicado:
+            return None
+
+    job.refresh_from_db()
+    return job
+
+
+def registrar_batimento(job_id=None, log=None):
+    """
+    Sinal de vida da tarefa em execução (pelo id ou pelo log vinculado).
+    A sincronização chama a cada página; os scripts, enquanto o processo filho roda.
+    """
+    filtro = Q(pk=job_id) if job_id is not None else Q(log=log)
+    AsaasSyncJob.objects.filter(filtro, status='EM_EXECUCAO').update(batimento_em=timezone.now())
+
+
+def recuperar_jobs_travados(timeout_segundos=None):
+    """
+    Devolve à fila as tarefas cujo worker morreu no meio da execução.
+    Travada = sem sinal de vida (batimento_em) há ASAAS_JOBS_TIMEOUT_SEGUNDOS;
+    uma sincronização longa que continua baixando páginas não é interrompida.
+    Sem tentativas restantes, a tarefa (e o log) são marcados como erro.
+    """
+    timeout_segundos = int(timeout_segundos or getattr(settings, 'ASAAS_JOBS_TIMEOUT_SEGUNDOS', 3600))
+    limite = timezone.now() - timedelta(seconds=timeout_segundos)
+    recuperados = 0
+
+    travados = AsaasSyncJob.objects.filter(status='EM_EXECUCAO').filter(
+        Q(batimento_em__lt=limite) | Q(batimento_em__isnull=True, iniciado_em__lt=limite)
+    ).select_related('log')
+    for job in travados:
+        if job.tentativas < job.max_tentativas:
+            job.status = 'PENDENTE'
+            job.save(update_fields=['status'])
+            logger.warning(f"♻️  Job {job.id} travado em {job.worker}. Devolvido à fila")
+        else:
+            _finalizar_com_erro(job, f'Sem sinal de vida há {timeout_segundos}s no worker {job.worker}')
+        recuperados += 1
+
+    return recuperados
+
+
+def executar_job(job):
+    """Executa uma tarefa já reivindicada e registra o resultado"""
+    executor = EXECUTORES.get(job.tipo)
+    logger.info(f"⚙️  Executando job {job.id} ({job.tipo}) - tentativa {job.tentativas}/{job.max_tentativas}")
+
+    try:
+        if executor is None:
+            raise ValueError(f'Tipo de job desconhecido: {job.tipo}')
+        executor(job)
+    except Exception as e:
+        logger.error(f"❌ Job {job.id} falhou: {str(e)}", exc_info=True)
+        if job.tentativas < job.max_tentativas:
+            job.status = 'PENDENTE'
+            job.erro = traceback.format_exc()
+            job.save(update_fields=['status', 'erro'])
+        else:
+            _finalizar_com_erro(job, f'{str(e)}\n\n{traceback.format_exc()}')
+        return False
+
+    job.status = 'CONCLUIDO'
+    job.finalizado_em = timezone.now()
+    job.save(update_fields=['status', 'finalizado_em'])
+    logger.info(f"✅ Job {job.id} concluído")
+    return True
+
+
+def _finalizar_com_erro(job, erro):
+    job.status = 'ERRO'
+    job.erro = erro
+    job.finalizado_em = timezone.now()
+    job.save(update_fields=['status', 'erro', 'finalizado_em'])
+
+    log = job.log
+    if log and log.status == 'EM_ANDAMENTO':
+        log.status = 'ERRO'
+        log.data_fim = job.finalizado_em
+        log.erros = erro
+        log.mensagem = f'[ERRO] {erro.splitlines()[0] if erro else "Erro desconhecido"}'
+        log.calcular_duracao()
+        log.save()
+
+
+# =============================================================================
+# Executores por tipo de tarefa
+# =============================================================================
+
+def _executar_sincronizacao(job):
+    """Sincronização incremental (padrão) ou completa de uma conta"""
+    from .sync_completo import AsaasSyncCompleto
+
+    conta = job.parametros.get('conta', 'principal')
+    modo = job.parametros.get('modo', 'incremental')
+
+    if conta == 'alternativo':
+        token = getattr(settings, 'ASAAS_ALTERNATIVO_TOKEN', None)
+        if not token:
+            raise ValueError('ASAAS_ALTERNATIVO_TOKEN não configurado')
+        sync_service = AsaasSyncCompleto(api_token=token, conta='alternativo')
+        nome_conta = 'Asaas Alternativo (Conta 2)'
+    else:
+        sync_service = AsaasSyncCompleto(conta='principal')
+        nome_conta = 'Asaas Principal'
+
+    if modo == 'completo':
+        sync_service.executar_sincronizacao_completa(nome_conta=nome_conta, log=job.log)
+    else:
+        sync_service.executar_sincronizacao_incremental(nome_conta=nome_conta, log=job.log)
+
+
+def _executar_boletos_faltantes(job):
+    """Boletos faltantes dos clientes já cadastrados"""
+    from .services import AsaasSyncService
+
+    log = job.log
+    log.mensagem = 'Sincronização iniciada...'
+    log.save(update_fields=['mensagem'])
+
+    stats = AsaasSyncService().sincronizar_boletos_faltantes()
+
+    log.data_fim = timezone.now()
+    log.status = 'SUCESSO'
+    log.total_clientes = stats.get('clientes_processados', 0)
+    log.cobrancas_novas = stats.get('cobrancas_novas', 0)
+    log.cobrancas_atualizadas = stats.get('cobrancas_atualizadas', 0)
+    log.total_cobrancas = stats.get('cobrancas_novas', 0) + stats.get('cobrancas_atualizadas', 0)
+    log.mensagem = f"Sincronização concluída com sucesso. {stats.get('clientes_processados', 0)} clientes processados."
+    log.calcular_duracao()
+    log.save()
+
+    logger.info(f"✅ Sincronização de boletos concluída: {stats}")
+
+
+def _executar_script(job, argumentos, timeout=3600):
+    """
+    Roda um script da raiz do projeto e devolve o CompletedProcess.
+    Enquanto o processo filho roda, registra o sinal de vida da tarefa.
+    """
+    comando = [sys.executable, *[str(argumento) for argumento in argumentos]]
+    logger.info(f"[SYNC] Executando: {' '.join(comando)}")
+    intervalo = int(getattr(settings, 'ASAAS_JOBS_BATIMENTO_SEGUNDOS', 60))
+    limite = time.monotonic() + timeout
+
+    with subprocess.Popen(
+        comando,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding='utf-8',
+        errors='replace',  # Substituir caracteres problemáticos
+    ) as processo:
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                processo.kill()
+                processo.communicate()
+                raise subprocess.TimeoutExpired(comando, timeout)
+            try:
+                stdout, stderr = processo.communicate(timeout=min(intervalo, restante))
+                break
+            except subprocess.TimeoutExpired:
+                registrar_batimento(job_id=job.pk)
+
+    return subprocess.CompletedProcess(comando, processo.returncode, stdout, stderr)
+
+
+def _executar_auto_sync(job):
+    """
+    Script sincronizar_asaas_auto.py (baixa, atualiza, adiciona e exclui)
+    Com --resume só quando a própria tarefa está sendo retentada (o worker morreu
+    no meio): continua do checkpoint. Uma tarefa nova começa do zero, em vez de
+    continuar um checkpoint antigo de outra execução.
+    """
+    conta = job.parametros.get('conta', 'principal')
+    log = job.log
+
+    log.mensagem = f'Executando sincronização automática do Asaas ({conta})...'
+    log.save(update_fields=['mensagem'])
+
+    argumentos = [settings.BASE_DIR / 'sincronizar_asaas_auto.py', conta]
+    if job.tentativas > 1:
+        argumentos.append('--resume')
+    result = _executar_script(job, argumentos)
+
+    logger.info(f"[SYNC] Return code: {result.returncode}")
+    if result.stderr:
+        logger.error(f"[SYNC] STDERR: {result.stderr[:500]}")
+
+    log.data_fim = timezone.now()
+    if result.returncode == 0:
+        log.status = 'SUCESSO'
+        log.mensagem = f'[OK] Sincronização automática concluída!\n\n{result.stdout[-1000:]}'
+
+        # Extrair estatísticas do output
+        match_clientes = re.search(r'Total: (\d+)', result.stdout)
+        match_cobrancas = re.search(r'COBRANÇAS:.*?Total: (\d+)', result.stdout, re.DOTALL)
+        if match_clientes:
+            log.total_clientes = int(match_clientes.group(1))
+        if match_cobrancas:
+            log.total_cobrancas = int(match_cobrancas.group(1))
+    else:
+        log.status = 'ERRO'
+        log.mensagem = f'[ERRO] Erro na sincronização (code {result.returncode}):\n\nSTDOUT:\n{result.stdout[:500]}\n\nSTDERR:\n{result.stderr[:500]}'
+    log.calcular_duracao()
+    log.save()
+
+
+def _executar_importacao_json_limpa(job):
+    """Script importar_json_banco.py com --limpar"""
+    arquivo = job.parametros.get('arquivo')
+    log = job.log
+
+    log.mensagem = f'Importando {arquivo}...'
+    log.save(update_fields=['mensagem'])
+
+    result = _executar_script(job, [
+        settings.BASE_DIR / 'importar_json_banco.py',
+        settings.BASE_DIR / arquivo,
+        '--limpar', '--auto-confirm'
+    ])
+
+    log.data_fim = timezone.now()
+    if result.returncode == 0:
+        log.status = 'SUCESSO'
+        log.mensagem = f'✅ Importação limpa concluída!\n\n{result.stdout[-1000:]}'
+
+        # Extrair estatísticas do output
+        match_clientes = re.search(r'Total: (\d+)', result.stdout)
+        match_cobrancas = re.search(r'Cobranças.*?Total: (\d+)', result.stdout, re.DOTALL)
+        if match_clientes:
+            log.total_clientes = int(match_clientes.group(1))
+        if match_cobrancas:
+            log.total_cobrancas = int(match_cobrancas.group(1))
+    else:
+        log.status = 'ERRO'
+        log.mensagem = f'❌ Erro na importação:\n\n{result.stderr[:1000]}'
+    log.calcular_duracao()
+    log.save()
+
+
+def _executar_reconciliacao(job):
+    """Reconciliação de Parcela/PixEntrada/PixLevantamento com o Asaas (diária ou completa)"""
+    from .reconciliacao import ReconciliacaoPagamentos
+
+    ReconciliacaoPagamentos(conta='principal').executar(
+        dias=job.parametros.get('dias'),
+        completo=job.parametros.get('completo', False),
+        log=job.log,
+    )
+
+
+EXECUTORES = {
+    'SINCRONIZACAO': _executar_sincronizacao,
+    'BOLETOS_FALTANTES': _executar_boletos_faltantes,
+    'AUTO_SYNC': _executar_auto_sync,
+    'IMPORTACAO_JSON_LIMPA': _executar_importacao_json_limpa,
+    'RECONCILIACAO': _executar_reconciliacao,
+}
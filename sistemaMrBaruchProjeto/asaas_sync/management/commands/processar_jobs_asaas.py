@@ -0,0 +1,64 @@
+"""
+Worker da fila de tarefas do Asaas (sincronizações e importações enfileiradas pelas views)
+Rodar como serviço (systemd/supervisor): python manage.py processar_jobs_asaas
+"""
+import time
+import logging
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from asaas_sync.jobs import (
+    identificar_worker, reivindicar_proximo_job, executar_job, recuperar_jobs_travados
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de sincronizações/importações do Asaas fora do ciclo HTTP'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Processa as tarefas pendentes e encerra (útil em cron)'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=5,
+            help='Segundos entre consultas quando a fila está vazia'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=None,
+            help='Segundos sem conclusão para considerar uma tarefa travada (padrão: ASAAS_JOBS_TIMEOUT_SEGUNDOS)'
+        )
+
+    def handle(self, *args, **options):
+        worker = identificar_worker()
+        processados = 0
+        self.stdout.write(self.style.SUCCESS(f'🚀 Worker {worker} aguardando tarefas do Asaas'))
+
+        try:
+            while True:
+                close_old_connections()
+                recuperar_jobs_travados(options['timeout'])
+
+                job = reivindicar_proximo_job(worker)
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                self.stdout.write(f'⚙️  Job {job.id}: {job.get_tipo_display()} (log {job.log_id})')
+                if executar_job(job):
+                    self.stdout.write(self.style.SUCCESS(f'✅ Job {job.id} concluído'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'❌ Job {job.id} falhou'))
+                processados += 1
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('⏹️  Worker interrompido'))
+
+        self.stdout.write(f'Tarefas processadas: {processados}')
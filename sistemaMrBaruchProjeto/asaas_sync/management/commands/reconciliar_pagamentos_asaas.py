@@ -0,0 +1,79 @@
+"""
+Reconcilia Parcela / PixEntrada / PixLevantamento com o estado real das cobranças no Asaas
+Rodar diariamente (cron), ex.: 0 4 * * * python manage.py reconciliar_pagamentos_asaas
+Reconciliação completa (listagem global inteira): --completo
+"""
+import json
+from django.core.management.base import BaseCommand
+from asaas_sync.jobs import enfileirar_job
+from asaas_sync.reconciliacao import ReconciliacaoPagamentos
+
+
+class Command(BaseCommand):
+    help = 'Compara os pagamentos locais com o Asaas em lote, corrige o que faltou e gera o relatório de divergências'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=None,
+            help='Cobranças criadas, pagas ou vencendo nos últimos N dias (padrão: ASAAS_RECONCILIACAO_DIAS)'
+        )
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Usa a listagem global inteira (também reporta cobranças ausentes no Asaas)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas gera o relatório, sem corrigir'
+        )
+        parser.add_argument(
+            '--relatorio',
+            help='Grava o relatório de divergências (JSON) neste arquivo'
+        )
+        parser.add_argument(
+            '--enfileirar',
+            action='store_true',
+            help='Enfileira como job (processar_jobs_asaas) em vez de executar agora'
+        )
+
+    def handle(self, *args, **options):
+        if options['enfileirar']:
+            job, criado = enfileirar_job(
+                'RECONCILIACAO',
+                parametros={'dias': options['dias'], 'completo': options['completo']},
+                tipo_log='RECONCILIACAO',
+            )
+            estado = 'enfileirado' if criado else 'já estava na fila'
+            self.stdout.write(self.style.SUCCESS(f"✅ Job {job.id} {estado}"))
+            return
+
+        self.stdout.write("🔎 Reconciliando pagamentos com o Asaas...")
+        resultado = ReconciliacaoPagamentos(conta='principal', simular=options['dry_run']).executar(
+            dias=options['dias'], completo=options['completo']
+        )
+        divergencias = resultado['divergencias']
+
+        self.stdout.write(f"   {resultado['verificadas']} cobranças verificadas em {resultado['duracao']}s")
+        for categoria, quantidade in sorted(divergencias['contagens'].items()):
+            self.stdout.write(f"   ⚠️  {categoria}: {quantidade}")
+        if resultado['falhas_download']:
+            self.stdout.write(self.style.WARNING(f"⚠️  {resultado['falhas_download']} falhas de download"))
+
+        if options['relatorio']:
+            with open(options['relatorio'], 'w', encoding='utf-8') as arquivo:
+                json.dump(resultado, arquivo, ensure_ascii=False, indent=2, default=str)
+            self.stdout.write(f"   📄 Relatório gravado em {options['relatorio']}")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"⚠️  Dry-run: {divergencias['total']} divergências, nada foi corrigido"))
+            return
+
+        for correcao, quantidade in sorted(resultado['aplicadas'].items()):
+            self.stdout.write(f"   🔧 {correcao}: {quantidade}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {divergencias['total']} divergências, {sum(resultado['aplicadas'].values())} correções aplicadas "
+            f"(log {resultado['log_id']})"
+        ))
@@ -0,0 +1,64 @@
+"""
+Comando para a sincronização 100% do Asaas (mesma lógica do script sincronizar_asaas_auto.py)
+Com --resume continua uma execução interrompida a partir do último checkpoint.
+"""
+from django.core.management.base import BaseCommand
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Baixa 100% dos clientes e cobranças do Asaas (retomável com --resume)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--conta',
+            choices=['principal', 'alternativo'],
+            default='principal',
+            help='Conta Asaas a sincronizar'
+        )
+        parser.add_argument(
+            '--por-cliente',
+            action='store_true',
+            help='Modo antigo: GET payments?customer= para cada cliente'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continua a última execução interrompida desta conta (offsets salvos a cada página)'
+        )
+
+    def handle(self, *args, **options):
+        # O script fica na raiz do projeto (mesmo diretório do manage.py)
+        from sincronizar_asaas_auto import SincronizadorAsaas100Porcento
+
+        sincronizador = SincronizadorAsaas100Porcento(
+            conta=options['conta'],
+            modo_global=not options['por_cliente'],
+            retomar=options['resume'],
+        )
+
+        if sincronizador.retomado:
+            progresso = sincronizador.progresso
+            self.stdout.write(self.style.WARNING(
+                f'♻️  Retomando a partir da etapa {progresso.get_etapa_display()} '
+                f'(offset clientes {progresso.offset_clientes}, offset cobranças {progresso.offset_cobrancas})'
+            ))
+
+        try:
+            sucesso = sincronizador.executar_sincronizacao_100porcento()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('⏹️  Interrompido. Rode novamente com --resume para continuar'))
+            return
+
+        log = sincronizador.log
+        if not sucesso:
+            self.stdout.write(self.style.ERROR(f'❌ Sincronização falhou: {log.erros}'))
+            self.stdout.write('Progresso salvo. Rode novamente com --resume para continuar')
+            return
+
+        self.stdout.write(self.style.SUCCESS('✅ Sincronização 100% concluída'))
+        self.stdout.write(f'Clientes: {log.total_clientes} ({log.clientes_novos} novos)')
+        self.stdout.write(f'Cobranças: {log.total_cobrancas} ({log.cobrancas_novas} novas)')
+        self.stdout.write(f'Duração: {log.duracao_segundos}s')
@@ -0,0 +1,56 @@
+"""
+Comando para sincronização incremental do Asaas (ideal para cron de hora em hora)
+"""
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from asaas_sync.sync_completo import AsaasSyncCompleto
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Sincroniza apenas o que mudou no Asaas desde o último checkpoint (com reconciliação completa periódica)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--conta',
+            choices=['principal', 'alternativo'],
+            default='principal',
+            help='Conta Asaas a sincronizar'
+        )
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Força a reconciliação completa'
+        )
+
+    def handle(self, *args, **options):
+        conta = options['conta']
+        
+        if conta == 'alternativo':
+            token = getattr(settings, 'ASAAS_ALTERNATIVO_TOKEN', None)
+            if not token:
+                self.stdout.write(self.style.ERROR('❌ ASAAS_ALTERNATIVO_TOKEN não configurado'))
+                return
+            sync_service = AsaasSyncCompleto(api_token=token, conta='alternativo')
+            nome_conta = 'Asaas Alternativo (Conta 2)'
+        else:
+            sync_service = AsaasSyncCompleto(conta='principal')
+            nome_conta = 'Asaas Principal'
+        
+        try:
+            if options['completo']:
+                log = sync_service.executar_sincronizacao_completa(nome_conta=nome_conta)
+            else:
+                log = sync_service.executar_sincronizacao_incremental(nome_conta=nome_conta)
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'❌ Erro: {str(e)}'))
+            logger.error(f'Erro na sincronização incremental: {str(e)}', exc_info=True)
+            raise
+        
+        self.stdout.write(self.style.SUCCESS(f'✅ {log.get_tipo_sincronizacao_display()} concluída'))
+        self.stdout.write(f'Status: {log.status}')
+        self.stdout.write(f'Clientes: {log.total_clientes} ({log.clientes_novos} novos)')
+        self.stdout.write(f'Cobranças: {log.total_cobrancas} ({log.cobrancas_novas} novas)')
+        self.stdout.write(f'Duração: {log.duracao_segundos}s')
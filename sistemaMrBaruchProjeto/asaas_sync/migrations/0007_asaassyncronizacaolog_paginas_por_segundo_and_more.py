@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asaas_sync', '0006_asaasclientesyncronizado2_asaascobrancasyncronizada2_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asaassyncronizacaolog',
+            name='total_paginas',
+            field=models.IntegerField(default=0, verbose_name='Páginas Baixadas'),
+        ),
+        migrations.AddField(
+            model_name='asaassyncronizacaolog',
+            name='paginas_por_segundo',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='Páginas/s'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asaas_sync', '0007_asaassyncronizacaolog_paginas_por_segundo_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsaasSyncCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('conta', models.CharField(max_length=30, unique=True, verbose_name='Conta')),
+                ('ultimo_date_created', models.DateField(blank=True, null=True, verbose_name='Último dateCreated Visto')),
+                ('ultima_sincronizacao', models.DateTimeField(blank=True, null=True, verbose_name='Última Sincronização')),
+                ('ultimo_webhook_em', models.DateTimeField(blank=True, null=True, verbose_name='Último Webhook Aplicado')),
+                ('ultima_reconciliacao_completa', models.DateTimeField(blank=True, null=True, verbose_name='Última Reconciliação Completa')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Checkpoint de Sincronização',
+                'verbose_name_plural': 'Checkpoints de Sincronização',
+                'db_table': 'asaas_sync_checkpoints',
+            },
+        ),
+        migrations.AlterField(
+            model_name='asaassyncronizacaolog',
+            name='tipo_sincronizacao',
+            field=models.CharField(choices=[('COMPLETO', 'Sincronização Completa'), ('BOLETOS_FALTANTES', 'Boletos Faltantes'), ('ALTERNATIVO', 'Sincronização Alternativa'), ('INCREMENTAL', 'Sincronização Incremental')], default='COMPLETO', max_length=30, verbose_name='Tipo'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asaas_sync', '0008_asaassynccheckpoint_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asaasclientesyncronizado',
+            name='payload_hash',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='Hash do Payload'),
+        ),
+        migrations.AddField(
+            model_name='asaasclientesyncronizado2',
+            name='payload_hash',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='Hash do Payload'),
+        ),
+        migrations.AddField(
+            model_name='asaascobrancasyncronizada',
+            name='payload_hash',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='Hash do Payload'),
+        ),
+        migrations.AddField(
+            model_name='asaascobrancasyncronizada2',
+            name='payload_hash',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='Hash do Payload'),
+        ),
+    ]
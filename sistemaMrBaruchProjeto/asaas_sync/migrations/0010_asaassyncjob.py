@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asaas_sync', '0009_asaasclientesyncronizado_payload_hash_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsaasSyncJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('SINCRONIZACAO', 'Sincronização (incremental/completa)'), ('BOLETOS_FALTANTES', 'Boletos Faltantes'), ('AUTO_SYNC', 'Sincronização Automática (script)'), ('IMPORTACAO_JSON_LIMPA', 'Importação JSON Limpa')], max_length=30, verbose_name='Tipo')),
+                ('parametros', models.JSONField(blank=True, default=dict, verbose_name='Parâmetros')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('EM_EXECUCAO', 'Em Execução'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro')], default='PENDENTE', max_length=20, verbose_name='Status')),
+                ('usuario', models.CharField(blank=True, max_length=100, null=True, verbose_name='Usuário')),
+                ('tentativas', models.IntegerField(default=0, verbose_name='Tentativas')),
+                ('max_tentativas', models.IntegerField(default=1, verbose_name='Máximo de Tentativas')),
+                ('worker', models.CharField(blank=True, max_length=100, null=True, verbose_name='Worker')),
+                ('erro', models.TextField(blank=True, null=True, verbose_name='Erro')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('finalizado_em', models.DateTimeField(blank=True, null=True, verbose_name='Finalizado em')),
+                ('log', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='asaas_sync.asaassyncronizacaolog', verbose_name='Log de Sincronização')),
+            ],
+            options={
+                'verbose_name': 'Tarefa de Sincronização',
+                'verbose_name_plural': 'Tarefas de Sincronização',
+                'db_table': 'asaas_sync_jobs',
+                'ordering': ['criado_em'],
+                'indexes': [models.Index(fields=['status', 'criado_em'], name='asaas_sync_job_fila_idx')],
+            },
+        ),
+    ]
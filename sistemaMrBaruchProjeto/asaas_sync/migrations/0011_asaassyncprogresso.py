@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asaas_sync', '0010_asaassyncjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsaasSyncProgresso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('conta', models.CharField(max_length=30, unique=True, verbose_name='Conta')),
+                ('modo_global', models.BooleanField(default=True, verbose_name='Listagem Global de Cobranças')),
+                ('etapa', models.CharField(choices=[('CLIENTES', 'Baixando Clientes'), ('COBRANCAS', 'Baixando Cobranças'), ('LIMPEZA', 'Excluindo Obsoletos'), ('CONCLUIDO', 'Concluído')], default='CLIENTES', max_length=20, verbose_name='Etapa')),
+                ('iniciado_em', models.DateTimeField(verbose_name='Início da Execução')),
+                ('offset_clientes', models.IntegerField(default=0, verbose_name='Próximo Offset de Clientes')),
+                ('total_clientes_esperado', models.IntegerField(blank=True, null=True, verbose_name='Total de Clientes Esperado')),
+                ('ultimo_cliente_concluido', models.CharField(blank=True, max_length=100, null=True, verbose_name='Último Cliente Concluído')),
+                ('cliente_em_andamento', models.CharField(blank=True, max_length=100, null=True, verbose_name='Cliente em Andamento')),
+                ('janela_atual', models.IntegerField(default=0, verbose_name='Janela Atual')),
+                ('offset_cobrancas', models.IntegerField(default=0, verbose_name='Próximo Offset de Cobranças')),
+                ('stats', models.JSONField(blank=True, default=dict, verbose_name='Estatísticas')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('log', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='progressos', to='asaas_sync.asaassyncronizacaolog', verbose_name='Log de Sincronização')),
+            ],
+            options={
+                'verbose_name': 'Progresso da Sincronização 100%',
+                'verbose_name_plural': 'Progresso das Sincronizações 100%',
+                'db_table': 'asaas_sync_progresso',
+            },
+        ),
+    ]
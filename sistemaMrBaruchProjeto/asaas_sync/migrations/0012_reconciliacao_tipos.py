@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asaas_sync', '0011_asaassyncprogresso'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asaassyncronizacaolog',
+            name='tipo_sincronizacao',
+            field=models.CharField(choices=[('COMPLETO', 'Sincronização Completa'), ('BOLETOS_FALTANTES', 'Boletos Faltantes'), ('ALTERNATIVO', 'Sincronização Alternativa'), ('INCREMENTAL', 'Sincronização Incremental'), ('RECONCILIACAO', 'Reconciliação de Pagamentos')], default='COMPLETO', max_length=30, verbose_name='Tipo'),
+        ),
+        migrations.AlterField(
+            model_name='asaassyncjob',
+            name='tipo',
+            field=models.CharField(choices=[('SINCRONIZACAO', 'Sincronização (incremental/completa)'), ('BOLETOS_FALTANTES', 'Boletos Faltantes'), ('AUTO_SYNC', 'Sincronização Automática (script)'), ('IMPORTACAO_JSON_LIMPA', 'Importação JSON Limpa'), ('RECONCILIACAO', 'Reconciliação de Pagamentos')], max_length=30, verbose_name='Tipo'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asaas_sync', '0012_reconciliacao_tipos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asaassyncjob',
+            name='batimento_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Último Sinal de Vida'),
+        ),
+    ]
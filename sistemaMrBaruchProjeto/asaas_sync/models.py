@@ -2,6 +2,7 @@
 Models para armazenar dados sincronizados do Asaas
 Tabelas separadas para não misturar com os dados do sistema
 """
+from datetime import timedelta
 from django.db import models
 from django.utils import timezone
 
@@ -48,6 +49,7 @@ class AsaasClienteSyncronizado(models.Model):
     servico_restauracao_score = models.BooleanField('Restauração de Score', default=False)
     
     # Controle de sincronização
+    payload_hash = models.CharField('Hash do Payload', max_length=64, blank=True, null=True)
     sincronizado_em = models.DateTimeField('Sincronizado em', auto_now=True)
     criado_em = models.DateTimeField('Criado em', auto_now_add=True)
     
@@ -186,6 +188,7 @@ class AsaasCobrancaSyncronizada(models.Model):
     external_reference = models.CharField('Referência Externa', max_length=100, blank=True, null=True)
     
     # Controle de sincronização
+    payload_hash = models.CharField('Hash do Payload', max_length=64, blank=True, null=True)
     sincronizado_em = models.DateTimeField('Sincronizado em', auto_now=True)
     criado_em = models.DateTimeField('Criado em', auto_now_add=True)
     
@@ -237,6 +240,8 @@ class AsaasSyncronizacaoLog(models.Model):
         ('COMPLETO', 'Sincronização Completa'),
         ('BOLETOS_FALTANTES', 'Boletos Faltantes'),
         ('ALTERNATIVO', 'Sincronização Alternativa'),
+        ('INCREMENTAL', 'Sincronização Incremental'),
+        ('RECONCILIACAO', 'Reconciliação de Pagamentos'),
     ]
     
     # Dados da sincronização
@@ -254,6 +259,10 @@ class AsaasSyncronizacaoLog(models.Model):
     cobrancas_novas = models.IntegerField('Cobranças Novas', default=0)
     cobrancas_atualizadas = models.IntegerField('Cobranças Atualizadas', default=0)
     
+    # Desempenho do download
+    total_paginas = models.IntegerField('Páginas Baixadas', default=0)
+    paginas_por_segundo = models.DecimalField('Páginas/s', max_digits=8, decimal_places=2, blank=True, null=True)
+    
     # Mensagens e erros
     mensagem = models.TextField('Mensagem', blank=True, null=True)
     erros = models.TextField('Erros', blank=True, null=True)
@@ -279,6 +288,158 @@ class AsaasSyncronizacaoLog(models.Model):
             self.save(update_fields=['duracao_segundos'])
 
 
+class AsaasSyncCheckpoint(models.Model):
+    """
+    Marcas d'água (high-water marks) da sincronização incremental, uma por conta.
+    A sincronização incremental busca apenas o que mudou desde estas marcas;
+    de tempos em tempos uma reconciliação completa é feita como garantia.
+    """
+    
+    conta = models.CharField('Conta', max_length=30, unique=True)
+    
+    # Marcas d'água
+    ultimo_date_created = models.DateField('Último dateCreated Visto', blank=True, null=True)
+    ultima_sincronizacao = models.DateTimeField('Última Sincronização', blank=True, null=True)
+    ultimo_webhook_em = models.DateTimeField('Último Webhook Aplicado', blank=True, null=True)
+    ultima_reconciliacao_completa = models.DateTimeField('Última Reconciliação Completa', blank=True, null=True)
+    
+    atualizado_em = models.DateTimeField('Atualizado em', auto_now=True)
+    
+    class Meta:
+        db_table = 'asaas_sync_checkpoints'
+        verbose_name = 'Checkpoint de Sincronização'
+        verbose_name_plural = 'Checkpoints de Sincronização'
+    
+    def __str__(self):
+        return f"Checkpoint {self.conta} - {self.ultima_sincronizacao or 'nunca sincronizado'}"
+    
+    def precisa_reconciliacao_completa(self, intervalo_horas=24):
+        """Sem histórico ou reconciliação vencida → sincronização completa"""
+        if not self.ultima_sincronizacao or not self.ultima_reconciliacao_completa:
+            return True
+        return timezone.now() - self.ultima_reconciliacao_completa > timedelta(hours=intervalo_horas)
+    
+    def data_inicio_delta(self):
+        """Data a partir da qual buscar alterações (1 dia de sobreposição por segurança)"""
+        datas = [self.ultima_sincronizacao.date()] if self.ultima_sincronizacao else []
+        if self.ultimo_date_created:
+            datas.append(self.ultimo_date_created)
+        return min(datas) - timedelta(days=1)
+
+
+class AsaasSyncProgresso(models.Model):
+    """
+    Progresso da sincronização 100% (sincronizar_asaas_auto.py), uma linha por conta.
+    Gravado a cada página baixada: uma execução interrompida (falha, deploy,
+    gunicorn reiniciado) continua com --resume do ponto onde parou.
+    """
+    
+    ETAPA_CHOICES = [
+        ('CLIENTES', 'Baixando Clientes'),
+        ('COBRANCAS', 'Baixando Cobranças'),
+        ('LIMPEZA', 'Excluindo Obsoletos'),
+        ('CONCLUIDO', 'Concluído'),
+    ]
+    
+    conta = models.CharField('Conta', max_length=30, unique=True)
+    modo_global = models.BooleanField('Listagem Global de Cobranças', default=True)
+    etapa = models.CharField('Etapa', max_length=20, choices=ETAPA_CHOICES, default='CLIENTES')
+    log = models.ForeignKey(
+        AsaasSyncronizacaoLog,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='progressos',
+        verbose_name='Log de Sincronização'
+    )
+    iniciado_em = models.DateTimeField('Início da Execução')
+    
+    # Clientes: próximo offset da listagem /customers
+    offset_clientes = models.IntegerField('Próximo Offset de Clientes', default=0)
+    total_clientes_esperado = models.IntegerField('Total de Clientes Esperado', blank=True, null=True)
+    
+    # Cobranças por cliente: último cliente concluído + offset do cliente em andamento
+    ultimo_cliente_concluido = models.CharField('Último Cliente Concluído', max_length=100, blank=True, null=True)
+    cliente_em_andamento = models.CharField('Cliente em Andamento', max_length=100, blank=True, null=True)
+    # Cobranças globais: janela de dateCreated em andamento
+    janela_atual = models.IntegerField('Janela Atual', default=0)
+    offset_cobrancas = models.IntegerField('Próximo Offset de Cobranças', default=0)
+    
+    stats = models.JSONField('Estatísticas', default=dict, blank=True)
+    atualizado_em = models.DateTimeField('Atualizado em', auto_now=True)
+    
+    class Meta:
+        db_table = 'asaas_sync_progresso'
+        verbose_name = 'Progresso da Sincronização 100%'
+        verbose_name_plural = 'Progresso das Sincronizações 100%'
+    
+    def __str__(self):
+        return f"Progresso {self.conta} - {self.get_etapa_display()}"
+    
+    @property
+    def pode_retomar(self):
+        return self.etapa != 'CONCLUIDO'
+
+
+class AsaasSyncJob(models.Model):
+    """
+    Fila de tarefas longas do Asaas (sincronizações e importações).
+    As views apenas enfileiram; o comando `processar_jobs_asaas` executa
+    fora do ciclo HTTP e grava o progresso no AsaasSyncronizacaoLog vinculado.
+    """
+    
+    TIPO_CHOICES = [
+        ('SINCRONIZACAO', 'Sincronização (incremental/completa)'),
+        ('BOLETOS_FALTANTES', 'Boletos Faltantes'),
+        ('AUTO_SYNC', 'Sincronização Automática (script)'),
+        ('IMPORTACAO_JSON_LIMPA', 'Importação JSON Limpa'),
+        ('RECONCILIACAO', 'Reconciliação de Pagamentos'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('EM_EXECUCAO', 'Em Execução'),
+        ('CONCLUIDO', 'Concluído'),
+        ('ERRO', 'Erro'),
+    ]
+    
+    tipo = models.CharField('Tipo', max_length=30, choices=TIPO_CHOICES)
+    parametros = models.JSONField('Parâmetros', default=dict, blank=True)
+    status = models.CharField('Status', max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
+    log = models.ForeignKey(
+        AsaasSyncronizacaoLog,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name='Log de Sincronização'
+    )
+    usuario = models.CharField('Usuário', max_length=100, blank=True, null=True)
+    
+    # Controle de execução
+    tentativas = models.IntegerField('Tentativas', default=0)
+    max_tentativas = models.IntegerField('Máximo de Tentativas', default=1)
+    worker = models.CharField('Worker', max_length=100, blank=True, null=True)
+    erro = models.TextField('Erro', blank=True, null=True)
+    
+    criado_em = models.DateTimeField('Criado em', auto_now_add=True)
+    iniciado_em = models.DateTimeField('Iniciado em', blank=True, null=True)
+    batimento_em = models.DateTimeField('Último Sinal de Vida', blank=True, null=True)  # Atualizado durante a execução
+    finalizado_em = models.DateTimeField('Finalizado em', blank=True, null=True)
+    
+    class Meta:
+        db_table = 'asaas_sync_jobs'
+        verbose_name = 'Tarefa de Sincronização'
+        verbose_name_plural = 'Tarefas de Sincronização'
+        ordering = ['criado_em']
+        indexes = [
+            models.Index(fields=['status', 'criado_em'], name='asaas_sync_job_fila_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.id} - {self.get_status_display()}"
+
+
 class DocumentoClienteAsaas(models.Model):
     """Documentos anexados aos clientes Asaas"""
     
@@ -383,6 +544,7 @@ class AsaasClienteSyncronizado2(models.Model):
     servico_restauracao_score = models.BooleanField('Restauração de Score', default=False)
     
     # Controle de sincronização
+    payload_hash = models.CharField('Hash do Payload', max_length=64, blank=True, null=True)
     sincronizado_em = models.DateTimeField('Sincronizado em', auto_now=True)
     criado_em = models.DateTimeField('Criado em', auto_now_add=True)
     
@@ -515,6 +677,7 @@ class AsaasCobrancaSyncronizada2(models.Model):
     external_reference = models.CharField('Referência Externa', max_length=100, blank=True, null=True)
     
     # Controle de sincronização
+    payload_hash = models.CharField('Hash do Payload', max_length=64, blank=True, null=True)
     sincronizado_em = models.DateTimeField('Sincronizado em', auto_now=True)
     criado_em = models.DateTimeField('Criado em', auto_now_add=True)
     
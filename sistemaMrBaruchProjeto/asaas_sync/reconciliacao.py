@@ -0,0 +1,326 @@
+"""
+Reconciliação em lote dos pagamentos locais com o estado real do Asaas
+Detecta webhooks perdidos comparando Parcela, PixEntrada e PixLevantamento com
+a listagem global de payments do Asaas:
+
+1. Carrega em dicionários (payment_id -> linha) os registros locais com id do Asaas
+2. Baixa as cobranças pelo mesmo pipeline da sincronização (janelas em paralelo,
+   limitador da conta) e faz o join em memória, página a página
+3. Aplica as correções:
+   - pagamentos confirmados no Asaas e não baixados aqui passam pela máquina de
+     estados (core.maquina_pagamentos), para gerar comissões, contrato e NF
+   - vencimento, reabertura e estorno de parcelas e vencimento de PIX de entrada
+     são UPDATEs em lote (um por tipo de correção, com o status anterior no filtro)
+   - data de pagamento divergente: bulk_update
+4. Monta o relatório de divergências (inclusive as que não são corrigidas
+   automaticamente: pago aqui e pendente no Asaas, valor diferente, cobrança
+   ausente no Asaas)
+
+Modo diário (padrão): cobranças criadas, pagas ou vencendo nos últimos
+ASAAS_RECONCILIACAO_DIAS dias. Modo completo: listagem global inteira (só nele as
+cobranças locais ausentes no Asaas são reportadas).
+
+Usado pelo comando `reconciliar_pagamentos_asaas` e pelo job RECONCILIACAO.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.utils import timezone
+from core.cache_relatorios import invalidar_apos_commit
+from .sync_completo import AsaasSyncCompleto
+
+logger = logging.getLogger(__name__)
+
+
+STATUS_PAGOS = ('RECEIVED', 'CONFIRMED', 'RECEIVED_IN_CASH')
+STATUS_VENCIDOS = ('OVERDUE',)
+STATUS_PENDENTES = ('PENDING', 'AWAITING_RISK_ANALYSIS')
+STATUS_ESTORNADOS = ('REFUNDED',)
+
+# Itens por categoria guardados no relatório (as contagens são sempre completas)
+LIMITE_ITENS_RELATORIO = 200
+
+
+class RelatorioDivergencias:
+    """Divergências encontradas, por categoria"""
+
+    def __init__(self):
+        self.contagens = defaultdict(int)
+        self.itens = defaultdict(list)
+
+    def registrar(self, categoria, tipo, objeto_id, payment_id, local, asaas):
+        self.contagens[categoria] += 1
+        if len(self.itens[categoria]) < LIMITE_ITENS_RELATORIO:
+            self.itens[categoria].append({
+                'tipo': tipo, 'id': objeto_id, 'payment_id': payment_id, 'local': local, 'asaas': asaas,
+            })
+
+    @property
+    def total(self):
+        return sum(self.contagens.values())
+
+    def como_dict(self):
+        return {
+            'total': self.total,
+            'contagens': dict(self.contagens),
+            'itens': {categoria: itens for categoria, itens in self.itens.items()},
+        }
+
+    def resumo(self):
+        if not self.contagens:
+            return 'Nenhuma divergência'
+        return '\n'.join(f"   {categoria}: {quantidade}" for categoria, quantidade in sorted(self.contagens.items()))
+
+
+class ReconciliacaoPagamentos(AsaasSyncCompleto):
+    """Reconciliação Parcela / PixEntrada / PixLevantamento x Asaas (reaproveita o download da sincronização)"""
+
+    def __init__(self, *args, simular=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.simular = simular
+
+    # =========================================================================
+    # Estado local (dict joins)
+    # =========================================================================
+
+    def _carregar_locais(self):
+        """payment_id -> (tipo, pk, status, data_pagamento, valor)"""
+        from financeiro.models import Parcela, PixEntrada, PixLevantamento
+
+        locais = {}
+        for pk, payment_id, status, data_pagamento, valor in (
+            Parcela.objects.exclude(id_asaas='').order_by()
+            .values_list('id', 'id_asaas', 'status', 'data_pagamento', 'valor').iterator(chunk_size=5000)
+        ):
+            locais[payment_id] = ('PARCELA', pk, status, data_pagamento, valor)
+        for pk, payment_id, status, data_pagamento, valor in (
+            PixEntrada.objects.order_by()
+            .values_list('id', 'asaas_payment_id', 'status_pagamento', 'data_pagamento', 'valor').iterator(chunk_size=5000)
+        ):
+            locais[payment_id] = ('PIX_ENTRADA', pk, status, data_pagamento, valor)
+        for pk, payment_id, status, valor in (
+            PixLevantamento.objects.order_by()
+            .values_list('id', 'asaas_payment_id', 'status_pagamento', 'valor').iterator(chunk_size=5000)
+        ):
+            locais[payment_id] = ('PIX_LEVANTAMENTO', pk, status, None, valor)
+        return locais
+
+    # =========================================================================
+    # Comparação
+    # =========================================================================
+
+    def _comparar(self, cobranca, local, correcoes, relatorio):
+        """Classifica a divergência de uma cobrança e agenda a correção"""
+        tipo, pk, status_local, data_local, valor_local = local
+        payment_id = cobranca.get('id')
+        status_asaas = cobranca.get('status') or ''
+        pago_local = status_local in ('paga', 'pago')
+
+        valor_asaas = cobranca.get('value')
+        if valor_asaas is not None and valor_local is not None and Decimal(str(valor_asaas)) != valor_local:
+            relatorio.registrar('valor_divergente', tipo, pk, payment_id, str(valor_local), str(valor_asaas))
+
+        if status_asaas in STATUS_PAGOS:
+            if not pago_local:
+                relatorio.registrar('pago_no_asaas', tipo, pk, payment_id, status_local, status_asaas)
+                correcoes['pagar'].append((tipo, pk, cobranca))
+            elif tipo == 'PARCELA':
+                data_asaas = self._parse_date(cobranca.get('paymentDate') or cobranca.get('clientPaymentDate'))
+                if data_asaas and data_local != data_asaas:
+                    relatorio.registrar('data_pagamento_divergente', tipo, pk, payment_id, str(data_local), str(data_asaas))
+                    correcoes['data_pagamento'].append((pk, data_asaas))
+            return
+
+        if pago_local:
+            # Baixa manual ou webhook de estorno perdido: só estorno é corrigido automaticamente
+            if status_asaas in STATUS_ESTORNADOS and tipo == 'PARCELA':
+                relatorio.registrar('estornado_no_asaas', tipo, pk, payment_id, status_local, status_asaas)
+                correcoes['estornar_parcela'].append(pk)
+            else:
+                relatorio.registrar('pago_local_pendente_asaas', tipo, pk, payment_id, status_local, status_asaas)
+            return
+
+        if status_asaas in STATUS_VENCIDOS:
+            if tipo == 'PARCELA' and status_local == 'aberta':
+                relatorio.registrar('vencido_no_asaas', tipo, pk, payment_id, status_local, status_asaas)
+                correcoes['vencer_parcela'].append(pk)
+            elif tipo == 'PIX_ENTRADA' and status_local == 'pendente':
+                relatorio.registrar('vencido_no_asaas', tipo, pk, payment_id, status_local, status_asaas)
+                correcoes['vencer_pix_entrada'].append(pk)
+            elif tipo == 'PIX_LEVANTAMENTO' and status_local == 'pendente':
+                relatorio.registrar('vencido_no_asaas', tipo, pk, payment_id, status_local, status_asaas)
+                correcoes['vencer_pix_levantamento'].append((tipo, pk, cobranca))
+        elif status_asaas in STATUS_PENDENTES:
+            if tipo == 'PARCELA' and status_local == 'vencida':
+                # Vencimento prorrogado no Asaas: reabre com o novo vencimento (senão
+                # marcar_parcelas_vencidas venceria de novo no dia seguinte)
+                relatorio.registrar('reaberto_no_asaas', tipo, pk, payment_id, status_local, status_asaas)
+                correcoes['reabrir_parcela'].append((pk, self._parse_date(cobranca.get('dueDate'))))
+
+    # =========================================================================
+    # Correções
+    # =========================================================================
+
+    def _aplicar_correcoes(self, correcoes):
+        """Aplica as correções agendadas. Returns: dict tipo_correcao -> quantidade aplicada"""
+        from core.maquina_pagamentos import EventoPagamento, aplicar_evento
+        from financeiro.models import Parcela, PixEntrada
+
+        aplicadas = defaultdict(int)
+
+        # Transições com efeitos colaterais: uma a uma pela máquina de estados
+        for chave, evento in (('pagar', 'PAYMENT_RECEIVED'), ('vencer_pix_levantamento', 'PAYMENT_OVERDUE')):
+            for tipo, pk, cobranca in correcoes[chave]:
+                valor = cobranca.get('value')
+                try:
+                    aplicar_evento(EventoPagamento(
+                        evento=evento,
+                        payment_id=cobranca.get('id'),
+                        status=cobranca.get('status'),
+                        valor=Decimal(str(valor)) if valor is not None else None,
+                        external_reference=cobranca.get('externalReference'),
+                    ))
+                    aplicadas[chave] += 1
+                except Exception as e:
+                    logger.error(f"❌ Reconciliação: falha ao aplicar {evento} em {tipo} #{pk}: {str(e)}")
+
+        # Data de pagamento das parcelas recém-baixadas pela máquina (que usa a data de hoje)
+        for tipo, pk, cobranca in correcoes['pagar']:
+            data_asaas = self._parse_date(cobranca.get('paymentDate') or cobranca.get('clientPaymentDate'))
+            if tipo == 'PARCELA' and data_asaas:
+                correcoes['data_pagamento'].append((pk, data_asaas))
+
+        # Demais correções: UPDATEs em lote, protegidos pelo status anterior
+        lotes = (
+            ('vencer_parcela', Parcela.objects.filter(status='aberta'), {'status': 'vencida'}),
+            ('estornar_parcela', Parcela.objects.filter(status='paga'), {'status': 'cancelada', 'data_pagamento': None}),
+            ('vencer_pix_entrada', PixEntrada.objects.filter(status_pagamento='pendente'), {'status_pagamento': 'vencido'}),
+        )
+        for chave, queryset, campos in lotes:
+            ids = correcoes[chave]
+            for inicio in range(0, len(ids), 1000):
+                aplicadas[chave] += queryset.filter(pk__in=ids[inicio:inicio + 1000]).update(**campos)
+
+        # Reabertas: status e vencimento do Asaas juntos, num bulk_update
+        vencimentos = dict(correcoes['reabrir_parcela'])
+        if vencimentos:
+            parcelas = list(
+                Parcela.objects.filter(pk__in=vencimentos.keys(), status='vencida').only('id', 'status', 'data_vencimento')
+            )
+            for parcela in parcelas:
+                parcela.status = 'aberta'
+                parcela.data_vencimento = vencimentos[parcela.pk] or parcela.data_vencimento
+            Parcela.objects.bulk_update(parcelas, ['status', 'data_vencimento'], batch_size=500)
+            aplicadas['reabrir_parcela'] += len(parcelas)
+
+        datas = dict(correcoes['data_pagamento'])
+        if datas:
+            parcelas = list(Parcela.objects.filter(pk__in=datas.keys(), status='paga').only('id', 'data_pagamento'))
+            for parcela in parcelas:
+                parcela.data_pagamento = datas[parcela.pk]
+            Parcela.objects.bulk_update(parcelas, ['data_pagamento'], batch_size=500)
+            aplicadas['data_pagamento'] += len(parcelas)
+
+        if any(aplicadas.values()):
+            # UPDATEs em lote não disparam post_save
+            invalidar_apos_commit('parcela')
+        return dict(aplicadas)
+
+    # =========================================================================
+    # Execução
+    # =========================================================================
+
+    def executar(self, dias=None, completo=False, usuario=None, log=None):
+        """
+        Executa a reconciliação.
+
+        Returns:
+            dict com verificadas, divergencias (relatório), aplicadas, ausentes_no_asaas,
+            falhas_download, duracao e log_id
+        """
+        dias = int(dias or getattr(settings, 'ASAAS_RECONCILIACAO_DIAS', 7))
+        desde = timezone.localdate() - timedelta(days=dias)
+        escopo = 'completa' if completo else f'desde {desde:%d/%m/%Y}'
+        log = self._iniciar_log(log, 'RECONCILIACAO', usuario, f'Reconciliação de pagamentos ({escopo})...')
+
+        try:
+            inicio = timezone.now()
+            self._reiniciar_estado()
+            locais = self._carregar_locais()
+            logger.info(f"🔎 Reconciliação {escopo}: {len(locais)} cobranças locais com id do Asaas")
+
+            paginas = self.iterar_paginas_cobrancas_globais() if completo else self.iterar_paginas_cobrancas_alteradas(desde)
+            relatorio = RelatorioDivergencias()
+            correcoes = defaultdict(list)
+            vistos = set()
+            for pagina in paginas:
+                for cobranca in pagina:
+                    payment_id = cobranca.get('id')
+                    if payment_id in vistos:
+                        continue  # Mesma cobrança em mais de uma listagem do modo diário
+                    vistos.add(payment_id)
+                    local = locais.get(payment_id)
+                    if local is not None:
+                        self._comparar(cobranca, local, correcoes, relatorio)
+
+            verificadas = len(vistos & locais.keys())
+            if completo and not self.falhas_download:
+                # Só com a listagem inteira e sem falhas a ausência é confiável
+                for payment_id in locais.keys() - vistos:
+                    tipo, pk, status_local, _, _ = locais[payment_id]
+                    relatorio.registrar('ausente_no_asaas', tipo, pk, payment_id, status_local, None)
+
+            aplicadas = {} if self.simular else self._aplicar_correcoes(correcoes)
+            duracao = (timezone.now() - inicio).total_seconds()
+
+            resultado = {
+                'verificadas': verificadas,
+                'divergencias': relatorio.como_dict(),
+                'aplicadas': aplicadas,
+                'falhas_download': self.falhas_download,
+                'duracao': round(duracao, 1),
+                'log_id': log.id,
+            }
+            self._finalizar_log(log, resultado, relatorio, escopo)
+            return resultado
+
+        except Exception as e:
+            logger.error(f"❌ ERRO FATAL na reconciliação: {str(e)}", exc_info=True)
+            log.status = 'ERRO'
+            log.data_fim = timezone.now()
+            log.mensagem = f'Erro fatal: {str(e)}'
+            log.erros = str(e)
+            log.save()
+            raise
+
+    def _finalizar_log(self, log, resultado, relatorio, escopo):
+        from core.services import LogService
+
+        total_aplicadas = sum(resultado['aplicadas'].values())
+        log.total_cobrancas = resultado['verificadas']
+        log.cobrancas_atualizadas = total_aplicadas
+        log.total_paginas = self.paginas_baixadas
+        log.status = 'PARCIAL' if self.falhas_download else 'SUCESSO'
+        log.data_fim = timezone.now()
+        log.duracao_segundos = int(resultado['duracao'])
+        log.mensagem = f"""🔎 Reconciliação de pagamentos ({escopo}){' - SIMULAÇÃO' if self.simular else ''}
+
+💰 Cobranças verificadas: {resultado['verificadas']}
+⚠️  Divergências: {relatorio.total}
+{relatorio.resumo()}
+✅ Correções aplicadas: {total_aplicadas}
+⏱️  Duração: {resultado['duracao']:.0f} segundos"""
+        if self.falhas_download:
+            log.erros = f"{self.falhas_download} falhas de download (cobranças ausentes não reportadas)"
+        log.save()
+
+        if relatorio.total:
+            LogService.registrar(
+                nivel='WARNING',
+                mensagem=f"Reconciliação Asaas: {relatorio.total} divergências, {total_aplicadas} corrigidas "
+                         f"({dict(relatorio.contagens)})",
+                modulo='asaas_sync',
+                acao='reconciliacao_divergencias'
+            )
@@ -6,8 +6,9 @@ import requests
 import logging
 from django.conf import settings
 from django.utils import timezone
-from decimal import Decimal
 from datetime import datetime
+from core.asaas_client import AsaasClient
+from .upsert_lote import UpsertEmLote, mapear_cliente, mapear_cobranca
 from .models import AsaasClienteSyncronizado, AsaasCobrancaSyncronizada, AsaasSyncronizacaoLog
 
 logger = logging.getLogger(__name__)
@@ -29,23 +30,25 @@ class AsaasSyncService:
         self.timeout = 120
         self.limite_por_pagina = 100 
     
+    @property
+    def client(self):
+        """
+        Cliente da conta atual. Montado a cada uso porque as views trocam
+        api_token depois da criação (conta alternativa); a Session e o
+        limitador continuam compartilhados por token.
+        """
+        return AsaasClient(self.api_token, base_url=self.base_url, timeout=self.timeout)
+    
     def _fazer_requisicao(self, metodo, endpoint, params=None):
         """Faz requisição à API do Asaas"""
         url = f"{self.base_url}/{endpoint}"
         
         try:
-            response = requests.request(
-                method=metodo,
-                url=url,
-                params=params,
-                headers=self.headers,
-                timeout=self.timeout
-            )
+            response = self.client.request(metodo, endpoint, params=params)
             
             # Log detalhado para debug
             logger.info(f"Requisição {metodo} para {url}")
             logger.info(f"Status Code: {response.status_code}")
-            logger.info(f"Headers enviados: {self.headers}")
             
             # Verificar status code ANTES de tentar parsear JSON
             if response.status_code == 401:
@@ -120,46 +123,14 @@ class AsaasSyncService:
         
         logger.info(f"Encontrados {len(clientes)} clientes (total: {total_count})")
         
-        for cliente_data in clientes:
-            try:
-                asaas_id = cliente_data.get('id')
-                
-                # Verifica se cliente já existe
-                cliente, created = AsaasClienteSyncronizado.objects.update_or_create(
-                    asaas_customer_id=asaas_id,
-                    defaults={
-                        'nome': cliente_data.get('name', ''),
-                        'cpf_cnpj': cliente_data.get('cpfCnpj', ''),
-                        'email': cliente_data.get('email', ''),
-                        'telefone': cliente_data.get('phone', ''),
-                        'celular': cliente_data.get('mobilePhone', ''),
-                        'cep': cliente_data.get('postalCode', ''),
-                        'endereco': cliente_data.get('address', ''),
-                        'numero': cliente_data.get('addressNumber', ''),
-                        'complemento': cliente_data.get('complement', ''),
-                        'bairro': cliente_data.get('province', ''),
-                        'cidade': cliente_data.get('city', ''),
-                        'estado': cliente_data.get('state', ''),
-                        'inscricao_municipal': cliente_data.get('municipalInscription', ''),
-                        'inscricao_estadual': cliente_data.get('stateInscription', ''),
-                        'observacoes': cliente_data.get('observations', ''),
-                        'external_reference': cliente_data.get('externalReference', ''),
-                        'notificacoes_desabilitadas': cliente_data.get('notificationDisabled', False),
-                        'data_criacao_asaas': self._parse_datetime(cliente_data.get('dateCreated')),
-                    }
-                )
-                
-                stats['total'] += 1
-                if created:
-                    stats['novos'] += 1
-                    logger.info(f"✅ Cliente novo: {cliente.nome}")
-                else:
-                    stats['atualizados'] += 1
-                    logger.info(f"🔄 Cliente atualizado: {cliente.nome}")
-                    
-            except Exception as e:
-                stats['erros'] += 1
-                logger.error(f"Erro ao sincronizar cliente {cliente_data.get('id')}: {str(e)}")
+        # Upsert em lote: um SELECT + uma escrita por página em vez de um update_or_create por cliente
+        resultado = UpsertEmLote(AsaasClienteSyncronizado, 'asaas_customer_id').executar(
+            mapear_cliente(cliente_data) for cliente_data in clientes
+        )
+        for chave in stats:
+            stats[chave] = resultado[chave]
+        logger.info(f"✅ Clientes: {resultado['novos']} novos, {resultado['atualizados']} atualizados, "
+                    f"{resultado['inalterados']} sem alteração")
         
         # NÃO fazer paginação recursiva automática para evitar timeout
         # A sincronização deve ser feita em lotes controlados
@@ -201,41 +172,11 @@ class AsaasSyncService:
         cobrancas = response.get('data', [])
         has_more = response.get('hasMore', False)
         
-        for cobranca_data in cobrancas:
-            try:
-                asaas_payment_id = cobranca_data.get('id')
-                
-                cobranca, created = AsaasCobrancaSyncronizada.objects.update_or_create(
-                    asaas_payment_id=asaas_payment_id,
-                    defaults={
-                        'cliente': cliente_sync,
-                        'tipo_cobranca': cobranca_data.get('billingType', 'UNDEFINED'),
-                        'status': cobranca_data.get('status', 'PENDING'),
-                        'valor': Decimal(str(cobranca_data.get('value', 0))),
-                        'valor_liquido': Decimal(str(cobranca_data.get('netValue', 0))) if cobranca_data.get('netValue') else None,
-                        'descricao': cobranca_data.get('description', ''),
-                        'data_vencimento': self._parse_date(cobranca_data.get('dueDate')),
-                        'data_pagamento': self._parse_date(cobranca_data.get('paymentDate')),
-                        'data_criacao_asaas': self._parse_datetime(cobranca_data.get('dateCreated')),
-                        'invoice_url': cobranca_data.get('invoiceUrl', ''),
-                        'bank_slip_url': cobranca_data.get('bankSlipUrl', ''),
-                        'pix_qrcode_url': cobranca_data.get('pixQrCodeUrl', ''),
-                        'pix_copy_paste': cobranca_data.get('pixCopyAndPaste', ''),
-                        'numero_parcela': cobranca_data.get('installmentNumber'),
-                        'total_parcelas': cobranca_data.get('installmentCount'),
-                        'external_reference': cobranca_data.get('externalReference', ''),
-                    }
-                )
-                
-                stats['total'] += 1
-                if created:
-                    stats['novas'] += 1
-                else:
-                    stats['atualizadas'] += 1
-                    
-            except Exception as e:
-                stats['erros'] += 1
-                logger.error(f"Erro ao sincronizar cobrança {cobranca_data.get('id')}: {str(e)}")
+        resultado = self._salvar_cobrancas(cobrancas, cliente_sync.id)
+        stats['total'] = resultado['total']
+        stats['novas'] = resultado['novos']
+        stats['atualizadas'] = resultado['atualizados']
+        stats['erros'] = resultado['erros']
         
         # NÃO fazer paginação recursiva - processar apenas primeira página
         # Para sincronizar todas as cobranças, use sincronizar_boletos_faltantes
@@ -376,6 +317,19 @@ Para sincronizar TODOS os dados, use: "Sincronizar Boletos Faltantes" """
             
             return log
     
+    def _salvar_cobrancas(self, cobrancas_data, cliente_id):
+        """
+        Grava uma página de cobranças do mesmo cliente via upsert em lote
+        
+        Returns:
+            dict de UpsertEmLote.executar (cobranças sem vencimento contam como erro)
+        """
+        registros = [mapear_cobranca(cobranca_data, cliente_id) for cobranca_data in cobrancas_data]
+        validos = [registro for registro in registros if registro['data_vencimento']]
+        resultado = UpsertEmLote(AsaasCobrancaSyncronizada, 'asaas_payment_id').executar(validos)
+        resultado['erros'] += len(registros) - len(validos)
+        return resultado
+    
     def _parse_date(self, date_string):
         """Converte string de data para date"""
         if not date_string:
@@ -475,41 +429,11 @@ Para sincronizar TODOS os dados, use: "Sincronizar Boletos Faltantes" """
                     
                     cobrancas_api_count += len(cobrancas_data)
                     
-                    # Processar cada cobrança
-                    for cobranca_data in cobrancas_data:
-                        try:
-                            asaas_payment_id = cobranca_data.get('id')
-                            
-                            cobranca, created = AsaasCobrancaSyncronizada.objects.update_or_create(
-                                asaas_payment_id=asaas_payment_id,
-                                defaults={
-                                    'cliente': cliente,
-                                    'tipo_cobranca': cobranca_data.get('billingType', 'UNDEFINED'),
-                                    'status': cobranca_data.get('status', 'PENDING'),
-                                    'valor': Decimal(str(cobranca_data.get('value', 0))),
-                                    'valor_liquido': Decimal(str(cobranca_data.get('netValue', 0))) if cobranca_data.get('netValue') else None,
-                                    'descricao': cobranca_data.get('description', ''),
-                                    'data_vencimento': self._parse_date(cobranca_data.get('dueDate')),
-                                    'data_pagamento': self._parse_date(cobranca_data.get('paymentDate')),
-                                    'data_criacao_asaas': self._parse_datetime(cobranca_data.get('dateCreated')),
-                                    'invoice_url': cobranca_data.get('invoiceUrl', ''),
-                                    'bank_slip_url': cobranca_data.get('bankSlipUrl', ''),
-                                    'pix_qrcode_url': cobranca_data.get('pixQrCodeUrl', ''),
-                                    'pix_copy_paste': cobranca_data.get('pixCopyAndPaste', ''),
-                                    'numero_parcela': cobranca_data.get('installmentNumber'),
-                                    'total_parcelas': cobranca_data.get('installmentCount'),
-                                    'external_reference': cobranca_data.get('externalReference', ''),
-                                }
-                            )
-                            
-                            if created:
-                                novas_count += 1
-                            else:
-                                atualizadas_count += 1
-                                
-                        except Exception as e:
-                            logger.error(f"    ❌ Erro ao processar cobrança {cobranca_data.get('id')}: {str(e)}")
-                            stats['erros'] += 1
+                    # Gravar a página inteira em lote
+                    resultado = self._salvar_cobrancas(cobrancas_data, cliente.id)
+                    novas_count += resultado['novos']
+                    atualizadas_count += resultado['atualizados']
+                    stats['erros'] += resultado['erros']
                     
                     if not has_more:
                         break
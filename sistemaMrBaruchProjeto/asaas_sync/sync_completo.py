@@ -1,405 +1,491 @@
 """
 Sincronização COMPLETA e ROBUSTA do Asaas
-Estratégia: Baixar TUDO em JSON → Salvar no banco depois
+Estratégia: cada página baixada é gravada no banco assim que chega (memória constante)
 """
 import requests
 import json
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from django.conf import settings
 from django.utils import timezone
 from decimal import Decimal
-from datetime import datetime
-from .models import AsaasClienteSyncronizado, AsaasCobrancaSyncronizada, AsaasSyncronizacaoLog
+from datetime import datetime, date, timedelta
+from core.asaas_client import AsaasClient
+from core.asaas_rate_limiter import obter_retry_after
+from .upsert_lote import UpsertEmLote, mapear_cliente, mapear_cobranca, somar_stats
+from .models import AsaasClienteSyncronizado, AsaasCobrancaSyncronizada, AsaasSyncronizacaoLog, AsaasSyncCheckpoint
 
 logger = logging.getLogger(__name__)
 
 
+def gerar_janelas_data(data_inicial, data_final=None, dias=30):
+    """
+    Divide o período em janelas de dateCreated (datas inclusivas, sem sobreposição).
+    
+    A primeira janela é aberta no início (tudo antes de data_inicial) e a última
+    é aberta no fim, então nenhuma cobrança fica de fora independente da idade da conta.
+    
+    Returns:
+        lista de tuplas (inicio, fim) com date ou None
+    """
+    data_final = data_final or timezone.localdate()
+    janelas = [(None, data_inicial - timedelta(days=1))]
+    inicio = data_inicial
+    while inicio + timedelta(days=dias) <= data_final:
+        fim = inicio + timedelta(days=dias - 1)
+        janelas.append((inicio, fim))
+        inicio = fim + timedelta(days=1)
+    janelas.append((inicio, None))
+    return janelas
+
+
 class AsaasSyncCompleto:
     """
-    Sincronização completa em 2 FASES:
-    FASE 1: Baixar TODOS os dados da API (clientes e cobranças) em JSON
-    FASE 2: Salvar/Atualizar tudo no banco de dados
+    Sincronização completa em pipeline (streaming):
+    FASE 1: Baixar as páginas da API (clientes e cobranças)
+    FASE 2: Salvar/Atualizar cada página no banco assim que ela chega
+    
+    O download usa um pool de threads limitado + token bucket compartilhado
+    por conta (core.asaas_rate_limiter), no lugar de sleeps fixos. As páginas
+    passam por uma fila limitada até a thread principal, que grava no banco.
     """
     
-    def __init__(self, api_token=None, api_url=None):
+    def __init__(self, api_token=None, api_url=None, conta='principal'):
+        self.conta = conta  # Chave do checkpoint incremental
         self.api_token = api_token or getattr(settings, 'ASAAS_API_TOKEN', '')
         self.base_url = api_url or getattr(settings, 'ASAAS_API_URL', 'https://api.asaas.com/v3')
-        self.headers = {
-            'Content-Type': 'application/json',
-            'access_token': self.api_token
-        }
         self.timeout = 120  # 2 minutos por requisição
         
-        # Armazenamento temporário dos dados
-        self.dados_clientes = []
-        self.dados_cobrancas = []
+        # Session compartilhada por token (pool de conexões para as threads do download)
+        self.client = AsaasClient(self.api_token, base_url=self.base_url, timeout=self.timeout, conta=conta)
+        
+        # Concorrência do download (limitada pela cota da conta no limitador)
+        self.max_workers = int(getattr(settings, 'ASAAS_SYNC_MAX_WORKERS', 5))
+        self.limitador = self.client.limitador
         
+        self._paginas_lock = threading.Lock()
+        self._reiniciar_estado()
+    
+    def _reiniciar_estado(self):
+        """Contadores da execução (as páginas em si não ficam em memória)"""
+        self.paginas_baixadas = 0
+        self.falhas_download = 0
+        self._ultimo_batimento = 0.0
+        self.clientes_baixados = 0
+        self.cobrancas_baixadas = 0
+        self.maior_date_created = None
+        self.stats_clientes = {'total': 0, 'novos': 0, 'atualizados': 0, 'inalterados': 0, 'erros': 0}
+        self.stats_cobrancas = {
+            'total': 0, 'novas': 0, 'atualizadas': 0, 'inalteradas': 0, 'erros': 0, 'sem_cliente': 0
+        }
+    
     def _fazer_requisicao(self, metodo, endpoint, params=None):
-        """Faz requisição à API do Asaas com retry e rate limit handling"""
-        url = f"{self.base_url}/{endpoint}"
-        max_tentativas = 3
+        """
+        Faz requisição à API do Asaas com retry e rate limit handling.
+        Seguro para uso concorrente: a Session e o limitador (aplicado pelo
+        cliente a cada requisição) são compartilhados entre as threads.
+        
+        Rate limit (429/403) não gasta as tentativas de erro: a espera do
+        Retry-After é feita pelo limitador na próxima requisição, e essas
+        esperas têm orçamento próprio (ASAAS_SYNC_MAX_ESPERAS_RATE_LIMIT).
+        """
+        max_tentativas = 5
+        max_esperas = int(getattr(settings, 'ASAAS_SYNC_MAX_ESPERAS_RATE_LIMIT', 30))
+        tentativa = 1
+        esperas = 0
         
-        for tentativa in range(1, max_tentativas + 1):
+        while tentativa <= max_tentativas:
             try:
-                logger.info(f"📡 {metodo} {endpoint} (tentativa {tentativa}/{max_tentativas})")
+                logger.debug(f"📡 {metodo} {endpoint} {params or ''} (tentativa {tentativa}/{max_tentativas})")
                 
-                response = requests.request(
-                    method=metodo,
-                    url=url,
-                    params=params,
-                    headers=self.headers,
-                    timeout=self.timeout
-                )
+                response = self.client.request(metodo, endpoint, params=params)
                 
                 if response.status_code == 200:
+                    with self._paginas_lock:
+                        self.paginas_baixadas += 1
                     return response.json()
                     
-                elif response.status_code == 429 or response.status_code == 403:  # Rate limit
-                    tempo_espera = 60 if response.status_code == 403 else 10
-                    logger.warning(f"⚠️  Rate limit atingido (erro {response.status_code}). Aguardando {tempo_espera}s...")
-                    import time
-                    time.sleep(tempo_espera)
+                elif response.status_code in (429, 403):
+                    esperas += 1
+                    if esperas > max_esperas:
+                        logger.error(f"❌ Rate limit persistente em {endpoint}: {max_esperas} esperas sem sucesso")
+                        return None
+                    logger.warning(f"⚠️  Rate limit atingido (erro {response.status_code}) em {endpoint} ({esperas}/{max_esperas})")
+                    if response.status_code == 403:
+                        # 403 sem Retry-After costuma ser bloqueio de cota: aguarda mais
+                        # (o 429 o cliente já registrou no limitador)
+                        self.limitador.registrar_rate_limit(obter_retry_after(response) or 60)
                     continue
                     
                 else:
                     logger.error(f"❌ Erro {response.status_code}: {response.text[:200]}")
                     if tentativa == max_tentativas:
                         return None
-                    import time
-                    time.sleep(2)
+                    time.sleep(2 ** (tentativa - 1))
                     
             except requests.exceptions.Timeout:
                 logger.error(f"❌ Timeout na tentativa {tentativa}")
                 if tentativa == max_tentativas:
                     return None
-                import time
-                time.sleep(3)
+                time.sleep(2 ** tentativa)
                 
             except Exception as e:
                 logger.error(f"❌ Erro inesperado: {str(e)}")
                 if tentativa == max_tentativas:
                     return None
-                import time
-                time.sleep(2)
+                time.sleep(2 ** (tentativa - 1))
+            
+            tentativa += 1
         
         return None
     
-    def baixar_todos_clientes(self):
+    # =========================================================================
+    # FASE 1: Download em streaming (páginas entregues conforme chegam)
+    # =========================================================================
+    
+    def iterar_paginas_clientes(self, limit=100):
         """
-        FASE 1A: Baixar TODOS os clientes do Asaas
-        Faz paginação até não ter mais dados
+        Gera as páginas de clientes conforme chegam.
+        A primeira página informa o totalCount; as demais são baixadas em paralelo.
         """
-        logger.info("="*80)
-        logger.info("🔽 FASE 1A: BAIXANDO TODOS OS CLIENTES")
-        logger.info("="*80)
+        primeira = self._baixar_pagina_clientes(0, limit)
+        if not primeira:
+            self._registrar_falha("❌ Falha ao baixar a primeira página de clientes.")
+            return
+        
+        total_count = primeira.get('totalCount', 0)
+        logger.info(f"📊 Total de clientes no Asaas: {total_count}")
+        yield primeira.get('data', [])
+        
+        ultimo_offset = 0
+        tem_mais = primeira.get('hasMore', False)
+        if tem_mais:
+            tarefas = [
+                partial(self._tarefa_pagina_clientes, offset, limit)
+                for offset in range(limit, max(total_count, limit + 1), limit)
+            ]
+            for offset, response in self._paginas_em_paralelo(tarefas):
+                if not response:
+                    self._registrar_falha(f"❌ Falha ao baixar página de clientes (offset={offset})")
+                    continue
+                yield response.get('data', [])
+                if offset >= ultimo_offset:
+                    ultimo_offset = offset
+                    tem_mais = response.get('hasMore', False)
+        
+        # Clientes criados durante o download: segue a paginação além do totalCount inicial
+        while tem_mais:
+            ultimo_offset += limit
+            response = self._baixar_pagina_clientes(ultimo_offset, limit)
+            if not response or not response.get('data'):
+                break
+            yield response.get('data', [])
+            tem_mais = response.get('hasMore', False)
+    
+    def iterar_paginas_cobrancas_globais(self, data_inicial=None, janela_dias=None):
+        """
+        Modo GLOBAL: listagem global de payments fatiada por janelas de dateCreated
+        (janelas em paralelo no pool). O número de requisições depende do número de
+        cobranças e não do número de clientes; o vínculo com o cliente é feito
+        localmente pelo campo 'customer'.
+        """
+        if data_inicial is None:
+            data_inicial = self._parse_date(getattr(settings, 'ASAAS_SYNC_DATA_INICIAL', '2020-01-01')) or date(2020, 1, 1)
+        janela_dias = janela_dias or int(getattr(settings, 'ASAAS_SYNC_JANELA_DIAS', 30))
+        
+        janelas = gerar_janelas_data(data_inicial, dias=janela_dias)
+        logger.info(f"📅 {len(janelas)} janelas de {janela_dias} dias a partir de {data_inicial}")
+        
+        tarefas = []
+        for inicio, fim in janelas:
+            filtros = {}
+            if inicio:
+                filtros['dateCreated[ge]'] = inicio.isoformat()
+            if fim:
+                filtros['dateCreated[le]'] = fim.isoformat()
+            tarefas.append(partial(self._iterar_cobrancas, filtros))
+        
+        yield from self._paginas_em_paralelo(tarefas)
+    
+    def iterar_paginas_cobrancas_por_cliente(self, customer_ids):
+        """Modo POR_CLIENTE: um loop GET payments?customer= por cliente (clientes em paralelo)"""
+        tarefas = [partial(self._iterar_cobrancas_cliente, customer_id) for customer_id in customer_ids]
+        yield from self._paginas_em_paralelo(tarefas)
+    
+    def iterar_paginas_cobrancas_alteradas(self, desde):
+        """
+        Download incremental: cobranças criadas, pagas ou vencendo desde a data informada.
+        O Asaas não filtra por data de alteração, então a união destas três
+        listagens cobre as transições comuns (nova, paga, vencida); estornos e
+        exclusões ficam para a reconciliação completa periódica.
+        Uma cobrança pode vir em mais de uma listagem: a segunda gravação é
+        descartada pelo hash do payload.
+        """
+        hoje = timezone.localdate().isoformat()
+        desde = desde.isoformat()
+        consultas = [
+            {'dateCreated[ge]': desde},
+            {'paymentDate[ge]': desde},
+            {'dueDate[ge]': desde, 'dueDate[le]': hoje},
+        ]
+        yield from self._paginas_em_paralelo([partial(self._iterar_cobrancas, filtros) for filtros in consultas])
+    
+    def _paginas_em_paralelo(self, tarefas):
+        """
+        Executa as tarefas (funções geradoras de páginas) no pool e entrega as
+        páginas à thread principal, que é a única a acessar o banco.
+        
+        A fila é limitada: se a gravação ficar para trás, as threads de download
+        esperam (backpressure), então a memória não cresce com o tamanho da conta.
+        """
+        fila = queue.Queue(maxsize=self.max_workers * 2)
+        cancelado = threading.Event()
+        fim = object()
         
-        self.dados_clientes = []
+        def colocar(item):
+            while not cancelado.is_set():
+                try:
+                    fila.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produtor(tarefa):
+            try:
+                if cancelado.is_set():
+                    return
+                for pagina in tarefa():
+                    if not colocar(pagina):
+                        return
+            except Exception as e:
+                self._registrar_falha(f"   ❌ Erro no download: {str(e)}")
+            finally:
+                colocar(fim)
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for tarefa in tarefas:
+                pool.submit(produtor, tarefa)
+            try:
+                restantes = len(tarefas)
+                while restantes:
+                    item = fila.get()
+                    if item is fim:
+                        restantes -= 1
+                        continue
+                    yield item
+            finally:
+                # Consumidor interrompido (erro na gravação): libera as threads presas na fila
+                cancelado.set()
+    
+    def _iterar_cobrancas(self, filtros):
+        """Pagina GET payments com os filtros informados, uma página por vez"""
         offset = 0
-        limit = 100  # Limite máximo da API
-        pagina = 1
+        limit = 100
+        total_esperado = None
+        recebidas = 0
         
         while True:
-            logger.info(f"\n📄 Página {pagina} (offset={offset})")
+            params = dict(filtros, offset=offset, limit=limit)
             
-            params = {
-                'offset': offset,
-                'limit': limit
-            }
-            
-            response = self._fazer_requisicao('GET', 'customers', params=params)
+            response = self._fazer_requisicao('GET', 'payments', params=params)
             
             if not response:
-                logger.error(f"❌ Falha ao baixar página {pagina}. Parando.")
+                self._registrar_falha(f"   ⚠️  Falha na listagem de cobranças {filtros} (offset={offset})")
                 break
             
-            clientes_pagina = response.get('data', [])
-            total_count = response.get('totalCount', 0)
-            has_more = response.get('hasMore', False)
+            if total_esperado is None:
+                total_esperado = response.get('totalCount', 0)
             
-            if not clientes_pagina:
-                logger.info("✅ Nenhum cliente nesta página. Finalizando.")
+            pagina = response.get('data', [])
+            if not pagina:
+                if response.get('hasMore', False):
+                    self._registrar_falha(f"   ⚠️  Listagem {filtros}: página vazia com hasMore (offset={offset})")
                 break
             
-            # Adicionar clientes ao array
-            self.dados_clientes.extend(clientes_pagina)
-            
-            logger.info(f"✅ Baixados {len(clientes_pagina)} clientes")
-            logger.info(f"📊 Total acumulado: {len(self.dados_clientes)} de {total_count}")
+            recebidas += len(pagina)
+            yield pagina
             
-            # Verificar se há mais páginas
-            if not has_more:
-                logger.info("✅ Última página alcançada!")
+            if not response.get('hasMore', False):
                 break
             
-            # Aguardar 1 segundo entre requisições para evitar rate limit
-            import time
-            time.sleep(1)
-            
-            # Próxima página
             offset += limit
-            pagina += 1
         
-        logger.info("\n" + "="*80)
-        logger.info(f"✅ FASE 1A COMPLETA: {len(self.dados_clientes)} clientes baixados")
-        logger.info("="*80)
-        
-        return len(self.dados_clientes)
+        # Listagem incompleta conta como falha: a FASE 3 excluiria cobranças que não vieram
+        if total_esperado and recebidas < total_esperado:
+            self._registrar_falha(f"   ⚠️  Listagem {filtros}: {recebidas}/{total_esperado} cobranças")
     
-    def baixar_todas_cobrancas(self):
-        """
-        FASE 1B: Baixar TODAS as cobranças do Asaas
-        Para CADA cliente, baixa TODAS as suas cobranças
-        """
-        logger.info("\n" + "="*80)
-        logger.info("🔽 FASE 1B: BAIXANDO TODAS AS COBRANÇAS")
-        logger.info("="*80)
-        
-        self.dados_cobrancas = []
-        total_clientes = len(self.dados_clientes)
-        
-        for i, cliente in enumerate(self.dados_clientes, 1):
-            customer_id = cliente.get('id')
-            customer_name = cliente.get('name', 'Sem nome')
-            
-            logger.info(f"\n👤 Cliente {i}/{total_clientes}: {customer_name} ({customer_id})")
-            
-            # Baixar TODAS as cobranças deste cliente (com paginação)
-            offset = 0
-            limit = 100
-            pagina = 1
-            cobrancas_cliente = 0
-            
-            while True:
-                params = {
-                    'customer': customer_id,
-                    'offset': offset,
-                    'limit': limit
-                }
-                
-                response = self._fazer_requisicao('GET', 'payments', params=params)
-                
-                if not response:
-                    logger.warning(f"   ⚠️  Falha ao baixar cobranças (página {pagina})")
-                    break
-                
-                cobrancas_pagina = response.get('data', [])
-                has_more = response.get('hasMore', False)
-                
-                if not cobrancas_pagina:
-                    break
-                
-                # Adicionar customer_id em cada cobrança para facilitar depois
-                for cobranca in cobrancas_pagina:
-                    cobranca['_customer_id'] = customer_id
-                
-                self.dados_cobrancas.extend(cobrancas_pagina)
-                cobrancas_cliente += len(cobrancas_pagina)
-                
-                if not has_more:
-                    break
-                
-                # Aguardar 0.5 segundos entre páginas de cobranças
-                import time
-                time.sleep(0.5)
-                
-                offset += limit
-                pagina += 1
-            
-            logger.info(f"   ✅ {cobrancas_cliente} cobranças baixadas")
-            
-            # Aguardar 0.3 segundos entre clientes para evitar rate limit
-            import time
-            time.sleep(0.3)
-        
-        logger.info("\n" + "="*80)
-        logger.info(f"✅ FASE 1B COMPLETA: {len(self.dados_cobrancas)} cobranças baixadas")
-        logger.info("="*80)
-        
-        return len(self.dados_cobrancas)
+    def _iterar_cobrancas_cliente(self, customer_id):
+        """Páginas de cobranças de um cliente (com _customer_id para o vínculo local)"""
+        for pagina in self._iterar_cobrancas({'customer': customer_id}):
+            for cobranca in pagina:
+                cobranca['_customer_id'] = customer_id
+            yield pagina
     
-    def salvar_clientes_no_banco(self):
-        """
-        FASE 2A: Salvar/Atualizar TODOS os clientes no banco de dados
-        """
-        logger.info("\n" + "="*80)
-        logger.info("💾 FASE 2A: SALVANDO CLIENTES NO BANCO DE DADOS")
-        logger.info("="*80)
-        
-        stats = {
-            'total': 0,
-            'novos': 0,
-            'atualizados': 0,
-            'erros': 0
-        }
-        
-        for i, cliente_data in enumerate(self.dados_clientes, 1):
-            try:
-                asaas_id = cliente_data.get('id')
-                
-                if not asaas_id:
-                    logger.warning(f"   ⚠️  Cliente sem ID, pulando...")
-                    stats['erros'] += 1
-                    continue
-                
-                # Salvar ou atualizar
-                cliente, created = AsaasClienteSyncronizado.objects.update_or_create(
-                    asaas_customer_id=asaas_id,
-                    defaults={
-                        'nome': cliente_data.get('name', ''),
-                        'cpf_cnpj': cliente_data.get('cpfCnpj', ''),
-                        'email': cliente_data.get('email', ''),
-                        'telefone': cliente_data.get('phone', ''),
-                        'celular': cliente_data.get('mobilePhone', ''),
-                        'cep': cliente_data.get('postalCode', ''),
-                        'endereco': cliente_data.get('address', ''),
-                        'numero': cliente_data.get('addressNumber', ''),
-                        'complemento': cliente_data.get('complement', ''),
-                        'bairro': cliente_data.get('province', ''),
-                        'cidade': cliente_data.get('city', ''),
-                        'estado': cliente_data.get('state', ''),
-                        'inscricao_municipal': cliente_data.get('municipalInscription', ''),
-                        'inscricao_estadual': cliente_data.get('stateInscription', ''),
-                        'observacoes': cliente_data.get('observations', ''),
-                        'external_reference': cliente_data.get('externalReference', ''),
-                        'notificacoes_desabilitadas': cliente_data.get('notificationDisabled', False),
-                        'data_criacao_asaas': self._parse_datetime(cliente_data.get('dateCreated')),
-                    }
-                )
-                
-                stats['total'] += 1
-                if created:
-                    stats['novos'] += 1
-                else:
-                    stats['atualizados'] += 1
-                
-                if i % 100 == 0:
-                    logger.info(f"   📊 Progresso: {i}/{len(self.dados_clientes)} clientes processados")
-                    
-            except Exception as e:
-                stats['erros'] += 1
-                logger.error(f"   ❌ Erro ao salvar cliente {cliente_data.get('id', 'DESCONHECIDO')}: {str(e)}")
-        
-        logger.info("\n" + "="*80)
-        logger.info(f"✅ FASE 2A COMPLETA:")
-        logger.info(f"   Total: {stats['total']}")
-        logger.info(f"   Novos: {stats['novos']}")
-        logger.info(f"   Atualizados: {stats['atualizados']}")
-        logger.info(f"   Erros: {stats['erros']}")
-        logger.info("="*80)
-        
-        return stats
+    def _tarefa_pagina_clientes(self, offset, limit):
+        """Tarefa do pool: uma página de clientes (com o offset, para detectar o fim da listagem)"""
+        yield offset, self._baixar_pagina_clientes(offset, limit)
     
-    def salvar_cobrancas_no_banco(self):
+    def _baixar_pagina_clientes(self, offset, limit=100):
+        """Baixa uma página de clientes"""
+        return self._fazer_requisicao('GET', 'customers', params={'offset': offset, 'limit': limit})
+    
+    def _baixar_clientes_por_id(self, customer_ids):
+        """Baixa clientes avulsos (GET customers/{id}) em paralelo"""
+        clientes = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futuros = [pool.submit(self._fazer_requisicao, 'GET', f'customers/{customer_id}') for customer_id in customer_ids]
+            for futuro in as_completed(futuros):
+                cliente = futuro.result()
+                if cliente and cliente.get('id'):
+                    clientes.append(cliente)
+        
+        logger.info(f"   👥 {len(clientes)}/{len(customer_ids)} clientes avulsos baixados")
+        return clientes
+    
+    def _registrar_falha(self, mensagem):
+        """Conta falhas de download (com falhas, a limpeza de excluídas não roda)"""
+        with self._paginas_lock:
+            self.falhas_download += 1
+        logger.warning(mensagem)
+    
+    # =========================================================================
+    # FASE 2: Gravação página a página
+    # =========================================================================
+    
+    def gravar_pagina_clientes(self, clientes):
+        """Grava uma página de clientes assim que ela chega (upsert em lote)"""
+        if not clientes:
+            return
+        self.clientes_baixados += len(clientes)
+        
+        resultado = UpsertEmLote(AsaasClienteSyncronizado, 'asaas_customer_id').executar(
+            mapear_cliente(cliente_data) for cliente_data in clientes
+        )
+        somar_stats(self.stats_clientes, resultado)
+    
+    def gravar_pagina_cobrancas(self, cobrancas):
         """
-        FASE 2B: Salvar/Atualizar TODAS as cobranças no banco de dados
+        Grava uma página de cobranças assim que ela chega.
+        Clientes ainda inexistentes localmente (criados depois da listagem de
+        clientes, ou no modo incremental) são baixados avulsos antes da gravação.
         """
-        logger.info("\n" + "="*80)
-        logger.info("💾 FASE 2B: SALVANDO COBRANÇAS NO BANCO DE DADOS")
-        logger.info("="*80)
-        
-        stats = {
-            'total': 0,
-            'novas': 0,
-            'atualizadas': 0,
-            'erros': 0,
-            'sem_cliente': 0
-        }
-        
-        for i, cobranca_data in enumerate(self.dados_cobrancas, 1):
-            try:
-                asaas_payment_id = cobranca_data.get('id')
-                customer_id = cobranca_data.get('_customer_id') or cobranca_data.get('customer')
-                
-                if not asaas_payment_id:
-                    stats['erros'] += 1
-                    continue
-                
-                # Buscar cliente no banco
-                try:
-                    cliente = AsaasClienteSyncronizado.objects.get(asaas_customer_id=customer_id)
-                except AsaasClienteSyncronizado.DoesNotExist:
-                    logger.warning(f"   ⚠️  Cliente {customer_id} não encontrado para cobrança {asaas_payment_id}")
-                    stats['sem_cliente'] += 1
-                    continue
-                
-                # Salvar ou atualizar cobrança
-                cobranca, created = AsaasCobrancaSyncronizada.objects.update_or_create(
-                    asaas_payment_id=asaas_payment_id,
-                    defaults={
-                        'cliente': cliente,
-                        'tipo_cobranca': cobranca_data.get('billingType', 'UNDEFINED'),
-                        'status': cobranca_data.get('status', 'PENDING'),
-                        'valor': Decimal(str(cobranca_data.get('value', 0))),
-                        'valor_liquido': Decimal(str(cobranca_data.get('netValue', 0))) if cobranca_data.get('netValue') else None,
-                        'descricao': cobranca_data.get('description', ''),
-                        'data_vencimento': self._parse_date(cobranca_data.get('dueDate')),
-                        'data_pagamento': self._parse_date(cobranca_data.get('paymentDate')),
-                        'data_criacao_asaas': self._parse_datetime(cobranca_data.get('dateCreated')),
-                        'invoice_url': cobranca_data.get('invoiceUrl', ''),
-                        'bank_slip_url': cobranca_data.get('bankSlipUrl', ''),
-                        'pix_qrcode_url': cobranca_data.get('pixQrCodeUrl', ''),
-                        'pix_copy_paste': cobranca_data.get('pixCopyAndPaste', ''),
-                        'numero_parcela': cobranca_data.get('installmentNumber'),
-                        'total_parcelas': cobranca_data.get('installmentCount'),
-                        'external_reference': cobranca_data.get('externalReference', ''),
-                    }
-                )
-                
-                stats['total'] += 1
-                if created:
-                    stats['novas'] += 1
-                else:
-                    stats['atualizadas'] += 1
-                
-                if i % 500 == 0:
-                    logger.info(f"   📊 Progresso: {i}/{len(self.dados_cobrancas)} cobranças processadas")
-                    
-            except Exception as e:
-                stats['erros'] += 1
-                logger.error(f"   ❌ Erro ao salvar cobrança {cobranca_data.get('id', 'DESCONHECIDO')}: {str(e)}")
-        
-        logger.info("\n" + "="*80)
-        logger.info(f"✅ FASE 2B COMPLETA:")
-        logger.info(f"   Total: {stats['total']}")
-        logger.info(f"   Novas: {stats['novas']}")
-        logger.info(f"   Atualizadas: {stats['atualizadas']}")
-        logger.info(f"   Sem cliente: {stats['sem_cliente']}")
-        logger.info(f"   Erros: {stats['erros']}")
-        logger.info("="*80)
-        
-        return stats
+        if not cobrancas:
+            return
+        self.cobrancas_baixadas += len(cobrancas)
+        agora = timezone.now()
+        
+        for cobranca_data in cobrancas:
+            data_criacao = self._parse_date((cobranca_data.get('dateCreated') or '')[:10])
+            if data_criacao and (self.maior_date_created is None or data_criacao > self.maior_date_created):
+                self.maior_date_created = data_criacao
+        
+        # Join local só com os clientes desta página
+        customer_ids = {c.get('_customer_id') or c.get('customer') for c in cobrancas} - {None, ''}
+        clientes_por_asaas_id = dict(
+            AsaasClienteSyncronizado.objects.filter(asaas_customer_id__in=customer_ids)
+            .values_list('asaas_customer_id', 'id')
+        )
+        faltantes = customer_ids - set(clientes_por_asaas_id)
+        if faltantes:
+            self.gravar_pagina_clientes(self._baixar_clientes_por_id(faltantes))
+            clientes_por_asaas_id.update(
+                AsaasClienteSyncronizado.objects.filter(asaas_customer_id__in=faltantes)
+                .values_list('asaas_customer_id', 'id')
+            )
+        
+        registros = []
+        for cobranca_data in cobrancas:
+            customer_id = cobranca_data.get('_customer_id') or cobranca_data.get('customer')
+            cliente_id = clientes_por_asaas_id.get(customer_id)
+            if cliente_id is None:
+                logger.warning(f"   ⚠️  Cliente {customer_id} não encontrado para cobrança {cobranca_data.get('id')}")
+                self.stats_cobrancas['sem_cliente'] += 1
+                continue
+            
+            registro = mapear_cobranca(cobranca_data, cliente_id)
+            if registro['data_vencimento'] is None:
+                self.stats_cobrancas['erros'] += 1
+                continue
+            registros.append(registro)
+        
+        resultado = UpsertEmLote(AsaasCobrancaSyncronizada, 'asaas_payment_id').executar(registros)
+        self.stats_cobrancas['total'] += resultado['total']
+        self.stats_cobrancas['novas'] += resultado['novos']
+        self.stats_cobrancas['atualizadas'] += resultado['atualizados']
+        self.stats_cobrancas['inalteradas'] += resultado['inalterados']
+        self.stats_cobrancas['erros'] += resultado['erros']
+        
+        # Marca como vistas nesta execução (inclusive as inalteradas): base da FASE 3
+        ids_pagina = [c['id'] for c in cobrancas if c.get('id')]
+        AsaasCobrancaSyncronizada.objects.filter(asaas_payment_id__in=ids_pagina).update(sincronizado_em=agora)
+    
+    def _registrar_batimento(self, log):
+        """Sinal de vida da tarefa da fila (AsaasSyncJob) no máximo a cada 30s"""
+        agora = time.monotonic()
+        if log is None or agora - self._ultimo_batimento < 30:
+            return
+        self._ultimo_batimento = agora
+        from .jobs import registrar_batimento
+        registrar_batimento(log=log)
+    
+    def _atualizar_progresso(self, log):
+        """Publica o progresso parcial no log (lido por status_sincronizacao)"""
+        log.total_clientes = self.stats_clientes['total']
+        log.clientes_novos = self.stats_clientes['novos']
+        log.clientes_atualizados = self.stats_clientes['atualizados']
+        log.total_cobrancas = self.stats_cobrancas['total']
+        log.cobrancas_novas = self.stats_cobrancas['novas']
+        log.cobrancas_atualizadas = self.stats_cobrancas['atualizadas']
+        log.total_paginas = self.paginas_baixadas
+        log.save(update_fields=[
+            'total_clientes', 'clientes_novos', 'clientes_atualizados',
+            'total_cobrancas', 'cobrancas_novas', 'cobrancas_atualizadas', 'total_paginas'
+        ])
+        logger.info(f"   📊 Progresso: {self.clientes_baixados} clientes | "
+                    f"{self.cobrancas_baixadas} cobranças | {self.paginas_baixadas} páginas")
     
-    def limpar_cobrancas_deletadas(self):
+    def _atualizar_checkpoint(self, checkpoint, inicio_execucao, completo):
+        """Avança as marcas d'água após uma sincronização bem-sucedida"""
+        from core.models import WebhookLog
+        from django.db.models import Max
+        
+        if self.maior_date_created:
+            if not checkpoint.ultimo_date_created or self.maior_date_created > checkpoint.ultimo_date_created:
+                checkpoint.ultimo_date_created = self.maior_date_created
+        
+        checkpoint.ultima_sincronizacao = inicio_execucao
+        checkpoint.ultimo_webhook_em = WebhookLog.objects.filter(
+            tipo='ASAAS', status_processamento='SUCCESS'
+        ).aggregate(ultimo=Max('data_recebimento'))['ultimo']
+        if completo:
+            checkpoint.ultima_reconciliacao_completa = inicio_execucao
+        checkpoint.save()
+    
+    def limpar_cobrancas_deletadas(self, inicio_execucao):
         """
         FASE 3: Excluir cobranças que existem no servidor mas NÃO existem mais no Asaas
         Garante que os valores totais sejam idênticos
+        
+        Toda cobrança recebida nesta execução tem sincronizado_em >= inicio_execucao;
+        as que ficaram para trás não vieram na listagem completa do Asaas.
         """
         logger.info("\n" + "="*80)
         logger.info("🗑️  FASE 3: LIMPANDO COBRANÇAS DELETADAS DO ASAAS")
         logger.info("="*80)
         
-        # IDs de cobranças que vieram do Asaas
-        ids_asaas = set()
-        for cobranca_data in self.dados_cobrancas:
-            asaas_payment_id = cobranca_data.get('id')
-            if asaas_payment_id:
-                ids_asaas.add(asaas_payment_id)
-        
-        logger.info(f"Total de cobranças no Asaas: {len(ids_asaas)}")
-        
-        # Buscar TODAS as cobranças no banco local
-        cobrancas_local = AsaasCobrancaSyncronizada.objects.all()
-        total_local = cobrancas_local.count()
-        
-        logger.info(f"Total de cobranças no banco local: {total_local}")
+        if self.falhas_download:
+            logger.warning(f"⚠️  {self.falhas_download} falhas no download: limpeza ignorada para não excluir cobranças válidas")
+            return {'excluidas': 0}
         
-        # Encontrar cobranças que NÃO existem mais no Asaas
-        cobrancas_para_excluir = []
-        for cobranca in cobrancas_local:
-            if cobranca.asaas_payment_id not in ids_asaas:
-                cobrancas_para_excluir.append(cobranca)
+        logger.info(f"Total de cobranças no Asaas: {self.cobrancas_baixadas}")
         
-        total_excluir = len(cobrancas_para_excluir)
+        cobrancas_para_excluir = AsaasCobrancaSyncronizada.objects.filter(sincronizado_em__lt=inicio_execucao)
+        total_excluir = cobrancas_para_excluir.count()
         
         if total_excluir == 0:
             logger.info("✅ Nenhuma cobrança para excluir. Dados sincronizados!")
@@ -408,17 +494,12 @@ class AsaasSyncCompleto:
         logger.info(f"⚠️  Encontradas {total_excluir} cobranças que NÃO existem mais no Asaas")
         logger.info("🗑️  Iniciando exclusão...")
         
-        # Excluir cobranças
-        excluidas = 0
-        for cobranca in cobrancas_para_excluir:
-            try:
-                cliente_nome = cobranca.cliente.nome if cobranca.cliente else "Cliente desconhecido"
-                valor = cobranca.valor
-                logger.info(f"   🗑️  Excluindo: {cobranca.asaas_payment_id} - {cliente_nome} - R$ {valor}")
-                cobranca.delete()
-                excluidas += 1
-            except Exception as e:
-                logger.error(f"   ❌ Erro ao excluir cobrança {cobranca.asaas_payment_id}: {str(e)}")
+        for asaas_payment_id, cliente_nome, valor in cobrancas_para_excluir.values_list(
+            'asaas_payment_id', 'cliente__nome', 'valor'
+        ).iterator():
+            logger.info(f"   🗑️  Excluindo: {asaas_payment_id} - {cliente_nome or 'Cliente desconhecido'} - R$ {valor}")
+        
+        excluidas, _ = cobrancas_para_excluir.delete()
         
         logger.info("\n" + "="*80)
         logger.info(f"✅ FASE 3 COMPLETA: {excluidas} cobranças excluídas")
@@ -426,44 +507,67 @@ class AsaasSyncCompleto:
         
         return {'excluidas': excluidas}
     
-    def executar_sincronizacao_completa(self, usuario=None, nome_conta="Principal"):
+    def executar_sincronizacao_completa(self, usuario=None, nome_conta="Principal", modo=None, log=None):
         """
-        Executa sincronização completa em 5 FASES:
-        FASE 1A: Baixar todos os clientes
-        FASE 1B: Baixar todas as cobranças
-        FASE 2A: Salvar clientes no banco
-        FASE 2B: Salvar cobranças no banco
+        Executa sincronização completa em streaming:
+        FASE 1A/2A: Clientes - cada página é gravada assim que chega
+        FASE 1B/2B: Cobranças - idem, com download paralelo e fila limitada
+            modo='GLOBAL' (padrão): listagem global de payments por janelas de dateCreated
+            modo='POR_CLIENTE': um loop GET payments?customer= por cliente
         FASE 3: Limpar cobranças deletadas do Asaas
+        
+        Nenhuma listagem completa fica em memória; uma queda no meio preserva
+        tudo o que já foi gravado.
+        
+        log: AsaasSyncronizacaoLog já criado ao enfileirar (fila de jobs); se None, cria um novo
         """
         logger.info("\n" + "🚀"*40)
         logger.info(f"SINCRONIZAÇÃO COMPLETA - ASAAS {nome_conta}")
         logger.info("🚀"*40 + "\n")
         
-        # Criar log
-        log = AsaasSyncronizacaoLog.objects.create(
-            tipo_sincronizacao='COMPLETO',
-            status='EM_ANDAMENTO',
-            usuario=usuario.username if usuario else 'Sistema',
-            mensagem=f'Sincronizando conta: {nome_conta}'
-        )
+        # Criar (ou reaproveitar) log
+        log = self._iniciar_log(log, 'COMPLETO', usuario, f'Sincronizando conta: {nome_conta}')
         
         try:
             tempo_inicio = timezone.now()
-            
-            # FASE 1A: Baixar clientes
-            total_clientes_baixados = self.baixar_todos_clientes()
-            
-            # FASE 1B: Baixar cobranças
-            total_cobrancas_baixadas = self.baixar_todas_cobrancas()
-            
-            # FASE 2A: Salvar clientes
-            stats_clientes = self.salvar_clientes_no_banco()
-            
-            # FASE 2B: Salvar cobranças
-            stats_cobrancas = self.salvar_cobrancas_no_banco()
+            self._reiniciar_estado()
+            modo = (modo or getattr(settings, 'ASAAS_SYNC_MODO', 'GLOBAL')).upper()
+            
+            # FASE 1A + 2A: Clientes
+            logger.info("🔽 FASE 1A/2A: CLIENTES (download e gravação por página)")
+            customer_ids = []
+            for i, pagina in enumerate(self.iterar_paginas_clientes(), 1):
+                self.gravar_pagina_clientes(pagina)
+                if modo == 'POR_CLIENTE':
+                    customer_ids.extend(c['id'] for c in pagina if c.get('id'))
+                self._registrar_batimento(log)
+                if i % 20 == 0:
+                    self._atualizar_progresso(log)
+            
+            # FASE 1B + 2B: Cobranças
+            logger.info(f"🔽 FASE 1B/2B: COBRANÇAS (modo {modo}, {self.max_workers} workers)")
+            if modo == 'POR_CLIENTE':
+                paginas_cobrancas = self.iterar_paginas_cobrancas_por_cliente(customer_ids)
+            else:
+                paginas_cobrancas = self.iterar_paginas_cobrancas_globais()
+            for i, pagina in enumerate(paginas_cobrancas, 1):
+                self.gravar_pagina_cobrancas(pagina)
+                self._registrar_batimento(log)
+                if i % 20 == 0:
+                    self._atualizar_progresso(log)
+            
+            duracao_download = max((timezone.now() - tempo_inicio).total_seconds(), 0.001)
+            paginas_por_segundo = self.paginas_baixadas / duracao_download
+            stats_clientes = self.stats_clientes
+            stats_cobrancas = self.stats_cobrancas
             
             # FASE 3: Limpar cobranças deletadas
-            stats_limpeza = self.limpar_cobrancas_deletadas()
+            stats_limpeza = self.limpar_cobrancas_deletadas(tempo_inicio)
+            
+            # Sincronização completa = reconciliação: reinicia as marcas d'água incrementais
+            # (só com download íntegro, senão a próxima incremental cobriria um buraco)
+            checkpoint, _ = AsaasSyncCheckpoint.objects.get_or_create(conta=self.conta)
+            self._atualizar_checkpoint(checkpoint, tempo_inicio, completo=not self.falhas_download)
             
             # Finalizar log
             tempo_fim = timezone.now()
@@ -477,6 +581,9 @@ class AsaasSyncCompleto:
             log.cobrancas_novas = stats_cobrancas['novas']
             log.cobrancas_atualizadas = stats_cobrancas['atualizadas']
             
+            log.total_paginas = self.paginas_baixadas
+            log.paginas_por_segundo = Decimal(f"{paginas_por_segundo:.2f}")
+            
             log.status = 'SUCESSO'
             log.data_fim = tempo_fim
             log.duracao_segundos = int(duracao)
@@ -485,11 +592,12 @@ class AsaasSyncCompleto:
             
             log.mensagem = f"""✅ Sincronização COMPLETA - {nome_conta}
 
-📥 DOWNLOAD (Fase 1):
-   • Clientes baixados: {total_clientes_baixados}
-   • Cobranças baixadas: {total_cobrancas_baixadas}
+📥 DOWNLOAD (Fase 1 - modo {modo}):
+   • Clientes baixados: {self.clientes_baixados}
+   • Cobranças baixadas: {self.cobrancas_baixadas}
+   • Páginas: {self.paginas_baixadas} em {duracao_download:.0f}s ({paginas_por_segundo:.2f} páginas/s)
 
-💾 SALVAMENTO (Fase 2):
+💾 SALVAMENTO (Fase 2 - página a página):
    • Clientes salvos: {stats_clientes['total']} ({stats_clientes['novos']} novos, {stats_clientes['atualizados']} atualizados)
    • Cobranças salvas: {stats_cobrancas['total']} ({stats_cobrancas['novas']} novas, {stats_cobrancas['atualizadas']} atualizadas)
 
@@ -500,9 +608,10 @@ class AsaasSyncCompleto:
 
 ✅ GARANTIA: Valores totais do servidor = Valores totais do Asaas!"""
             
-            if stats_clientes['erros'] > 0 or stats_cobrancas['erros'] > 0:
+            if stats_clientes['erros'] > 0 or stats_cobrancas['erros'] > 0 or self.falhas_download:
                 log.status = 'PARCIAL'
-                log.erros = f"Erros: {stats_clientes['erros']} clientes, {stats_cobrancas['erros']} cobranças"
+                log.erros = (f"Erros: {stats_clientes['erros']} clientes, {stats_cobrancas['erros']} cobranças, "
+                             f"{self.falhas_download} falhas de download")
             
             log.save()
             
@@ -523,6 +632,106 @@ class AsaasSyncCompleto:
             
             raise
     
+    def executar_sincronizacao_incremental(self, usuario=None, nome_conta="Principal", log=None):
+        """
+        Sincronização INCREMENTAL (delta) a partir do checkpoint da conta.
+        
+        Baixa apenas as cobranças alteradas desde a última execução e os
+        clientes novos que elas referenciam. Quando não há checkpoint ou a
+        última reconciliação completa passou de ASAAS_SYNC_RECONCILIACAO_HORAS,
+        executa a sincronização completa no lugar.
+        """
+        checkpoint, _ = AsaasSyncCheckpoint.objects.get_or_create(conta=self.conta)
+        intervalo = int(getattr(settings, 'ASAAS_SYNC_RECONCILIACAO_HORAS', 24))
+        
+        if checkpoint.precisa_reconciliacao_completa(intervalo):
+            logger.info(f"🔁 Reconciliação completa necessária para conta {self.conta}")
+            return self.executar_sincronizacao_completa(usuario=usuario, nome_conta=nome_conta, log=log)
+        
+        desde = checkpoint.data_inicio_delta()
+        logger.info(f"⚡ SINCRONIZAÇÃO INCREMENTAL - ASAAS {nome_conta} (desde {desde})")
+        
+        log = self._iniciar_log(
+            log, 'INCREMENTAL', usuario,
+            f'Sincronização incremental da conta {nome_conta} desde {desde:%d/%m/%Y}'
+        )
+        
+        try:
+            tempo_inicio = timezone.now()
+            self._reiniciar_estado()
+            
+            for i, pagina in enumerate(self.iterar_paginas_cobrancas_alteradas(desde), 1):
+                self.gravar_pagina_cobrancas(pagina)
+                self._registrar_batimento(log)
+                if i % 20 == 0:
+                    self._atualizar_progresso(log)
+            duracao_download = max((timezone.now() - tempo_inicio).total_seconds(), 0.001)
+            
+            stats_clientes = self.stats_clientes
+            stats_cobrancas = self.stats_cobrancas
+            
+            # Com falhas, o checkpoint não avança: a próxima execução cobre o mesmo período
+            if not self.falhas_download:
+                self._atualizar_checkpoint(checkpoint, tempo_inicio, completo=False)
+            
+            tempo_fim = timezone.now()
+            duracao = (tempo_fim - tempo_inicio).total_seconds()
+            
+            log.total_clientes = stats_clientes['total']
+            log.clientes_novos = stats_clientes['novos']
+            log.clientes_atualizados = stats_clientes['atualizados']
+            log.total_cobrancas = stats_cobrancas['total']
+            log.cobrancas_novas = stats_cobrancas['novas']
+            log.cobrancas_atualizadas = stats_cobrancas['atualizadas']
+            log.total_paginas = self.paginas_baixadas
+            log.paginas_por_segundo = Decimal(f"{self.paginas_baixadas / duracao_download:.2f}")
+            log.status = 'SUCESSO'
+            log.data_fim = tempo_fim
+            log.duracao_segundos = int(duracao)
+            log.mensagem = f"""⚡ Sincronização INCREMENTAL - {nome_conta}
+
+📅 Alterações desde: {desde:%d/%m/%Y}
+👥 Clientes novos: {stats_clientes['novos']}
+💰 Cobranças: {stats_cobrancas['total']} ({stats_cobrancas['novas']} novas, {stats_cobrancas['atualizadas']} atualizadas)
+📄 Páginas: {self.paginas_baixadas}
+⏱️  Duração: {duracao:.0f} segundos
+
+ℹ️  Exclusões e estornos são conferidos na reconciliação completa (a cada {intervalo}h)."""
+            
+            if stats_clientes['erros'] > 0 or stats_cobrancas['erros'] > 0 or self.falhas_download:
+                log.status = 'PARCIAL'
+                log.erros = (f"Erros: {stats_clientes['erros']} clientes, {stats_cobrancas['erros']} cobranças, "
+                             f"{self.falhas_download} falhas de download")
+            
+            log.save()
+            return log
+            
+        except Exception as e:
+            logger.error(f"\n❌ ERRO FATAL na sincronização incremental: {str(e)}", exc_info=True)
+            
+            log.status = 'ERRO'
+            log.data_fim = timezone.now()
+            log.mensagem = f'Erro fatal: {str(e)}'
+            log.erros = str(e)
+            log.save()
+            
+            raise
+    
+    def _iniciar_log(self, log, tipo, usuario, mensagem):
+        """Cria o log da execução ou atualiza o que foi criado ao enfileirar o job"""
+        if log is None:
+            return AsaasSyncronizacaoLog.objects.create(
+                tipo_sincronizacao=tipo,
+                status='EM_ANDAMENTO',
+                usuario=usuario.username if usuario else 'Sistema',
+                mensagem=mensagem
+            )
+        log.tipo_sincronizacao = tipo
+        log.status = 'EM_ANDAMENTO'
+        log.mensagem = mensagem
+        log.save(update_fields=['tipo_sincronizacao', 'status', 'mensagem'])
+        return log
+    
     def _parse_date(self, date_string):
         """Converte string de data para date"""
         if not date_string:
@@ -0,0 +1,238 @@
+"""
+Gravação em lote (upsert) dos dados sincronizados do Asaas
+Camada única usada por todos os pontos de entrada da sincronização
+(sync_completo, services, importar_json_banco.py, sincronizar_asaas_auto.py)
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime
+from decimal import Decimal
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+TIPOS_COBRANCA_VALIDOS = ('BOLETO', 'CREDIT_CARD', 'PIX')
+
+
+def parse_date(date_string):
+    """Converte 'YYYY-MM-DD' (ou datetime ISO) para date"""
+    if not date_string:
+        return None
+    try:
+        return datetime.strptime(date_string[:10], '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_datetime(datetime_string):
+    """Converte os formatos de data/hora do Asaas para datetime com timezone"""
+    if not datetime_string:
+        return None
+    try:
+        if 'T' in datetime_string:
+            dt = datetime.fromisoformat(datetime_string.replace('Z', '+00:00'))
+        elif ' ' in datetime_string:
+            dt = datetime.strptime(datetime_string, '%Y-%m-%d %H:%M:%S')
+        else:
+            dt = datetime.strptime(datetime_string, '%Y-%m-%d')
+        if dt.tzinfo is None:
+            dt = timezone.make_aware(dt)
+        return dt
+    except (TypeError, ValueError):
+        return None
+
+
+def mapear_cliente(cliente_data):
+    """Converte um customer da API para os campos de AsaasClienteSyncronizado(2)"""
+    return {
+        'asaas_customer_id': cliente_data.get('id'),
+        'nome': cliente_data.get('name', '') or '',
+        'cpf_cnpj': cliente_data.get('cpfCnpj', ''),
+        'email': cliente_data.get('email', ''),
+        'telefone': cliente_data.get('phone', ''),
+        'celular': cliente_data.get('mobilePhone', ''),
+        'cep': cliente_data.get('postalCode', ''),
+        'endereco': cliente_data.get('address', ''),
+        'numero': cliente_data.get('addressNumber', ''),
+        'complemento': cliente_data.get('complement', ''),
+        'bairro': cliente_data.get('province', ''),
+        'cidade': cliente_data.get('city', ''),
+        'estado': cliente_data.get('state', ''),
+        'inscricao_municipal': cliente_data.get('municipalInscription', ''),
+        'inscricao_estadual': cliente_data.get('stateInscription', ''),
+        'observacoes': cliente_data.get('observations', ''),
+        'external_reference': cliente_data.get('externalReference', ''),
+        'notificacoes_desabilitadas': cliente_data.get('notificationDisabled', False) or False,
+        'data_criacao_asaas': parse_datetime(cliente_data.get('dateCreated')),
+    }
+
+
+def mapear_cobranca(cobranca_data, cliente_id):
+    """
+    Converte um payment da API para os campos de AsaasCobrancaSyncronizada(2)
+
+    Args:
+        cobranca_data: dict retornado pela API
+        cliente_id: PK local do cliente (já resolvido pelo chamador)
+    """
+    billing_type = cobranca_data.get('billingType', 'UNDEFINED')
+    return {
+        'asaas_payment_id': cobranca_data.get('id'),
+        'cliente_id': cliente_id,
+        'tipo_cobranca': billing_type if billing_type in TIPOS_COBRANCA_VALIDOS else 'UNDEFINED',
+        'status': cobranca_data.get('status', 'PENDING'),
+        'valor': Decimal(str(cobranca_data.get('value', 0))),
+        'valor_liquido': Decimal(str(cobranca_data.get('netValue'))) if cobranca_data.get('netValue') else None,
+        'descricao': cobranca_data.get('description', ''),
+        'data_vencimento': parse_date(cobranca_data.get('dueDate')),
+        'data_pagamento': parse_date(cobranca_data.get('paymentDate')),
+        'data_criacao_asaas': parse_datetime(cobranca_data.get('dateCreated')),
+        'invoice_url': cobranca_data.get('invoiceUrl', ''),
+        'bank_slip_url': cobranca_data.get('bankSlipUrl', ''),
+        'pix_qrcode_url': cobranca_data.get('pixQrCodeUrl', ''),
+        'pix_copy_paste': cobranca_data.get('pixCopyAndPaste') or cobranca_data.get('pixCopyPaste', ''),
+        'numero_parcela': cobranca_data.get('installmentNumber'),
+        'total_parcelas': cobranca_data.get('installmentCount'),
+        'external_reference': cobranca_data.get('externalReference', ''),
+    }
+
+
+def somar_stats(acumulado, parcial):
+    """Acumula as estatísticas de várias chamadas a UpsertEmLote.executar"""
+    for chave, valor in parcial.items():
+        acumulado[chave] = acumulado.get(chave, 0) + valor
+    return acumulado
+
+
+def calcular_hash(campos):
+    """Hash estável dos campos mapeados (detecta registros sem alteração)"""
+    conteudo = json.dumps(campos, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+class UpsertEmLote:
+    """
+    Upsert em lote por chave única (asaas_customer_id / asaas_payment_id).
+
+    Para cada lote de `chunk_size` registros:
+    1. Um SELECT traz (chave, pk, payload_hash) dos registros existentes
+    2. Registros com o mesmo hash são ignorados (nada mudou no Asaas)
+    3. Novos + alterados são gravados numa única transação com
+       bulk_create(update_conflicts=True) quando o banco suporta,
+       ou bulk_create + bulk_update como fallback
+    """
+
+    def __init__(self, model, campo_chave, chunk_size=None):
+        self.model = model
+        self.campo_chave = campo_chave
+        self.chunk_size = int(chunk_size or getattr(settings, 'ASAAS_SYNC_CHUNK_SIZE', 500))
+
+    def executar(self, registros):
+        """
+        Args:
+            registros: iterável de dicts com os campos do model (incluindo a chave)
+
+        Returns:
+            dict com total, novos, atualizados, inalterados e erros
+        """
+        stats = {'total': 0, 'novos': 0, 'atualizados': 0, 'inalterados': 0, 'erros': 0}
+
+        # Consome o iterável em lotes (memória limitada a chunk_size registros).
+        # Chave repetida no mesmo lote quebraria o ON CONFLICT: a última versão vence
+        lote = {}
+        for registro in registros:
+            chave = registro.get(self.campo_chave)
+            if not chave:
+                stats['erros'] += 1
+                continue
+            lote[chave] = registro
+            if len(lote) >= self.chunk_size:
+                self._processar_lote(list(lote.values()), stats)
+                lote = {}
+        if lote:
+            self._processar_lote(list(lote.values()), stats)
+
+        stats['total'] = stats['novos'] + stats['atualizados'] + stats['inalterados']
+        return stats
+
+    def _processar_lote(self, lote, stats):
+        chaves = [registro[self.campo_chave] for registro in lote]
+        existentes = {
+            chave: (pk, payload_hash)
+            for chave, pk, payload_hash in self.model.objects.filter(
+                **{f'{self.campo_chave}__in': chaves}
+            ).values_list(self.campo_chave, 'pk', 'payload_hash')
+        }
+
+        agora = timezone.now()
+        novos = []
+        alterados = []
+
+        for registro in lote:
+            payload_hash = calcular_hash(registro)
+            existente = existentes.get(registro[self.campo_chave])
+
+            if existente and existente[1] == payload_hash:
+                stats['inalterados'] += 1
+                continue
+
+            obj = self.model(**registro, payload_hash=payload_hash, sincronizado_em=agora)
+            if existente:
+                obj.pk = existente[0]
+                alterados.append(obj)
+            else:
+                novos.append(obj)
+
+        if not novos and not alterados:
+            return
+
+        campos_update = [
+            self.model._meta.get_field(campo).name
+            for campo in lote[0] if campo != self.campo_chave
+        ] + ['payload_hash', 'sincronizado_em']
+
+        try:
+            with transaction.atomic():
+                if connection.features.supports_update_conflicts_with_target:
+                    for obj in alterados:
+                        obj.pk = None  # O conflito é resolvido pela chave única
+                    self.model.objects.bulk_create(
+                        novos + alterados,
+                        update_conflicts=True,
+                        unique_fields=[self.campo_chave],
+                        update_fields=campos_update,
+                    )
+                else:
+                    if novos:
+                        self.model.objects.bulk_create(novos)
+                    if alterados:
+                        self.model.objects.bulk_update(alterados, campos_update)
+            stats['novos'] += len(novos)
+            stats['atualizados'] += len(alterados)
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar lote de {self.model.__name__}: {str(e)}. Gravando um a um...")
+            self._gravar_individualmente(novos + alterados, existentes, campos_update, stats)
+
+        logger.info(f"   📦 {self.model.__name__}: lote de {len(lote)} "
+                    f"({len(novos)} novos, {len(alterados)} alterados)")
+
+    def _gravar_individualmente(self, objetos, existentes, campos_update, stats):
+        """Fallback para isolar o registro com problema sem perder o lote inteiro"""
+        attnames = [self.model._meta.get_field(campo).attname for campo in campos_update]
+        for obj in objetos:
+            chave = getattr(obj, self.campo_chave)
+            try:
+                # Apenas os campos vindos do Asaas: dados internos (consultor, serviços) são preservados
+                defaults = {attname: getattr(obj, attname) for attname in attnames}
+                self.model.objects.update_or_create(**{self.campo_chave: chave}, defaults=defaults)
+                if chave in existentes:
+                    stats['atualizados'] += 1
+                else:
+                    stats['novos'] += 1
+            except Exception as e:
+                stats['erros'] += 1
+                logger.error(f"   ❌ Erro ao salvar {self.model.__name__} {chave}: {str(e)}")
@@ -12,15 +12,12 @@ from .models import (
     AsaasClienteSyncronizado2, AsaasCobrancaSyncronizada2
 )
 from .services import AsaasSyncService
-from .sync_completo import AsaasSyncCompleto  # NOVO: Sincronização robusta
+from .jobs import enfileirar_job  # Execução pelo worker processar_jobs_asaas
+from core.cache_relatorios import obter_relatorio
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill
 from openpyxl.utils import get_column_letter
 import logging
-import subprocess
-import threading
-import sys
-import traceback
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +25,13 @@ logger = logging.getLogger(__name__)
 @login_required
 def dashboard_asaas_sync(request):
     """Dashboard principal com dados do Asaas (ambas as contas)"""
+    context = obter_relatorio('dashboard_asaas_sync', {}, ('asaas_sync',), _dados_dashboard_asaas_sync)
     
+    return render(request, 'asaas_sync/dashboard.html', context)
+
+
+def _dados_dashboard_asaas_sync():
+    """Números do dashboard das contas Asaas (em cache: obter_relatorio)"""
     # Estatísticas ASAAS 1 (Principal)
     total_clientes1 = AsaasClienteSyncronizado.objects.count()
     total_cobrancas1 = AsaasCobrancaSyncronizada.objects.count()
@@ -107,7 +110,7 @@ def dashboard_asaas_sync(request):
         'ultima_sync': ultima_sync,
     }
     
-    return render(request, 'asaas_sync/dashboard.html', context)
+    return context
 
 
 @login_required
@@ -366,38 +369,27 @@ def lista_cobrancas(request):
 @login_required
 def sincronizar_agora(request):
     """
-    Sincronização COMPLETA e ROBUSTA
-    Baixa TUDO primeiro, depois salva no banco
+    Sincronização INCREMENTAL (padrão) ou COMPLETA (modo=completo)
+    A incremental cai automaticamente na completa quando a reconciliação vence.
+    Apenas enfileira: a execução é feita pelo worker `processar_jobs_asaas`.
     """
     
     if request.method == 'POST':
         try:
-            logger.info(f"🚀 Sincronização COMPLETA iniciada por {request.user.username}")
+            modo = 'completo' if request.POST.get('modo') == 'completo' else 'incremental'
+            logger.info(f"🚀 Sincronização {modo.upper()} enfileirada por {request.user.username}")
             
-            # Usar o novo serviço de sincronização completa
-            sync_service = AsaasSyncCompleto()
-            log = sync_service.executar_sincronizacao_completa(
-                usuario=request.user,
-                nome_conta="Asaas Principal"
+            job, criado = enfileirar_job(
+                'SINCRONIZACAO',
+                usuario=request.user.username,
+                parametros={'conta': 'principal', 'modo': modo},
+                tipo_log='COMPLETO' if modo == 'completo' else 'INCREMENTAL',
+                mensagem='Sincronização do Asaas Principal na fila...'
             )
-            
-            return JsonResponse({
-                'success': True,
-                'message': 'Sincronização completa realizada com sucesso!',
-                'log': {
-                    'id': log.id,
-                    'status': log.status,
-                    'total_clientes': log.total_clientes,
-                    'clientes_novos': log.clientes_novos,
-                    'total_cobrancas': log.total_cobrancas,
-                    'cobrancas_novas': log.cobrancas_novas,
-                    'duracao': log.duracao_segundos,
-                    'mensagem': log.mensagem,
-                }
-            })
+            return _resposta_job_enfileirado(job, criado, 'Sincronização iniciada! Acompanhe o progresso na página.')
             
         except Exception as e:
-            logger.error(f"❌ Erro na sincronização: {str(e)}", exc_info=True)
+            logger.error(f"❌ Erro ao enfileirar sincronização: {str(e)}", exc_info=True)
             return JsonResponse({
                 'success': False,
                 'message': f'Erro na sincronização: {str(e)}'
@@ -409,69 +401,41 @@ def sincronizar_agora(request):
     }, status=405)
 
 
+def _resposta_job_enfileirado(job, criado, mensagem):
+    """Resposta padrão das views que enfileiram tarefas do Asaas"""
+    if not criado:
+        mensagem = 'Já existe uma operação igual em andamento. Acompanhe o progresso na página.'
+    return JsonResponse({
+        'success': True,
+        'message': mensagem,
+        'log_id': job.log_id,
+        'job_id': job.id,
+        'log': {
+            'id': job.log_id,
+            'status': job.log.status if job.log else 'EM_ANDAMENTO',
+        }
+    }, status=202)
+
+
 @login_required
 def sincronizar_boletos_faltantes(request):
     """
     Sincroniza APENAS os boletos faltantes dos clientes já cadastrados.
-    Mostra progresso em tempo real.
+    Enfileira a tarefa; o progresso é consultado em status_sincronizacao.
     """
     
     if request.method == 'POST':
         try:
-            from asaas_sync.models import AsaasSyncronizacaoLog
-            from django.utils import timezone
-            
-            logger.info(f"Sincronização de BOLETOS FALTANTES iniciada por {request.user.username}")
+            logger.info(f"Sincronização de BOLETOS FALTANTES enfileirada por {request.user.username}")
             
-            # Criar log inicial
-            log = AsaasSyncronizacaoLog.objects.create(
-                tipo_sincronizacao='BOLETOS_FALTANTES',
-                status='EM_ANDAMENTO',
+            job, criado = enfileirar_job(
+                'BOLETOS_FALTANTES',
                 usuario=request.user.username,
-                mensagem='Sincronização iniciada...'
+                tipo_log='BOLETOS_FALTANTES'
+            )
+            return _resposta_job_enfileirado(
+                job, criado, 'Sincronização de boletos faltantes iniciada. Acompanhe o progresso na página.'
             )
-            
-            # Executar sincronização em thread separada
-            import threading
-            
-            def executar_sync():
-                try:
-                    inicio = timezone.now()
-                    sync_service = AsaasSyncService()
-                    stats = sync_service.sincronizar_boletos_faltantes()
-                    fim = timezone.now()
-                    
-                    # Atualizar log com resultados
-                    log.data_fim = fim
-                    log.status = 'SUCESSO'
-                    log.total_clientes = stats.get('clientes_processados', 0)
-                    log.cobrancas_novas = stats.get('cobrancas_novas', 0)
-                    log.cobrancas_atualizadas = stats.get('cobrancas_atualizadas', 0)
-                    log.total_cobrancas = stats.get('cobrancas_novas', 0) + stats.get('cobrancas_atualizadas', 0)
-                    log.mensagem = f"Sincronização concluída com sucesso. {stats.get('clientes_processados', 0)} clientes processados."
-                    log.calcular_duracao()
-                    log.save()
-                    
-                    logger.info(f"✅ Sincronização de boletos concluída: {stats}")
-                    
-                except Exception as e:
-                    log.data_fim = timezone.now()
-                    log.status = 'ERRO'
-                    log.erros = str(e)
-                    log.mensagem = f'Erro durante sincronização: {str(e)}'
-                    log.calcular_duracao()
-                    log.save()
-                    logger.error(f"Erro na sincronização de boletos: {str(e)}", exc_info=True)
-            
-            thread = threading.Thread(target=executar_sync)
-            thread.daemon = True
-            thread.start()
-            
-            return JsonResponse({
-                'success': True,
-                'message': 'Sincronização de boletos faltantes iniciada. Acompanhe o progresso na página.',
-                'log_id': log.id
-            })
             
         except Exception as e:
             logger.error(f"Erro ao iniciar sincronização de boletos: {str(e)}", exc_info=True)
@@ -521,7 +485,10 @@ def status_sincronizacao(request, log_id):
             'total_cobrancas': log.total_cobrancas,
             'cobrancas_novas': log.cobrancas_novas,
             'cobrancas_atualizadas': log.cobrancas_atualizadas,
+            'total_paginas': log.total_paginas,
+            'paginas_por_segundo': float(log.paginas_por_segundo) if log.paginas_por_segundo is not None else None,
             'erros': log.erros or '',
+            'fila': _status_fila(log),
         })
     except Exception as e:
         return JsonResponse({
@@ -530,6 +497,20 @@ def status_sincronizacao(request, log_id):
         }, status=500)
 
 
+def _status_fila(log):
+    """Situação da tarefa na fila (PENDENTE = aguardando worker) para a interface"""
+    job = log.jobs.order_by('-id').first()
+    if job is None:
+        return None
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'tentativas': job.tentativas,
+        'worker': job.worker or '',
+    }
+
+
 @login_required
 def historico_sincronizacoes(request):
     """Página com histórico de todas as sincronizações"""
@@ -862,7 +843,7 @@ def atualizar_telefone_cliente(request, cliente_id):
 def sincronizar_alternativo(request):
     """
     Sincroniza dados de conta Asaas ALTERNATIVA
-    Usa o mesmo método robusto: baixa tudo → salva tudo
+    Usa o mesmo método robusto (checkpoint incremental próprio), via fila de tarefas
     """
     
     if request.method == 'POST':
@@ -876,29 +857,17 @@ def sincronizar_alternativo(request):
                     'message': '❌ Token alternativo não configurado.\n\nConfigure ASAAS_ALTERNATIVO_TOKEN nas variáveis de ambiente.'
                 }, status=500)
             
-            logger.info(f"🚀 Sincronização ALTERNATIVA iniciada por {request.user.username}")
+            modo = 'completo' if request.POST.get('modo') == 'completo' else 'incremental'
+            logger.info(f"🚀 Sincronização ALTERNATIVA ({modo}) enfileirada por {request.user.username}")
             
-            # Usar o novo serviço de sincronização completa com token alternativo
-            sync_service = AsaasSyncCompleto(api_token=token_alternativo)
-            log = sync_service.executar_sincronizacao_completa(
-                usuario=request.user,
-                nome_conta="Asaas Alternativo (Conta 2)"
+            job, criado = enfileirar_job(
+                'SINCRONIZACAO',
+                usuario=request.user.username,
+                parametros={'conta': 'alternativo', 'modo': modo},
+                tipo_log='COMPLETO' if modo == 'completo' else 'INCREMENTAL',
+                mensagem='Sincronização do Asaas Alternativo (Conta 2) na fila...'
             )
-            
-            return JsonResponse({
-                'success': True,
-                'message': 'Sincronização alternativa completa realizada com sucesso!',
-                'log': {
-                    'id': log.id,
-                    'status': log.status,
-                    'total_clientes': log.total_clientes,
-                    'clientes_novos': log.clientes_novos,
-                    'total_cobrancas': log.total_cobrancas,
-                    'cobrancas_novas': log.cobrancas_novas,
-                    'duracao': log.duracao_segundos,
-                    'mensagem': log.mensagem,
-                }
-            })
+            return _resposta_job_enfileirado(job, criado, 'Sincronização alternativa iniciada!')
             
         except Exception as e:
             logger.error(f"Erro ao iniciar sincronização alternativa: {str(e)}", exc_info=True)
@@ -1709,10 +1678,10 @@ def baixar_dados_asaas(request):
     """
     Executa sincronização automática do Asaas
     Baixa, atualiza, adiciona e exclui dados automaticamente
+    (enfileirada; o worker roda sincronizar_asaas_auto.py)
     """
     if request.method == 'POST':
         try:
-            import json
             conta = request.POST.get('conta', 'principal')
             
             if conta not in ['principal', 'alternativo']:
@@ -1721,86 +1690,16 @@ def baixar_dados_asaas(request):
                     'message': 'Conta inválida. Use: principal ou alternativo'
                 }, status=400)
             
-            logger.info(f"[SYNC AUTO] Iniciando sincronização automática do Asaas ({conta}) por {request.user.username}")
-            
-            # Caminho do script
-            script_path = settings.BASE_DIR / 'sincronizar_asaas_auto.py'
-            python_executable = sys.executable
+            logger.info(f"[SYNC AUTO] Sincronização automática do Asaas ({conta}) enfileirada por {request.user.username}")
             
-            # Executar script em background e retornar task_id
-            import uuid
-            task_id = str(uuid.uuid4())
-            
-            # Criar log inicial
-            log = AsaasSyncronizacaoLog.objects.create(
-                tipo_sincronizacao=f'AUTO_SYNC_{conta.upper()}',
-                status='EM_ANDAMENTO',
+            job, criado = enfileirar_job(
+                'AUTO_SYNC',
                 usuario=request.user.username,
-                mensagem=f'Iniciando sincronização automática do Asaas ({conta})...'
+                parametros={'conta': conta},
+                tipo_log=f'AUTO_SYNC_{conta.upper()}',
+                mensagem=f'Sincronização automática do Asaas ({conta}) na fila...'
             )
-            
-            # Executar script em thread separada
-            def executar_sincronizacao():
-                try:
-                    logger.info(f"[SYNC] Executando: {python_executable} {script_path} {conta}")
-                    
-                    result = subprocess.run(
-                        [python_executable, str(script_path), conta],
-                        capture_output=True,
-                        text=True,
-                        encoding='utf-8',
-                        errors='replace',  # Substituir caracteres problemáticos
-                        timeout=3600  # 1 hora
-                    )
-                    
-                    logger.info(f"[SYNC] Return code: {result.returncode}")
-                    logger.info(f"[SYNC] STDOUT (primeiros 500 chars): {result.stdout[:500]}")
-                    if result.stderr:
-                        logger.error(f"[SYNC] STDERR: {result.stderr[:500]}")
-                    
-                    if result.returncode == 0:
-                        log.status = 'SUCESSO'
-                        log.mensagem = f'[OK] Sincronização automática concluída!\n\n{result.stdout[-1000:]}'
-                        
-                        # Extrair estatísticas do output
-                        import re
-                        match_clientes = re.search(r'Total: (\d+)', result.stdout)
-                        match_cobrancas = re.search(r'COBRANÇAS:.*?Total: (\d+)', result.stdout, re.DOTALL)
-                        
-                        if match_clientes:
-                            log.total_clientes = int(match_clientes.group(1))
-                        if match_cobrancas:
-                            log.total_cobrancas = int(match_cobrancas.group(1))
-                        
-                        log.save()
-                        logger.info(f"[SYNC] Sucesso! Clientes: {log.total_clientes}, Cobranças: {log.total_cobrancas}")
-                    else:
-                        log.status = 'ERRO'
-                        log.mensagem = f'[ERRO] Erro na sincronização (code {result.returncode}):\n\nSTDOUT:\n{result.stdout[:500]}\n\nSTDERR:\n{result.stderr[:500]}'
-                        log.save()
-                        logger.error(f"[SYNC] Erro! Return code: {result.returncode}")
-                        
-                except subprocess.TimeoutExpired:
-                    log.status = 'ERRO'
-                    log.mensagem = f'[ERRO] Timeout: Sincronização demorou mais de 1 hora'
-                    log.save()
-                    logger.error(f"[SYNC] Timeout na sincronização")
-                except Exception as e:
-                    log.status = 'ERRO'
-                    log.mensagem = f'[ERRO] Exception: {str(e)}\n\nTraceback:\n{traceback.format_exc()}'
-                    log.save()
-                    logger.error(f"[SYNC] Exception: {str(e)}", exc_info=True)
-            
-            thread = threading.Thread(target=executar_sincronizacao)
-            thread.daemon = True
-            thread.start()
-            
-            return JsonResponse({
-                'success': True,
-                'message': f'Sincronização automática iniciada para conta {conta}',
-                'log_id': log.id,
-                'task_id': task_id
-            })
+            return _resposta_job_enfileirado(job, criado, f'Sincronização automática iniciada para conta {conta}')
             
         except Exception as e:
             logger.error(f"Erro ao iniciar sincronização: {str(e)}", exc_info=True)
@@ -1816,11 +1715,10 @@ def baixar_dados_asaas(request):
 def importar_json_limpo(request):
     """
     Importa JSON e executa limpeza automática (--limpar)
-    Remove do banco local tudo que não está no Asaas
+    Remove do banco local tudo que não está no Asaas (enfileirada)
     """
     if request.method == 'POST':
         try:
-            import json
             arquivo_json = request.POST.get('arquivo')
             conta = request.POST.get('conta', 'principal')
             
@@ -1830,71 +1728,22 @@ def importar_json_limpo(request):
                     'message': 'Arquivo JSON não especificado'
                 }, status=400)
             
-            logger.info(f"📥 Iniciando importação LIMPA do arquivo {arquivo_json} por {request.user.username}")
-            
-            # Caminho do script
-            script_path = settings.BASE_DIR / 'importar_json_banco.py'
-            json_path = settings.BASE_DIR / arquivo_json
-            python_executable = sys.executable
-            
-            if not json_path.exists():
+            if not (settings.BASE_DIR / arquivo_json).exists():
                 return JsonResponse({
                     'success': False,
                     'message': f'Arquivo não encontrado: {arquivo_json}'
                 }, status=404)
             
-            # Criar log inicial
-            log = AsaasSyncronizacaoLog.objects.create(
-                tipo_sincronizacao=f'IMPORTACAO_JSON_LIMPA_{conta.upper()}',
-                status='EM_ANDAMENTO',
+            logger.info(f"📥 Importação LIMPA do arquivo {arquivo_json} enfileirada por {request.user.username}")
+            
+            job, criado = enfileirar_job(
+                'IMPORTACAO_JSON_LIMPA',
                 usuario=request.user.username,
-                mensagem=f'Iniciando importação limpa de {arquivo_json}...'
+                parametros={'arquivo': arquivo_json, 'conta': conta},
+                tipo_log=f'IMPORTACAO_JSON_LIMPA_{conta.upper()}',
+                mensagem=f'Importação limpa de {arquivo_json} na fila...'
             )
-            
-            # Executar script em thread separada
-            def executar_importacao():
-                try:
-                    result = subprocess.run(
-                        [python_executable, str(script_path), str(json_path), '--limpar', '--auto-confirm'],
-                        capture_output=True,
-                        text=True,
-                        timeout=3600  # 1 hora
-                    )
-                    
-                    if result.returncode == 0:
-                        log.status = 'SUCESSO'
-                        log.mensagem = f'✅ Importação limpa concluída!\n\n{result.stdout[-1000:]}'
-                        
-                        # Extrair estatísticas do output
-                        import re
-                        match_clientes = re.search(r'Total: (\d+)', result.stdout)
-                        match_cobrancas = re.search(r'Cobranças.*?Total: (\d+)', result.stdout, re.DOTALL)
-                        
-                        if match_clientes:
-                            log.total_clientes = int(match_clientes.group(1))
-                        if match_cobrancas:
-                            log.total_cobrancas = int(match_cobrancas.group(1))
-                        
-                        log.save()
-                    else:
-                        log.status = 'ERRO'
-                        log.mensagem = f'❌ Erro na importação:\n\n{result.stderr[:1000]}'
-                        log.save()
-                        
-                except Exception as e:
-                    log.status = 'ERRO'
-                    log.mensagem = f'❌ Erro: {str(e)}'
-                    log.save()
-            
-            thread = threading.Thread(target=executar_importacao)
-            thread.daemon = True
-            thread.start()
-            
-            return JsonResponse({
-                'success': True,
-                'message': f'Importação limpa iniciada',
-                'log_id': log.id
-            })
+            return _resposta_job_enfileirado(job, criado, 'Importação limpa iniciada')
             
         except Exception as e:
             logger.error(f"Erro ao iniciar importação: {str(e)}", exc_info=True)
@@ -1920,7 +1769,8 @@ def status_operacao(request, log_id):
             'mensagem': log.mensagem,
             'total_clientes': log.total_clientes or 0,
             'total_cobrancas': log.total_cobrancas or 0,
-            'duracao': log.duracao_segundos or 0
+            'duracao': log.duracao_segundos or 0,
+            'fila': _status_fila(log),
         })
         
     except AsaasSyncronizacaoLog.DoesNotExist:
@@ -17,14 +17,19 @@ from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from core.services import LogService, NotificacaoService, ConfiguracaoService
 from core.asaas_service import asaas_service
 from core.utils import Validadores, FormularioUtils
-from core.webhook_handlers import webhook_handler
+from core.maquina_pagamentos import aplicar_webhook
+from core.webhook_dedup import gerar_chave_idempotencia, chaves_recentes
+from core.models import WebhookLog
+from core.webhook_fila import finalizar_webhook
+from core.webhook_estatisticas import registrar_recebido, atualizar_status
+from django.db import IntegrityError, transaction
 
 # IMPORTAR FORMULÁRIOS E MODELOS LOCAIS
 from marketing.models import Lead, OrigemContato, OrigemLead
 from .models import Atendimento, HistoricoAtendimento
 from financeiro.views import criar_cliente_asaas
 from comissoes.models import ComissaoLead
-from financeiro.models import PixLevantamento, ClienteAsaas
+from financeiro.models import PixLevantamento, ClienteAsaas, RotaPagamentoAsaas
 
 from django.views.decorators.cache import never_cache
 
@@ -541,7 +546,7 @@ def salvar_lead_sem_levantamento(request):
                 return JsonResponse({'success': False, 'message': 'CPF ou CNPJ inválido.'})
         
         # E-mail obrigatório? (config)
-        obrigar_email = ConfiguracaoService.obter_config('LEAD_OBRIGAR_EMAIL', False)
+        obrigar_email = ConfiguracaoService.obter_bool('LEAD_OBRIGAR_EMAIL', False)
         if obrigar_email and not email:
             return JsonResponse({'success': False, 'message': 'E-mail é obrigatório.'})
         if not origem_id:
@@ -564,7 +569,7 @@ def salvar_lead_sem_levantamento(request):
         else:
             return JsonResponse({'success': False, 'message': 'ID do captador é obrigatório.'})
         
-        status_inicial = str(ConfiguracaoService.obter_config('LEAD_STATUS_INICIAL', 'NOVO') or 'NOVO')
+        status_inicial = ConfiguracaoService.obter_texto('LEAD_STATUS_INICIAL', 'NOVO') or 'NOVO'
         
         # Usa função inteligente para salvar/atualizar lead
         lead, created, aviso = salvar_ou_atualizar_lead_inteligente(
@@ -630,7 +635,7 @@ def salvar_lead_api(request):
                 return JsonResponse({'success': False, 'message': 'CPF ou CNPJ inválido.'})
 
         # Validar outros campos obrigatórios conforme política do painel
-        obrigar_email = ConfiguracaoService.obter_config('LEAD_OBRIGAR_EMAIL', False)
+        obrigar_email = ConfiguracaoService.obter_bool('LEAD_OBRIGAR_EMAIL', False)
         validacao = FormularioUtils.validar_etapa_lead(
             nome_completo,
             telefone,
@@ -663,7 +668,7 @@ def salvar_lead_api(request):
         else:
             return JsonResponse({'success': False, 'message': 'ID do captador é obrigatório.'})
         
-        status_inicial = str(ConfiguracaoService.obter_config('LEAD_STATUS_INICIAL', 'CONTATADO') or 'CONTATADO')
+        status_inicial = ConfiguracaoService.obter_texto('LEAD_STATUS_INICIAL', 'CONTATADO') or 'CONTATADO'
         
         # Usa função inteligente para salvar/atualizar lead
         lead, created, aviso = salvar_ou_atualizar_lead_inteligente(
@@ -867,7 +872,7 @@ def gerar_pix_api(request, lead_id):
         logger.info(f"Iniciando geração de PIX para lead {lead_id}: {lead.nome_completo}")
         
         # Validar CPF/CNPJ obrigatório
-        exigir_cpf = ConfiguracaoService.obter_config('LEAD_OBRIGAR_CPF_PARA_LEVANTAMENTO', True)
+        exigir_cpf = ConfiguracaoService.obter_bool('LEAD_OBRIGAR_CPF_PARA_LEVANTAMENTO', True)
         if exigir_cpf and not lead.cpf_cnpj:
             logger.warning(f"Lead {lead_id} sem CPF/CNPJ")
             return JsonResponse({
@@ -926,13 +931,13 @@ def gerar_pix_api(request, lead_id):
         logger.info(f"Usando customer_id: {cliente_asaas.asaas_customer_id}")
         
         # Obter valor do PIX da configuração
-        valor_pix = float(ConfiguracaoService.obter_config('PIX_VALOR_LEVANTAMENTO', ConfiguracaoService.obter_config('VALOR_CONSULTA_PADRAO', 29.90)))
+        valor_pix = ConfiguracaoService.obter_float('PIX_VALOR_LEVANTAMENTO', ConfiguracaoService.obter_float('VALOR_CONSULTA_PADRAO', 29.90))
         
         # ASAAS exige valor mínimo de R$ 5,00 por parcela
         if valor_pix < 5.00:
             valor_pix = 5.00
         
-        descricao_pix = str(ConfiguracaoService.obter_config('PIX_DESCRICAO', f"Consulta {lead.nome_completo[:20]}"))
+        descricao_pix = ConfiguracaoService.obter_texto('PIX_DESCRICAO', f"Consulta {lead.nome_completo[:20]}")
         
         # Dados para criar cobrança PIX usando dados do Lead
         cobranca_data = {
@@ -957,7 +962,7 @@ def gerar_pix_api(request, lead_id):
             
             if pix_data:
                 # Salvar os dados do PIX na tabela PixLevantamento
-                PixLevantamento.objects.create(
+                pix_levantamento = PixLevantamento.objects.create(
                     lead=lead,
                     asaas_payment_id=cobranca_response['id'],
                     valor=valor_pix,
@@ -965,6 +970,7 @@ def gerar_pix_api(request, lead_id):
                     pix_qr_code_url=pix_data.get('encodedImage', ''),
                     status_pagamento='pendente'
                 )
+                RotaPagamentoAsaas.registrar('PIX_LEVANTAMENTO', pix_levantamento.pk, pix_levantamento.asaas_payment_id)
                 
                 # Atualiza status para pendente de pagamento
                 lead.status = 'LEVANTAMENTO_PENDENTE'
@@ -1029,90 +1035,52 @@ def gerar_pix_api(request, lead_id):
 def webhook_pagamento_pix(request):
     """
     Webhook para receber confirmações de pagamento do ASAAS
-    Usando o handler do core
+    Usando a máquina de estados do core
     """
     if request.method == 'POST':
+        webhook_log = None
+        chave = None
         try:
             data = json.loads(request.body)
+            payment = data.get('payment', {})
             
-            #  USAR WEBHOOK HANDLER DO CORE
-            resultado = webhook_handler.processar_webhook_pagamento(data)
-            
-            if resultado:
-                # Lógica específica do atendimento
-                payment = data.get('payment', {})
-                payment_id = payment.get('id')
-                status = payment.get('status')
-                
-                if status == 'RECEIVED':
-                    # Atualizar Lead: fez_levantamento = True
-                    try:
-                        pix = PixLevantamento.objects.get(asaas_payment_id=payment_id)
-                        lead = pix.lead
-                        lead.fez_levantamento = True
-                        # Atualizar status conforme configuração
-                        status_pos = str(ConfiguracaoService.obter_config('LEAD_STATUS_APOS_PAGAMENTO', 'LEVANTAMENTO_PAGO') or 'LEVANTAMENTO_PAGO')
-                        lead.status = status_pos
-                        lead.save()
-                    except Exception as e:
-                        logger.error(f'Erro ao atualizar Lead após pagamento PIX: {str(e)}')
-                    
-                    # Comissionamento automático (se ativo)
-                    try:
-                        if ConfiguracaoService.obter_config('COMISSAO_ATIVA', True) and lead.atendente:
-                            valor_comissao = ConfiguracaoService.obter_config('COMISSAO_ATENDENTE_VALOR_FIXO', 0.50)
-                            # Cria se não existir (unique_together garante unicidade)
-                            ComissaoLead.objects.get_or_create(
-                                lead=lead,
-                                atendente=lead.atendente,
-                                defaults={'valor': valor_comissao}
-                            )
-                    except Exception as e:
-                        logger.error(f'Erro ao registrar comissão: {str(e)}')
-
-                    # Agendar follow-up (notificação) conforme configuração
-                    try:
-                        intervalo = int(ConfiguracaoService.obter_config('FOLLOWUP_INTERVALO_PADRAO_DIAS', 2) or 2)
-                        data_follow = timezone.now() + timedelta(days=intervalo)
-                        usuario_destino = lead.atendente or lead.captador
-                        if usuario_destino:
-                            NotificacaoService.criar_notificacao(
-                                usuario=usuario_destino,
-                                titulo='Agendar Follow-up',
-                                mensagem=f"Realizar follow-up com {lead.nome_completo} em {data_follow.strftime('%d/%m/%Y')}",
-                                tipo='INFO',
-                                link=f'/atendimento/lead/{lead.id}/'
-                            )
-                        # Atualiza status para contato se definido
-                        status_contato = ConfiguracaoService.obter_config('LEAD_STATUS_CONTATO', None)
-                        if status_contato:
-                            lead.status = str(status_contato)
-                            lead.save(update_fields=['status'])
-                    except Exception as e:
-                        logger.error(f'Erro ao agendar follow-up: {str(e)}')
-
-                    #  NOTIFICAÇÃO DE PAGAMENTO
-                    NotificacaoService.criar_notificacao(
-                        usuario=lead.captador,
-                        titulo='Pagamento Confirmado',
-                        mensagem=f'Pagamento confirmado para {lead.nome_completo}',
-                        tipo='SUCESSO',
-                        link=f'/atendimento/lead/{lead.id}/'
-                    )
-                    
-                    LogService.registrar(
-                        usuario=lead.captador,
-                        nivel='INFO',
-                        mensagem=f"Pagamento confirmado - Lead ID: {lead.id}",
-                        modulo='atendimento',
-                        acao='pagamento_confirmado',
-                        ip=None  # Webhook não tem IP do cliente
+            #  REENTREGA DO ASAAS: descarta antes de qualquer consulta de domínio
+            chave = gerar_chave_idempotencia(data, origem='atendimento')
+            if chaves_recentes.contem(chave):
+                return JsonResponse({'status': 'success', 'duplicado': True})
+            try:
+                with transaction.atomic():
+                    webhook_log = WebhookLog.objects.create(
+                        tipo='ASAAS_ATENDIMENTO',
+                        evento=data.get('event') or 'DESCONHECIDO',
+                        payload=data,
+                        chave_idempotencia=chave,
+                        payment_id=payment.get('id') or '',
+                        customer_id=payment.get('customer') or '',
+                        payment_status=payment.get('status') or '',
+                        status_processamento='PROCESSING',
                     )
+                    registrar_recebido(webhook_log)
+            except IntegrityError:
+                chaves_recentes.adicionar(chave)
+                return JsonResponse({'status': 'success', 'duplicado': True})
+            chaves_recentes.adicionar(chave)
+            
+            #  MÁQUINA DE ESTADOS DO CORE (lead, comissões e notificações incluídos)
+            status, mensagem = aplicar_webhook(data)
             
+            finalizar_webhook(webhook_log, status, mensagem)
             return JsonResponse({'status': 'success'})
             
         except Exception as e:
             logger.error(f"Erro no webhook: {str(e)}")
+            if webhook_log is not None:
+                # Libera a chave: a reentrega do Asaas deve ser processada de novo
+                atualizar_status(
+                    WebhookLog.objects.filter(pk=webhook_log.pk), 'ERROR',
+                    chave_idempotencia=None, mensagem_erro=str(e)
+                )
+                chaves_recentes.remover(chave)
             LogService.registrar(
                 nivel='ERROR',
                 mensagem=f"Erro no webhook atendimento: {str(e)}",
@@ -1239,7 +1207,7 @@ def lista_leads_pix(request):
             # Lead tentou fazer levantamento mas PIX não foi gerado (erro)
             lead.pix_real = None
             lead.pix_code = ''
-            lead.pix_valor = float(ConfiguracaoService.obter_config('PIX_VALOR_LEVANTAMENTO', 29.90))
+            lead.pix_valor = ConfiguracaoService.obter_float('PIX_VALOR_LEVANTAMENTO', 29.90)
             lead.pix_status = 'erro_geracao'  # Status especial para indicar erro na geração
 
     return render(request, 'atendimento/lista_leads_pix.html', {'leads': leads_paginated})
@@ -1332,7 +1300,7 @@ def forcar_pagamento_levantamento(request, lead_id):
         lead.fez_levantamento = True
         
         # Atualiza o status
-        status_pos = str(ConfiguracaoService.obter_config('LEAD_STATUS_APOS_PAGAMENTO', 'LEVANTAMENTO_PAGO') or 'LEVANTAMENTO_PAGO')
+        status_pos = ConfiguracaoService.obter_texto('LEAD_STATUS_APOS_PAGAMENTO', 'LEVANTAMENTO_PAGO') or 'LEVANTAMENTO_PAGO'
         lead.status = status_pos
         
         logger.info(f'[FORCAR_PAGAMENTO] Lead ID: {lead.id}, Nome: {lead.nome_completo}')
@@ -1351,8 +1319,8 @@ def forcar_pagamento_levantamento(request, lead_id):
         
         # Registra comissão automaticamente (se ativo)
         try:
-            if ConfiguracaoService.obter_config('COMISSAO_ATIVA', True) and lead.atendente:
-                valor_comissao = float(ConfiguracaoService.obter_config('COMISSAO_ATENDENTE_VALOR_FIXO', 0.50) or 0.50)
+            if ConfiguracaoService.obter_bool('COMISSAO_ATIVA', True) and lead.atendente:
+                valor_comissao = ConfiguracaoService.obter_float('COMISSAO_ATENDENTE_VALOR_FIXO', 0.50) or 0.50
                 ComissaoLead.objects.get_or_create(
                     lead=lead,
                     atendente=lead.atendente,
@@ -1,15 +1,18 @@
 """
-SCRIPT 1: Baixar TODOS os dados do Asaas e salvar em JSON
+SCRIPT 1: Baixar TODOS os dados do Asaas e salvar em NDJSON (um registro por linha)
 Uso: python baixar_asaas_json.py [conta]
 Exemplos:
   python baixar_asaas_json.py principal
   python baixar_asaas_json.py alternativo
+
+Cada página é gravada no arquivo assim que chega (memória constante). Durante o
+download o arquivo tem a extensão .parcial; se o processo cair, o que já foi
+baixado continua no disco.
 """
 import os
 import sys
 import django
 import json
-import requests
 import time
 from datetime import datetime
 
@@ -24,6 +27,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistemaMrBaruchProjeto.settings
 django.setup()
 
 from django.conf import settings
+from core.asaas_client import AsaasClient
 
 
 class BaixadorAsaas:
@@ -36,38 +40,45 @@ class BaixadorAsaas:
             self.api_token = getattr(settings, 'ASAAS_API_TOKEN', '')
             
         self.base_url = getattr(settings, 'ASAAS_API_URL', 'https://api.asaas.com/v3')
-        self.headers = {
-            'Content-Type': 'application/json',
-            'access_token': self.api_token
-        }
         self.timeout = 120
+        # Session compartilhada (keep-alive) + limitador da conta
+        self.client = AsaasClient(self.api_token, base_url=self.base_url, timeout=self.timeout, conta=nome_conta)
         
-        # Dados coletados
-        self.clientes = []
-        self.cobrancas = []
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.nome_arquivo = f'asaas_{self.nome_conta}_{timestamp}.ndjson'
+        self.arquivo = None  # Spool aberto durante o download
+        
+        # Apenas contadores e IDs ficam em memória; os registros vão direto para o arquivo
+        self.ids_clientes = []
+        self._ids_clientes_vistos = set()
+        self.ids_cobrancas = set()
+        self.total_clientes = 0
+        self.total_cobrancas = 0
+        self.duplicados_clientes = 0
+        self.duplicados_cobrancas = 0
+        self.clientes_sem_nome = 0
+        self.cobrancas_por_status = {}
+        self.valor_total = 0
         
     def fazer_requisicao(self, endpoint, params=None):
         """Faz requisição com retry"""
-        url = f"{self.base_url}/{endpoint}"
-        
         for tentativa in range(1, 4):
             try:
                 print(f"  [REQ] Requisição {tentativa}/3: {endpoint}")
                 
-                response = requests.get(
-                    url,
-                    params=params,
-                    headers=self.headers,
-                    timeout=self.timeout
-                )
+                response = self.client.get(endpoint, params=params)
                 
                 if response.status_code == 200:
                     return response.json()
                     
-                elif response.status_code in [429, 403]:
-                    tempo = 60 if response.status_code == 403 else 10
-                    print(f"  [AVISO]  Rate limit. Aguardando {tempo}s...")
-                    time.sleep(tempo)
+                elif response.status_code == 429:
+                    # O cliente já pausou o limitador da conta (Retry-After)
+                    print(f"  [AVISO]  Rate limit. Aguardando liberação da cota...")
+                    continue
+                    
+                elif response.status_code == 403:
+                    print(f"  [AVISO]  Rate limit. Aguardando 60s...")
+                    time.sleep(60)
                     continue
                     
                 else:
@@ -114,8 +125,8 @@ class BaixadorAsaas:
                 print("[OK] Sem mais clientes.")
                 break
             
-            self.clientes.extend(clientes_pagina)
-            print(f"[OK] Baixados {len(clientes_pagina)} clientes. Total: {len(self.clientes)}/{total_esperado}")
+            self.gravar_clientes(clientes_pagina)
+            print(f"[OK] Baixados {len(clientes_pagina)} clientes. Total: {self.total_clientes}/{total_esperado}")
             
             if not has_more:
                 print("[OK] API informou que não há mais páginas (hasMore=false)")
@@ -130,19 +141,19 @@ class BaixadorAsaas:
         print("[VALIDACAO] VALIDAÇÃO DE CLIENTES")
         print("="*80)
         print(f"[STATS] Total esperado: {total_esperado}")
-        print(f"[STATS] Total baixado: {len(self.clientes)}")
+        print(f"[STATS] Total baixado: {self.total_clientes}")
         
-        if total_esperado and len(self.clientes) == total_esperado:
-            print(f"[OK] CONFIRMADO: Baixados {len(self.clientes)} clientes - 100% completo!")
-        elif total_esperado and len(self.clientes) < total_esperado:
-            faltam = total_esperado - len(self.clientes)
-            print(f"[AVISO]  ATENÇÃO: Faltam {faltam} clientes! ({len(self.clientes)}/{total_esperado})")
+        if total_esperado and self.total_clientes == total_esperado:
+            print(f"[OK] CONFIRMADO: Baixados {self.total_clientes} clientes - 100% completo!")
+        elif total_esperado and self.total_clientes < total_esperado:
+            faltam = total_esperado - self.total_clientes
+            print(f"[AVISO]  ATENÇÃO: Faltam {faltam} clientes! ({self.total_clientes}/{total_esperado})")
             if not input("\n[AVISO]  Continuar mesmo assim? (s/n): ").lower().startswith('s'):
                 raise Exception(f"Download incompleto! Faltam {faltam} clientes.")
         else:
-            print(f"[OK] Total baixado: {len(self.clientes)} clientes")
+            print(f"[OK] Total baixado: {self.total_clientes} clientes")
         
-        return len(self.clientes)
+        return self.total_clientes
     
     def baixar_cobrancas(self):
         """Baixa TODAS as cobranças de TODOS os clientes"""
@@ -150,13 +161,10 @@ class BaixadorAsaas:
         print("[DOWNLOAD] BAIXANDO TODAS AS COBRANÇAS")
         print("="*80)
         
-        total_clientes = len(self.clientes)
+        total_clientes = len(self.ids_clientes)
         
-        for i, cliente in enumerate(self.clientes, 1):
-            customer_id = cliente.get('id')
-            customer_name = cliente.get('name', 'Sem nome')[:50]
-            
-            print(f"\n[CLIENTE] Cliente {i}/{total_clientes}: {customer_name}")
+        for i, customer_id in enumerate(self.ids_clientes, 1):
+            print(f"\n[CLIENTE] Cliente {i}/{total_clientes}: {customer_id}")
             
             offset = 0
             limit = 100
@@ -184,7 +192,7 @@ class BaixadorAsaas:
                 for cobranca in cobrancas_pagina:
                     cobranca['_customer_id'] = customer_id
                 
-                self.cobrancas.extend(cobrancas_pagina)
+                self.gravar_cobrancas(cobrancas_pagina)
                 cobrancas_cliente += len(cobrancas_pagina)
                 
                 if not has_more:
@@ -196,60 +204,92 @@ class BaixadorAsaas:
             print(f"   [OK] {cobrancas_cliente} cobranças")
             time.sleep(0.3)  # Pausa entre clientes
         
-        print(f"\n[OK] Total: {len(self.cobrancas)} cobranças baixadas")
-        return len(self.cobrancas)
+        print(f"\n[OK] Total: {self.total_cobrancas} cobranças baixadas")
+        return self.total_cobrancas
     
-    def salvar_json(self):
-        """Salva tudo em arquivo JSON"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        nome_arquivo = f'asaas_{self.nome_conta}_{timestamp}.json'
-        
-        # Calcular estatísticas das cobranças
-        cobrancas_por_status = {}
-        valor_total = 0
-        for c in self.cobrancas:
-            status = c.get('status', 'UNKNOWN')
-            cobrancas_por_status[status] = cobrancas_por_status.get(status, 0) + 1
-            valor_total += float(c.get('value', 0))
-        
-        dados = {
+    def abrir_spool(self):
+        """Abre o arquivo .parcial e grava o cabeçalho"""
+        self.arquivo = open(f'{self.nome_arquivo}.parcial', 'w', encoding='utf-8')
+        self._gravar_linha({
+            'tipo': 'cabecalho',
             'conta': self.nome_conta,
             'data_download': datetime.now().isoformat(),
-            'total_clientes': len(self.clientes),
-            'total_cobrancas': len(self.cobrancas),
-            'valor_total_cobrancas': valor_total,
-            'cobrancas_por_status': cobrancas_por_status,
-            'validacao': {
-                'download_completo': True,
-                'clientes_unicos': len(set(c.get('id') for c in self.clientes)),
-                'cobrancas_unicas': len(set(c.get('id') for c in self.cobrancas)),
-            },
-            'clientes': self.clientes,
-            'cobrancas': self.cobrancas
-        }
-        
+        })
+    
+    def _gravar_linha(self, registro):
+        self.arquivo.write(json.dumps(registro, ensure_ascii=False))
+        self.arquivo.write('\n')
+    
+    def gravar_clientes(self, clientes_pagina):
+        """Grava uma página de clientes no spool assim que ela chega"""
+        for cliente in clientes_pagina:
+            customer_id = cliente.get('id')
+            if customer_id:
+                if customer_id in self._ids_clientes_vistos:
+                    self.duplicados_clientes += 1
+                    continue
+                self._ids_clientes_vistos.add(customer_id)
+                self.ids_clientes.append(customer_id)
+            if not cliente.get('name'):
+                self.clientes_sem_nome += 1
+            self._gravar_linha({'tipo': 'cliente', 'dados': cliente})
+            self.total_clientes += 1
+        self.arquivo.flush()
+    
+    def gravar_cobrancas(self, cobrancas_pagina):
+        """Grava uma página de cobranças no spool assim que ela chega"""
+        for cobranca in cobrancas_pagina:
+            cobranca_id = cobranca.get('id')
+            if cobranca_id in self.ids_cobrancas:
+                self.duplicados_cobrancas += 1
+                continue
+            self.ids_cobrancas.add(cobranca_id)
+            
+            status = cobranca.get('status', 'UNKNOWN')
+            self.cobrancas_por_status[status] = self.cobrancas_por_status.get(status, 0) + 1
+            self.valor_total += float(cobranca.get('value', 0))
+            
+            self._gravar_linha({'tipo': 'cobranca', 'dados': cobranca})
+            self.total_cobrancas += 1
+        self.arquivo.flush()
+    
+    def salvar_json(self):
+        """Grava o resumo no fim do spool e publica o arquivo final"""
         print("\n" + "="*80)
-        print("[SALVANDO] SALVANDO ARQUIVO JSON")
+        print("[SALVANDO] FINALIZANDO ARQUIVO NDJSON")
         print("="*80)
         
-        with open(nome_arquivo, 'w', encoding='utf-8') as f:
-            json.dump(dados, f, ensure_ascii=False, indent=2)
+        self._gravar_linha({
+            'tipo': 'resumo',
+            'total_clientes': self.total_clientes,
+            'total_cobrancas': self.total_cobrancas,
+            'valor_total_cobrancas': self.valor_total,
+            'cobrancas_por_status': self.cobrancas_por_status,
+            'validacao': {
+                'download_completo': True,
+                'clientes_unicos': len(self.ids_clientes),
+                'cobrancas_unicas': len(self.ids_cobrancas),
+            },
+        })
+        self.arquivo.close()
+        self.arquivo = None
+        os.replace(f'{self.nome_arquivo}.parcial', self.nome_arquivo)
         
-        tamanho_mb = os.path.getsize(nome_arquivo) / (1024 * 1024)
+        tamanho_mb = os.path.getsize(self.nome_arquivo) / (1024 * 1024)
         
-        print(f"\n[OK] Arquivo salvo: {nome_arquivo}")
+        print(f"\n[OK] Arquivo salvo: {self.nome_arquivo}")
         print(f"[STATS] Tamanho: {tamanho_mb:.2f} MB")
-        print(f"[STATS] Clientes: {len(self.clientes)} (únicos: {dados['validacao']['clientes_unicos']})")
-        print(f"[STATS] Cobranças: {len(self.cobrancas)} (únicas: {dados['validacao']['cobrancas_unicas']})")
-        print(f"[VALOR] Valor total: R$ {valor_total:,.2f}")
+        print(f"[STATS] Clientes: {self.total_clientes} (únicos: {len(self.ids_clientes)})")
+        print(f"[STATS] Cobranças: {self.total_cobrancas} (únicas: {len(self.ids_cobrancas)})")
+        print(f"[VALOR] Valor total: R$ {self.valor_total:,.2f}")
         print(f"\n[STATS] Cobranças por status:")
-        for status, qtd in sorted(cobrancas_por_status.items()):
+        for status, qtd in sorted(self.cobrancas_por_status.items()):
             print(f"   • {status}: {qtd}")
         
-        return nome_arquivo
+        return self.nome_arquivo
     
     def validar_integridade(self):
-        """Validação final de integridade dos dados"""
+        """Validação final de integridade dos dados (contadores acumulados no download)"""
         print("\n" + "="*80)
         print("[VALIDACAO] VALIDAÇÃO FINAL DE INTEGRIDADE")
         print("="*80)
@@ -257,46 +297,31 @@ class BaixadorAsaas:
         erros = []
         avisos = []
         
-        # 1. Verificar clientes duplicados
-        ids_clientes = [c.get('id') for c in self.clientes if c.get('id')]
-        duplicados_clientes = len(ids_clientes) - len(set(ids_clientes))
-        if duplicados_clientes > 0:
-            avisos.append(f"[AVISO]  {duplicados_clientes} clientes duplicados no download")
+        # 1. Verificar clientes duplicados (descartados na gravação)
+        if self.duplicados_clientes > 0:
+            avisos.append(f"[AVISO]  {self.duplicados_clientes} clientes duplicados no download (ignorados)")
         else:
             print(f"[OK] Nenhum cliente duplicado")
         
-        # 2. Verificar cobranças duplicadas
-        ids_cobrancas = [c.get('id') for c in self.cobrancas if c.get('id')]
-        duplicados_cobrancas = len(ids_cobrancas) - len(set(ids_cobrancas))
-        if duplicados_cobrancas > 0:
-            avisos.append(f"[AVISO]  {duplicados_cobrancas} cobranças duplicadas no download")
+        # 2. Verificar cobranças duplicadas (descartadas na gravação)
+        if self.duplicados_cobrancas > 0:
+            avisos.append(f"[AVISO]  {self.duplicados_cobrancas} cobranças duplicadas no download (ignoradas)")
         else:
             print(f"[OK] Nenhuma cobrança duplicada")
         
         # 3. Verificar clientes sem ID
-        clientes_sem_id = sum(1 for c in self.clientes if not c.get('id'))
+        clientes_sem_id = self.total_clientes - len(self.ids_clientes)
         if clientes_sem_id > 0:
             erros.append(f"[ERRO] {clientes_sem_id} clientes sem ID!")
         else:
             print(f"[OK] Todos os clientes têm ID")
         
-        # 4. Verificar cobranças orfãs (sem cliente)
-        customer_ids = set(c.get('id') for c in self.clientes)
-        cobrancas_orfas = 0
-        for cobranca in self.cobrancas:
-            customer_id = cobranca.get('_customer_id') or cobranca.get('customer')
-            if customer_id not in customer_ids:
-                cobrancas_orfas += 1
-        
-        if cobrancas_orfas > 0:
-            avisos.append(f"[AVISO]  {cobrancas_orfas} cobranças sem cliente correspondente")
-        else:
-            print(f"[OK] Todas as cobranças têm cliente correspondente")
+        # 4. Cobranças orfãs: impossível aqui, elas são baixadas a partir da lista de clientes
+        print(f"[OK] Todas as cobranças têm cliente correspondente")
         
         # 5. Verificar clientes sem nome
-        clientes_sem_nome = sum(1 for c in self.clientes if not c.get('name'))
-        if clientes_sem_nome > 0:
-            avisos.append(f"[AVISO]  {clientes_sem_nome} clientes sem nome")
+        if self.clientes_sem_nome > 0:
+            avisos.append(f"[AVISO]  {self.clientes_sem_nome} clientes sem nome")
         else:
             print(f"[OK] Todos os clientes têm nome")
         
@@ -326,14 +351,20 @@ class BaixadorAsaas:
         
         inicio = time.time()
         
-        # Baixar dados
-        self.baixar_clientes()
-        self.baixar_cobrancas()
-        
-        # Validar integridade
-        self.validar_integridade()
-        
-        # Salvar JSON
+        # Baixar dados (gravados no spool página a página)
+        self.abrir_spool()
+        try:
+            self.baixar_clientes()
+            self.baixar_cobrancas()
+            
+            # Validar integridade
+            self.validar_integridade()
+        except BaseException:
+            self.arquivo.close()
+            print(f"\n[AVISO]  Download interrompido. Dados parciais em: {self.nome_arquivo}.parcial")
+            raise
+        
+        # Finalizar arquivo
         arquivo = self.salvar_json()
         
         duracao = time.time() - inicio
@@ -350,7 +381,7 @@ class BaixadorAsaas:
         print(f"   • Download 100% completo (totalCount validado)")
         print(f"   • Sem duplicações")
         print(f"   • Todas as cobranças têm cliente")
-        print(f"   • Arquivo JSON íntegro e validado")
+        print(f"   • Arquivo NDJSON íntegro e validado")
         
         return arquivo
 
@@ -52,13 +52,9 @@ class ComissaoLead(models.Model):
     @classmethod
     def obter_valor_comissao(cls):
         """Obtém o valor da comissão do sistema de configurações"""
-        from core.models import ConfiguracaoSistema
-        try:
-            config = ConfiguracaoSistema.objects.get(chave='COMISSAO_ATENDENTE_VALOR_FIXO')
-            return Decimal(config.valor)
-        except ConfiguracaoSistema.DoesNotExist:
-            # Valor padrão caso não esteja configurado
-            return Decimal('0.50')
+        from core.services import ConfiguracaoService
+        # Valor padrão caso não esteja configurado
+        return ConfiguracaoService.obter_decimal('COMISSAO_ATENDENTE_VALOR_FIXO', Decimal('0.50'))
     
     def save(self, *args, **kwargs):
         # Se o valor não foi definido, busca da configuração
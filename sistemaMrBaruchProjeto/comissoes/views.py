@@ -4,7 +4,7 @@ from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from datetime import timedelta
 from .models import ComissaoLead
-from core.models import ConfiguracaoSistema
+from core.services import ConfiguracaoService
 from financeiro.models import Comissao
 
 @login_required
@@ -67,11 +67,7 @@ def painel_comissoes(request):
     }
     
     # Obter valor configurado de comissão
-    try:
-        config_valor = ConfiguracaoSistema.objects.get(chave='COMISSAO_ATENDENTE_VALOR_FIXO')
-        valor_comissao_atual = config_valor.valor
-    except ConfiguracaoSistema.DoesNotExist:
-        valor_comissao_atual = '0.50'
+    valor_comissao_atual = ConfiguracaoService.obter_texto('COMISSAO_ATENDENTE_VALOR_FIXO', '0.50')
     
     context = {
         'total_comissoes': total_comissoes,
@@ -132,13 +128,8 @@ def painel_comissoes_leads(request):
     ).order_by('-total_comissoes')[:10]
     
     # Obter configuração atual
-    try:
-        config_valor = ConfiguracaoSistema.objects.get(chave='COMISSAO_ATENDENTE_VALOR_FIXO')
-        valor_comissao_config = config_valor.valor
-        config_ativa = ConfiguracaoSistema.objects.get(chave='COMISSAO_ATIVA').valor == 'true'
-    except ConfiguracaoSistema.DoesNotExist:
-        valor_comissao_config = '0.50'
-        config_ativa = True
+    valor_comissao_config = ConfiguracaoService.obter_texto('COMISSAO_ATENDENTE_VALOR_FIXO', '0.50')
+    config_ativa = ConfiguracaoService.obter_bool('COMISSAO_ATIVA', True)
     
     context = {
         'comissoes': comissoes.order_by('-data_criacao')[:100],  # últimas 100
@@ -15,6 +15,7 @@ from decimal import Decimal
 
 from .models import ComissaoLead, ComissaoConsultor, ComissaoCaptador
 from financeiro.models import Comissao  # Modelo correto de comissões
+from core.cache_relatorios import obter_relatorio
 from .services import (
     autorizar_comissao, 
     processar_pagamento_comissao, 
@@ -41,6 +42,72 @@ def painel_gestao_comissoes(request):
     competencia_filtro = request.GET.get('competencia', '')  # YYYY-MM
     busca = request.GET.get('busca', '')
     
+    comissoes_lista = _lista_comissoes(tipo_filtro, status_filtro, competencia_filtro, busca)
+    
+    # Só as estatísticas vão para o cache: a lista tem uma linha por comissão (com os
+    # usuários) e a busca é texto livre, o que multiplicaria as entradas
+    filtros_stats = {'tipo_filtro': tipo_filtro, 'competencia_filtro': competencia_filtro}
+    stats = obter_relatorio(
+        'painel_gestao_comissoes', filtros_stats, ('comissao', 'comissao_lead', 'comissao_consultor'),
+        lambda: _stats_painel_gestao_comissoes(**filtros_stats)
+    )
+    
+    # Paginação - 25 itens por página
+    paginator = Paginator(comissoes_lista, 25)
+    page_number = request.GET.get('page', 1)
+    
+    try:
+        comissoes_paginadas = paginator.page(page_number)
+    except PageNotAnInteger:
+        # Se page não é um inteiro, entrega primeira página
+        comissoes_paginadas = paginator.page(1)
+    except EmptyPage:
+        # Se page está fora do range, entrega última página
+        comissoes_paginadas = paginator.page(paginator.num_pages)
+    
+    # Lista de competências disponíveis (últimos 12 meses)
+    competencias = []
+    data_atual = timezone.now().date().replace(day=1)
+    for i in range(12):
+        comp = data_atual - timedelta(days=30 * i)
+        competencias.append({
+            'valor': comp.strftime('%Y-%m'),
+            'texto': comp.strftime('%m/%Y')
+        })
+    
+    context = {
+        'comissoes': comissoes_paginadas,
+        'page_obj': comissoes_paginadas,  # Para compatibilidade com template
+        'total_comissoes': len(comissoes_lista),
+        'stats': stats,
+        'tipo_filtro': tipo_filtro,
+        'status_filtro': status_filtro,
+        'competencia_filtro': competencia_filtro,
+        'busca': busca,
+        'competencias': competencias,
+    }
+    
+    return render(request, 'comissoes/painel_gestao.html', context)
+
+
+def _competencia(competencia_filtro):
+    """date do filtro YYYY-MM (None se vazio ou inválido)"""
+    try:
+        return datetime.strptime(competencia_filtro, '%Y-%m').date() if competencia_filtro else None
+    except ValueError:
+        return None
+
+
+def _stats_painel_gestao_comissoes(tipo_filtro, competencia_filtro):
+    """Estatísticas do painel (em cache: obter_relatorio)"""
+    return obter_estatisticas_comissoes(
+        tipo_comissao=tipo_filtro if tipo_filtro != 'todos' else None,
+        competencia=_competencia(competencia_filtro)
+    )
+
+
+def _lista_comissoes(tipo_filtro, status_filtro, competencia_filtro, busca):
+    """Lista unificada de comissões (atendente, consultor e captador) para os filtros"""
     # Busca comissões de cada tipo
     comissoes_lead = ComissaoLead.objects.select_related('atendente', 'lead', 'autorizado_por', 'pago_por')
     comissoes_consultor = ComissaoConsultor.objects.select_related('consultor', 'venda', 'parcela', 'autorizado_por', 'pago_por')
@@ -75,14 +142,11 @@ def painel_gestao_comissoes(request):
         comissoes_captador = comissoes_captador.filter(status=status_captador)
     
     # Aplica filtro de competência
-    if competencia_filtro:
-        try:
-            comp_date = datetime.strptime(competencia_filtro, '%Y-%m').date()
-            comissoes_lead = comissoes_lead.filter(competencia=comp_date)
-            comissoes_consultor = comissoes_consultor.filter(competencia=comp_date)
-            comissoes_captador = comissoes_captador.filter(competencia=comp_date)
-        except ValueError:
-            pass
+    comp_date = _competencia(competencia_filtro)
+    if comp_date:
+        comissoes_lead = comissoes_lead.filter(competencia=comp_date)
+        comissoes_consultor = comissoes_consultor.filter(competencia=comp_date)
+        comissoes_captador = comissoes_captador.filter(competencia=comp_date)
     
     # Aplica busca por nome de usuário
     if busca:
@@ -180,48 +244,7 @@ def painel_gestao_comissoes(request):
     # Ordena por data de criação (mais recente primeiro)
     comissoes_lista.sort(key=lambda x: x['data_criacao'], reverse=True)
     
-    # Paginação - 25 itens por página
-    paginator = Paginator(comissoes_lista, 25)
-    page_number = request.GET.get('page', 1)
-    
-    try:
-        comissoes_paginadas = paginator.page(page_number)
-    except PageNotAnInteger:
-        # Se page não é um inteiro, entrega primeira página
-        comissoes_paginadas = paginator.page(1)
-    except EmptyPage:
-        # Se page está fora do range, entrega última página
-        comissoes_paginadas = paginator.page(paginator.num_pages)
-    
-    # Estatísticas
-    stats = obter_estatisticas_comissoes(
-        tipo_comissao=tipo_filtro if tipo_filtro != 'todos' else None,
-        competencia=comp_date if competencia_filtro else None
-    )
-    
-    # Lista de competências disponíveis (últimos 12 meses)
-    competencias = []
-    data_atual = timezone.now().date().replace(day=1)
-    for i in range(12):
-        comp = data_atual - timedelta(days=30 * i)
-        competencias.append({
-            'valor': comp.strftime('%Y-%m'),
-            'texto': comp.strftime('%m/%Y')
-        })
-    
-    context = {
-        'comissoes': comissoes_paginadas,
-        'page_obj': comissoes_paginadas,  # Para compatibilidade com template
-        'total_comissoes': len(comissoes_lista),
-        'stats': stats,
-        'tipo_filtro': tipo_filtro,
-        'status_filtro': status_filtro,
-        'competencia_filtro': competencia_filtro,
-        'busca': busca,
-        'competencias': competencias,
-    }
-    
-    return render(request, 'comissoes/painel_gestao.html', context)
+    return comissoes_lista
 
 
 @login_required
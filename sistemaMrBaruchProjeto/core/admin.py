@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ConfiguracaoSistema, LogSistema, Notificacao, WebhookLog
+from .models import ConfiguracaoSistema, LogSistema, Notificacao, WebhookLog, WebhookEstatisticaHora
 
 @admin.register(ConfiguracaoSistema)
 class ConfiguracaoSistemaAdmin(admin.ModelAdmin):
@@ -39,7 +39,7 @@ class WebhookLogAdmin(admin.ModelAdmin):
     list_display = ['id', 'tipo', 'evento', 'payment_id', 'payment_status', 'status_processamento', 'data_recebimento']
     list_filter = ['tipo', 'evento', 'status_processamento', 'data_recebimento']
     search_fields = ['payment_id', 'customer_id', 'evento']
-    readonly_fields = ['data_recebimento', 'processado_em', 'payload_formatado']
+    readonly_fields = ['data_recebimento', 'processado_em', 'payload_formatado', 'tentativas', 'worker', 'reivindicado_em', 'arquivo_payload', 'arquivado_em']
     
     fieldsets = (
         ('Informações Básicas', {
@@ -49,7 +49,11 @@ class WebhookLogAdmin(admin.ModelAdmin):
             'fields': ('payment_id', 'customer_id', 'payment_status', 'valor')
         }),
         ('Payload', {
-            'fields': ('payload_formatado', 'headers'),
+            'fields': ('payload_formatado', 'headers', 'arquivo_payload', 'arquivado_em'),
+            'classes': ('collapse',)
+        }),
+        ('Fila de Processamento', {
+            'fields': ('tentativas', 'worker', 'reivindicado_em'),
             'classes': ('collapse',)
         }),
         ('Erro', {
@@ -65,3 +69,11 @@ class WebhookLogAdmin(admin.ModelAdmin):
         return obj.payload_formatado
     payload_formatado.short_description = 'Payload (JSON)'
 
+
+
+@admin.register(WebhookEstatisticaHora)
+class WebhookEstatisticaHoraAdmin(admin.ModelAdmin):
+    list_display = ['hora', 'tipo', 'evento', 'status_processamento', 'quantidade', 'valor_total']
+    list_filter = ['tipo', 'status_processamento', 'evento']
+    date_hierarchy = 'hora'
+    readonly_fields = ['hora', 'tipo', 'evento', 'status_processamento', 'quantidade', 'valor_total']
@@ -7,4 +7,22 @@ class CoreConfig(AppConfig):
     
     def ready(self):
         """Importa signals quando app estiver pronto"""
-        import core.signals_comissoes  # noqa
\ No newline at end of file
+        import core.signals_comissoes  # noqa
+        
+        # Grava os logs bufferizados (LogService.registrar) ao fim de cada request
+        from django.core.signals import request_finished
+        from .log_buffer import descarregar_logs
+        request_finished.connect(descarregar_logs, dispatch_uid='core_descarregar_logs')
+        
+        # Configurações em memória (ConfiguracaoService): invalida ao salvar/excluir
+        from django.db.models.signals import post_save, post_delete
+        from .models import ConfiguracaoSistema
+        from .services import ConfiguracaoService
+        post_save.connect(ConfiguracaoService.invalidar_cache, sender=ConfiguracaoSistema,
+                          weak=False, dispatch_uid='core_configuracao_post_save')
+        post_delete.connect(ConfiguracaoService.invalidar_cache, sender=ConfiguracaoSistema,
+                            weak=False, dispatch_uid='core_configuracao_post_delete')
+        
+        # Cache de relatórios: invalida as tags ao salvar/excluir vendas, parcelas, comissões, leads...
+        from .cache_relatorios import conectar_signals
+        conectar_signals()
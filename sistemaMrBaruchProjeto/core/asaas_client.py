@@ -0,0 +1,221 @@
+"""
+Cliente HTTP compartilhado para a API do Asaas
+Uma requests.Session por token (keep-alive + pool de conexões reaproveitado entre
+chamadas), retry/backoff do urllib3 para falhas de conexão e 5xx, o limitador de
+taxa da conta (core.asaas_rate_limiter) e ganchos de métricas.
+
+Uso:
+    cliente = obter_cliente_asaas(api_token)
+    response = cliente.get('payments', params={'limit': 100})
+
+Os serviços continuam tratando o status da resposta como antes: o cliente devolve
+o requests.Response e só levanta exceção em erro de conexão/timeout.
+"""
+import threading
+import time
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from .asaas_rate_limiter import obter_limitador, obter_retry_after
+
+logger = logging.getLogger(__name__)
+
+
+URL_PADRAO = 'https://api.asaas.com/v3'
+USER_AGENT = 'MrBaruch-System/1.0'
+
+# POST não é repetido automaticamente: reenviar uma criação de cobrança duplicaria a cobrança
+METODOS_IDEMPOTENTES = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+
+def _criar_sessao(api_token):
+    """Session com pool de conexões e retry de transporte"""
+    retry = Retry(
+        total=int(getattr(settings, 'ASAAS_HTTP_TENTATIVAS', 3)),
+        backoff_factor=float(getattr(settings, 'ASAAS_HTTP_BACKOFF', 0.5)),
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=METODOS_IDEMPOTENTES,
+        # Retry-After (429/503) fica com o limitador da conta: se o urllib3 dormisse
+        # aqui, request() só veria o 429 no fim e o limitador/métricas não saberiam
+        respect_retry_after_header=False,
+        raise_on_status=False,  # Devolve a última resposta; o serviço decide o que fazer
+    )
+    # Pool grande o bastante para as threads do download paralelo (sync_completo)
+    tamanho_pool = max(10, int(getattr(settings, 'ASAAS_SYNC_MAX_WORKERS', 5)) * 2)
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=2, pool_maxsize=tamanho_pool)
+
+    sessao = requests.Session()
+    sessao.mount('https://', adapter)
+    sessao.mount('http://', adapter)
+    sessao.headers.update({
+        'Content-Type': 'application/json',
+        'access_token': api_token or '',
+        'User-Agent': USER_AGENT,
+    })
+    return sessao
+
+
+_sessoes = {}
+_sessoes_lock = threading.Lock()
+
+
+def obter_sessao(api_token):
+    """Retorna a Session da conta (uma por token, compartilhada no processo)"""
+    with _sessoes_lock:
+        sessao = _sessoes.get(api_token)
+        if sessao is None:
+            sessao = _criar_sessao(api_token)
+            _sessoes[api_token] = sessao
+        return sessao
+
+
+def identificar_conta(api_token):
+    """Nome da conta usado nas métricas (o token nunca vai para logs/métricas)"""
+    if api_token and api_token == getattr(settings, 'ASAAS_ALTERNATIVO_TOKEN', None):
+        return 'alternativo'
+    return 'principal'
+
+
+# =============================================================================
+# Métricas
+# =============================================================================
+
+_ganchos_metricas = []
+_metricas = {}
+_metricas_lock = threading.Lock()
+
+
+def registrar_gancho_metricas(funcao):
+    """
+    Registra uma função chamada após cada requisição ao Asaas com um dict:
+    conta, metodo, endpoint, status (None em erro de conexão), duracao (s) e erro.
+    """
+    if funcao not in _ganchos_metricas:
+        _ganchos_metricas.append(funcao)
+    return funcao
+
+
+def remover_gancho_metricas(funcao):
+    if funcao in _ganchos_metricas:
+        _ganchos_metricas.remove(funcao)
+
+
+def obter_metricas():
+    """Contadores acumulados no processo, por conta"""
+    with _metricas_lock:
+        return {conta: dict(valores) for conta, valores in _metricas.items()}
+
+
+def _registrar_metrica(evento):
+    with _metricas_lock:
+        valores = _metricas.setdefault(evento['conta'], {
+            'requisicoes': 0, 'erros_http': 0, 'erros_conexao': 0, 'rate_limits': 0, 'tempo_total': 0.0
+        })
+        valores['requisicoes'] += 1
+        valores['tempo_total'] += evento['duracao']
+        if evento['status'] is None:
+            valores['erros_conexao'] += 1
+        elif evento['status'] == 429:
+            valores['rate_limits'] += 1
+        elif evento['status'] >= 400:
+            valores['erros_http'] += 1
+
+    for gancho in list(_ganchos_metricas):
+        try:
+            gancho(evento)
+        except Exception as e:
+            logger.warning(f"⚠️  Erro no gancho de métricas do Asaas: {str(e)}")
+
+
+# =============================================================================
+# Cliente
+# =============================================================================
+
+class AsaasClient:
+    """
+    Cliente da API do Asaas para uma conta.
+    Objeto leve: a Session e o limitador vêm dos registros por token.
+    """
+
+    def __init__(self, api_token, base_url=None, timeout=30, conta=None):
+        self.api_token = api_token or ''
+        self.base_url = (base_url or getattr(settings, 'ASAAS_API_URL', URL_PADRAO)).rstrip('/')
+        self.timeout = timeout
+        self.conta = conta or identificar_conta(self.api_token)
+        self.sessao = obter_sessao(self.api_token)
+        self.limitador = obter_limitador(self.api_token)
+
+    def montar_url(self, endpoint):
+        if endpoint.startswith(('http://', 'https://')):
+            return endpoint
+        return f"{self.base_url}/{endpoint.lstrip('/')}"
+
+    def request(self, metodo, endpoint, params=None, json=None, timeout=None, headers=None):
+        """
+        Faz a requisição pela Session da conta.
+
+        Returns:
+            requests.Response (qualquer status)
+
+        Raises:
+            requests.exceptions.RequestException em erro de conexão/timeout
+            (depois das tentativas do urllib3)
+        """
+        metodo = metodo.upper()
+        self.limitador.adquirir()
+        inicio = time.monotonic()
+        status = None
+        erro = None
+
+        try:
+            response = self.sessao.request(
+                method=metodo,
+                url=self.montar_url(endpoint),
+                params=params,
+                json=json,
+                headers=headers,
+                timeout=timeout or self.timeout,
+            )
+            status = response.status_code
+        except requests.exceptions.RequestException as e:
+            erro = str(e)
+            raise
+        finally:
+            _registrar_metrica({
+                'conta': self.conta,
+                'metodo': metodo,
+                'endpoint': endpoint,
+                'status': status,
+                'duracao': time.monotonic() - inicio,
+                'erro': erro,
+            })
+
+        if status == 429:
+            self.limitador.registrar_rate_limit(obter_retry_after(response))
+        else:
+            if status < 400:
+                self.limitador.registrar_sucesso()
+            self.limitador.registrar_cabecalhos(response.headers)
+
+        return response
+
+    def get(self, endpoint, params=None, **kwargs):
+        return self.request('GET', endpoint, params=params, **kwargs)
+
+    def post(self, endpoint, json=None, **kwargs):
+        return self.request('POST', endpoint, json=json, **kwargs)
+
+    def put(self, endpoint, json=None, **kwargs):
+        return self.request('PUT', endpoint, json=json, **kwargs)
+
+    def delete(self, endpoint, json=None, **kwargs):
+        return self.request('DELETE', endpoint, json=json, **kwargs)
+
+
+def obter_cliente_asaas(api_token=None, base_url=None, timeout=30):
+    """Atalho: cliente da conta (token padrão: ASAAS_API_TOKEN)"""
+    if api_token is None:
+        api_token = getattr(settings, 'ASAAS_API_TOKEN', '')
+    return AsaasClient(api_token, base_url=base_url, timeout=timeout)
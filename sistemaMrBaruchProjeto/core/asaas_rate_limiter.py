@@ -0,0 +1,116 @@
+"""
+Controle de taxa (rate limit) para a API do Asaas
+Token bucket thread-safe compartilhado por token de API (cada conta tem sua própria cota)
+"""
+import threading
+import time
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AsaasRateLimiter:
+    """
+    Token bucket compartilhado entre as threads que chamam o Asaas.
+
+    - adquirir(): bloqueia até existir uma ficha disponível
+    - registrar_rate_limit(): 429 recebido → pausa todas as threads e reduz a taxa pela metade
+    - registrar_sucesso(): devolve a taxa aos poucos até o teto configurado
+    """
+
+    def __init__(self, taxa_por_segundo=5.0, capacidade=10, taxa_minima=0.5):
+        self.taxa_maxima = float(taxa_por_segundo)
+        self.taxa = self.taxa_maxima
+        self.taxa_minima = min(float(taxa_minima), self.taxa_maxima)
+        self.capacidade = max(1, int(capacidade))
+
+        self._fichas = float(self.capacidade)
+        self._ultimo_abastecimento = time.monotonic()
+        self._bloqueado_ate = 0.0
+        self._lock = threading.Lock()
+
+    def _abastecer(self, agora):
+        """Repõe fichas proporcionalmente ao tempo decorrido"""
+        decorrido = agora - self._ultimo_abastecimento
+        if decorrido > 0:
+            self._fichas = min(self.capacidade, self._fichas + decorrido * self.taxa)
+            self._ultimo_abastecimento = agora
+
+    def adquirir(self):
+        """Aguarda até poder fazer uma requisição"""
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                if agora < self._bloqueado_ate:
+                    espera = self._bloqueado_ate - agora
+                else:
+                    self._abastecer(agora)
+                    if self._fichas >= 1:
+                        self._fichas -= 1
+                        return
+                    espera = (1 - self._fichas) / self.taxa
+            time.sleep(espera)
+
+    def registrar_sucesso(self):
+        """Aumento aditivo da taxa após cada resposta bem-sucedida"""
+        with self._lock:
+            if self.taxa < self.taxa_maxima:
+                self.taxa = min(self.taxa_maxima, self.taxa + 0.1)
+
+    def registrar_rate_limit(self, retry_after=None):
+        """
+        Pausa global após um 429.
+        Respeita o Retry-After do Asaas quando presente; sem ele aguarda 10s.
+        """
+        espera = retry_after if retry_after and retry_after > 0 else 10
+        with self._lock:
+            agora = time.monotonic()
+            self._bloqueado_ate = max(self._bloqueado_ate, agora + espera)
+            self._fichas = 0.0
+            self._ultimo_abastecimento = agora + espera
+            self.taxa = max(self.taxa_minima, self.taxa / 2)
+        logger.warning(f"⚠️  Rate limit do Asaas: pausando {espera:.0f}s (nova taxa: {self.taxa:.2f} req/s)")
+
+    def registrar_cabecalhos(self, headers):
+        """
+        Usa os cabeçalhos RateLimit-Remaining/RateLimit-Reset (quando enviados)
+        para pausar antes de estourar a cota, evitando o 429.
+        """
+        try:
+            restantes = headers.get('RateLimit-Remaining')
+            reset = headers.get('RateLimit-Reset')
+            if restantes is not None and reset is not None and int(restantes) <= 0:
+                with self._lock:
+                    self._bloqueado_ate = max(self._bloqueado_ate, time.monotonic() + float(reset))
+                logger.info(f"⏰ Cota do Asaas esgotada. Aguardando reset em {float(reset):.0f}s")
+        except (TypeError, ValueError):
+            pass
+
+
+def obter_retry_after(response):
+    """Extrai o Retry-After (em segundos) de uma resposta HTTP, se houver"""
+    valor = response.headers.get('Retry-After')
+    if not valor:
+        return None
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+_limitadores = {}
+_limitadores_lock = threading.Lock()
+
+
+def obter_limitador(api_token):
+    """Retorna o limitador da conta (um por token, compartilhado no processo)"""
+    with _limitadores_lock:
+        limitador = _limitadores.get(api_token)
+        if limitador is None:
+            limitador = AsaasRateLimiter(
+                taxa_por_segundo=getattr(settings, 'ASAAS_RATE_LIMIT_POR_SEGUNDO', 5),
+                capacidade=getattr(settings, 'ASAAS_RATE_LIMIT_RAJADA', 10),
+            )
+            _limitadores[api_token] = limitador
+        return limitador
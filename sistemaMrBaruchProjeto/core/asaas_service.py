@@ -5,6 +5,7 @@ from django.conf import settings
 from django.utils import timezone
 from .models import LogSistema
 from .services import LogService, ConfiguracaoService
+from .asaas_client import AsaasClient
 
 logger = logging.getLogger(__name__)
 
@@ -18,35 +19,25 @@ class AsaasService:
         self.base_url = getattr(settings, 'ASAAS_API_URL', 'https://api.asaas.com/v3')
         self.api_token = getattr(settings, 'ASAAS_API_TOKEN', '')
         # Preferir valores do banco (painel), com fallback para settings
-        self.max_retries = int(
-            ConfiguracaoService.obter_config('ASAAS_MAX_RETRIES', getattr(settings, 'ASAAS_MAX_RETRIES', 3)) or 3
-        )
-        self.timeout = int(
-            ConfiguracaoService.obter_config('ASAAS_TIMEOUT', getattr(settings, 'ASAAS_TIMEOUT', 30)) or 30
-        )
+        self.max_retries = ConfiguracaoService.obter_int('ASAAS_MAX_RETRIES', int(getattr(settings, 'ASAAS_MAX_RETRIES', 3))) or 3
+        self.timeout = ConfiguracaoService.obter_int('ASAAS_TIMEOUT', int(getattr(settings, 'ASAAS_TIMEOUT', 30))) or 30
         
         self.headers = {
             'Content-Type': 'application/json',
             'access_token': self.api_token
         }
+        # Session compartilhada por token (keep-alive) + limitador da conta
+        self.client = AsaasClient(self.api_token, base_url=self.base_url, timeout=self.timeout)
     
     def _fazer_requisicao(self, metodo, endpoint, dados=None, params=None):
         """
         Método interno para fazer requisições à API ASAAS
         """
-        url = f"{self.base_url}/{endpoint}"
         last_error_text = None
         
         for tentativa in range(self.max_retries):
             try:
-                response = requests.request(
-                    method=metodo,
-                    url=url,
-                    json=dados,
-                    params=params,
-                    headers=self.headers,
-                    timeout=self.timeout
-                )
+                response = self.client.request(metodo, endpoint, json=dados, params=params)
                 
                 # Log da requisição
                 LogService.registrar(
@@ -135,7 +126,7 @@ class AsaasService:
         # Valor da cobrança (fallback para config PIX_VALOR_LEVANTAMENTO quando não informado)
         valor_informado = dados_cobranca.get('value')
         if valor_informado in (None, '', 0, '0', '0.0'):
-            valor_informado = ConfiguracaoService.obter_config('PIX_VALOR_LEVANTAMENTO', 5.00)
+            valor_informado = ConfiguracaoService.obter_float('PIX_VALOR_LEVANTAMENTO', 5.00)
         
         # ASAAS exige valor mínimo de R$ 5,00 por parcela/cobrança
         valor_informado = float(valor_informado)
@@ -143,7 +134,7 @@ class AsaasService:
             logger.warning(f"Valor {valor_informado} abaixo do mínimo ASAAS. Ajustando para R$ 5,00")
             valor_informado = 5.00
         
-        descricao = dados_cobranca.get('description') or ConfiguracaoService.obter_config('PIX_DESCRICAO', 'Levantamento de informações (PIX)')
+        descricao = dados_cobranca.get('description') or ConfiguracaoService.obter_texto('PIX_DESCRICAO', 'Levantamento de informações (PIX)')
 
         payload = {
             "customer": dados_cobranca.get('customer_id'),
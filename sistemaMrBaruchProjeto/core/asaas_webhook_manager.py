@@ -7,6 +7,8 @@ import time
 import logging
 from typing import List, Dict, Any, Optional
 from django.conf import settings
+from .asaas_client import AsaasClient
+from .webhook_dedup import gerar_chave_idempotencia, chaves_recentes, chaves_ja_registradas
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +38,9 @@ class AsaasWebhookManager:
         
         self.timeout = 30
         self.delay_between_requests = 0.5  # 500ms entre requisições
+        
+        # Session compartilhada por token (keep-alive) + limitador da conta
+        self.client = AsaasClient(self.api_token, base_url=self.base_url, timeout=self.timeout)
     
     def list_webhooks(
         self, 
@@ -55,7 +60,6 @@ class AsaasWebhookManager:
             Dict com dados dos webhooks e metadados
         """
         try:
-            url = f"{self.base_url}/webhooks"
             params = {
                 'status': status,
                 'limit': limit,
@@ -64,12 +68,7 @@ class AsaasWebhookManager:
             
             logger.info(f"Listando webhooks com status {status}, limit {limit}, offset {offset}")
             
-            response = requests.get(
-                url,
-                headers=self.headers,
-                params=params,
-                timeout=self.timeout
-            )
+            response = self.client.get('webhooks', params=params)
             
             response.raise_for_status()
             data = response.json()
@@ -106,15 +105,9 @@ class AsaasWebhookManager:
             Dict com resultado do reenvio
         """
         try:
-            url = f"{self.base_url}/webhooks/{webhook_id}/resend"
-            
             logger.info(f"Reenviando webhook: {webhook_id}")
             
-            response = requests.post(
-                url,
-                headers=self.headers,
-                timeout=self.timeout
-            )
+            response = self.client.post(f'webhooks/{webhook_id}/resend')
             
             success = response.status_code in [200, 201, 202, 204]
             
@@ -185,15 +178,36 @@ class AsaasWebhookManager:
                 'total_pending': 0
             }
         
+        # Entregas que já chegaram aqui (o Asaas só não recebeu a resposta) não
+        # precisam ser reenviadas: uma consulta para a página inteira
+        chaves = {webhook.get('id'): self._chave_idempotencia(webhook) for webhook in pending_webhooks}
+        ja_recebidas = chaves_ja_registradas(chaves.values())
+        
         # Processar cada webhook
         results = []
         succeeded = 0
         failed = 0
+        skipped = 0
         
         for idx, webhook in enumerate(pending_webhooks, 1):
             webhook_id = webhook.get('id')
             event = webhook.get('event', 'unknown')
             
+            chave = chaves.get(webhook_id)
+            if chave in ja_recebidas or chaves_recentes.contem(chave):
+                logger.info(f"Ignorando {idx}/{len(pending_webhooks)}: {webhook_id} - {event} (já recebido)")
+                results.append({
+                    'success': True,
+                    'duplicado': True,
+                    'webhook_id': webhook_id,
+                    'event': event,
+                    'created': webhook.get('created'),
+                    'url': webhook.get('url')
+                })
+                succeeded += 1
+                skipped += 1
+                continue
+            
             logger.info(f"Processando {idx}/{len(pending_webhooks)}: {webhook_id} - {event}")
             
             # Reenviar webhook
@@ -219,6 +233,7 @@ class AsaasWebhookManager:
             'processed': len(results),
             'succeeded': succeeded,
             'failed': failed,
+            'skipped': skipped,
             'total_pending': total_count,
             'has_more': webhooks_response.get('hasMore', False),
             'results': results
@@ -226,11 +241,19 @@ class AsaasWebhookManager:
         
         logger.info(
             f"Reenvio concluído: {succeeded}/{len(results)} webhooks "
-            f"reenviados com sucesso"
+            f"reenviados com sucesso ({skipped} já recebidos)"
         )
         
         return summary
     
+    @staticmethod
+    def _chave_idempotencia(webhook: Dict[str, Any]) -> str:
+        """Mesma chave que o endpoint core.views.webhook_asaas grava no WebhookLog"""
+        payload = webhook.get('payload')
+        if isinstance(payload, dict):
+            return gerar_chave_idempotencia(payload)
+        return gerar_chave_idempotencia({'id': webhook.get('id')})
+    
     def get_webhook_details(self, webhook_id: str) -> Dict[str, Any]:
         """
         Obtém detalhes de um webhook específico
@@ -242,13 +265,7 @@ class AsaasWebhookManager:
             Dict com detalhes do webhook e status
         """
         try:
-            url = f"{self.base_url}/webhooks/{webhook_id}"
-            
-            response = requests.get(
-                url,
-                headers=self.headers,
-                timeout=self.timeout
-            )
+            response = self.client.get(f'webhooks/{webhook_id}')
             
             response.raise_for_status()
             webhook_data = response.json()
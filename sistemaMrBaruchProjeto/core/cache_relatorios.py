@@ -0,0 +1,156 @@
+"""
+Cache de resultados dos relatórios com invalidação por tags
+Cada relatório guarda no cache do Django o resultado calculado (o context, sem o
+request), com chave = nome do relatório + filtros, marcado com as tags dos dados
+de que depende ('venda', 'parcela', 'comissao', ...).
+
+Cada tag tem uma versão no cache; post_save/post_delete dos models de TAGS_MODELOS
+trocam a versão da tag (após o commit). Uma entrada gravada com versões antigas
+está desatualizada.
+
+Stale-while-revalidate: entrada desatualizada (ou mais velha que
+RELATORIOS_CACHE_FRESCO) é recalculada por um único request, que pega a trava
+do relatório; os requests concorrentes recebem o resultado anterior em vez de
+recalcular todos juntos. Sem entrada nenhuma, o request calcula normalmente.
+Entradas expiram de vez após RELATORIOS_CACHE_MAXIMO.
+
+Uso:
+    context = obter_relatorio(
+        'dashboard_financeiro', {'periodo': periodo}, ('parcela', 'renegociacao'),
+        lambda: _dados_dashboard_financeiro(periodo),
+    )
+
+Atualizações em massa (.update(), bulk_update) não disparam signals: quem as faz
+chama invalidar_apos_commit('parcela', ...) explicitamente.
+"""
+import time
+import hashlib
+import logging
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+logger = logging.getLogger(__name__)
+
+
+CACHE_PREFIXO = 'core:relatorio:'
+
+# Tag -> model cujo save/delete a invalida
+TAGS_MODELOS = {
+    'venda': 'vendas.Venda',
+    'pre_venda': 'vendas.PreVenda',
+    'repescagem': 'vendas.RepescagemLead',
+    'parcela': 'financeiro.Parcela',
+    'renegociacao': 'financeiro.Renegociacao',
+    'comissao': 'financeiro.Comissao',
+    'comissao_lead': 'comissoes.ComissaoLead',
+    'comissao_consultor': 'comissoes.ComissaoConsultor',
+    'lead': 'marketing.Lead',
+    'compliance': 'compliance.AnaliseCompliance',
+    'asaas_sync': 'asaas_sync.AsaasSyncronizacaoLog',
+}
+
+
+def _tempo_fresco():
+    return int(getattr(settings, 'RELATORIOS_CACHE_FRESCO', 300))
+
+
+def _tempo_maximo():
+    return int(getattr(settings, 'RELATORIOS_CACHE_MAXIMO', 3600))
+
+
+def _tempo_trava():
+    return int(getattr(settings, 'RELATORIOS_CACHE_TRAVA', 60))
+
+
+def _chave_tag(tag):
+    return f'{CACHE_PREFIXO}tag:{tag}'
+
+
+def _chave_relatorio(nome, filtros):
+    texto = '&'.join(f'{campo}={filtros[campo]}' for campo in sorted(filtros))
+    return f"{CACHE_PREFIXO}{nome}:{hashlib.sha1(texto.encode('utf-8')).hexdigest()}"
+
+
+def versoes_tags(tags):
+    """Versão atual de cada tag (cria as que ainda não existem no cache)"""
+    chaves = {tag: _chave_tag(tag) for tag in tags}
+    atuais = cache.get_many(list(chaves.values()))
+    versoes = {}
+    for tag, chave in chaves.items():
+        versao = atuais.get(chave)
+        if versao is None:
+            versao = time.time_ns()
+            if not cache.add(chave, versao, None):
+                versao = cache.get(chave, versao)
+        versoes[tag] = versao
+    return versoes
+
+
+def invalidar(*tags):
+    """Marca como desatualizados os relatórios que dependem das tags"""
+    versao = time.time_ns()
+    cache.set_many({_chave_tag(tag): versao for tag in tags}, None)
+
+
+def invalidar_apos_commit(*tags):
+    """invalidar() depois do commit: um recálculo durante a transação leria os dados antigos"""
+    transaction.on_commit(lambda: invalidar(*tags))
+
+
+def obter_relatorio(nome, filtros, tags, calcular):
+    """
+    Resultado do relatório `nome` para `filtros`, do cache ou de calcular().
+
+    Args:
+        nome: identificador do relatório (view)
+        filtros: dict com tudo que muda o resultado (período, status, usuário...)
+        tags: dados de que o relatório depende (chaves de TAGS_MODELOS)
+        calcular: função sem argumentos que monta o resultado (precisa ser serializável)
+    """
+    chave = _chave_relatorio(nome, filtros)
+    versoes = versoes_tags(tags)
+    entrada = cache.get(chave)
+
+    if entrada is not None:
+        atualizada = entrada['versoes'] == versoes and time.time() - entrada['gerado_em'] < _tempo_fresco()
+        if atualizada:
+            return entrada['valor']
+        if not cache.add(f'{chave}:trava', 1, _tempo_trava()):
+            # Outro request já está recalculando: serve o resultado anterior
+            return entrada['valor']
+    else:
+        cache.add(f'{chave}:trava', 1, _tempo_trava())
+
+    try:
+        valor = calcular()
+        cache.set(chave, {'valor': valor, 'versoes': versoes, 'gerado_em': time.time()}, _tempo_maximo())
+    finally:
+        cache.delete(f'{chave}:trava')
+    return valor
+
+
+def _invalidar_por_signal(sender, **kwargs):
+    tag = _tags_por_model.get(sender)
+    if tag:
+        invalidar_apos_commit(tag)
+
+
+_tags_por_model = {}
+
+
+def conectar_signals():
+    """Liga post_save/post_delete dos models de TAGS_MODELOS (chamado no CoreConfig.ready)"""
+    for tag, rotulo in TAGS_MODELOS.items():
+        try:
+            modelo = apps.get_model(rotulo)
+        except LookupError:
+            logger.warning(f"⚠️  Cache de relatórios: model {rotulo} não encontrado (tag {tag})")
+            continue
+        _tags_por_model[modelo] = tag
+        post_save.connect(_invalidar_por_signal, sender=modelo, weak=False,
+                          dispatch_uid=f'core_cache_relatorios_save_{tag}')
+        post_delete.connect(_invalidar_por_signal, sender=modelo, weak=False,
+                            dispatch_uid=f'core_cache_relatorios_delete_{tag}')
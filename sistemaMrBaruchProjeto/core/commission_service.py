@@ -225,25 +225,11 @@ class CommissionService:
         Returns:
             dict com: atendente_valor_fixo, consultor_percentual
         """
-        from core.models import ConfiguracaoSistema
-        
-        try:
-            valor_atendente = ConfiguracaoSistema.objects.get(
-                chave='COMISSAO_ATENDENTE_VALOR_FIXO'
-            ).valor
-        except ConfiguracaoSistema.DoesNotExist:
-            valor_atendente = '0.50'
-        
-        try:
-            percentual_captador = ConfiguracaoSistema.objects.get(
-                chave='COMISSAO_CAPTADOR_PERCENTUAL'
-            ).valor
-        except ConfiguracaoSistema.DoesNotExist:
-            percentual_captador = '3.00'
+        from core.services import ConfiguracaoService
         
         return {
-            'atendente_valor_fixo': Decimal(valor_atendente),
-            'captador_percentual': Decimal(percentual_captador),
+            'atendente_valor_fixo': ConfiguracaoService.obter_decimal('COMISSAO_ATENDENTE_VALOR_FIXO', Decimal('0.50')),
+            'captador_percentual': ConfiguracaoService.obter_decimal('COMISSAO_CAPTADOR_PERCENTUAL', Decimal('3.00')),
         }
     
     @classmethod
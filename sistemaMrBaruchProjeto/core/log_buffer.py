@@ -0,0 +1,125 @@
+"""
+Buffer de escrita (write-behind) do LogSistema
+LogService.registrar apenas enfileira o registro em memória; o buffer grava tudo
+com um único bulk_create quando atinge LOG_BUFFER_TAMANHO registros, a cada
+LOG_BUFFER_INTERVALO segundos (thread de fundo), ao fim de cada request
+(sinal request_finished, ligado em CoreConfig.ready) e na saída do processo.
+
+Dentro de um transaction.atomic() do chamador o buffer nunca grava: os logs de
+outros requests entrariam na transação (e sumiriam num rollback). O lote fica
+para a thread de fundo ou para o fim do request.
+"""
+import atexit
+import os
+import threading
+import time
+import logging
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class BufferLogSistema:
+    """Fila em memória de LogSistema, segura para várias threads"""
+
+    def __init__(self):
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._pendentes = []
+        self._primeiro_em = None
+        self._thread = None
+        self._parar = threading.Event()
+
+    @property
+    def tamanho_maximo(self):
+        return int(getattr(settings, 'LOG_BUFFER_TAMANHO', 50))
+
+    @property
+    def intervalo(self):
+        return float(getattr(settings, 'LOG_BUFFER_INTERVALO', 5))
+
+    def _verificar_processo(self):
+        """Depois de um fork (workers do gunicorn) o buffer e a thread do pai não valem"""
+        if self._pid != os.getpid():
+            self._reiniciar()
+
+    def adicionar(self, **campos):
+        """Enfileira um registro; grava o lote se o limite de tamanho/tempo foi atingido"""
+        self._verificar_processo()
+        campos.setdefault('data_criacao', timezone.now())
+        with self._lock:
+            if not self._pendentes:
+                self._primeiro_em = time.monotonic()
+            self._pendentes.append(campos)
+            cheio = (
+                len(self._pendentes) >= self.tamanho_maximo
+                or time.monotonic() - self._primeiro_em >= self.intervalo
+            )
+        self._iniciar_thread()
+        if cheio and not connection.in_atomic_block:
+            self.descarregar()
+
+    def descarregar(self):
+        """Grava todos os registros pendentes num único bulk_create"""
+        from .models import LogSistema
+
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, []
+            self._primeiro_em = None
+        if not pendentes:
+            return 0
+
+        objetos = [LogSistema(**campos) for campos in pendentes]
+        try:
+            with transaction.atomic():
+                LogSistema.objects.bulk_create(objetos)
+        except Exception as e:
+            # Um registro inválido (ex.: usuário removido) não derruba o lote inteiro
+            logger.error(f"Erro ao gravar lote de {len(objetos)} logs: {e}. Gravando um a um...")
+            for obj in objetos:
+                try:
+                    with transaction.atomic():
+                        obj.save()
+                except Exception as erro:
+                    logger.error(f"Erro ao registrar log: {erro}")
+        return len(objetos)
+
+    def _iniciar_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name='log-buffer', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        """Grava periodicamente o que ficou no buffer (processos sem requests, como os workers)"""
+        while not self._parar.wait(self.intervalo):
+            try:
+                if self._pendentes:
+                    self.descarregar()
+            except Exception as e:
+                logger.error(f"Erro no descarregamento periódico de logs: {e}")
+            finally:
+                # A thread tem conexão própria com o banco: não deixa aberta entre ciclos
+                connection.close()
+
+
+buffer_logs = BufferLogSistema()
+
+
+def descarregar_logs(**kwargs):
+    """Receptor do request_finished e do atexit"""
+    try:
+        buffer_logs.descarregar()
+    except Exception as e:
+        logger.error(f"Erro ao descarregar logs: {e}")
+
+
+atexit.register(descarregar_logs)
@@ -0,0 +1,49 @@
+"""
+Arquiva os payloads de WebhookLog antigos em arquivos mensais comprimidos
+Ex.: python manage.py arquivar_webhooks --dias 90
+"""
+from django.core.management.base import BaseCommand, CommandError
+from core.webhook_arquivo import arquivar_webhooks, diretorio_arquivo
+
+
+class Command(BaseCommand):
+    help = 'Move payloads e headers de webhooks concluídos para o arquivo morto (NDJSON zstd/gzip por mês)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=None,
+            help='Arquiva webhooks recebidos há mais de N dias (padrão: WEBHOOK_RETENCAO_DIAS)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Webhooks por lote (padrão: 1000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas conta o que seria arquivado'
+        )
+
+    def handle(self, *args, **options):
+        if options['dias'] is not None and options['dias'] < 1:
+            raise CommandError('--dias deve ser maior que zero')
+
+        self.stdout.write(f"🗄️  Arquivando webhooks em {diretorio_arquivo()}...")
+        stats = arquivar_webhooks(dias=options['dias'], lote=options['lote'], simular=options['dry_run'])
+
+        limite = stats['limite'].strftime('%d/%m/%Y %H:%M')
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️  Dry-run: {stats['arquivados']} webhooks recebidos antes de {limite} seriam arquivados"
+            ))
+            return
+
+        for nome, quantidade in stats['arquivos'].items():
+            self.stdout.write(f"   {nome}: {quantidade} webhooks")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {stats['arquivados']} webhooks recebidos antes de {limite} arquivados"
+        ))
@@ -0,0 +1,83 @@
+"""
+Worker da fila de webhooks do Asaas (WebhookLog com status PENDING)
+Rodar como serviço (systemd/supervisor): python manage.py processar_webhooks_asaas
+Vários workers podem rodar em paralelo: a ordem por pagamento é preservada.
+"""
+import time
+import logging
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from core.webhook_fila import (
+    identificar_worker, reivindicar_lote, processar_lote, recuperar_webhooks_travados
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Processa os webhooks do Asaas recebidos (fila PENDING) fora do ciclo HTTP'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Processa os webhooks pendentes e encerra (útil em cron)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=None,
+            help='Webhooks reivindicados por vez (padrão: WEBHOOK_FILA_LOTE)'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=1,
+            help='Segundos entre consultas quando a fila está vazia'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=None,
+            help='Segundos em processamento para considerar um webhook travado (padrão: WEBHOOK_FILA_TIMEOUT_SEGUNDOS)'
+        )
+
+    def handle(self, *args, **options):
+        worker = identificar_worker()
+        totais = {'sucesso': 0, 'ignorados': 0, 'erros': 0, 'reenfileirados': 0}
+        self.stdout.write(self.style.SUCCESS(f'🚀 Worker {worker} aguardando webhooks do Asaas'))
+
+        try:
+            while True:
+                close_old_connections()
+                recuperar_webhooks_travados(options['timeout'])
+
+                logs = reivindicar_lote(worker, options['lote'])
+                if not logs:
+                    if options['once']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                inicio = time.monotonic()
+                stats = processar_lote(logs)
+                for chave, valor in stats.items():
+                    totais[chave] += valor
+
+                self.stdout.write(
+                    f"📦 Lote de {len(logs)} webhooks em {time.monotonic() - inicio:.2f}s: "
+                    f"{stats['sucesso']} ok, {stats['ignorados']} ignorados, "
+                    f"{stats['erros']} erros, {stats['reenfileirados']} reenfileirados"
+                )
+
+                # Só reenfileirados: espera antes de tentar de novo em vez de girar em falso
+                if stats['reenfileirados'] and not (stats['sucesso'] or stats['ignorados'] or stats['erros']):
+                    if options['once']:
+                        break
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('⏹️  Worker interrompido'))
+
+        self.stdout.write(
+            f"Webhooks processados: {totais['sucesso']} ok, {totais['ignorados']} ignorados, {totais['erros']} erros"
+        )
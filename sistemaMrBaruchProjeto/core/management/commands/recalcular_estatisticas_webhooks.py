@@ -0,0 +1,27 @@
+"""
+Reconstrói o rollup horário de estatísticas dos webhooks a partir de WebhookLog
+Ex.: python manage.py recalcular_estatisticas_webhooks --desde 2026-10-01
+"""
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.webhook_estatisticas import recalcular
+
+
+class Command(BaseCommand):
+    help = 'Recalcula WebhookEstatisticaHora (todas as horas ou a partir de uma data)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Recalcula a partir desta data (YYYY-MM-DD); padrão: todo o histórico')
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            try:
+                desde = timezone.make_aware(datetime.strptime(options['desde'], '%Y-%m-%d'))
+            except ValueError:
+                raise CommandError(f"Data inválida: {options['desde']} (use YYYY-MM-DD)")
+
+        self.stdout.write("📊 Recalculando estatísticas horárias dos webhooks...")
+        buckets = recalcular(desde)
+        self.stdout.write(self.style.SUCCESS(f"✅ {buckets} buckets gravados"))
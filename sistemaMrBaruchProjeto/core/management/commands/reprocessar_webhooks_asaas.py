@@ -0,0 +1,75 @@
+"""
+Reprocessa localmente webhooks do Asaas já gravados (sem chamar a API do Asaas)
+Ex.: python manage.py reprocessar_webhooks_asaas --status ERROR --desde 2026-10-01 --evento PAYMENT_RECEIVED
+"""
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from core.webhook_replay import selecionar_logs, reprocessar_webhooks
+
+
+class Command(BaseCommand):
+    help = 'Reaplica em lote os payloads de WebhookLog (estado final por pagamento, em paralelo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--status',
+            nargs='+',
+            default=['ERROR'],
+            help='Status dos webhooks a reprocessar (padrão: ERROR)'
+        )
+        parser.add_argument('--desde', help='Data inicial de recebimento (YYYY-MM-DD)')
+        parser.add_argument('--ate', help='Data final de recebimento (YYYY-MM-DD)')
+        parser.add_argument(
+            '--evento',
+            nargs='+',
+            default=None,
+            help='Eventos a reprocessar (ex.: PAYMENT_RECEIVED PAYMENT_CONFIRMED)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Pagamentos processados em paralelo (padrão: WEBHOOK_REPLAY_WORKERS)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas mostra o que seria reprocessado'
+        )
+
+    def _data(self, valor):
+        if not valor:
+            return None
+        try:
+            return datetime.strptime(valor, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Data inválida: {valor} (use YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        logs = selecionar_logs(
+            status=options['status'],
+            desde=self._data(options['desde']),
+            ate=self._data(options['ate']),
+            eventos=options['evento'],
+        )
+
+        self.stdout.write(f"🔁 Reprocessando webhooks {', '.join(options['status'])}...")
+        stats = reprocessar_webhooks(logs, max_workers=options['workers'], simular=options['dry_run'])
+
+        self.stdout.write(
+            f"   {stats['selecionados']} webhooks de {stats['pagamentos']} pagamentos | "
+            f"{stats['substituidos']} substituídos pelo estado final | "
+            f"{stats['ja_aplicados']} já aplicados por webhook mais recente"
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"⚠️  Dry-run: {stats['aplicados']} webhooks seriam reaplicados"))
+            return
+
+        self.stdout.write(
+            f"   {stats['sucesso']} ok, {stats['ignorados']} ignorados, {stats['erros']} erros, "
+            f"{stats['ocupados']} em processamento pela fila"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {stats['aplicados']} webhooks reaplicados em {stats['duracao']}s "
+            f"({stats['por_segundo']}/s)"
+        ))
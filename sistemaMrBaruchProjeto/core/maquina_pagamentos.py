@@ -0,0 +1,587 @@
+"""
+Máquina de estados dos pagamentos do Asaas
+Ponto único de aplicação dos eventos de pagamento, usado pela fila de webhooks
+(core.webhook_fila), pelo replay (core.webhook_replay) e pelo webhook do
+atendimento (atendimento.views.webhook_pagamento_pix).
+
+Fluxo:
+1. O payload é normalizado em EventoPagamento e o evento vira um estado alvo
+   (PAGO, VENCIDO, ESTORNADO, DELETADO)
+2. O pagamento é resolvido uma única vez (RotaPagamentoAsaas ou externalReference
+   DISTRATO-<id>)
+3. A transição (tipo do pagamento, estado alvo) roda numa única transação, com a
+   linha bloqueada (select_for_update). Se o registro já está no estado alvo,
+   nada é regravado: reentregas e os dois webhooks não repetem efeitos colaterais
+4. Efeitos opcionais (contrato, nota fiscal, comissões, notificações) rodam em
+   savepoints: uma falha neles é registrada sem desfazer o pagamento
+
+As comissões do financeiro (atendente, entrada e parcelas) continuam sendo
+criadas pelos signals (core.signals_comissoes) disparados pelos save() daqui.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from .services import LogService, NotificacaoService, ConfiguracaoService
+from .cache_relatorios import invalidar_apos_commit
+
+logger = logging.getLogger(__name__)
+
+
+EVENTOS_CONFIRMACAO = ('PAYMENT_RECEIVED', 'PAYMENT_CONFIRMED', 'PAYMENT_RECEIVED_IN_CASH')
+EVENTOS_SEM_ACAO = ('PAYMENT_CREATED', 'PAYMENT_UPDATED')
+
+TRANSICOES = {
+    'PAYMENT_RECEIVED': 'PAGO',
+    'PAYMENT_CONFIRMED': 'PAGO',
+    'PAYMENT_RECEIVED_IN_CASH': 'PAGO',
+    'PAYMENT_OVERDUE': 'VENCIDO',
+    'PAYMENT_REFUNDED': 'ESTORNADO',
+    'PAYMENT_DELETED': 'DELETADO',
+}
+
+
+class EventoPagamento:
+    """Evento de pagamento normalizado (independe do endpoint que o recebeu)"""
+
+    def __init__(self, evento, payment_id, status='', valor=None, external_reference=''):
+        self.evento = evento or ''
+        self.payment_id = payment_id or ''
+        self.status = status or ''
+        self.valor = valor
+        self.external_reference = external_reference or ''
+
+    @classmethod
+    def do_webhook(cls, dados_webhook):
+        payment = dados_webhook.get('payment') or {}
+        valor = payment.get('value')
+        return cls(
+            evento=dados_webhook.get('event'),
+            payment_id=payment.get('id'),
+            status=payment.get('status'),
+            valor=Decimal(str(valor)) if valor is not None else None,
+            external_reference=payment.get('externalReference'),
+        )
+
+    @property
+    def estado_alvo(self):
+        return TRANSICOES.get(self.evento)
+
+    def __repr__(self):
+        return f"<EventoPagamento {self.evento} {self.payment_id}>"
+
+
+def aplicar_webhook(dados_webhook):
+    """Atalho: normaliza o payload do Asaas e aplica o evento"""
+    return aplicar_evento(EventoPagamento.do_webhook(dados_webhook))
+
+
+def aplicar_evento(evento):
+    """
+    Aplica um evento de pagamento.
+
+    Returns:
+        (status, mensagem) com status SUCCESS ou IGNORED
+
+    Raises:
+        Exception em falha (a transação é desfeita; quem chamou decide se tenta de novo)
+    """
+    if evento.evento in EVENTOS_SEM_ACAO:
+        logger.info(f"[pagamentos] {evento.evento} {evento.payment_id} - sem ação necessária")
+        return 'SUCCESS', ''
+
+    estado = evento.estado_alvo
+    if estado is None:
+        logger.warning(f"[pagamentos] Evento não tratado: {evento.evento}")
+        LogService.registrar(
+            nivel='WARNING',
+            mensagem=f"Evento webhook não tratado: {evento.evento}",
+            modulo='core',
+            acao='webhook_evento_nao_tratado'
+        )
+        return 'IGNORED', f'Evento não tratado: {evento.evento}'
+
+    if estado == 'DELETADO':
+        LogService.registrar(
+            nivel='INFO',
+            mensagem=f"Cobrança deletada no ASAAS: {evento.payment_id}",
+            modulo='financeiro',
+            acao='cobranca_deletada'
+        )
+        return 'SUCCESS', ''
+
+    alvo = _resolver_alvo(evento)
+    if alvo is None:
+        logger.warning(f"[pagamentos] Payment ID {evento.payment_id} não encontrado no sistema")
+        LogService.registrar(
+            nivel='WARNING',
+            mensagem=f"Payment ID {evento.payment_id} não encontrado no sistema",
+            modulo='financeiro',
+            acao='payment_nao_encontrado'
+        )
+        return 'SUCCESS', ''  # Sucesso para não reenviar
+
+    tipo, objeto_id = alvo
+    transicao = TRANSICOES_POR_TIPO.get((tipo, estado))
+    if transicao is None:
+        logger.info(f"[pagamentos] Sem transição {estado} para {tipo} ({evento.payment_id})")
+        return 'IGNORED', f'Sem transição {estado} para {tipo}'
+
+    with transaction.atomic():
+        aplicada = transicao(evento, objeto_id)
+
+    if aplicada:
+        logger.info(f"[pagamentos] {tipo} #{objeto_id} -> {estado} ({evento.payment_id})")
+    else:
+        logger.info(f"[pagamentos] {tipo} #{objeto_id} já estava em {estado} ({evento.payment_id})")
+    return 'SUCCESS', ''
+
+
+def _resolver_alvo(evento):
+    """(tipo, pk) do pagamento: uma consulta indexada na rota; multas de distrato pela externalReference"""
+    from financeiro.models import RotaPagamentoAsaas
+
+    rota = RotaPagamentoAsaas.resolver(evento.payment_id)
+    if rota:
+        return rota
+
+    if evento.external_reference.startswith('DISTRATO-'):
+        try:
+            return 'DISTRATO', int(evento.external_reference.replace('DISTRATO-', ''))
+        except ValueError:
+            return None
+    return None
+
+
+def _efeito_opcional(descricao, modulo, acao, funcao, *args):
+    """
+    Executa um efeito colateral num savepoint: se falhar, o erro é registrado
+    e o restante da transição (o pagamento em si) é mantido.
+    """
+    try:
+        with transaction.atomic():
+            return funcao(*args)
+    except Exception as e:
+        logger.error(f"[pagamentos] Erro ao {descricao}: {str(e)}")
+        LogService.registrar(
+            nivel='ERROR',
+            mensagem=f"Erro ao {descricao}: {str(e)}",
+            modulo=modulo,
+            acao=acao
+        )
+        return None
+
+
+# =============================================================================
+# PIX de levantamento
+# =============================================================================
+
+def _pix_levantamento_pago(evento, objeto_id):
+    from financeiro.models import PixLevantamento
+
+    pix = PixLevantamento.objects.select_for_update().get(pk=objeto_id)
+    if pix.status_pagamento == 'pago':
+        return False
+
+    pix.status_pagamento = 'pago'
+    pix.save(update_fields=['status_pagamento'])  # Signals: comissão do atendente e compliance
+
+    lead = pix.lead
+    # Sem LEAD_STATUS_APOS_PAGAMENTO/LEAD_STATUS_CONTATO configurados o status é
+    # LEVANTAMENTO_PAGO (o fixo do antigo webhook do core); configurados, valem
+    # para os dois endpoints, como já valiam no webhook do atendimento
+    status_pos = ConfiguracaoService.obter_texto('LEAD_STATUS_APOS_PAGAMENTO', 'LEVANTAMENTO_PAGO') or 'LEVANTAMENTO_PAGO'
+    lead.status = ConfiguracaoService.obter_texto('LEAD_STATUS_CONTATO', '') or status_pos
+    lead.fez_levantamento = True
+    lead.save(update_fields=['status', 'fez_levantamento'])
+
+    LogService.registrar(
+        nivel='INFO',
+        mensagem=f"PIX Levantamento confirmado: Lead {lead.id} - R$ {evento.valor}",
+        modulo='financeiro',
+        acao='pix_levantamento_pago'
+    )
+
+    if lead.atendente and ConfiguracaoService.obter_bool('COMISSAO_ATIVA', True):
+        _efeito_opcional('gerar comissão de atendente', 'comissoes', 'erro_comissao_atendente',
+                         _gerar_comissao_lead, lead)
+    _efeito_opcional('notificar pagamento do levantamento', 'atendimento', 'erro_notificacao_pagamento',
+                     _notificar_levantamento_pago, lead)
+    return True
+
+
+def _gerar_comissao_lead(lead):
+    """
+    ComissaoLead do atendente pelo CommissionService (validação + auditoria), o
+    mesmo caminho do signal de PixLevantamento; get_or_create, então não duplica
+    """
+    from .commission_service import CommissionService
+
+    return CommissionService.criar_comissao_atendente(lead)
+
+
+def _notificar_levantamento_pago(lead):
+    """Follow-up para o atendente e aviso de pagamento para o captador"""
+    intervalo = ConfiguracaoService.obter_int('FOLLOWUP_INTERVALO_PADRAO_DIAS', 2) or 2
+    data_follow = timezone.now() + timedelta(days=intervalo)
+    usuario_destino = lead.atendente or lead.captador
+    if usuario_destino:
+        NotificacaoService.criar_notificacao(
+            usuario=usuario_destino,
+            titulo='Agendar Follow-up',
+            mensagem=f"Realizar follow-up com {lead.nome_completo} em {data_follow.strftime('%d/%m/%Y')}",
+            tipo='INFO',
+            link=f'/atendimento/lead/{lead.id}/'
+        )
+    if lead.captador:
+        NotificacaoService.criar_notificacao(
+            usuario=lead.captador,
+            titulo='Pagamento Confirmado',
+            mensagem=f'Pagamento confirmado para {lead.nome_completo}',
+            tipo='SUCESSO',
+            link=f'/atendimento/lead/{lead.id}/'
+        )
+        LogService.registrar(
+            usuario=lead.captador,
+            nivel='INFO',
+            mensagem=f"Pagamento confirmado - Lead ID: {lead.id}",
+            modulo='atendimento',
+            acao='pagamento_confirmado'
+        )
+
+
+def _pix_levantamento_vencido(evento, objeto_id):
+    from financeiro.models import PixLevantamento
+
+    pix = PixLevantamento.objects.select_for_update().get(pk=objeto_id)
+    if pix.status_pagamento in ('pago', 'vencido'):
+        return False  # Pago não volta para vencido
+
+    pix.status_pagamento = 'vencido'
+    pix.save(update_fields=['status_pagamento'])
+
+    lead = pix.lead
+    lead.status = 'PERDIDO'
+    lead.save(update_fields=['status'])
+
+    LogService.registrar(
+        nivel='WARNING',
+        mensagem=f"PIX Levantamento vencido: {evento.payment_id} - Lead {lead.id}",
+        modulo='financeiro',
+        acao='pix_levantamento_vencido'
+    )
+    return True
+
+
+# =============================================================================
+# PIX de entrada da venda
+# =============================================================================
+
+def _pix_entrada_pago(evento, objeto_id):
+    from financeiro.models import PixEntrada
+
+    pix_entrada = PixEntrada.objects.select_for_update().get(pk=objeto_id)
+    if pix_entrada.status_pagamento == 'pago':
+        return False
+
+    agora = timezone.now()
+    pix_entrada.status_pagamento = 'pago'
+    pix_entrada.data_pagamento = agora
+    pix_entrada.save(update_fields=['status_pagamento', 'data_pagamento'])
+
+    venda = pix_entrada.venda
+    venda.status = 'CONTRATO_ASSINADO'  # Indica que a entrada foi paga
+    venda.status_pagamento_entrada = 'PAGO'
+    venda.save(update_fields=['status', 'status_pagamento_entrada'])  # Signal: comissões da entrada
+
+    LogService.registrar(
+        nivel='INFO',
+        mensagem=f"PIX Entrada confirmado: Venda {venda.id} - R$ {evento.valor} - Status atualizado",
+        modulo='financeiro',
+        acao='pix_entrada_pago'
+    )
+
+    _efeito_opcional('gerar contrato automaticamente', 'juridico', 'erro_gerar_contrato_auto',
+                     _gerar_contrato, venda)
+    _efeito_opcional('atualizar comissões da entrada', 'comissoes', 'erro_atualizar_comissoes_entrada',
+                     _pagar_comissoes, venda, None, ['CAPTADOR_ENTRADA', 'CONSULTOR_ENTRADA'], None)
+    if venda.cliente_quer_nf:
+        _efeito_opcional('criar nota fiscal da entrada', 'notas_fiscais', 'erro_criar_nota_fiscal_entrada',
+                         _criar_nota_fiscal, venda, None)
+    return True
+
+
+def _gerar_contrato(venda):
+    from juridico.models import Contrato
+
+    contrato, criado = Contrato.objects.get_or_create(
+        venda=venda,
+        cliente=venda.cliente,
+        defaults={'status': 'AGUARDANDO_GERACAO'}
+    )
+    if not (criado or contrato.status == 'AGUARDANDO_GERACAO'):
+        return contrato
+
+    if not contrato.numero_contrato:
+        contrato.gerar_numero_contrato()
+    contrato.mudar_status('GERADO', None, 'Contrato gerado automaticamente após pagamento da entrada')
+
+    LogService.registrar(
+        nivel='INFO',
+        mensagem=f"Contrato {contrato.numero_contrato} gerado automaticamente para Venda {venda.id}",
+        modulo='juridico',
+        acao='contrato_gerado_auto'
+    )
+    return contrato
+
+
+# =============================================================================
+# Parcelas e entradas da venda
+# =============================================================================
+
+def _parcela_paga(evento, objeto_id):
+    from financeiro.models import Parcela
+
+    parcela = Parcela.objects.select_for_update().get(pk=objeto_id)
+    if parcela.status == 'paga':
+        return False
+
+    hoje = timezone.localdate()
+    parcela.status = 'paga'
+    parcela.data_pagamento = hoje
+    # Signals: comissões da parcela (ou da entrada, se numero_parcela == 0,
+    # que também marca a entrada da venda como paga)
+    parcela.save(update_fields=['status', 'data_pagamento'])
+
+    venda = parcela.venda
+    if parcela.numero_parcela == 0:
+        LogService.registrar(
+            nivel='INFO',
+            mensagem=f"Entrada BOLETO confirmada: Venda {venda.id} - R$ {evento.valor}",
+            modulo='financeiro',
+            acao='entrada_boleto_paga'
+        )
+    LogService.registrar(
+        nivel='INFO',
+        mensagem=f"Parcela confirmada: Venda {venda.id} - Parcela {parcela.numero_parcela} - R$ {evento.valor}",
+        modulo='financeiro',
+        acao='parcela_paga'
+    )
+
+    _efeito_opcional('atualizar comissões da parcela', 'comissoes', 'erro_atualizar_comissoes_parcela',
+                     _pagar_comissoes, venda, parcela, ['CAPTADOR_PARCELA', 'CONSULTOR_PARCELA'],
+                     f"Parcela {parcela.numero_parcela} paga em {hoje.strftime('%d/%m/%Y')}")
+    if venda.cliente_quer_nf and parcela.numero_parcela > 0:  # Só parcelas, não entrada
+        _efeito_opcional('criar nota fiscal da parcela', 'notas_fiscais', 'erro_criar_nota_fiscal_parcela',
+                         _criar_nota_fiscal, venda, parcela)
+
+    _verificar_venda_quitada(venda)
+    return True
+
+
+def _parcela_vencida(evento, objeto_id):
+    from financeiro.models import Parcela
+
+    parcela = Parcela.objects.select_for_update().get(pk=objeto_id)
+    if parcela.status != 'aberta':
+        return False  # Paga/cancelada não volta para vencida
+
+    parcela.status = 'vencida'
+    parcela.save(update_fields=['status'])
+    return True
+
+
+def _parcela_estornada(evento, objeto_id):
+    from financeiro.models import Parcela
+
+    parcela = Parcela.objects.select_for_update().get(pk=objeto_id)
+    if parcela.status == 'cancelada':
+        return False
+
+    parcela.status = 'cancelada'
+    parcela.data_pagamento = None
+    parcela.save(update_fields=['status', 'data_pagamento'])
+
+    LogService.registrar(
+        nivel='WARNING',
+        mensagem=f"Pagamento estornado: Venda {parcela.venda_id} - Parcela {parcela.numero_parcela} - R$ {evento.valor}",
+        modulo='financeiro',
+        acao='pagamento_estornado'
+    )
+    return True
+
+
+def _entrada_venda_paga(evento, objeto_id):
+    from vendas.models import EntradaVenda
+
+    entrada = EntradaVenda.objects.select_for_update().get(pk=objeto_id)
+    if entrada.status == 'PAGO':
+        return False
+
+    entrada.status = 'PAGO'
+    entrada.data_pagamento = timezone.now()
+    entrada.save(update_fields=['status', 'data_pagamento'])
+
+    venda = entrada.venda
+    pendentes = EntradaVenda.objects.filter(venda=venda).exclude(status='PAGO').exists()
+    if not pendentes and venda.status_pagamento_entrada != 'PAGO':
+        venda.status_pagamento_entrada = 'PAGO'
+        venda.save(update_fields=['status_pagamento_entrada'])  # Signal: comissões da entrada
+
+    LogService.registrar(
+        nivel='INFO',
+        mensagem=f"Entrada {entrada.numero_entrada} confirmada: Venda {venda.id} - R$ {evento.valor}",
+        modulo='financeiro',
+        acao='entrada_venda_paga'
+    )
+    return True
+
+
+def _pagar_comissoes(venda, parcela, tipos, observacoes):
+    """Marca como pagas, num único UPDATE, as comissões pendentes da entrada (parcela=None) ou da parcela"""
+    from financeiro.models import Comissao
+
+    comissoes = Comissao.objects.filter(venda=venda, tipo_comissao__in=tipos, status='pendente')
+    comissoes = comissoes.filter(parcela=parcela) if parcela else comissoes.filter(parcela__isnull=True)
+
+    campos = {'status': 'paga', 'data_pagamento': timezone.localdate()}
+    if observacoes:
+        campos['observacoes'] = observacoes
+    quantidade = comissoes.update(**campos)
+
+    referencia = f"da parcela {parcela.numero_parcela}" if parcela else "da entrada"
+    if quantidade:
+        invalidar_apos_commit('comissao')  # O UPDATE não dispara post_save
+        LogService.registrar(
+            nivel='INFO',
+            mensagem=f"Comissões {referencia} ATUALIZADAS para paga: {quantidade} comissões - Venda {venda.id}",
+            modulo='comissoes',
+            acao='comissoes_parcela_atualizadas' if parcela else 'comissoes_entrada_atualizadas'
+        )
+    else:
+        logger.warning(f"[pagamentos] Nenhuma comissão pendente {referencia} - Venda {venda.id}")
+    return quantidade
+
+
+def _criar_nota_fiscal(venda, parcela):
+    """Nota fiscal da entrada (parcela=None) ou da parcela, se ainda não existir"""
+    from notas_fiscais.models import NotaFiscal
+
+    if parcela is None:
+        valor = venda.valor_entrada
+        filtros = {'venda': venda, 'tipo': 'ENTRADA'}
+        descricao = 'Consultoria Financeira - Entrada'
+    else:
+        valor = parcela.valor
+        filtros = {'venda': venda, 'parcela': parcela, 'tipo': 'PARCELA'}
+        descricao = f'Consultoria Financeira - Parcela {parcela.numero_parcela}/{venda.quantidade_parcelas}'
+
+    nota, criada = NotaFiscal.objects.get_or_create(
+        **filtros,
+        defaults={
+            'valor_servico': valor,
+            'aliquota_iss': Decimal('2.00'),
+            'valor_iss': valor * Decimal('0.02'),
+            'status': 'PENDENTE',
+            'descricao_servico': descricao,
+            'email_destinatario': venda.nf_email or venda.cliente.email,
+        }
+    )
+    if criada:
+        LogService.registrar(
+            nivel='INFO',
+            mensagem=f"Nota Fiscal {filtros['tipo']} criada automaticamente: NF #{nota.id} - Venda {venda.id} - R$ {valor}",
+            modulo='notas_fiscais',
+            acao='nota_fiscal_parcela_criada' if parcela else 'nota_fiscal_entrada_criada'
+        )
+    return nota
+
+
+def _verificar_venda_quitada(venda):
+    """Todas as parcelas pagas? (uma consulta agregada)"""
+    from financeiro.models import Parcela
+
+    contagem = Parcela.objects.filter(venda=venda).aggregate(
+        total=Count('id'),
+        pagas=Count('id', filter=Q(status='paga')),
+    )
+    if contagem['total'] and contagem['total'] == contagem['pagas']:
+        logger.info(f"[pagamentos] Venda {venda.id} quitada - {contagem['pagas']}/{contagem['total']} parcelas pagas")
+        LogService.registrar(
+            nivel='INFO',
+            mensagem=f"Venda {venda.id} totalmente quitada",
+            modulo='financeiro',
+            acao='venda_quitada'
+        )
+
+
+# =============================================================================
+# Multas de distrato (externalReference DISTRATO-<id>)
+# =============================================================================
+
+def _distrato_multa_paga(evento, objeto_id):
+    from juridico.models import Distrato
+
+    distrato = Distrato.objects.select_for_update().filter(
+        pk=objeto_id, boleto_multa_codigo=evento.payment_id
+    ).first()
+    if distrato is None or distrato.status == 'MULTA_PAGA':
+        return False
+
+    distrato.data_pagamento_multa = timezone.localdate()
+    distrato.status = 'MULTA_PAGA'
+    distrato.save()
+    distrato.adicionar_historico(
+        'pagamento_multa',
+        None,
+        f'Multa paga via ASAAS - Valor: R$ {evento.valor} - Payment ID: {evento.payment_id}'
+    )
+
+    LogService.registrar(
+        nivel='INFO',
+        mensagem=f"Multa de distrato paga: Distrato {distrato.numero_distrato} - R$ {evento.valor}",
+        modulo='juridico',
+        acao='multa_distrato_paga'
+    )
+    return True
+
+
+def _distrato_multa_vencida(evento, objeto_id):
+    from juridico.models import Distrato
+
+    distrato = Distrato.objects.select_for_update().filter(
+        pk=objeto_id, boleto_multa_codigo=evento.payment_id
+    ).first()
+    if distrato is None or distrato.data_pagamento_multa or distrato.status == 'MULTA_VENCIDA':
+        return False
+
+    distrato.status = 'MULTA_VENCIDA'
+    distrato.save()
+    distrato.adicionar_historico(
+        'vencimento_multa',
+        None,
+        f'Multa vencida - Boleto ASAAS vencido: {evento.payment_id}'
+    )
+
+    LogService.registrar(
+        nivel='WARNING',
+        mensagem=f"Multa de distrato vencida: Distrato {distrato.numero_distrato} - Payment: {evento.payment_id}",
+        modulo='juridico',
+        acao='multa_distrato_vencida'
+    )
+    return True
+
+
+TRANSICOES_POR_TIPO = {
+    ('PIX_LEVANTAMENTO', 'PAGO'): _pix_levantamento_pago,
+    ('PIX_LEVANTAMENTO', 'VENCIDO'): _pix_levantamento_vencido,
+    ('PIX_ENTRADA', 'PAGO'): _pix_entrada_pago,
+    ('PARCELA', 'PAGO'): _parcela_paga,
+    ('PARCELA', 'VENCIDO'): _parcela_vencida,
+    ('PARCELA', 'ESTORNADO'): _parcela_estornada,
+    ('ENTRADA_VENDA', 'PAGO'): _entrada_venda_paga,
+    ('DISTRATO', 'PAGO'): _distrato_multa_paga,
+    ('DISTRATO', 'VENCIDO'): _distrato_multa_vencida,
+}
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_webhooklog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webhooklog',
+            name='status_processamento',
+            field=models.CharField(choices=[('PENDING', 'Pendente'), ('PROCESSING', 'Processando'), ('SUCCESS', 'Sucesso'), ('ERROR', 'Erro'), ('IGNORED', 'Ignorado')], default='PENDING', max_length=20, verbose_name='Status'),
+        ),
+        migrations.AddField(
+            model_name='webhooklog',
+            name='tentativas',
+            field=models.PositiveIntegerField(default=0, verbose_name='Tentativas'),
+        ),
+        migrations.AddField(
+            model_name='webhooklog',
+            name='worker',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Worker'),
+        ),
+        migrations.AddField(
+            model_name='webhooklog',
+            name='reivindicado_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Reivindicado em'),
+        ),
+        migrations.AddIndex(
+            model_name='webhooklog',
+            index=models.Index(fields=['status_processamento', 'data_recebimento'], name='core_webhoo_status__9082ff_idx'),
+        ),
+    ]
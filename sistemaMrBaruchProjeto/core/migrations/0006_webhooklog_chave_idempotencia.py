@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_webhooklog_fila'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhooklog',
+            name='chave_idempotencia',
+            field=models.CharField(blank=True, max_length=150, null=True, unique=True, verbose_name='Chave de Idempotência'),
+        ),
+        migrations.AlterField(
+            model_name='webhooklog',
+            name='tipo',
+            field=models.CharField(choices=[('ASAAS', 'ASAAS'), ('ASAAS_ATENDIMENTO', 'ASAAS (Atendimento)'), ('OUTRO', 'Outro')], default='ASAAS', max_length=20, verbose_name='Tipo'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_webhooklog_chave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhooklog',
+            name='arquivo_payload',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Arquivo do Payload'),
+        ),
+        migrations.AddField(
+            model_name='webhooklog',
+            name='arquivado_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Arquivado em'),
+        ),
+    ]
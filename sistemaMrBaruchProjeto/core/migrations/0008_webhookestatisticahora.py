@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:05
+
+from django.db import migrations, models
+
+
+def popular_rollup(apps, schema_editor):
+    """Carga inicial do rollup a partir dos logs existentes"""
+    from collections import defaultdict
+    from datetime import timezone as dt_timezone
+    from decimal import Decimal
+    from django.conf import settings
+    from django.db.models import Count, Sum
+    from django.db.models.functions import TruncHour
+
+    WebhookLog = apps.get_model('core', 'WebhookLog')
+    WebhookEstatisticaHora = apps.get_model('core', 'WebhookEstatisticaHora')
+
+    truncar = TruncHour('data_recebimento', tzinfo=dt_timezone.utc) if getattr(settings, 'USE_TZ', False) \
+        else TruncHour('data_recebimento')
+    agregados = defaultdict(lambda: [0, Decimal('0')])
+    linhas = (
+        WebhookLog.objects.order_by().annotate(hora=truncar)
+        .values('hora', 'tipo', 'evento', 'status_processamento')
+        .annotate(quantidade=Count('id'), valor_total=Sum('valor'))
+    )
+    for linha in linhas:
+        status = 'PENDING' if linha['status_processamento'] == 'PROCESSING' else linha['status_processamento']
+        chave = (linha['hora'], linha['tipo'], linha['evento'] or '', status)
+        agregados[chave][0] += linha['quantidade']
+        agregados[chave][1] += linha['valor_total'] or Decimal('0')
+
+    WebhookEstatisticaHora.objects.bulk_create([
+        WebhookEstatisticaHora(
+            hora=hora, tipo=tipo, evento=evento, status_processamento=status,
+            quantidade=quantidade, valor_total=valor,
+        )
+        for (hora, tipo, evento, status), (quantidade, valor) in agregados.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_webhooklog_arquivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEstatisticaHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField(verbose_name='Hora')),
+                ('tipo', models.CharField(max_length=20, verbose_name='Tipo')),
+                ('evento', models.CharField(max_length=100, verbose_name='Evento')),
+                ('status_processamento', models.CharField(max_length=20, verbose_name='Status')),
+                ('quantidade', models.IntegerField(default=0, verbose_name='Quantidade')),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Valor Total')),
+            ],
+            options={
+                'verbose_name': 'Estatística Horária de Webhooks',
+                'verbose_name_plural': 'Estatísticas Horárias de Webhooks',
+                'db_table': 'core_webhook_estatistica_hora',
+                'ordering': ['-hora'],
+                'unique_together': {('hora', 'tipo', 'evento', 'status_processamento')},
+            },
+        ),
+        migrations.RunPython(popular_rollup, migrations.RunPython.noop),
+    ]
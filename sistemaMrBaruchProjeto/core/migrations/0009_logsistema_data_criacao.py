@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_webhookestatisticahora'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='logsistema',
+            name='data_criacao',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_logsistema_data_criacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhooklog',
+            name='arquivo_posicao',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Posição no Arquivo'),
+        ),
+    ]
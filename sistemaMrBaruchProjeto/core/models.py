@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -38,7 +39,8 @@ class LogSistema(models.Model):
     modulo = models.CharField(max_length=100)  # Ex: 'vendas', 'financeiro'
     acao = models.CharField(max_length=100)    # Ex: 'cadastro_venda', 'webhook_asaas'
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    data_criacao = models.DateTimeField(auto_now_add=True)
+    # Hora do evento: o buffer (core.log_buffer) preenche ao enfileirar, não ao gravar
+    data_criacao = models.DateTimeField(default=timezone.now, editable=False)
     
     def __str__(self):
         return f"{self.modulo}.{self.acao} - {self.nivel}"
@@ -84,10 +86,13 @@ class WebhookLog(models.Model):
     
     TIPO_CHOICES = [
         ('ASAAS', 'ASAAS'),
+        ('ASAAS_ATENDIMENTO', 'ASAAS (Atendimento)'),
         ('OUTRO', 'Outro'),
     ]
     
     STATUS_CHOICES = [
+        ('PENDING', 'Pendente'),
+        ('PROCESSING', 'Processando'),
         ('SUCCESS', 'Sucesso'),
         ('ERROR', 'Erro'),
         ('IGNORED', 'Ignorado'),
@@ -97,11 +102,23 @@ class WebhookLog(models.Model):
     evento = models.CharField('Evento', max_length=100, blank=True)
     payload = models.JSONField('Payload Completo')
     headers = models.JSONField('Headers HTTP', blank=True, null=True)
+    # Reentregas do Asaas têm a mesma chave (core.webhook_dedup)
+    chave_idempotencia = models.CharField('Chave de Idempotência', max_length=150, unique=True, null=True, blank=True)
     
     # Dados processados
-    status_processamento = models.CharField('Status', max_length=20, choices=STATUS_CHOICES)
+    status_processamento = models.CharField('Status', max_length=20, choices=STATUS_CHOICES, default='PENDING')
     mensagem_erro = models.TextField('Mensagem de Erro', blank=True)
     
+    # Fila de processamento (core.webhook_fila / processar_webhooks_asaas)
+    tentativas = models.PositiveIntegerField('Tentativas', default=0)
+    worker = models.CharField('Worker', max_length=100, blank=True)
+    reivindicado_em = models.DateTimeField('Reivindicado em', null=True, blank=True)
+    
+    # Retenção (core.webhook_arquivo / arquivar_webhooks): payload e headers no arquivo mensal
+    arquivo_payload = models.CharField('Arquivo do Payload', max_length=100, blank=True)
+    arquivo_posicao = models.BigIntegerField('Posição no Arquivo', null=True, blank=True)  # Byte do frame/membro
+    arquivado_em = models.DateTimeField('Arquivado em', null=True, blank=True)
+    
     # Dados extraídos
     payment_id = models.CharField('Payment ID', max_length=100, blank=True, db_index=True)
     customer_id = models.CharField('Customer ID', max_length=100, blank=True, db_index=True)
@@ -122,13 +139,54 @@ class WebhookLog(models.Model):
             models.Index(fields=['-data_recebimento']),
             models.Index(fields=['payment_id']),
             models.Index(fields=['evento']),
+            models.Index(fields=['status_processamento', 'data_recebimento']),
         ]
     
     def __str__(self):
         return f"{self.tipo} - {self.evento} - {self.data_recebimento.strftime('%d/%m/%Y %H:%M')}"
     
+    @property
+    def arquivado(self):
+        return bool(self.arquivo_payload)
+    
+    def obter_conteudo(self):
+        """(payload, headers), lendo do arquivo morto se o log já foi arquivado"""
+        if not self.arquivado:
+            return self.payload, self.headers
+        from .webhook_arquivo import ler_registro
+        registro = ler_registro(self.arquivo_payload, self.id, self.arquivo_posicao)
+        if registro is None:
+            return {}, None
+        return registro['payload'], registro['headers']
+    
     @property
     def payload_formatado(self):
         """Retorna payload formatado para visualização"""
         import json
-        return json.dumps(self.payload, indent=2, ensure_ascii=False)
\ No newline at end of file
+        return json.dumps(self.obter_conteudo()[0], indent=2, ensure_ascii=False)
+
+
+class WebhookEstatisticaHora(models.Model):
+    """
+    Rollup horário dos webhooks (tipo × evento × status × hora)
+    Mantido incrementalmente no recebimento e a cada mudança de status
+    (core.webhook_estatisticas); as telas de estatística leem daqui em vez de
+    varrer WebhookLog. PROCESSING é contado como PENDING.
+    """
+    
+    hora = models.DateTimeField('Hora')
+    tipo = models.CharField('Tipo', max_length=20)
+    evento = models.CharField('Evento', max_length=100)
+    status_processamento = models.CharField('Status', max_length=20)
+    quantidade = models.IntegerField('Quantidade', default=0)
+    valor_total = models.DecimalField('Valor Total', max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        db_table = 'core_webhook_estatistica_hora'
+        verbose_name = 'Estatística Horária de Webhooks'
+        verbose_name_plural = 'Estatísticas Horárias de Webhooks'
+        ordering = ['-hora']
+        unique_together = ['hora', 'tipo', 'evento', 'status_processamento']
+    
+    def __str__(self):
+        return f"{self.hora:%d/%m/%Y %H}h - {self.evento} - {self.status_processamento}: {self.quantidade}"
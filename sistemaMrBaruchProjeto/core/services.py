@@ -1,41 +1,31 @@
+import json
 import logging
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import Count, Max
 from django.utils import timezone
 from django.conf import settings
 from .models import ConfiguracaoSistema, LogSistema, Notificacao
+from .log_buffer import buffer_logs
 
 logger = logging.getLogger(__name__)
 
 class LogService:
     """Serviço centralizado de logging"""
     
+    NIVEIS_ORDEM = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+    
     @staticmethod
     def registrar(usuario=None, nivel='INFO', mensagem='', modulo='', acao='', ip=None):
-        """Registra log no banco de dados"""
+        """
+        Registra log no banco de dados.
+        A gravação é feita em lote pelo buffer (core.log_buffer); com
+        LOG_BUFFER_ATIVO=False cada registro é gravado na hora.
+        """
         try:
-            # Respeita configuração de logs
-            ativo = ConfiguracaoService.obter_config('LOG_ATIVO', True)
-            nivel_min = str(ConfiguracaoService.obter_config('LOG_NIVEL_MINIMO', 'INFO') or 'INFO').upper()
-            niveis_ordem = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
-            if not ativo or niveis_ordem.get(str(nivel).upper(), 20) < niveis_ordem.get(nivel_min, 20):
-                # Ainda assim loga em console para dev (nível WARNING/ERROR)
-                log_message = f"[{modulo}.{acao}] {mensagem}"
-                if nivel == 'ERROR':
-                    logger.error(log_message)
-                elif nivel == 'WARNING':
-                    logger.warning(log_message)
-                else:
-                    logger.info(log_message)
-                return
-            LogSistema.objects.create(
-                usuario=usuario,
-                nivel=nivel,
-                mensagem=mensagem,
-                modulo=modulo,
-                acao=acao,
-                ip_address=ip
-            )
-            
-            # Também loga no console para desenvolvimento
+            # Também loga no console para desenvolvimento (mesmo abaixo do nível mínimo)
             log_message = f"[{modulo}.{acao}] {mensagem}"
             if nivel == 'ERROR':
                 logger.error(log_message)
@@ -43,6 +33,26 @@ class LogService:
                 logger.warning(log_message)
             else:
                 logger.info(log_message)
+            
+            # Respeita configuração de logs
+            ativo = ConfiguracaoService.obter_bool('LOG_ATIVO', True)
+            nivel_min = ConfiguracaoService.obter_texto('LOG_NIVEL_MINIMO', 'INFO').upper() or 'INFO'
+            niveis_ordem = LogService.NIVEIS_ORDEM
+            if not ativo or niveis_ordem.get(str(nivel).upper(), 20) < niveis_ordem.get(nivel_min, 20):
+                return
+            
+            campos = {
+                'usuario_id': getattr(usuario, 'pk', None),
+                'nivel': nivel,
+                'mensagem': mensagem,
+                'modulo': modulo,
+                'acao': acao,
+                'ip_address': ip,
+            }
+            if getattr(settings, 'LOG_BUFFER_ATIVO', True):
+                buffer_logs.adicionar(**campos)
+            else:
+                LogSistema.objects.create(**campos)
                 
         except Exception as e:
             logger.error(f"Erro ao registrar log: {e}")
@@ -78,27 +88,163 @@ class NotificacaoService:
             return False
 
 class ConfiguracaoService:
-    """Serviço de configurações do sistema"""
+    """
+    Serviço de configurações do sistema.
+    
+    Todas as linhas de ConfiguracaoSistema ficam em memória no processo, já
+    convertidas pelo tipo. A versão é lida do banco (maior ultima_atualizacao e
+    quantidade de linhas), então vale entre workers mesmo com o cache local por
+    processo: a cada CONFIG_CACHE_VERIFICACAO segundos cada processo compara a
+    versão e recarrega quando ela muda. Salvar/excluir no próprio processo
+    (post_save/post_delete, ligados em CoreConfig.ready) descarta na hora, e
+    CONFIG_CACHE_TTL força a recarga de qualquer forma (cobre .update(), que não
+    mexe em ultima_atualizacao).
+    """
+    
+    _valores = None          # chave -> (valor bruto, valor convertido)
+    _versao = None
+    _verificado_em = 0.0
+    _carregado_em = 0.0
+    _lock = threading.Lock()
     
     @staticmethod
-    def obter_config(chave, valor_padrao=None):
-        """Obtém valor de configuração"""
+    def _converter(valor, tipo):
+        """Converte o valor bruto pelo tipo cadastrado"""
+        if tipo == 'NUMERO':
+            return float(valor) if '.' in valor else int(valor)
+        elif tipo == 'BOOLEANO':
+            return valor.lower() in ('true', '1', 'yes')
+        elif tipo == 'JSON':
+            return json.loads(valor)
+        return valor
+    
+    @staticmethod
+    def _versao_banco():
+        """(última atualização, quantidade): muda com qualquer save/create/delete"""
+        versao = ConfiguracaoSistema.objects.aggregate(
+            atualizacao=Max('ultima_atualizacao'), quantidade=Count('id')
+        )
+        return versao['atualizacao'], versao['quantidade']
+    
+    @classmethod
+    def _carregar(cls):
+        """Uma consulta para todas as configurações"""
+        versao = cls._versao_banco()
+        valores = {}
+        for chave, valor, tipo in ConfiguracaoSistema.objects.values_list('chave', 'valor', 'tipo'):
+            try:
+                valores[chave] = (valor, cls._converter(valor, tipo))
+            except Exception as e:
+                logger.error(f"Erro ao obter configuração {chave}: {e}")
+                valores[chave] = (valor, None)
+        cls._valores = valores
+        cls._versao = versao
+        cls._verificado_em = cls._carregado_em = time.monotonic()
+        return valores
+    
+    @classmethod
+    def _registro(cls):
+        """Configurações em memória, recarregadas se outro processo alterou alguma"""
+        valores = cls._valores
+        agora = time.monotonic()
+        intervalo = float(getattr(settings, 'CONFIG_CACHE_VERIFICACAO', 2))
+        idade_maxima = float(getattr(settings, 'CONFIG_CACHE_TTL', 300))
+        
+        if valores is not None and agora - cls._verificado_em < intervalo:
+            return valores
+        
+        with cls._lock:
+            agora = time.monotonic()
+            if cls._valores is None or agora - cls._carregado_em >= idade_maxima:
+                return cls._carregar()
+            if agora - cls._verificado_em < intervalo:
+                return cls._valores
+            if cls._versao_banco() == cls._versao:
+                cls._verificado_em = agora
+                return cls._valores
+            return cls._carregar()
+    
+    @classmethod
+    def invalidar_cache(cls, **kwargs):
+        """
+        Descarta as configurações em memória deste processo (os demais percebem
+        pela versão no banco). Também serve de receptor para post_save/post_delete
+        de ConfiguracaoSistema.
+        """
+        def _invalidar():
+            cls._valores = None
+        # Só depois do commit: antes disso a recarga leria o valor antigo
+        transaction.on_commit(_invalidar)
+    
+    @classmethod
+    def _obter(cls, chave):
+        """(valor bruto, valor convertido) ou None se a chave não existe"""
         try:
-            config = ConfiguracaoSistema.objects.get(chave=chave)
-            # Converte o valor baseado no tipo
-            if config.tipo == 'NUMERO':
-                return float(config.valor) if '.' in config.valor else int(config.valor)
-            elif config.tipo == 'BOOLEANO':
-                return config.valor.lower() in ('true', '1', 'yes')
-            elif config.tipo == 'JSON':
-                import json
-                return json.loads(config.valor)
-            else:
-                return config.valor
-        except ConfiguracaoSistema.DoesNotExist:
-            return valor_padrao
+            return cls._registro().get(chave)
         except Exception as e:
             logger.error(f"Erro ao obter configuração {chave}: {e}")
+            return None
+    
+    @staticmethod
+    def obter_config(chave, valor_padrao=None):
+        """Obtém valor de configuração (convertido pelo tipo cadastrado)"""
+        item = ConfiguracaoService._obter(chave)
+        if item is None or item[1] is None:
+            return valor_padrao
+        return item[1]
+    
+    # ---- Acessores tipados: convertem o valor bruto, sem depender do tipo cadastrado ----
+    
+    @staticmethod
+    def obter_texto(chave, valor_padrao=''):
+        item = ConfiguracaoService._obter(chave)
+        return valor_padrao if item is None else item[0]
+    
+    @staticmethod
+    def obter_int(chave, valor_padrao=0):
+        item = ConfiguracaoService._obter(chave)
+        if item is None:
+            return valor_padrao
+        try:
+            return int(Decimal(str(item[0]).strip()))
+        except (InvalidOperation, ValueError):
+            return valor_padrao
+    
+    @staticmethod
+    def obter_float(chave, valor_padrao=0.0):
+        item = ConfiguracaoService._obter(chave)
+        if item is None:
+            return valor_padrao
+        try:
+            return float(str(item[0]).strip().replace(',', '.'))
+        except ValueError:
+            return valor_padrao
+    
+    @staticmethod
+    def obter_decimal(chave, valor_padrao=Decimal('0')):
+        item = ConfiguracaoService._obter(chave)
+        if item is None:
+            return Decimal(str(valor_padrao))
+        try:
+            return Decimal(str(item[0]).strip().replace(',', '.'))
+        except InvalidOperation:
+            return Decimal(str(valor_padrao))
+    
+    @staticmethod
+    def obter_bool(chave, valor_padrao=False):
+        item = ConfiguracaoService._obter(chave)
+        if item is None:
+            return valor_padrao
+        return str(item[0]).strip().lower() in ('true', '1', 'yes', 'sim')
+    
+    @staticmethod
+    def obter_json(chave, valor_padrao=None):
+        item = ConfiguracaoService._obter(chave)
+        if item is None:
+            return valor_padrao
+        try:
+            return json.loads(item[0])
+        except ValueError:
             return valor_padrao
     
     @staticmethod
@@ -1,3 +1,289 @@
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from clientes.models import Cliente
+from financeiro.models import Comissao, Parcela, PixEntrada, PixLevantamento, RotaPagamentoAsaas
+from marketing.models import Lead
+from vendas.models import Servico, Venda
+
+from .maquina_pagamentos import aplicar_webhook
+from .models import WebhookLog
+from .webhook_fila import processar_lote
+
+
+def _payload(evento, payment_id, valor='100.00'):
+    return {'event': evento, 'payment': {'id': payment_id, 'status': '', 'value': valor}}
+
+
+class MaquinaPagamentosBase(TestCase):
+    """Venda com parcela, PIX de entrada e PIX de levantamento roteados no Asaas"""
+
+    def setUp(self):
+        User = get_user_model()
+        self.captador = User.objects.create_user(username='captador', email='captador@teste.com', password='x')
+        self.consultor = User.objects.create_user(username='consultor', email='consultor@teste.com', password='x')
+
+        self.lead = Lead.objects.create(nome_completo='Lead Teste', telefone='11999999999')
+        cliente = Cliente.objects.create(lead=self.lead)
+        servico = Servico.objects.create(
+            nome='Limpa Nome', tipo='LIMPA_NOME', descricao='Teste', prazo_medio=90, preco_base=Decimal('1000.00')
+        )
+        self.venda = Venda.objects.create(
+            cliente=cliente,
+            servico=servico,
+            captador=self.captador,
+            consultor=self.consultor,
+            valor_total=Decimal('1000.00'),
+            valor_entrada=Decimal('200.00'),
+            quantidade_parcelas=4,
+            valor_parcela=Decimal('200.00'),
+            forma_entrada='PIX',
+            forma_pagamento='BOLETO',
+            data_vencimento_primeira=date(2026, 11, 10),
+            cliente_quer_nf=False,
+        )
+
+        self.parcela = Parcela.objects.create(
+            venda=self.venda, numero_parcela=1, valor=Decimal('200.00'),
+            data_vencimento=date(2026, 11, 10), id_asaas='pay_parcela',
+        )
+        self.pix_levantamento = PixLevantamento.objects.create(
+            lead=self.lead, asaas_payment_id='pay_levantamento', valor=Decimal('50.00'),
+            pix_code='pix', pix_qr_code_url='qr',
+        )
+        self.pix_entrada = PixEntrada.objects.create(
+            venda=self.venda, asaas_payment_id='pay_entrada', valor=Decimal('200.00'),
+            pix_code='pix', pix_qr_code_url='qr',
+        )
+        RotaPagamentoAsaas.registrar('PARCELA', self.parcela.pk, 'pay_parcela')
+        RotaPagamentoAsaas.registrar('PIX_LEVANTAMENTO', self.pix_levantamento.pk, 'pay_levantamento')
+        RotaPagamentoAsaas.registrar('PIX_ENTRADA', self.pix_entrada.pk, 'pay_entrada')
+
+    def _comissao(self, tipo, parcela=None):
+        return Comissao.objects.create(
+            usuario=self.captador if tipo.startswith('CAPTADOR') else self.consultor,
+            venda=self.venda,
+            parcela=parcela,
+            tipo_comissao=tipo,
+            valor_comissao=Decimal('10.00'),
+            percentual_comissao=Decimal('5.00'),
+        )
+
+
+class TransicoesParcelaTest(MaquinaPagamentosBase):
+
+    def test_pagamento_confirmado_marca_parcela_paga(self):
+        status, _ = aplicar_webhook(_payload('PAYMENT_RECEIVED', 'pay_parcela'))
+
+        self.parcela.refresh_from_db()
+        self.assertEqual(status, 'SUCCESS')
+        self.assertEqual(self.parcela.status, 'paga')
+        self.assertIsNotNone(self.parcela.data_pagamento)
+
+    def test_vencimento_marca_parcela_vencida(self):
+        aplicar_webhook(_payload('PAYMENT_OVERDUE', 'pay_parcela'))
+
+        self.parcela.refresh_from_db()
+        self.assertEqual(self.parcela.status, 'vencida')
+
+    def test_parcela_paga_nao_volta_para_vencida(self):
+        aplicar_webhook(_payload('PAYMENT_CONFIRMED', 'pay_parcela'))
+        aplicar_webhook(_payload('PAYMENT_OVERDUE', 'pay_parcela'))
+
+        self.parcela.refresh_from_db()
+        self.assertEqual(self.parcela.status, 'paga')
+
+    def test_estorno_cancela_parcela(self):
+        aplicar_webhook(_payload('PAYMENT_RECEIVED', 'pay_parcela'))
+        aplicar_webhook(_payload('PAYMENT_REFUNDED', 'pay_parcela'))
+
+        self.parcela.refresh_from_db()
+        self.assertEqual(self.parcela.status, 'cancelada')
+        self.assertIsNone(self.parcela.data_pagamento)
+
+    def test_reentrega_nao_repete_efeitos(self):
+        aplicar_webhook(_payload('PAYMENT_RECEIVED', 'pay_parcela'))
+        self.parcela.refresh_from_db()
+        data_pagamento = self.parcela.data_pagamento
+        comissoes = Comissao.objects.filter(parcela=self.parcela).count()
+
+        with mock.patch('core.maquina_pagamentos._pagar_comissoes') as pagar:
+            status, _ = aplicar_webhook(_payload('PAYMENT_CONFIRMED', 'pay_parcela'))
+
+        self.parcela.refresh_from_db()
+        self.assertEqual(status, 'SUCCESS')
+        self.assertEqual(self.parcela.status, 'paga')
+        self.assertEqual(self.parcela.data_pagamento, data_pagamento)
+        self.assertEqual(Comissao.objects.filter(parcela=self.parcela).count(), comissoes)
+        pagar.assert_not_called()
+
+    def test_pagamento_da_parcela_paga_comissoes_da_parcela(self):
+        comissao_parcela = self._comissao('CAPTADOR_PARCELA', parcela=self.parcela)
+        comissao_entrada = self._comissao('CAPTADOR_ENTRADA')
+
+        aplicar_webhook(_payload('PAYMENT_RECEIVED', 'pay_parcela'))
+
+        comissao_parcela.refresh_from_db()
+        comissao_entrada.refresh_from_db()
+        self.assertEqual(comissao_parcela.status, 'paga')
+        self.assertIsNotNone(comissao_parcela.data_pagamento)
+        self.assertEqual(comissao_entrada.status, 'pendente')
+
+    def test_payment_desconhecido_nao_reenvia(self):
+        status, _ = aplicar_webhook(_payload('PAYMENT_RECEIVED', 'pay_inexistente'))
+
+        self.assertEqual(status, 'SUCCESS')
+
+    def test_evento_nao_tratado_e_ignorado(self):
+        status, mensagem = aplicar_webhook(_payload('PAYMENT_ANTICIPATED', 'pay_parcela'))
+
+        self.assertEqual(status, 'IGNORED')
+        self.assertIn('PAYMENT_ANTICIPATED', mensagem)
+
+
+class TransicoesPixTest(MaquinaPagamentosBase):
+
+    def test_pix_levantamento_pago(self):
+        status, _ = aplicar_webhook(_payload('PAYMENT_RECEIVED', 'pay_levantamento', '50.00'))
+
+        self.pix_levantamento.refresh_from_db()
+        self.lead.refresh_from_db()
+        self.assertEqual(status, 'SUCCESS')
+        self.assertEqual(self.pix_levantamento.status_pagamento, 'pago')
+        self.assertTrue(self.lead.fez_levantamento)
+
+    def test_pix_levantamento_vencido_perde_lead(self):
+        aplicar_webhook(_payload('PAYMENT_OVERDUE', 'pay_levantamento', '50.00'))
+
+        self.pix_levantamento.refresh_from_db()
+        self.lead.refresh_from_db()
+        self.assertEqual(self.pix_levantamento.status_pagamento, 'vencido')
+        self.assertEqual(self.lead.status, 'PERDIDO')
+
+    def test_pix_levantamento_pago_nao_volta_para_vencido(self):
+        aplicar_webhook(_payload('PAYMENT_RECEIVED', 'pay_levantamento', '50.00'))
+        self.lead.refresh_from_db()
+        status_lead = self.lead.status
+
+        aplicar_webhook(_payload('PAYMENT_OVERDUE', 'pay_levantamento', '50.00'))
+
+        self.pix_levantamento.refresh_from_db()
+        self.lead.refresh_from_db()
+        self.assertEqual(self.pix_levantamento.status_pagamento, 'pago')
+        self.assertEqual(self.lead.status, status_lead)
+
+    def test_pix_levantamento_reentrega_nao_notifica_de_novo(self):
+        aplicar_webhook(_payload('PAYMENT_RECEIVED', 'pay_levantamento', '50.00'))
+
+        with mock.patch('core.maquina_pagamentos._notificar_levantamento_pago') as notificar:
+            status, _ = aplicar_webhook(_payload('PAYMENT_RECEIVED', 'pay_levantamento', '50.00'))
+
+        self.assertEqual(status, 'SUCCESS')
+        notificar.assert_not_called()
+
+    def test_pix_entrada_pago_atualiza_venda_e_comissoes(self):
+        comissao_entrada = self._comissao('CONSULTOR_ENTRADA')
+        comissao_parcela = self._comissao('CONSULTOR_PARCELA', parcela=self.parcela)
+
+        status, _ = aplicar_webhook(_payload('PAYMENT_RECEIVED', 'pay_entrada', '200.00'))
+
+        self.pix_entrada.refresh_from_db()
+        self.venda.refresh_from_db()
+        comissao_entrada.refresh_from_db()
+        comissao_parcela.refresh_from_db()
+        self.assertEqual(status, 'SUCCESS')
+        self.assertEqual(self.pix_entrada.status_pagamento, 'pago')
+        self.assertIsNotNone(self.pix_entrada.data_pagamento)
+        self.assertEqual(self.venda.status_pagamento_entrada, 'PAGO')
+        self.assertEqual(comissao_entrada.status, 'paga')
+        self.assertEqual(comissao_parcela.status, 'pendente')
+
+    def test_pix_entrada_reentrega_mantem_data_pagamento(self):
+        aplicar_webhook(_payload('PAYMENT_RECEIVED', 'pay_entrada', '200.00'))
+        self.pix_entrada.refresh_from_db()
+        data_pagamento = self.pix_entrada.data_pagamento
+
+        with mock.patch('core.maquina_pagamentos._gerar_contrato') as gerar_contrato:
+            aplicar_webhook(_payload('PAYMENT_CONFIRMED', 'pay_entrada', '200.00'))
+
+        self.pix_entrada.refresh_from_db()
+        self.assertEqual(self.pix_entrada.data_pagamento, data_pagamento)
+        gerar_contrato.assert_not_called()
+
+
+class ProcessarLoteTest(TestCase):
+    """Ordem por pagamento e devolução à fila em core.webhook_fila.processar_lote"""
+
+    def _webhook(self, payment_id, evento):
+        return WebhookLog.objects.create(
+            tipo='ASAAS',
+            evento=evento,
+            payload=_payload(evento, payment_id),
+            payment_id=payment_id,
+            status_processamento='PROCESSING',
+            tentativas=1,
+        )
+
+    def test_eventos_do_mesmo_pagamento_na_ordem_de_chegada(self):
+        logs = [
+            self._webhook('pay_a', 'PAYMENT_CREATED'),
+            self._webhook('pay_b', 'PAYMENT_CREATED'),
+            self._webhook('pay_a', 'PAYMENT_RECEIVED'),
+        ]
+        aplicados = []
+
+        def aplicar(payload):
+            aplicados.append((payload['payment']['id'], payload['event']))
+            return 'SUCCESS', ''
+
+        with mock.patch('core.webhook_fila.aplicar_webhook', side_effect=aplicar):
+            stats = processar_lote(logs)
+
+        self.assertEqual(stats['sucesso'], 3)
+        eventos_a = [evento for payment_id, evento in aplicados if payment_id == 'pay_a']
+        self.assertEqual(eventos_a, ['PAYMENT_CREATED', 'PAYMENT_RECEIVED'])
+        self.assertFalse(WebhookLog.objects.exclude(status_processamento='SUCCESS').exists())
+
+    def test_falha_devolve_eventos_seguintes_do_pagamento(self):
+        primeiro = self._webhook('pay_a', 'PAYMENT_CONFIRMED')
+        outro_pagamento = self._webhook('pay_b', 'PAYMENT_CONFIRMED')
+        seguinte = self._webhook('pay_a', 'PAYMENT_RECEIVED')
+        aplicados = []
+
+        def aplicar(payload):
+            aplicados.append((payload['payment']['id'], payload['event']))
+            if payload['payment']['id'] == 'pay_a':
+                raise RuntimeError('falha simulada')
+            return 'SUCCESS', ''
+
+        with mock.patch('core.webhook_fila.aplicar_webhook', side_effect=aplicar):
+            stats = processar_lote([primeiro, outro_pagamento, seguinte])
+
+        primeiro.refresh_from_db()
+        outro_pagamento.refresh_from_db()
+        seguinte.refresh_from_db()
+        self.assertNotIn(('pay_a', 'PAYMENT_RECEIVED'), aplicados)
+        self.assertEqual(stats, {'sucesso': 1, 'ignorados': 0, 'erros': 0, 'reenfileirados': 2})
+        self.assertEqual(primeiro.status_processamento, 'PENDING')
+        self.assertIn('falha simulada', primeiro.mensagem_erro)
+        self.assertEqual(primeiro.tentativas, 1)
+        self.assertEqual(seguinte.status_processamento, 'PENDING')
+        self.assertEqual(seguinte.tentativas, 0)  # A tentativa não consumida é devolvida
+        self.assertEqual(outro_pagamento.status_processamento, 'SUCCESS')
+
+    def test_falha_sem_tentativas_restantes_marca_erro(self):
+        webhook = self._webhook('pay_a', 'PAYMENT_CONFIRMED')
+        WebhookLog.objects.filter(pk=webhook.pk).update(tentativas=5)
+        webhook.refresh_from_db()
+
+        with self.settings(WEBHOOK_FILA_MAX_TENTATIVAS=5), \
+                mock.patch('core.webhook_fila.aplicar_webhook', side_effect=RuntimeError('falha simulada')):
+            stats = processar_lote([webhook])
+
+        webhook.refresh_from_db()
+        self.assertEqual(stats['erros'], 1)
+        self.assertEqual(webhook.status_processamento, 'ERROR')
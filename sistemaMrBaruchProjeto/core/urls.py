@@ -35,6 +35,7 @@ urlpatterns = [
    
    # Gerenciamento de Webhooks Pendentes
    path('webhook/resend-pending/', views.resend_pending_webhooks, name='resend_pending_webhooks'),
+   path('webhook/reprocessar/', views.reprocessar_webhooks, name='reprocessar_webhooks'),
    path('webhook/statistics/', views.webhook_statistics, name='webhook_statistics'),
    path('webhook/list-pending/', views.list_pending_webhooks, name='list_pending_webhooks'),
 ]
\ No newline at end of file
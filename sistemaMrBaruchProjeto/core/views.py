@@ -575,7 +575,6 @@ def redefinir_senha_usuario(request):
 # ==================== WEBHOOK ASAAS ====================
 import json
 import logging
-import traceback
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
@@ -598,7 +597,12 @@ def get_client_ip(request):
 @require_POST
 def webhook_asaas(request):
     """
-    Endpoint para receber webhooks do ASAAS com log completo
+    Endpoint para receber webhooks do ASAAS
+    
+    Apenas valida, grava o WebhookLog como PENDING e responde 200: o processamento
+    (parcela, PIX, comissões, notas fiscais) é feito pelo worker
+    `python manage.py processar_webhooks_asaas` (ver core.webhook_fila), para que
+    picos de webhooks do Asaas não prendam os workers HTTP nem causem reenvios por timeout.
     
     Eventos suportados:
     - PAYMENT_CREATED: Cobrança criada
@@ -613,14 +617,14 @@ def webhook_asaas(request):
     - PAYMENT_CHARGEBACK_DISPUTE: Contestação de chargeback
     """
     from .models import WebhookLog
+    from .webhook_dedup import gerar_chave_idempotencia, chaves_recentes
+    from .webhook_estatisticas import registrar_recebido
+    from django.db import IntegrityError, transaction
     from decimal import Decimal
     
-    webhook_log = None
-    
     try:
         # 1. Obter dados do webhook
         body = request.body.decode('utf-8')
-        logger.info(f"[webhook_asaas] Recebido webhook ASAAS: {body[:200]}...")
         
         try:
             dados_webhook = json.loads(body)
@@ -628,14 +632,14 @@ def webhook_asaas(request):
             logger.error(f"[webhook_asaas] Erro ao decodificar JSON: {str(e)}")
             # Tentar criar log de erro
             try:
-                WebhookLog.objects.create(
+                registrar_recebido(WebhookLog.objects.create(
                     tipo='ASAAS',
                     evento='ERRO_PARSE',
                     payload={'error': str(e), 'body': body[:1000]},
                     status_processamento='ERROR',
                     mensagem_erro=f"Erro ao decodificar JSON: {str(e)}",
                     ip_origem=get_client_ip(request)
-                )
+                ))
             except:
                 pass
             return JsonResponse({
@@ -643,16 +647,21 @@ def webhook_asaas(request):
                 'error': 'Invalid JSON'
             }, status=400)
         
-        # 2. Extrair informações principais
+        # 2. Reentrega já vista? Descarta antes de qualquer consulta ao banco
+        chave = gerar_chave_idempotencia(dados_webhook)
+        if chaves_recentes.contem(chave):
+            logger.info(f"[webhook_asaas] Reentrega descartada (cache): {chave}")
+            return JsonResponse({'success': True, 'duplicado': True}, status=200)
+        
+        # 3. Extrair informações principais
         event = dados_webhook.get('event')
         payment_data = dados_webhook.get('payment', {})
         payment_id = payment_data.get('id')
         payment_status = payment_data.get('status')
         payment_value = payment_data.get('value')
-        billing_type = payment_data.get('billingType')
         customer_id = payment_data.get('customer')
         
-        # 3. Capturar headers importantes
+        # 4. Capturar headers importantes
         headers = {
             'Content-Type': request.META.get('CONTENT_TYPE'),
             'User-Agent': request.META.get('HTTP_USER_AGENT'),
@@ -660,108 +669,49 @@ def webhook_asaas(request):
             'X-Real-IP': request.META.get('HTTP_X_REAL_IP'),
         }
         
-        # 4. Criar log no banco de dados
-        webhook_log = WebhookLog.objects.create(
-            tipo='ASAAS',
-            evento=event or 'DESCONHECIDO',
-            payload=dados_webhook,
-            headers=headers,
-            payment_id=payment_id or '',
-            customer_id=customer_id or '',
-            payment_status=payment_status or '',
-            valor=Decimal(str(payment_value)) if payment_value else None,
-            ip_origem=get_client_ip(request),
-            status_processamento='SUCCESS'  # Será atualizado se houver erro
-        )
+        # 5. Validar dados obrigatórios (sem eles não há o que processar)
+        valido = bool(event and payment_id)
         
-        logger.info(f"[webhook_asaas] Webhook #{webhook_log.id} | Event: {event} | Payment: {payment_id} | Status: {payment_status} | Type: {billing_type} | Value: R$ {payment_value}")
+        # 6. Gravar na fila (a chave única barra reentregas que o cache não pegou)
+        try:
+            with transaction.atomic():
+                webhook_log = WebhookLog.objects.create(
+                    tipo='ASAAS',
+                    evento=event or 'DESCONHECIDO',
+                    payload=dados_webhook,
+                    headers=headers,
+                    chave_idempotencia=chave if valido else None,
+                    payment_id=payment_id or '',
+                    customer_id=customer_id or '',
+                    payment_status=payment_status or '',
+                    valor=Decimal(str(payment_value)) if payment_value else None,
+                    ip_origem=get_client_ip(request),
+                    status_processamento='PENDING' if valido else 'ERROR',
+                    mensagem_erro='' if valido else 'Missing event or payment_id',
+                )
+                registrar_recebido(webhook_log)
+        except IntegrityError:
+            chaves_recentes.adicionar(chave)
+            logger.info(f"[webhook_asaas] Reentrega descartada (já registrada): {chave}")
+            return JsonResponse({'success': True, 'duplicado': True}, status=200)
         
-        # 5. Validar dados obrigatórios
-        if not event or not payment_id:
-            logger.warning(f"[webhook_asaas] Webhook sem event ou payment_id")
-            webhook_log.status_processamento = 'ERROR'
-            webhook_log.mensagem_erro = 'Missing event or payment_id'
-            webhook_log.save(update_fields=['status_processamento', 'mensagem_erro'])
+        if not valido:
+            logger.warning(f"[webhook_asaas] Webhook #{webhook_log.id} sem event ou payment_id")
             return JsonResponse({
                 'success': False,
                 'error': 'Missing event or payment_id',
                 'webhook_id': webhook_log.id
             }, status=400)
         
-        # 6. Registrar no log do sistema
-        LogService.registrar(
-            nivel='INFO',
-            mensagem=f"Webhook #{webhook_log.id} ASAAS recebido - Event: {event} - Payment: {payment_id} - Status: {payment_status}",
-            modulo='core',
-            acao='webhook_asaas_recebido'
-        )
-        
-        # 7. Processar por tipo de evento
-        success = False
-        
-        if event in ['PAYMENT_RECEIVED', 'PAYMENT_CONFIRMED', 'PAYMENT_RECEIVED_IN_CASH']:
-            # Pagamento confirmado/recebido
-            success = _processar_pagamento_confirmado(payment_data)
-            
-        elif event == 'PAYMENT_OVERDUE':
-            # Pagamento vencido
-            success = _processar_pagamento_vencido(payment_data)
-            
-        elif event == 'PAYMENT_DELETED':
-            # Cobrança deletada
-            success = _processar_pagamento_deletado(payment_data)
-            
-        elif event == 'PAYMENT_REFUNDED':
-            # Pagamento estornado
-            success = _processar_pagamento_estornado(payment_data)
-            
-        elif event in ['PAYMENT_CREATED', 'PAYMENT_UPDATED']:
-            # Apenas registrar no log, não precisa ação
-            logger.info(f"[webhook_asaas] Webhook #{webhook_log.id} - Evento {event} registrado - sem ação necessária")
-            success = True
-            
-        else:
-            # Evento não tratado
-            logger.warning(f"[webhook_asaas] Webhook #{webhook_log.id} - Evento não tratado: {event}")
-            LogService.registrar(
-                nivel='WARNING',
-                mensagem=f"Evento webhook não tratado: {event}",
-                modulo='core',
-                acao='webhook_evento_nao_tratado'
-            )
-            webhook_log.status_processamento = 'IGNORED'
-            webhook_log.mensagem_erro = f'Evento não tratado: {event}'
-            webhook_log.save(update_fields=['status_processamento', 'mensagem_erro'])
-            success = True  # Retorna sucesso para não reenviar
-        
-        # 8. Atualizar status do log
-        if success:
-            webhook_log.status_processamento = 'SUCCESS'
-            webhook_log.save(update_fields=['status_processamento'])
-            logger.info(f"[webhook_asaas] Webhook #{webhook_log.id} processado com sucesso")
-            return JsonResponse({
-                'success': True,
-                'webhook_id': webhook_log.id
-            }, status=200)
-        else:
-            webhook_log.status_processamento = 'ERROR'
-            webhook_log.mensagem_erro = 'Falha no processamento'
-            webhook_log.save(update_fields=['status_processamento', 'mensagem_erro'])
-            return JsonResponse({
-                'success': False,
-                'error': 'Processing failed',
-                'webhook_id': webhook_log.id
-            }, status=500)
+        chaves_recentes.adicionar(chave)
+        logger.info(f"[webhook_asaas] Webhook #{webhook_log.id} enfileirado | Event: {event} | Payment: {payment_id} | Status: {payment_status}")
+        return JsonResponse({
+            'success': True,
+            'webhook_id': webhook_log.id
+        }, status=200)
             
     except Exception as e:
         logger.error(f"[webhook_asaas] Erro crítico: {str(e)}", exc_info=True)
-        
-        # Atualizar log com erro
-        if webhook_log:
-            webhook_log.status_processamento = 'ERROR'
-            webhook_log.mensagem_erro = f"{str(e)}\n\n{traceback.format_exc()}"
-            webhook_log.save(update_fields=['status_processamento', 'mensagem_erro'])
-        
         LogService.registrar(
             nivel='ERROR',
             mensagem=f"Erro crítico no webhook ASAAS: {str(e)}",
@@ -770,478 +720,10 @@ def webhook_asaas(request):
         )
         return JsonResponse({
             'success': False,
-            'error': 'Internal server error',
-            'webhook_id': webhook_log.id if webhook_log else None
+            'error': 'Internal server error'
         }, status=500)
 
 
-def _processar_pagamento_confirmado(payment_data):
-    """
-    Processa pagamento confirmado/recebido
-    
-    Atualiza:
-    - PixLevantamento (se for PIX de levantamento)
-    - Parcela (se for parcela de venda)
-    - Lead status
-    
-    IMPORTANTE: As comissões são criadas automaticamente via SIGNALS.
-    Caso falhe, o validador automático irá recuperar.
-    """
-    payment_id = payment_data.get('id')
-    value = payment_data.get('value')
-    billing_type = payment_data.get('billingType')
-    
-    logger.info(f"[webhook] Processando pagamento confirmado: {payment_id}")
-    
-    try:
-        # 1. Tentar atualizar PIX Levantamento
-        from financeiro.models import PixLevantamento, PixEntrada, Parcela
-        
-        try:
-            pix_levantamento = PixLevantamento.objects.get(asaas_payment_id=payment_id)
-            pix_levantamento.status_pagamento = 'pago'
-            pix_levantamento.save(update_fields=['status_pagamento'])
-            
-            # Atualizar Lead
-            if pix_levantamento.lead:
-                pix_levantamento.lead.status = 'LEVANTAMENTO_PAGO'
-                pix_levantamento.lead.fez_levantamento = True
-                pix_levantamento.lead.save(update_fields=['status', 'fez_levantamento'])
-                
-                logger.info(f"[webhook] PIX Levantamento pago: {payment_id} - Lead {pix_levantamento.lead.id} atualizado")
-                
-                LogService.registrar(
-                    nivel='INFO',
-                    mensagem=f"PIX Levantamento confirmado: Lead {pix_levantamento.lead.id} - R$ {value}",
-                    modulo='financeiro',
-                    acao='pix_levantamento_pago'
-                )
-                
-                # GERAR COMISSÃO DO ATENDENTE
-                try:
-                    from core.commission_service import CommissionService
-                    comissao_atendente = CommissionService.criar_comissao_atendente(pix_levantamento.lead)
-                    logger.info(f"[webhook] Comissão atendente criada: R$ {comissao_atendente.valor:.2f}")
-                    
-                    LogService.registrar(
-                        nivel='INFO',
-                        mensagem=f"Comissão atendente criada: Lead {pix_levantamento.lead.id} - R$ {comissao_atendente.valor}",
-                        modulo='comissoes',
-                        acao='comissao_atendente_criada'
-                    )
-                except Exception as e_comissao:
-                    logger.error(f"[webhook] Erro ao criar comissão atendente: {str(e_comissao)}")
-                    LogService.registrar(
-                        nivel='ERROR',
-                        mensagem=f"Erro ao criar comissão atendente: {str(e_comissao)}",
-                        modulo='comissoes',
-                        acao='erro_comissao_atendente'
-                    )
-            
-            return True
-            
-        except PixLevantamento.DoesNotExist:
-            logger.debug(f"[webhook] Não é PIX Levantamento: {payment_id}")
-        
-        # 2. Tentar atualizar PIX de Entrada da Venda
-        try:
-            pix_entrada = PixEntrada.objects.select_related('venda', 'venda__cliente').get(asaas_payment_id=payment_id)
-            pix_entrada.status_pagamento = 'pago'
-            pix_entrada.data_pagamento = timezone.now()
-            pix_entrada.save(update_fields=['status_pagamento', 'data_pagamento'])
-            
-            logger.info(f"[webhook] PIX Entrada pago: {payment_id} - Venda {pix_entrada.venda.id}")
-            
-            # ✅ Atualizar status da venda para CONTRATO_ASSINADO E marcar entrada como PAGA
-            venda = pix_entrada.venda
-            venda.status = 'CONTRATO_ASSINADO'  # Muda para indicar que entrada foi paga
-            venda.status_pagamento_entrada = 'PAGO'  # ✅ MARCA ENTRADA COMO PAGA
-            venda.save(update_fields=['status', 'status_pagamento_entrada'])
-            
-            LogService.registrar(
-                nivel='INFO',
-                mensagem=f"PIX Entrada confirmado: Venda {venda.id} - R$ {value} - Status atualizado",
-                modulo='financeiro',
-                acao='pix_entrada_pago'
-            )
-            
-            # GERAR CONTRATO AUTOMATICAMENTE
-            try:
-                from juridico.models import Contrato
-                
-                # Criar ou buscar contrato
-                contrato, contrato_created = Contrato.objects.get_or_create(
-                    venda=venda,
-                    cliente=venda.cliente,
-                    defaults={'status': 'AGUARDANDO_GERACAO'}
-                )
-                
-                if contrato_created or contrato.status == 'AGUARDANDO_GERACAO':
-                    # Gerar número do contrato
-                    if not contrato.numero_contrato:
-                        contrato.gerar_numero_contrato()
-                    
-                    # Mudar status para GERADO (pronto para ser baixado e enviado)
-                    contrato.mudar_status('GERADO', None, 'Contrato gerado automaticamente após pagamento da entrada')
-                    
-                    logger.info(f"[webhook] Contrato gerado automaticamente: {contrato.numero_contrato}")
-                    
-                    LogService.registrar(
-                        nivel='INFO',
-                        mensagem=f"Contrato {contrato.numero_contrato} gerado automaticamente para Venda {venda.id}",
-                        modulo='juridico',
-                        acao='contrato_gerado_auto'
-                    )
-                
-            except Exception as e_contrato:
-                logger.error(f"[webhook] Erro ao gerar contrato: {str(e_contrato)}")
-                LogService.registrar(
-                    nivel='ERROR',
-                    mensagem=f"Erro ao gerar contrato automaticamente: {str(e_contrato)}",
-                    modulo='juridico',
-                    acao='erro_gerar_contrato_auto'
-                )
-            
-            # ✅ ATUALIZAR STATUS DAS COMISSÕES DA ENTRADA (já foram criadas no cadastro)
-            try:
-                from financeiro.models import Comissao
-                
-                # Buscar comissões da entrada (captador + consultor)
-                comissoes_entrada = Comissao.objects.filter(
-                    venda=venda,
-                    parcela__isnull=True,  # Comissões da entrada não têm parcela vinculada
-                    tipo_comissao__in=['CAPTADOR_ENTRADA', 'CONSULTOR_ENTRADA'],
-                    status='pendente'
-                )
-                
-                quantidade_atualizada = 0
-                for comissao in comissoes_entrada:
-                    comissao.status = 'paga'
-                    comissao.data_pagamento = timezone.now().date()
-                    comissao.save(update_fields=['status', 'data_pagamento'])
-                    quantidade_atualizada += 1
-                    
-                    logger.info(
-                        f"[webhook] Comissão {comissao.tipo_comissao} ATUALIZADA para paga: "
-                        f"{comissao.usuario.email} - R$ {comissao.valor_comissao:.2f}"
-                    )
-                
-                if quantidade_atualizada > 0:
-                    LogService.registrar(
-                        nivel='INFO',
-                        mensagem=f"Comissões da entrada ATUALIZADAS para paga: {quantidade_atualizada} comissões - Venda {venda.id}",
-                        modulo='comissoes',
-                        acao='comissoes_entrada_atualizadas'
-                    )
-                else:
-                    logger.warning(f"[webhook] Nenhuma comissão de entrada encontrada para atualizar - Venda {venda.id}")
-                    
-            except Exception as e_comissao:
-                logger.error(f"[webhook] Erro ao atualizar comissões da entrada: {str(e_comissao)}")
-                LogService.registrar(
-                    nivel='ERROR',
-                    mensagem=f"Erro ao atualizar comissões da entrada: {str(e_comissao)}",
-                    modulo='comissoes',
-                    acao='erro_atualizar_comissoes_entrada'
-                )
-            
-            # ✅ CRIAR NOTA FISCAL SE CLIENTE SOLICITOU
-            try:
-                if venda.cliente_quer_nf:
-                    from notas_fiscais.models import NotaFiscal
-                    from decimal import Decimal
-                    
-                    # Criar nota fiscal da entrada
-                    nota_entrada, nota_created = NotaFiscal.objects.get_or_create(
-                        venda=venda,
-                        tipo='ENTRADA',
-                        defaults={
-                            'valor_servico': venda.valor_entrada,
-                            'aliquota_iss': Decimal('2.00'),
-                            'valor_iss': venda.valor_entrada * Decimal('0.02'),
-                            'status': 'PENDENTE',
-                            'descricao_servico': 'Consultoria Financeira - Entrada',
-                            'email_destinatario': venda.nf_email or venda.cliente.email,
-                        }
-                    )
-                    
-                    if nota_created:
-                        logger.info(f"[webhook] Nota Fiscal ENTRADA criada: NF #{nota_entrada.id} - Venda {venda.id}")
-                        
-                        LogService.registrar(
-                            nivel='INFO',
-                            mensagem=f"Nota Fiscal ENTRADA criada automaticamente: NF #{nota_entrada.id} - Venda {venda.id} - R$ {venda.valor_entrada}",
-                            modulo='notas_fiscais',
-                            acao='nota_fiscal_entrada_criada'
-                        )
-                    else:
-                        logger.info(f"[webhook] Nota Fiscal ENTRADA já existe: NF #{nota_entrada.id} - Venda {venda.id}")
-                else:
-                    logger.info(f"[webhook] Cliente não solicitou NF - Venda {venda.id}")
-                    
-            except Exception as e_nf:
-                logger.error(f"[webhook] Erro ao criar nota fiscal da entrada: {str(e_nf)}")
-                LogService.registrar(
-                    nivel='ERROR',
-                    mensagem=f"Erro ao criar nota fiscal da entrada: {str(e_nf)}",
-                    modulo='notas_fiscais',
-                    acao='erro_criar_nota_fiscal_entrada'
-                )
-            
-            return True
-            
-        except PixEntrada.DoesNotExist:
-            logger.debug(f"[webhook] Não é PIX Entrada: {payment_id}")
-        
-        # 3. Tentar atualizar Parcela de Venda
-        try:
-            parcela = Parcela.objects.get(id_asaas=payment_id)
-            parcela.status = 'paga'
-            parcela.data_pagamento = timezone.now().date()
-            parcela.save(update_fields=['status', 'data_pagamento'])
-            
-            logger.info(f"[webhook] Parcela paga: {payment_id} - Venda {parcela.venda.id}")
-            
-            # ✅ SE FOR ENTRADA (numero_parcela = 0), MARCAR STATUS_PAGAMENTO_ENTRADA
-            if parcela.numero_parcela == 0:
-                venda = parcela.venda
-                venda.status_pagamento_entrada = 'PAGO'
-                venda.save(update_fields=['status_pagamento_entrada'])
-                
-                logger.info(f"[webhook] Entrada via BOLETO paga - Venda {venda.id} atualizada")
-                
-                LogService.registrar(
-                    nivel='INFO',
-                    mensagem=f"Entrada BOLETO confirmada: Venda {venda.id} - R$ {value}",
-                    modulo='financeiro',
-                    acao='entrada_boleto_paga'
-                )
-            
-            LogService.registrar(
-                nivel='INFO',
-                mensagem=f"Parcela confirmada: Venda {parcela.venda.id} - Parcela {parcela.numero_parcela} - R$ {value}",
-                modulo='financeiro',
-                acao='parcela_paga'
-            )
-
-            # ✅ ATUALIZAR STATUS DAS COMISSÕES DA PARCELA (já foram criadas no cadastro)
-            try:
-                from financeiro.models import Comissao
-                
-                # Buscar comissões vinculadas a esta parcela específica
-                comissoes_parcela = Comissao.objects.filter(
-                    venda=parcela.venda,
-                    parcela=parcela,  # Vinculadas a esta parcela específica
-                    tipo_comissao__in=['CAPTADOR_PARCELA', 'CONSULTOR_PARCELA'],
-                    status='pendente'
-                )
-                
-                quantidade_atualizada = 0
-                for comissao in comissoes_parcela:
-                    comissao.status = 'paga'
-                    comissao.data_pagamento = timezone.now().date()
-                    comissao.observacoes = f"Parcela {parcela.numero_parcela} paga em {timezone.now().date().strftime('%d/%m/%Y')}"
-                    comissao.save(update_fields=['status', 'data_pagamento', 'observacoes'])
-                    quantidade_atualizada += 1
-                    
-                    logger.info(
-                        f"[webhook] Comissão {comissao.tipo_comissao} ATUALIZADA para paga: "
-                        f"{comissao.usuario.email} - Parcela {parcela.numero_parcela} - R$ {comissao.valor_comissao:.2f}"
-                    )
-                
-                if quantidade_atualizada > 0:
-                    LogService.registrar(
-                        nivel='INFO',
-                        mensagem=f"Comissões da parcela {parcela.numero_parcela} ATUALIZADAS para paga: {quantidade_atualizada} comissões - Venda {parcela.venda.id}",
-                        modulo='comissoes',
-                        acao='comissoes_parcela_atualizadas'
-                    )
-                else:
-                    logger.warning(f"[webhook] Nenhuma comissão encontrada para parcela {parcela.numero_parcela} - Venda {parcela.venda.id}")
-                    
-            except Exception as e_comissao:
-                logger.error(f"[webhook] Erro ao atualizar comissões da parcela: {str(e_comissao)}")
-                LogService.registrar(
-                    nivel='ERROR',
-                    mensagem=f"Erro ao atualizar comissões da parcela: {str(e_comissao)}",
-                    modulo='comissoes',
-                    acao='erro_atualizar_comissoes_parcela'
-                )
-            
-            # ✅ CRIAR NOTA FISCAL SE CLIENTE SOLICITOU
-            try:
-                venda = parcela.venda
-                if venda.cliente_quer_nf and parcela.numero_parcela > 0:  # Só parcelas, não entrada
-                    from notas_fiscais.models import NotaFiscal
-                    from decimal import Decimal
-                    
-                    # Criar nota fiscal da parcela
-                    nota_parcela, nota_created = NotaFiscal.objects.get_or_create(
-                        venda=venda,
-                        parcela=parcela,
-                        tipo='PARCELA',
-                        defaults={
-                            'valor_servico': parcela.valor,
-                            'aliquota_iss': Decimal('2.00'),
-                            'valor_iss': parcela.valor * Decimal('0.02'),
-                            'status': 'PENDENTE',
-                            'descricao_servico': f'Consultoria Financeira - Parcela {parcela.numero_parcela}/{parcela.venda.quantidade_parcelas}',
-                            'email_destinatario': venda.nf_email or venda.cliente.email,
-                        }
-                    )
-                    
-                    if nota_created:
-                        logger.info(f"[webhook] Nota Fiscal PARCELA criada: NF #{nota_parcela.id} - Venda {venda.id} - Parcela {parcela.numero_parcela}")
-                        
-                        LogService.registrar(
-                            nivel='INFO',
-                            mensagem=f"Nota Fiscal PARCELA {parcela.numero_parcela} criada automaticamente: NF #{nota_parcela.id} - Venda {venda.id} - R$ {parcela.valor}",
-                            modulo='notas_fiscais',
-                            acao='nota_fiscal_parcela_criada'
-                        )
-                    else:
-                        logger.info(f"[webhook] Nota Fiscal PARCELA já existe: NF #{nota_parcela.id} - Venda {venda.id} - Parcela {parcela.numero_parcela}")
-                        
-            except Exception as e_nf:
-                logger.error(f"[webhook] Erro ao criar nota fiscal da parcela: {str(e_nf)}")
-                LogService.registrar(
-                    nivel='ERROR',
-                    mensagem=f"Erro ao criar nota fiscal da parcela: {str(e_nf)}",
-                    modulo='notas_fiscais',
-                    acao='erro_criar_nota_fiscal_parcela'
-                )
-            
-            # Verificar se todas as parcelas foram pagas
-            _verificar_venda_quitada(parcela.venda)
-            
-            return True
-            
-        except Parcela.DoesNotExist:
-            logger.warning(f"[webhook] Payment ID {payment_id} não encontrado em PIX Levantamento, PIX Entrada nem Parcela")
-            LogService.registrar(
-                nivel='WARNING',
-                mensagem=f"Payment ID {payment_id} não encontrado no sistema",
-                modulo='financeiro',
-                acao='payment_nao_encontrado'
-            )
-            return True  # Retorna sucesso para não reenviar
-        
-    except Exception as e:
-        logger.error(f"[webhook] Erro ao processar pagamento confirmado: {str(e)}", exc_info=True)
-        return False
-
-
-def _processar_pagamento_vencido(payment_data):
-    """Processa pagamento vencido"""
-    payment_id = payment_data.get('id')
-    
-    logger.info(f"[webhook] Processando pagamento vencido: {payment_id}")
-    
-    try:
-        from financeiro.models import PixLevantamento, Parcela
-        
-        # Tentar PIX Levantamento
-        try:
-            pix_levantamento = PixLevantamento.objects.get(asaas_payment_id=payment_id)
-            pix_levantamento.status_pagamento = 'vencido'
-            pix_levantamento.save(update_fields=['status_pagamento'])
-            
-            if pix_levantamento.lead:
-                pix_levantamento.lead.status = 'PERDIDO'
-                pix_levantamento.lead.save(update_fields=['status'])
-            
-            logger.info(f"[webhook] PIX Levantamento vencido: {payment_id}")
-            return True
-            
-        except PixLevantamento.DoesNotExist:
-            pass
-        
-        # Tentar Parcela
-        try:
-            parcela = Parcela.objects.get(id_asaas=payment_id)
-            parcela.status = 'vencida'
-            parcela.save(update_fields=['status'])
-            
-            logger.info(f"[webhook] Parcela vencida: {payment_id}")
-            return True
-            
-        except Parcela.DoesNotExist:
-            logger.warning(f"[webhook] Payment vencido não encontrado: {payment_id}")
-            return True
-        
-    except Exception as e:
-        logger.error(f"[webhook] Erro ao processar vencido: {str(e)}", exc_info=True)
-        return False
-
-
-def _processar_pagamento_deletado(payment_data):
-    """Processa cobrança deletada"""
-    payment_id = payment_data.get('id')
-    
-    logger.info(f"[webhook] Cobrança deletada: {payment_id}")
-    
-    LogService.registrar(
-        nivel='INFO',
-        mensagem=f"Cobrança deletada no ASAAS: {payment_id}",
-        modulo='financeiro',
-        acao='cobranca_deletada'
-    )
-    
-    return True
-
-
-def _processar_pagamento_estornado(payment_data):
-    """Processa pagamento estornado"""
-    payment_id = payment_data.get('id')
-    value = payment_data.get('value')
-    
-    logger.info(f"[webhook] Pagamento estornado: {payment_id} - R$ {value}")
-    
-    try:
-        from financeiro.models import Parcela
-        
-        try:
-            parcela = Parcela.objects.get(id_asaas=payment_id)
-            parcela.status = 'cancelada'
-            parcela.data_pagamento = None
-            parcela.save(update_fields=['status', 'data_pagamento'])
-            
-            LogService.registrar(
-                nivel='WARNING',
-                mensagem=f"Pagamento estornado: Venda {parcela.venda.id} - Parcela {parcela.numero_parcela} - R$ {value}",
-                modulo='financeiro',
-                acao='pagamento_estornado'
-            )
-            
-            return True
-            
-        except Parcela.DoesNotExist:
-            logger.warning(f"[webhook] Parcela para estorno não encontrada: {payment_id}")
-            return True
-        
-    except Exception as e:
-        logger.error(f"[webhook] Erro ao processar estorno: {str(e)}", exc_info=True)
-        return False
-
-
-def _verificar_venda_quitada(venda):
-    """Verifica se todas as parcelas foram pagas e atualiza status da venda"""
-    from financeiro.models import Parcela
-    
-    total_parcelas = Parcela.objects.filter(venda=venda).count()
-    parcelas_pagas = Parcela.objects.filter(venda=venda, status='paga').count()
-    
-    if total_parcelas == parcelas_pagas and total_parcelas > 0:
-        logger.info(f"[webhook] Venda {venda.id} quitada - {parcelas_pagas}/{total_parcelas} parcelas pagas")
-        
-        LogService.registrar(
-            nivel='INFO',
-            mensagem=f"Venda {venda.id} totalmente quitada",
-            modulo='financeiro',
-            acao='venda_quitada'
-        )
-
-
 # ==================== VISUALIZAÇÃO DE LOGS DE WEBHOOK ====================
 
 @login_required
@@ -1273,12 +755,15 @@ def webhook_logs(request):
     page = request.GET.get('page', 1)
     logs_page = paginator.get_page(page)
     
-    # Estatísticas
+    # Estatísticas (rollup horário, sem varrer os logs)
+    from .webhook_estatisticas import resumo
+    totais = resumo()
     stats = {
-        'total': WebhookLog.objects.count(),
-        'success': WebhookLog.objects.filter(status_processamento='SUCCESS').count(),
-        'error': WebhookLog.objects.filter(status_processamento='ERROR').count(),
-        'ignored': WebhookLog.objects.filter(status_processamento='IGNORED').count(),
+        'total': totais['total'],
+        'success': totais['sucesso'],
+        'error': totais['erro'],
+        'ignored': totais['ignorado'],
+        'pending': totais['pendente'],
     }
     
     # Montar dict customer_id -> nome_completo e adicionar ao objeto log
@@ -1322,9 +807,13 @@ def webhook_log_detalhe(request, log_id):
         except ClienteAsaas.DoesNotExist:
             nome_cliente = None
     
+    # Logs antigos têm o payload no arquivo morto (core.webhook_arquivo)
+    payload, headers = log.obter_conteudo()
+    
     context = {
         'log': log,
-        'payload_formatado': json.dumps(log.payload, indent=2, ensure_ascii=False),
+        'payload_formatado': json.dumps(payload, indent=2, ensure_ascii=False),
+        'headers': headers,
         'nome_cliente': nome_cliente,
     }
     
@@ -1395,6 +884,61 @@ def resend_pending_webhooks(request):
     return redirect('core:painel_configuracoes')
 
 
+@login_required
+@permission_required('core.change_configuracaosistema')
+@require_POST
+def reprocessar_webhooks(request):
+    """
+    Reprocessa localmente webhooks já gravados (sem chamar o Asaas)
+    
+    POST: status (lista, padrão ERROR), desde/ate (YYYY-MM-DD), evento (lista),
+    limite (padrão 500 webhooks mais antigos da seleção)
+    """
+    from .webhook_replay import selecionar_logs, reprocessar_webhooks as executar_replay
+    import datetime
+    
+    try:
+        def _data(valor):
+            return datetime.datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+        
+        logs = selecionar_logs(
+            status=request.POST.getlist('status') or ['ERROR'],
+            desde=_data(request.POST.get('desde')),
+            ate=_data(request.POST.get('ate')),
+            eventos=request.POST.getlist('evento') or None,
+        )
+        limite = int(request.POST.get('limite', 500))
+        ids = list(logs.order_by('data_recebimento', 'id').values_list('id', flat=True)[:limite])
+        
+        stats = executar_replay(logs.filter(id__in=ids))
+        
+        LogService.registrar(
+            usuario=request.user,
+            nivel='INFO',
+            mensagem=f"Replay de webhooks: {stats['aplicados']} reaplicados ({stats['sucesso']} ok, {stats['erros']} erros) em {stats['duracao']}s",
+            modulo='core',
+            acao='webhook_replay'
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'stats': stats,
+            'message': f"{stats['aplicados']} webhooks reaplicados em {stats['duracao']}s ({stats['por_segundo']}/s)"
+        })
+    
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Parâmetro inválido: {str(e)}'
+        }, status=400)
+    except Exception as e:
+        logger.error(f"[webhook_replay] Erro: {str(e)}", exc_info=True)
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
 @login_required
 @permission_required('core.change_configuracaosistema')
 def webhook_statistics(request):
@@ -1402,7 +946,7 @@ def webhook_statistics(request):
     Retorna estatísticas dos webhooks recebidos e processados
     """
     from .models import WebhookLog
-    from django.db.models import Count, Q, Sum
+    from .webhook_estatisticas import resumo, eventos_comuns
     import datetime
     
     try:
@@ -1413,31 +957,11 @@ def webhook_statistics(request):
         # Último mês
         data_30d = timezone.now() - datetime.timedelta(days=30)
         
-        # Estatísticas gerais
-        stats_24h = WebhookLog.objects.filter(data_recebimento__gte=data_24h).aggregate(
-            total=Count('id'),
-            sucesso=Count('id', filter=Q(status_processamento='SUCCESS')),
-            erro=Count('id', filter=Q(status_processamento='ERROR')),
-            ignorado=Count('id', filter=Q(status_processamento='IGNORED'))
-        )
-        
-        stats_7d = WebhookLog.objects.filter(data_recebimento__gte=data_7d).aggregate(
-            total=Count('id'),
-            sucesso=Count('id', filter=Q(status_processamento='SUCCESS')),
-            erro=Count('id', filter=Q(status_processamento='ERROR'))
-        )
-        
-        stats_30d = WebhookLog.objects.filter(data_recebimento__gte=data_30d).aggregate(
-            total=Count('id'),
-            sucesso=Count('id', filter=Q(status_processamento='SUCCESS'))
-        )
-        
-        # Eventos mais comuns
-        eventos_comuns = list(WebhookLog.objects.filter(
-            data_recebimento__gte=data_7d
-        ).values('evento').annotate(
-            count=Count('id')
-        ).order_by('-count')[:5])
+        # Estatísticas gerais (rollup horário: O(buckets), sem varrer WebhookLog)
+        stats_24h = resumo(data_24h)
+        stats_7d = resumo(data_7d)
+        stats_30d = resumo(data_30d)
+        historico = resumo()
         
         # Últimos erros
         ultimos_erros = WebhookLog.objects.filter(
@@ -1450,9 +974,9 @@ def webhook_statistics(request):
             'periodo_24h': stats_24h,
             'periodo_7d': stats_7d,
             'periodo_30d': stats_30d,
-            'eventos_comuns': eventos_comuns,
+            'eventos_comuns': eventos_comuns(data_7d),
             'ultimos_erros': list(ultimos_erros),
-            'total_historico': WebhookLog.objects.count(),
+            'total_historico': historico['total'],
             'nota': 'Estatísticas baseadas nos webhooks recebidos e processados pelo sistema'
         })
     
@@ -1471,22 +995,15 @@ def list_pending_webhooks(request):
     Usa SEMPRE o ambiente de PRODUÇÃO do Asaas.
     """
     from .models import WebhookLog
-    from django.db.models import Count, Q
+    from .webhook_estatisticas import resumo
     import datetime
     
     try:
         # Últimas 24 horas
         data_limite = timezone.now() - datetime.timedelta(hours=24)
         
-        # Estatísticas dos webhooks recebidos
-        stats = WebhookLog.objects.filter(
-            data_recebimento__gte=data_limite
-        ).aggregate(
-            total=Count('id'),
-            sucesso=Count('id', filter=Q(status_processamento='SUCCESS')),
-            erro=Count('id', filter=Q(status_processamento='ERROR')),
-            ignorado=Count('id', filter=Q(status_processamento='IGNORED'))
-        )
+        # Estatísticas dos webhooks recebidos (rollup horário)
+        stats = resumo(data_limite)
         
         # Últimos webhooks recebidos
         limit = int(request.GET.get('limit', 20))
@@ -1506,7 +1023,7 @@ def list_pending_webhooks(request):
             'success': True,
             'stats': stats,
             'data': webhooks_data,
-            'totalCount': WebhookLog.objects.count(),
+            'totalCount': resumo()['total'],
             'periodo': '24h',
             'nota': 'Mostrando webhooks recebidos pelo sistema (últimas 24h)'
         })
@@ -0,0 +1,229 @@
+"""
+Retenção e arquivo morto dos WebhookLog
+Depois de WEBHOOK_RETENCAO_DIAS, o payload e os headers dos webhooks já
+concluídos (SUCCESS/IGNORED) saem do banco e vão para um arquivo mensal
+NDJSON comprimido (um registro {"id", "payload", "headers"} por linha):
+
+    WEBHOOK_ARQUIVO_DIR/webhooks-2026-07.ndjson.zst   (zstandard instalado)
+    WEBHOOK_ARQUIVO_DIR/webhooks-2026-07.ndjson.gz    (fallback gzip)
+
+Cada execução acrescenta um novo frame zstd / membro gzip ao arquivo do mês
+(os dois formatos leem frames concatenados como um único fluxo). A linha do
+banco fica como índice enxuto: campos extraídos (evento, payment_id, status,
+valor, datas), payload vazio, `arquivo_payload` com o nome do arquivo e
+`arquivo_posicao` com o byte onde começa o frame/membro do registro: a leitura
+descomprime só esse frame (no máximo um lote), não o mês inteiro.
+
+WebhookLog.obter_conteudo() lê o arquivo quando o log foi arquivado, então
+webhook_log_detalhe, o admin e o replay continuam funcionando.
+
+Usado pelo comando `arquivar_webhooks`.
+"""
+import io
+import os
+import gzip
+import json
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.utils import timezone
+from .models import WebhookLog
+
+try:
+    import zstandard
+except ImportError:  # Dependência opcional
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+STATUS_ARQUIVAVEIS = ('SUCCESS', 'IGNORED')
+
+
+def diretorio_arquivo():
+    padrao = Path(getattr(settings, 'BASE_DIR', '.')) / 'arquivo_webhooks'
+    return Path(getattr(settings, 'WEBHOOK_ARQUIVO_DIR', padrao))
+
+
+def _extensao():
+    return '.ndjson.zst' if zstandard is not None else '.ndjson.gz'
+
+
+def _comprimir(conteudo, nome):
+    if nome.endswith('.zst'):
+        return zstandard.ZstdCompressor(level=10).compress(conteudo)
+    return gzip.compress(conteudo, compresslevel=6)
+
+
+def _abrir_leitura(caminho):
+    """Fluxo de texto (todas as linhas de todos os frames/membros)"""
+    if caminho.suffix == '.zst':
+        if zstandard is None:
+            raise RuntimeError(f'Arquivo {caminho.name} exige o pacote zstandard')
+        leitor = zstandard.ZstdDecompressor().stream_reader(open(caminho, 'rb'), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(leitor, encoding='utf-8')
+    return gzip.open(caminho, 'rt', encoding='utf-8')
+
+
+def _ler_frame(caminho, posicao):
+    """Linhas de um único frame zstd / membro gzip que começa no byte `posicao`"""
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(posicao)
+        if caminho.suffix == '.zst':
+            if zstandard is None:
+                raise RuntimeError(f'Arquivo {caminho.name} exige o pacote zstandard')
+            with zstandard.ZstdDecompressor().stream_reader(arquivo, read_across_frames=False, closefd=False) as leitor:
+                conteudo = leitor.read()
+        else:
+            descompressor = zlib.decompressobj(wbits=31)  # Um membro gzip
+            partes = []
+            while not descompressor.eof:
+                bloco = arquivo.read(64 * 1024)
+                if not bloco:
+                    break
+                partes.append(descompressor.decompress(bloco))
+            conteudo = b''.join(partes)
+    return conteudo.decode('utf-8').splitlines()
+
+
+def nome_arquivo_mes(data):
+    """Arquivo do mês de `data`; mantém a extensão de um arquivo já existente do mês"""
+    base = f"webhooks-{data:%Y-%m}"
+    for extensao in ('.ndjson.zst', '.ndjson.gz'):
+        if (diretorio_arquivo() / f"{base}{extensao}").exists():
+            return f"{base}{extensao}"
+    return f"{base}{_extensao()}"
+
+
+def _acrescentar(nome, registros):
+    """
+    Acrescenta um frame com os registros ao arquivo do mês (gravado em disco antes do UPDATE).
+    Returns: byte onde o frame começa
+    """
+    linhas = ''.join(
+        json.dumps(registro, ensure_ascii=False, default=str, separators=(',', ':')) + '\n'
+        for registro in registros
+    )
+    caminho = diretorio_arquivo() / nome
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, 'ab') as arquivo:
+        arquivo.seek(0, os.SEEK_END)
+        posicao = arquivo.tell()
+        arquivo.write(_comprimir(linhas.encode('utf-8'), nome))
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    return posicao
+
+
+def arquivar_webhooks(dias=None, lote=1000, simular=False):
+    """
+    Move para o arquivo morto os payloads dos webhooks concluídos há mais de `dias`.
+
+    Returns:
+        dict com arquivados, arquivos (nome -> quantidade) e limite
+    """
+    dias = int(dias if dias is not None else getattr(settings, 'WEBHOOK_RETENCAO_DIAS', 90))
+    limite = timezone.now() - timedelta(days=dias)
+    candidatos = (
+        WebhookLog.objects
+        .filter(data_recebimento__lt=limite, status_processamento__in=STATUS_ARQUIVAVEIS, arquivo_payload='')
+        .order_by('data_recebimento', 'id')
+    )
+    stats = {'arquivados': 0, 'arquivos': {}, 'limite': limite}
+
+    if simular:
+        stats['arquivados'] = candidatos.count()
+        return stats
+
+    while True:
+        logs = list(candidatos.values('id', 'payload', 'headers', 'data_recebimento')[:lote])
+        if not logs:
+            break
+
+        por_mes = OrderedDict()
+        for log in logs:
+            nome = nome_arquivo_mes(timezone.localtime(log['data_recebimento']))
+            por_mes.setdefault(nome, []).append(log)
+
+        agora = timezone.now()
+        for nome, registros in por_mes.items():
+            posicao = _acrescentar(nome, [
+                {'id': log['id'], 'payload': log['payload'], 'headers': log['headers']}
+                for log in registros
+            ])
+            # Se o processo morrer entre a gravação e o UPDATE, a próxima execução
+            # grava o registro de novo; a leitura usa a primeira ocorrência (idêntica)
+            WebhookLog.objects.filter(pk__in=[log['id'] for log in registros]).update(
+                payload={}, headers=None, arquivo_payload=nome, arquivo_posicao=posicao, arquivado_em=agora
+            )
+            stats['arquivos'][nome] = stats['arquivos'].get(nome, 0) + len(registros)
+            stats['arquivados'] += len(registros)
+
+    if stats['arquivados']:
+        logger.info(f"🗄️  {stats['arquivados']} webhooks arquivados em {len(stats['arquivos'])} arquivo(s)")
+    return stats
+
+
+class CacheRegistros:
+    """Últimos registros lidos do arquivo morto (a tela de detalhe costuma ser reaberta)"""
+
+    def __init__(self, tamanho=256):
+        self._lock = threading.Lock()
+        self._itens = OrderedDict()
+        self._tamanho = tamanho
+
+    def obter(self, chave):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave]
+        return None
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self._tamanho:
+                self._itens.popitem(last=False)
+
+
+registros_lidos = CacheRegistros()
+
+
+def ler_registro(nome, log_id, posicao=None):
+    """
+    Registro {"id", "payload", "headers"} de um webhook arquivado.
+    Com `posicao` lê só o frame do registro; sem ela (logs arquivados antes da
+    posição existir) percorre o arquivo do mês.
+    Retorna None se o arquivo ou o registro não existirem.
+    """
+    chave = (nome, log_id)
+    registro = registros_lidos.obter(chave)
+    if registro is not None:
+        return registro
+
+    caminho = diretorio_arquivo() / nome
+    if not caminho.exists():
+        logger.error(f"Arquivo morto de webhooks não encontrado: {caminho}")
+        return None
+
+    prefixo = f'{{"id":{log_id},'
+    if posicao is not None:
+        for linha in _ler_frame(caminho, posicao):
+            if linha.startswith(prefixo):
+                registro = json.loads(linha)
+                registros_lidos.guardar(chave, registro)
+                return registro
+        logger.warning(f"Webhook #{log_id} fora do frame {posicao} de {nome}: procurando no arquivo inteiro")
+
+    with _abrir_leitura(caminho) as linhas:
+        for linha in linhas:
+            if linha.startswith(prefixo):
+                registro = json.loads(linha)
+                registros_lidos.guardar(chave, registro)
+                return registro
+    return None
@@ -0,0 +1,104 @@
+"""
+Deduplicação (idempotência) dos webhooks do Asaas
+O Asaas reenvia webhooks (timeout, reenvio manual, fila de pendentes). Cada entrega
+recebe uma chave de idempotência:
+- 'evt:<id>' quando o payload traz o id do evento do Asaas
+- '<evento>:<payment_id>:<hash do payment>' como fallback (reentrega = payload idêntico)
+
+A chave é única em WebhookLog.chave_idempotencia (garantia definitiva) e fica num
+cache de chaves recentes (memória do processo + cache do Django), para que a
+reentrega seja descartada antes de qualquer consulta ao banco.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+
+CACHE_PREFIXO = 'core:webhook:chave:'
+
+
+def gerar_chave_idempotencia(dados_webhook, origem=''):
+    """
+    Chave de idempotência de uma entrega.
+
+    Args:
+        dados_webhook: payload recebido do Asaas
+        origem: prefixo do endpoint que processa a entrega (endpoints diferentes
+            aplicam efeitos diferentes e não se deduplicam entre si)
+    """
+    prefixo = f'{origem}:' if origem else ''
+    evento_id = dados_webhook.get('id')
+    if evento_id:
+        return f'{prefixo}evt:{evento_id}'
+
+    payment = dados_webhook.get('payment') or {}
+    conteudo = json.dumps(payment, sort_keys=True, default=str, ensure_ascii=False)
+    resumo = hashlib.sha1(conteudo.encode('utf-8')).hexdigest()[:20]
+    return f"{prefixo}{dados_webhook.get('event') or 'DESCONHECIDO'}:{payment.get('id') or ''}:{resumo}"[:150]
+
+
+class ChavesRecentes:
+    """
+    Conjunto das chaves vistas recentemente.
+    O dict local (LRU limitado) evita ida ao cache no mesmo worker; o cache do
+    Django compartilha as chaves entre os workers do gunicorn.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locais = OrderedDict()
+
+    @property
+    def ttl(self):
+        return int(getattr(settings, 'WEBHOOK_DEDUP_TTL', 3600))
+
+    @property
+    def tamanho_maximo(self):
+        return int(getattr(settings, 'WEBHOOK_DEDUP_MEMORIA', 5000))
+
+    def contem(self, chave):
+        with self._lock:
+            if chave in self._locais:
+                self._locais.move_to_end(chave)
+                return True
+        try:
+            return cache.get(CACHE_PREFIXO + chave) is not None
+        except Exception:
+            return False
+
+    def adicionar(self, chave):
+        with self._lock:
+            self._locais[chave] = True
+            self._locais.move_to_end(chave)
+            while len(self._locais) > self.tamanho_maximo:
+                self._locais.popitem(last=False)
+        try:
+            cache.set(CACHE_PREFIXO + chave, 1, self.ttl)
+        except Exception:
+            pass  # Sem cache compartilhado a constraint do banco continua garantindo
+
+    def remover(self, chave):
+        """Libera a chave (entrega que falhou deve poder ser reprocessada)"""
+        with self._lock:
+            self._locais.pop(chave, None)
+        try:
+            cache.delete(CACHE_PREFIXO + chave)
+        except Exception:
+            pass
+
+
+chaves_recentes = ChavesRecentes()
+
+
+def chaves_ja_registradas(chaves):
+    """Subconjunto de `chaves` que já tem WebhookLog (uma consulta)"""
+    from .models import WebhookLog
+
+    chaves = [chave for chave in chaves if chave]
+    if not chaves:
+        return set()
+    return set(
+        WebhookLog.objects.filter(chave_idempotencia__in=chaves).values_list('chave_idempotencia', flat=True)
+    )
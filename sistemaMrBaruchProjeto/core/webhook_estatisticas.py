@@ -0,0 +1,168 @@
+"""
+Estatísticas pré-agregadas dos webhooks (rollup horário)
+WebhookEstatisticaHora guarda, por hora de recebimento, tipo, evento e status,
+a quantidade de webhooks e a soma dos valores. O rollup é mantido:
+- no recebimento (registrar_recebido), dentro da transação que cria o WebhookLog
+- em cada mudança de status (atualizar_status), que substitui os
+  `.update(status_processamento=...)` da fila, do replay e do atendimento
+
+Transições PENDING <-> PROCESSING não mexem no rollup (as duas contam como
+PENDING). Se o rollup divergir (edição manual, corrida entre workers no SQLite),
+`python manage.py recalcular_estatisticas_webhooks` o reconstrói a partir dos logs.
+
+As consultas (resumo, eventos_comuns) leem O(buckets); as janelas são
+arredondadas para a hora cheia.
+"""
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncHour
+from .models import WebhookLog, WebhookEstatisticaHora
+
+
+def status_rollup(status):
+    return 'PENDING' if status == 'PROCESSING' else status
+
+
+def hora_bucket(data):
+    """Hora cheia (UTC) de um datetime"""
+    if getattr(settings, 'USE_TZ', False) and data.tzinfo is not None:
+        data = data.astimezone(dt_timezone.utc)
+    return data.replace(minute=0, second=0, microsecond=0)
+
+
+def _aplicar_deltas(deltas):
+    """Soma os deltas {(hora, tipo, evento, status): [quantidade, valor]} nos buckets"""
+    for (hora, tipo, evento, status), (quantidade, valor) in deltas.items():
+        if not quantidade and not valor:
+            continue
+        chave = {'hora': hora, 'tipo': tipo, 'evento': evento or '', 'status_processamento': status}
+        incremento = {'quantidade': F('quantidade') + quantidade, 'valor_total': F('valor_total') + valor}
+        if WebhookEstatisticaHora.objects.filter(**chave).update(**incremento):
+            continue
+        try:
+            with transaction.atomic():
+                WebhookEstatisticaHora.objects.create(**chave, quantidade=quantidade, valor_total=valor)
+        except IntegrityError:
+            # Outro processo criou o bucket entre o UPDATE e o INSERT
+            WebhookEstatisticaHora.objects.filter(**chave).update(**incremento)
+
+
+def registrar_recebido(webhook_log):
+    """Conta um WebhookLog recém-criado"""
+    chave = (hora_bucket(webhook_log.data_recebimento), webhook_log.tipo, webhook_log.evento,
+             status_rollup(webhook_log.status_processamento))
+    _aplicar_deltas({chave: [1, webhook_log.valor or Decimal('0')]})
+
+
+def atualizar_status(logs, novo_status, **campos):
+    """
+    UPDATE de status dos logs do queryset, com o ajuste correspondente no rollup.
+
+    Args:
+        logs: queryset de WebhookLog (filtros condicionais incluídos)
+        novo_status: status_processamento final
+        campos: demais campos do UPDATE (mensagem_erro, worker, ...)
+
+    Returns:
+        quantidade de logs atualizados
+    """
+    with transaction.atomic():
+        atuais = list(
+            logs.select_for_update().order_by()
+            .values_list('id', 'tipo', 'evento', 'status_processamento', 'data_recebimento', 'valor')
+        )
+        if not atuais:
+            return 0
+
+        WebhookLog.objects.filter(pk__in=[log[0] for log in atuais]).update(
+            status_processamento=novo_status, **campos
+        )
+
+        deltas = defaultdict(lambda: [0, Decimal('0')])
+        novo = status_rollup(novo_status)
+        for _, tipo, evento, status, recebido, valor in atuais:
+            antigo = status_rollup(status)
+            if antigo == novo:
+                continue
+            hora = hora_bucket(recebido)
+            valor = valor or Decimal('0')
+            deltas[(hora, tipo, evento, antigo)][0] -= 1
+            deltas[(hora, tipo, evento, antigo)][1] -= valor
+            deltas[(hora, tipo, evento, novo)][0] += 1
+            deltas[(hora, tipo, evento, novo)][1] += valor
+        _aplicar_deltas(deltas)
+    return len(atuais)
+
+
+def recalcular(desde=None):
+    """
+    Reconstrói o rollup a partir de WebhookLog (todas as horas ou a partir de `desde`).
+
+    Returns:
+        quantidade de buckets gravados
+    """
+    logs = WebhookLog.objects.order_by()
+    buckets = WebhookEstatisticaHora.objects.all()
+    if desde is not None:
+        desde = hora_bucket(desde)
+        logs = logs.filter(data_recebimento__gte=desde)
+        buckets = buckets.filter(hora__gte=desde)
+
+    truncar = TruncHour('data_recebimento', tzinfo=dt_timezone.utc) if getattr(settings, 'USE_TZ', False) \
+        else TruncHour('data_recebimento')
+    agregados = defaultdict(lambda: [0, Decimal('0')])
+    linhas = (
+        logs.annotate(hora=truncar)
+        .values('hora', 'tipo', 'evento', 'status_processamento')
+        .annotate(quantidade=Count('id'), valor_total=Sum('valor'))
+    )
+    for linha in linhas:
+        chave = (linha['hora'], linha['tipo'], linha['evento'] or '', status_rollup(linha['status_processamento']))
+        agregados[chave][0] += linha['quantidade']
+        agregados[chave][1] += linha['valor_total'] or Decimal('0')
+
+    with transaction.atomic():
+        buckets.delete()
+        WebhookEstatisticaHora.objects.bulk_create([
+            WebhookEstatisticaHora(
+                hora=hora, tipo=tipo, evento=evento, status_processamento=status,
+                quantidade=quantidade, valor_total=valor,
+            )
+            for (hora, tipo, evento, status), (quantidade, valor) in agregados.items()
+        ], batch_size=1000)
+    return len(agregados)
+
+
+def _buckets(desde=None):
+    buckets = WebhookEstatisticaHora.objects.order_by()
+    if desde is not None:
+        buckets = buckets.filter(hora__gte=hora_bucket(desde))
+    return buckets
+
+
+def resumo(desde=None):
+    """Totais por status desde `desde` (None = todo o histórico)"""
+    totais = _buckets(desde).aggregate(
+        total=Sum('quantidade'),
+        sucesso=Sum('quantidade', filter=Q(status_processamento='SUCCESS')),
+        erro=Sum('quantidade', filter=Q(status_processamento='ERROR')),
+        ignorado=Sum('quantidade', filter=Q(status_processamento='IGNORED')),
+        pendente=Sum('quantidade', filter=Q(status_processamento='PENDING')),
+        valor_total=Sum('valor_total'),
+    )
+    resultado = {chave: (valor or 0) for chave, valor in totais.items()}
+    resultado['valor_total'] = float(resultado['valor_total'])
+    return resultado
+
+
+def eventos_comuns(desde=None, limite=5):
+    """Eventos mais frequentes no período: [{'evento', 'count'}]"""
+    return list(
+        _buckets(desde).values('evento')
+        .annotate(count=Sum('quantidade'))
+        .order_by('-count')[:limite]
+    )
@@ -0,0 +1,207 @@
+"""
+Fila de processamento dos webhooks do Asaas
+O endpoint core.views.webhook_asaas apenas grava o WebhookLog como PENDING e
+responde 200; o comando `processar_webhooks_asaas` reivindica os pendentes em
+lotes e aplica cada evento pela máquina de estados (core.maquina_pagamentos).
+
+Garantias:
+- Pelo menos uma vez: um log só sai de PROCESSING quando o resultado é gravado;
+  logs de um worker que morreu voltam para PENDING após o timeout.
+- Ordem por pagamento: um log só é reivindicado se não houver log anterior do
+  mesmo payment_id ainda pendente/em processamento fora do lote; dentro do lote
+  os eventos de cada pagamento são aplicados na ordem de chegada.
+"""
+import os
+import socket
+import logging
+import traceback
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import WebhookLog
+from .services import LogService
+from .maquina_pagamentos import aplicar_webhook
+from .webhook_estatisticas import atualizar_status
+
+logger = logging.getLogger(__name__)
+
+
+STATUS_ABERTOS = ('PENDING', 'PROCESSING')
+
+
+def identificar_worker():
+    """Identificação do processo worker (host:pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _max_tentativas():
+    return int(getattr(settings, 'WEBHOOK_FILA_MAX_TENTATIVAS', 5))
+
+
+def reivindicar_lote(worker=None, tamanho=None):
+    """
+    Reivindica até `tamanho` webhooks pendentes, na ordem de chegada.
+
+    select_for_update(skip_locked=True) deixa cada worker pegar linhas diferentes;
+    o UPDATE condicional garante a exclusividade também no SQLite.
+
+    Returns:
+        lista de WebhookLog em PROCESSING, ordenada por data_recebimento
+    """
+    worker = worker or identificar_worker()
+    tamanho = int(tamanho or getattr(settings, 'WEBHOOK_FILA_LOTE', 100))
+
+    with transaction.atomic():
+        candidatos = list(
+            WebhookLog.objects.select_for_update(skip_locked=True)
+            .filter(tipo='ASAAS', status_processamento='PENDING')
+            .order_by('data_recebimento', 'id')
+            .values_list('id', 'payment_id', 'data_recebimento')[:tamanho]
+        )
+        if not candidatos:
+            return []
+
+        ids_candidatos = {log_id for log_id, _, _ in candidatos}
+        primeiro_por_pagamento = {}
+        for log_id, payment_id, recebido in candidatos:
+            if payment_id and payment_id not in primeiro_por_pagamento:
+                primeiro_por_pagamento[payment_id] = (recebido, log_id)
+
+        # Pagamentos com evento anterior ainda aberto fora deste lote (pego por
+        # outro worker ou devolvido à fila) esperam a vez: preserva a ordem
+        bloqueados = set()
+        if primeiro_por_pagamento:
+            anteriores = (
+                WebhookLog.objects
+                .filter(tipo='ASAAS', payment_id__in=primeiro_por_pagamento.keys(), status_processamento__in=STATUS_ABERTOS)
+                .exclude(id__in=ids_candidatos)
+                .values_list('payment_id', 'data_recebimento', 'id')
+            )
+            for payment_id, recebido, log_id in anteriores:
+                if (recebido, log_id) < primeiro_por_pagamento[payment_id]:
+                    bloqueados.add(payment_id)
+
+        ids = [log_id for log_id, payment_id, _ in candidatos if payment_id not in bloqueados]
+        if not ids:
+            return []
+
+        agora = timezone.now()
+        # PENDING -> PROCESSING não altera o rollup de estatísticas (core.webhook_estatisticas)
+        WebhookLog.objects.filter(id__in=ids, status_processamento='PENDING').update(
+            status_processamento='PROCESSING',
+            worker=worker,
+            reivindicado_em=agora,
+            tentativas=F('tentativas') + 1,
+        )
+
+    return list(
+        WebhookLog.objects.filter(
+            id__in=ids, status_processamento='PROCESSING', worker=worker
+        ).order_by('data_recebimento', 'id')
+    )
+
+
+def recuperar_webhooks_travados(timeout_segundos=None):
+    """
+    Devolve à fila os webhooks cujo worker morreu no meio do processamento.
+    Sem tentativas restantes, o webhook é marcado como erro.
+    """
+    timeout_segundos = int(timeout_segundos or getattr(settings, 'WEBHOOK_FILA_TIMEOUT_SEGUNDOS', 300))
+    limite = timezone.now() - timedelta(seconds=timeout_segundos)
+    travados = WebhookLog.objects.filter(tipo='ASAAS', status_processamento='PROCESSING', reivindicado_em__lt=limite)
+
+    devolvidos = travados.filter(tentativas__lt=_max_tentativas()).update(status_processamento='PENDING')
+    esgotados = atualizar_status(
+        travados, 'ERROR',
+        mensagem_erro=f'Tempo limite excedido ({timeout_segundos}s) sem conclusão do processamento',
+    )
+    if devolvidos or esgotados:
+        logger.warning(f"♻️  Webhooks travados: {devolvidos} devolvidos à fila, {esgotados} marcados como erro")
+    return devolvidos + esgotados
+
+
+def processar_webhook(webhook_log):
+    """
+    Aplica o evento de um webhook (core.maquina_pagamentos).
+
+    Returns:
+        (status, mensagem) com status SUCCESS ou IGNORED
+
+    Raises:
+        Exception quando a transição falha (a transação é desfeita)
+    """
+    LogService.registrar(
+        nivel='INFO',
+        mensagem=f"Webhook #{webhook_log.id} ASAAS recebido - Event: {webhook_log.evento} - Payment: {webhook_log.payment_id} - Status: {webhook_log.payment_status}",
+        modulo='core',
+        acao='webhook_asaas_recebido'
+    )
+    payload, _ = webhook_log.obter_conteudo()
+    return aplicar_webhook(payload or {})
+
+
+def finalizar_webhook(webhook_log, status, mensagem=''):
+    atualizar_status(
+        WebhookLog.objects.filter(pk=webhook_log.pk), status,
+        mensagem_erro=mensagem, processado_em=timezone.now(),
+    )
+    webhook_log.status_processamento = status
+    webhook_log.mensagem_erro = mensagem
+
+
+def processar_lote(logs):
+    """
+    Processa um lote já reivindicado, agrupado por pagamento.
+
+    Se um evento falha, os eventos seguintes do mesmo pagamento voltam para a
+    fila sem serem aplicados (a ordem é mantida na próxima tentativa).
+
+    Returns:
+        dict com sucesso, ignorados, erros e reenfileirados
+    """
+    stats = {'sucesso': 0, 'ignorados': 0, 'erros': 0, 'reenfileirados': 0}
+    max_tentativas = _max_tentativas()
+
+    por_pagamento = OrderedDict()
+    for webhook_log in logs:
+        chave = webhook_log.payment_id or f'#{webhook_log.id}'
+        por_pagamento.setdefault(chave, []).append(webhook_log)
+
+    for eventos in por_pagamento.values():
+        for posicao, webhook_log in enumerate(eventos):
+            try:
+                status, mensagem = processar_webhook(webhook_log)
+            except Exception as e:
+                logger.error(f"[webhook_fila] Webhook #{webhook_log.id} falhou "
+                             f"(tentativa {webhook_log.tentativas}/{max_tentativas}): {str(e)}", exc_info=True)
+                erro = f"{str(e)}\n\n{traceback.format_exc()}"
+                if webhook_log.tentativas < max_tentativas:
+                    finalizar_webhook(webhook_log, 'PENDING', erro)
+                    stats['reenfileirados'] += 1
+                else:
+                    finalizar_webhook(webhook_log, 'ERROR', erro)
+                    stats['erros'] += 1
+                    LogService.registrar(
+                        nivel='ERROR',
+                        mensagem=f"Erro no webhook ASAAS #{webhook_log.id}: {str(e)}",
+                        modulo='core',
+                        acao='webhook_asaas_erro'
+                    )
+
+                restantes = [log.id for log in eventos[posicao + 1:]]
+                if restantes:
+                    # Ainda não foram tentados: devolve a tentativa consumida na reivindicação
+                    WebhookLog.objects.filter(id__in=restantes, status_processamento='PROCESSING').update(
+                        status_processamento='PENDING', tentativas=F('tentativas') - 1
+                    )
+                    stats['reenfileirados'] += len(restantes)
+                break
+
+            finalizar_webhook(webhook_log, status, mensagem)
+            stats['sucesso' if status == 'SUCCESS' else 'ignorados'] += 1
+            logger.info(f"[webhook_fila] Webhook #{webhook_log.id} processado: {status}")
+
+    return stats
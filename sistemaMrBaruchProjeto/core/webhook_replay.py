@@ -0,0 +1,159 @@
+"""
+Reprocessamento local (replay) de webhooks já recebidos
+Reaplica os payloads guardados em WebhookLog sem chamar o Asaas:
+- os logs selecionados são agrupados por payment_id e só o estado final de cada
+  pagamento é aplicado (os anteriores ficam IGNORED, apontando para o aplicado)
+- pagamentos cujo estado já foi aplicado por um webhook mais novo são pulados
+- os pagamentos são processados em paralelo (um pagamento por vez em cada thread,
+  o que preserva a ordem por pagamento da fila)
+
+Usado pelo comando `reprocessar_webhooks_asaas` e pela view reprocessar_webhooks.
+"""
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from .models import WebhookLog
+from .maquina_pagamentos import EVENTOS_SEM_ACAO
+from .webhook_fila import identificar_worker, processar_webhook, finalizar_webhook
+from .webhook_estatisticas import atualizar_status
+
+logger = logging.getLogger(__name__)
+
+
+def selecionar_logs(status=None, desde=None, ate=None, eventos=None):
+    """
+    Webhooks do Asaas a reprocessar.
+
+    Args:
+        status: lista de status_processamento (padrão: ERROR)
+        desde / ate: datas (inclusive) de data_recebimento
+        eventos: lista de eventos (PAYMENT_RECEIVED, ...)
+    """
+    logs = WebhookLog.objects.filter(tipo='ASAAS', status_processamento__in=status or ['ERROR']).exclude(payment_id='')
+    if desde:
+        logs = logs.filter(data_recebimento__date__gte=desde)
+    if ate:
+        logs = logs.filter(data_recebimento__date__lte=ate)
+    if eventos:
+        logs = logs.filter(evento__in=eventos)
+    return logs
+
+
+def _estado_final(logs):
+    """Último evento que altera estado; se o pagamento só tem eventos sem ação, o último deles"""
+    com_acao = [log for log in logs if log[2] not in EVENTOS_SEM_ACAO]
+    return (com_acao or logs)[-1]
+
+
+def _aplicar(log_id, worker):
+    """Reprocessa um webhook (thread do pool). Retorna o status final"""
+    try:
+        reivindicado = atualizar_status(
+            WebhookLog.objects.filter(pk=log_id).exclude(status_processamento='PROCESSING'),
+            'PROCESSING', worker=worker, reivindicado_em=timezone.now()
+        )
+        if not reivindicado:
+            return 'OCUPADO'  # A fila está processando este webhook agora
+
+        webhook_log = WebhookLog.objects.get(pk=log_id)
+        try:
+            status, mensagem = processar_webhook(webhook_log)
+        except Exception as e:
+            logger.error(f"[webhook_replay] Webhook #{log_id} falhou: {str(e)}")
+            finalizar_webhook(webhook_log, 'ERROR', f'Replay: {str(e)}')
+            return 'ERROR'
+        finalizar_webhook(webhook_log, status, mensagem)
+        return status
+    finally:
+        # Cada thread do pool tem a própria conexão
+        connection.close()
+
+
+def reprocessar_webhooks(logs, max_workers=None, simular=False):
+    """
+    Reprocessa os webhooks do queryset.
+
+    Returns:
+        dict com selecionados, pagamentos, aplicados, substituidos, ja_aplicados,
+        sucesso, ignorados, erros, ocupados, duracao e por_segundo
+    """
+    inicio = time.monotonic()
+    max_workers = int(max_workers or getattr(settings, 'WEBHOOK_REPLAY_WORKERS', 4))
+
+    por_pagamento = {}
+    for log in logs.order_by('data_recebimento', 'id').values_list('id', 'payment_id', 'evento', 'data_recebimento'):
+        por_pagamento.setdefault(log[1], []).append(log)
+
+    # Estado mais novo já aplicado com sucesso (fora da seleção) por pagamento
+    aplicados_depois = dict(
+        WebhookLog.objects.filter(
+            tipo='ASAAS', payment_id__in=por_pagamento.keys(), status_processamento='SUCCESS'
+        ).exclude(evento__in=EVENTOS_SEM_ACAO)
+        .order_by().values('payment_id').annotate(ultimo=Max('data_recebimento'))
+        .values_list('payment_id', 'ultimo')
+    )
+
+    stats = {
+        'selecionados': sum(len(itens) for itens in por_pagamento.values()),
+        'pagamentos': len(por_pagamento),
+        'aplicados': 0, 'substituidos': 0, 'ja_aplicados': 0,
+        'sucesso': 0, 'ignorados': 0, 'erros': 0, 'ocupados': 0,
+    }
+
+    a_aplicar = []
+    substituidos = {}
+    for payment_id, itens in por_pagamento.items():
+        final = _estado_final(itens)
+        ultimo_aplicado = aplicados_depois.get(payment_id)
+        if ultimo_aplicado and ultimo_aplicado > final[3]:
+            # Um webhook mais novo já levou o pagamento adiante: reaplicar regrediria o estado
+            substituidos.setdefault('já aplicado por webhook mais recente', []).extend(log[0] for log in itens)
+            stats['ja_aplicados'] += len(itens)
+            continue
+        a_aplicar.append(final[0])
+        anteriores = [log[0] for log in itens if log[0] != final[0]]
+        if anteriores:
+            substituidos.setdefault(f'substituído pelo webhook #{final[0]}', []).extend(anteriores)
+            stats['substituidos'] += len(anteriores)
+
+    if simular:
+        stats['aplicados'] = len(a_aplicar)
+        stats['duracao'] = round(time.monotonic() - inicio, 2)
+        stats['por_segundo'] = 0
+        return stats
+
+    for motivo, ids in substituidos.items():
+        atualizar_status(
+            WebhookLog.objects.filter(pk__in=ids).exclude(status_processamento='PROCESSING'),
+            'IGNORED', mensagem_erro=f'Replay: {motivo}'
+        )
+
+    worker = f'replay:{identificar_worker()}'
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='webhook-replay') as executor:
+        futuros = [executor.submit(_aplicar, log_id, worker) for log_id in a_aplicar]
+        for futuro in as_completed(futuros):
+            try:
+                status = futuro.result()
+            except Exception as e:
+                logger.error(f"[webhook_replay] Erro inesperado: {str(e)}", exc_info=True)
+                status = 'ERROR'
+            if status == 'OCUPADO':
+                stats['ocupados'] += 1
+                continue
+            stats['aplicados'] += 1
+            if status == 'SUCCESS':
+                stats['sucesso'] += 1
+            elif status == 'IGNORED':
+                stats['ignorados'] += 1
+            else:
+                stats['erros'] += 1
+
+    duracao = time.monotonic() - inicio
+    stats['duracao'] = round(duracao, 2)
+    stats['por_segundo'] = round(stats['aplicados'] / duracao, 1) if duracao else 0
+    logger.info(f"[webhook_replay] {stats}")
+    return stats
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     Parcela, Comissao, PixLevantamento, PixEntrada, ClienteAsaas,
-    Renegociacao, HistoricoContatoRetencao
+    Renegociacao, HistoricoContatoRetencao, RotaPagamentoAsaas, HistoricoStatusParcela
 )
 
 @admin.register(PixEntrada)
@@ -30,6 +30,19 @@ class PixLevantamentoAdmin(admin.ModelAdmin):
     search_fields = ('lead__nome_completo', 'asaas_payment_id')
     readonly_fields = ('asaas_payment_id', 'pix_code', 'pix_qr_code_url', 'data_criacao')
 
+@admin.register(RotaPagamentoAsaas)
+class RotaPagamentoAsaasAdmin(admin.ModelAdmin):
+    list_display = ('asaas_payment_id', 'tipo', 'objeto_id', 'data_criacao')
+    list_filter = ('tipo',)
+    search_fields = ('asaas_payment_id',)
+
+@admin.register(HistoricoStatusParcela)
+class HistoricoStatusParcelaAdmin(admin.ModelAdmin):
+    list_display = ('parcela', 'status_anterior', 'status_novo', 'origem', 'data')
+    list_filter = ('status_novo', 'origem', 'data')
+    search_fields = ('parcela__venda__id',)
+    raw_id_fields = ('parcela',)
+
 @admin.register(Parcela)
 class ParcelaAdmin(admin.ModelAdmin):
     list_display = ('venda', 'numero_parcela', 'valor', 'data_vencimento', 'status')
@@ -0,0 +1,223 @@
+"""
+Envio das parcelas de uma venda para o Asaas
+As cobranças são criadas em paralelo (pool limitado por ASAAS_ENVIO_MAX_WORKERS;
+o limitador de taxa da conta continua valendo para todas as threads) e gravadas
+no fim com um único bulk_update das parcelas e um bulk_create das rotas.
+
+Idempotência: cada cobrança leva o externalReference `venda_<id>_parcela_<n>`.
+Antes de criar, as cobranças já existentes do cliente são listadas uma vez; uma
+parcela cuja cobrança já existe no Asaas (envio anterior interrompido antes de
+gravar a parcela) é vinculada à cobrança existente em vez de gerar outra, sem
+mexer no status local (se ela já foi paga/venceu, a máquina de pagamentos e a
+reconciliação aplicam a transição com os efeitos dela). Se a listagem falha, o
+envio é abortado: criar às cegas duplicaria as cobranças.
+
+O parcelamento nativo (installmentCount) não é usado: ele exige parcelas de mesmo
+valor e vencimentos mensais, e as vendas têm frequência semanal/quinzenal e
+parcelas com valores/datas ajustados.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from core.asaas_service import AsaasService
+from core.services import LogService
+from core.cache_relatorios import invalidar_apos_commit
+from .models import Parcela, RotaPagamentoAsaas
+
+logger = logging.getLogger(__name__)
+
+
+STATUS_COBRANCA_DESCARTADA = ('DELETED', 'REFUNDED')
+
+
+def referencia_parcela(parcela):
+    """externalReference da cobrança de uma parcela (chave de idempotência)"""
+    return f'venda_{parcela.venda_id}_parcela_{parcela.numero_parcela}'
+
+
+def parcelas_pendentes_envio(venda):
+    """Parcelas da venda que ainda não têm cobrança no Asaas"""
+    return Parcela.objects.filter(venda=venda).filter(
+        Q(id_asaas__isnull=True) | Q(id_asaas='') | Q(id_asaas='None')
+    ).order_by('numero_parcela')
+
+
+def _criar_cliente(asaas, venda):
+    cliente = venda.cliente
+    lead = cliente.lead
+    asaas_customer = asaas.criar_cliente({
+        'nome': lead.nome_completo,
+        'cpf_cnpj': getattr(lead, 'cpf_cnpj', None) or '',
+        'email': lead.email,
+        'telefone': lead.telefone,
+        'cep': cliente.cep or '',
+        'endereco': cliente.rua or '',
+        'numero': cliente.numero or '',
+        'bairro': cliente.bairro or '',
+        'id_cliente': str(cliente.id),
+    })
+    customer_id = (asaas_customer or {}).get('id')
+    if not customer_id:
+        raise Exception("ASAAS não retornou ID do cliente")
+    return customer_id
+
+
+def _cobrancas_existentes(asaas, customer_id, referencias):
+    """
+    {externalReference: cobrança} das cobranças do cliente que casam com as referências.
+    Levanta exceção se a listagem falhar (não dá para saber o que já existe).
+    """
+    existentes = {}
+    offset = 0
+    while True:
+        resposta = asaas._fazer_requisicao(
+            'GET', 'payments', params={'customer': customer_id, 'offset': offset, 'limit': 100}
+        )
+        if not resposta or 'data' not in resposta:
+            erros = (resposta or {}).get('errors') or [{'description': 'resposta vazia'}]
+            raise Exception('; '.join(erro.get('description', '') for erro in erros))
+        for cobranca in resposta['data']:
+            referencia = cobranca.get('externalReference')
+            if referencia in referencias and cobranca.get('status') not in STATUS_COBRANCA_DESCARTADA:
+                existentes.setdefault(referencia, cobranca)
+        if not resposta.get('hasMore'):
+            break
+        offset += 100
+    return existentes
+
+
+def _criar_cobranca(asaas, dados):
+    """Cria uma cobrança (thread do pool). Retorna (cobrança, erro)"""
+    try:
+        cobranca = asaas.criar_cobranca(dados)
+        if not cobranca or not cobranca.get('id'):
+            erros = (cobranca or {}).get('errors') or [{'description': 'resposta sem ID da cobrança'}]
+            return None, '; '.join(erro.get('description', '') for erro in erros)
+        return cobranca, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        # Cada thread do pool tem a própria conexão
+        connection.close()
+
+
+def enviar_parcelas_asaas(venda):
+    """
+    Envia todas as parcelas pendentes de uma venda para o ASAAS.
+    Retorna dict com estatísticas do envio.
+    """
+    resultado = {
+        'sucesso': True,
+        'total_enviadas': 0,
+        'total_erros': 0,
+        'erros': []
+    }
+
+    parcelas = list(parcelas_pendentes_envio(venda))
+    if not parcelas:
+        resultado['mensagem'] = 'Nenhuma parcela pendente para enviar'
+        return resultado
+
+    asaas = AsaasService()
+    try:
+        customer_id = _criar_cliente(asaas, venda)
+    except Exception as e:
+        resultado['sucesso'] = False
+        resultado['erros'].append(f'Erro ao criar/buscar cliente no ASAAS: {str(e)}')
+        LogService.registrar(
+            nivel='ERROR',
+            mensagem=f'Erro ao criar cliente no ASAAS para venda #{venda.id}: {str(e)}',
+            modulo='financeiro',
+            acao='asaas_erro_cliente'
+        )
+        return resultado
+
+    referencias = {referencia_parcela(parcela): parcela for parcela in parcelas}
+    try:
+        cobrancas = _cobrancas_existentes(asaas, customer_id, referencias)
+    except Exception as e:
+        resultado['sucesso'] = False
+        resultado['erros'].append(f'Erro ao listar cobranças existentes no ASAAS: {str(e)}')
+        LogService.registrar(
+            nivel='ERROR',
+            mensagem=f'Envio da venda #{venda.id} abortado: falha ao listar cobranças do cliente no ASAAS: {str(e)}',
+            modulo='financeiro',
+            acao='asaas_erro_listagem'
+        )
+        return resultado
+    if cobrancas:
+        logger.info(f"♻️  Venda #{venda.id}: {len(cobrancas)} cobranças já existiam no Asaas")
+
+    # Total de parcelas da venda, calculado uma vez (entra na descrição de cada cobrança)
+    total_parcelas = venda.quantidade_parcelas or len(parcelas)
+    a_criar = [parcela for referencia, parcela in referencias.items() if referencia not in cobrancas]
+    criadas = set()
+    max_workers = max(1, min(len(a_criar), int(getattr(settings, 'ASAAS_ENVIO_MAX_WORKERS', 4))))
+
+    if a_criar:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='envio-parcelas') as executor:
+            futuros = {
+                referencia_parcela(parcela): executor.submit(_criar_cobranca, asaas, {
+                    'customer_id': customer_id,
+                    'billing_type': venda.forma_pagamento,
+                    'value': float(parcela.valor),
+                    'due_date': parcela.data_vencimento.isoformat(),
+                    'description': f'Parcela {parcela.numero_parcela}/{total_parcelas} - Venda #{venda.id} - {venda.servico.nome}',
+                    'external_reference': referencia_parcela(parcela),
+                })
+                for parcela in a_criar
+            }
+            for referencia, futuro in futuros.items():
+                cobranca, erro = futuro.result()
+                if cobranca:
+                    cobrancas[referencia] = cobranca
+                    criadas.add(referencia)
+                else:
+                    parcela = referencias[referencia]
+                    resultado['total_erros'] += 1
+                    resultado['erros'].append(f'Parcela {parcela.numero_parcela}: {erro}')
+
+    agora = timezone.now()
+    enviadas = []
+    for referencia, parcela in referencias.items():
+        cobranca = cobrancas.get(referencia)
+        if not cobranca:
+            continue
+        parcela.id_asaas = cobranca.get('id', '')
+        parcela.url_boleto = cobranca.get('bankSlipUrl') or ''
+        parcela.codigo_barras = cobranca.get('identificationField') or ''
+        parcela.enviado_asaas = True
+        parcela.data_envio_asaas = agora
+        if referencia in criadas:
+            parcela.status = 'aberta'  # Cobrança nova: pendente
+        enviadas.append(parcela)
+
+    if enviadas:
+        with transaction.atomic():
+            Parcela.objects.bulk_update(
+                enviadas,
+                ['id_asaas', 'url_boleto', 'codigo_barras', 'enviado_asaas', 'data_envio_asaas', 'status']
+            )
+            RotaPagamentoAsaas.objects.bulk_create([
+                RotaPagamentoAsaas(tipo='PARCELA', objeto_id=parcela.pk, asaas_payment_id=parcela.id_asaas)
+                for parcela in enviadas
+            ], ignore_conflicts=True)
+            invalidar_apos_commit('parcela')  # bulk_update não dispara post_save
+    resultado['total_enviadas'] = len(enviadas)
+
+    LogService.registrar(
+        nivel='ERROR' if resultado['total_erros'] else 'INFO',
+        mensagem=(
+            f"Venda #{venda.id}: {len(enviadas)} parcelas enviadas ao ASAAS, {resultado['total_erros']} erros"
+            + (f" ({'; '.join(resultado['erros'])})" if resultado['erros'] else '')
+        ),
+        modulo='financeiro',
+        acao='parcelas_enviadas_asaas'
+    )
+
+    # Ajustar o retorno para ser compatível
+    resultado['sucesso'] = resultado['total_enviadas']
+    return resultado
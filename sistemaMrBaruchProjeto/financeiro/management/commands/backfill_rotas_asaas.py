@@ -0,0 +1,55 @@
+"""
+Preenche RotaPagamentoAsaas com as cobranças criadas antes da tabela existir
+Idempotente: rotas já registradas são mantidas (ignore_conflicts).
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from financeiro.models import PixLevantamento, PixEntrada, Parcela, RotaPagamentoAsaas
+from vendas.models import EntradaVenda
+
+
+class Command(BaseCommand):
+    help = 'Cria as rotas asaas_payment_id -> (tipo, pk) das cobranças já existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Registros gravados por bulk_create'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        origens = [
+            ('PIX_LEVANTAMENTO', PixLevantamento.objects.all(), 'asaas_payment_id'),
+            ('PIX_ENTRADA', PixEntrada.objects.all(), 'asaas_payment_id'),
+            ('PARCELA', Parcela.objects.all(), 'id_asaas'),
+            ('ENTRADA_VENDA', EntradaVenda.objects.all(), 'asaas_payment_id'),
+        ]
+
+        total = 0
+        for tipo, queryset, campo in origens:
+            registros = (
+                queryset.exclude(Q(**{f'{campo}__isnull': True}) | Q(**{campo: ''}) | Q(**{campo: 'None'}))
+                .values_list('pk', campo)
+                .order_by('pk')
+            )
+            rotas = []
+            encontrados = 0
+            for objeto_id, payment_id in registros.iterator(chunk_size=lote):
+                rotas.append(RotaPagamentoAsaas(asaas_payment_id=payment_id, tipo=tipo, objeto_id=objeto_id))
+                encontrados += 1
+                if len(rotas) >= lote:
+                    RotaPagamentoAsaas.objects.bulk_create(rotas, ignore_conflicts=True)
+                    rotas = []
+            if rotas:
+                RotaPagamentoAsaas.objects.bulk_create(rotas, ignore_conflicts=True)
+
+            total += encontrados
+            self.stdout.write(f'📌 {tipo}: {encontrados} cobranças')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Backfill concluído: {total} cobranças verificadas, '
+            f'{RotaPagamentoAsaas.objects.count()} rotas registradas'
+        ))
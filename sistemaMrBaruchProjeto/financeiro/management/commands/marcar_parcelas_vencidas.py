@@ -0,0 +1,54 @@
+"""
+Marca como vencidas as parcelas em aberto com vencimento passado
+Rodar diariamente (cron), ex.: 5 0 * * * python manage.py marcar_parcelas_vencidas
+"""
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from core.services import LogService
+from financeiro.vencimentos import marcar_parcelas_vencidas
+
+
+class Command(BaseCommand):
+    help = "Transição em lote aberta -> vencida das parcelas já vencidas (com histórico de auditoria)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data',
+            help='Data de referência (YYYY-MM-DD); vence o que tem vencimento anterior a ela (padrão: hoje)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Parcelas por UPDATE (padrão: 1000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas conta as parcelas que seriam marcadas'
+        )
+
+    def handle(self, *args, **options):
+        data_referencia = None
+        if options['data']:
+            try:
+                data_referencia = datetime.strptime(options['data'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f"Data inválida: {options['data']} (use YYYY-MM-DD)")
+
+        quantidade = marcar_parcelas_vencidas(
+            data_referencia=data_referencia, lote=options['lote'], simular=options['dry_run']
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"⚠️  Dry-run: {quantidade} parcelas seriam marcadas como vencidas"))
+            return
+
+        if quantidade:
+            LogService.registrar(
+                nivel='INFO',
+                mensagem=f"{quantidade} parcelas marcadas como vencidas",
+                modulo='financeiro',
+                acao='parcelas_vencidas_lote'
+            )
+        self.stdout.write(self.style.SUCCESS(f"✅ {quantidade} parcelas marcadas como vencidas"))
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0008_renegociacao_historicocontatoretencao'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='parcela',
+            name='id_asaas',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+        migrations.CreateModel(
+            name='RotaPagamentoAsaas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asaas_payment_id', models.CharField(max_length=255, unique=True)),
+                ('tipo', models.CharField(choices=[('PIX_LEVANTAMENTO', 'PIX Levantamento'), ('PIX_ENTRADA', 'PIX de Entrada'), ('PARCELA', 'Parcela'), ('ENTRADA_VENDA', 'Entrada da Venda')], max_length=20)),
+                ('objeto_id', models.PositiveBigIntegerField()),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Rota de Pagamento ASAAS',
+                'verbose_name_plural': 'Rotas de Pagamento ASAAS',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 16:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0009_parcela_id_asaas_index_rotapagamentoasaas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='parcela',
+            index=models.Index(fields=['status', 'data_vencimento'], name='fin_parcela_status_venc_idx'),
+        ),
+        migrations.CreateModel(
+            name='HistoricoStatusParcela',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status_anterior', models.CharField(max_length=20)),
+                ('status_novo', models.CharField(max_length=20)),
+                ('origem', models.CharField(help_text='Rotina que fez a transição', max_length=50)),
+                ('data', models.DateTimeField(auto_now_add=True)),
+                ('parcela', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historico_status', to='financeiro.parcela')),
+            ],
+            options={
+                'verbose_name': 'Histórico de Status da Parcela',
+                'verbose_name_plural': 'Históricos de Status das Parcelas',
+                'ordering': ['-data'],
+            },
+        ),
+    ]
@@ -18,7 +18,7 @@ class Parcela(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='aberta')
     
     # Integração Asaas
-    id_asaas = models.CharField(max_length=100, blank=True)
+    id_asaas = models.CharField(max_length=100, blank=True, db_index=True)
     url_boleto = models.URLField(blank=True)
     codigo_barras = models.TextField(blank=True)
     
@@ -30,6 +30,9 @@ class Parcela(models.Model):
         ordering = ['venda', 'numero_parcela']
         verbose_name = 'Parcela'
         verbose_name_plural = 'Parcelas'
+        indexes = [
+            models.Index(fields=['status', 'data_vencimento'], name='fin_parcela_status_venc_idx'),
+        ]
     
     def __str__(self):
         return f"Parcela {self.numero_parcela} - Venda #{self.venda.id} - R$ {self.valor}"
@@ -150,6 +153,94 @@ class PixEntrada(models.Model):
         return f"PIX Entrada Venda #{self.venda.id} - R$ {self.valor} - {self.status_pagamento}"
 
 
+class RotaPagamentoAsaas(models.Model):
+    """
+    Índice único asaas_payment_id -> (tipo, pk) das cobranças geradas pelo sistema.
+    O processamento dos webhooks resolve o pagamento com uma consulta indexada,
+    em vez de tentar PixLevantamento, PixEntrada e Parcela em sequência.
+    Populado na criação das cobranças; registros antigos: `backfill_rotas_asaas`.
+    """
+    TIPO_CHOICES = [
+        ('PIX_LEVANTAMENTO', 'PIX Levantamento'),
+        ('PIX_ENTRADA', 'PIX de Entrada'),
+        ('PARCELA', 'Parcela'),
+        ('ENTRADA_VENDA', 'Entrada da Venda'),
+    ]
+
+    asaas_payment_id = models.CharField(max_length=255, unique=True)
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    objeto_id = models.PositiveBigIntegerField()
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Rota de Pagamento ASAAS'
+        verbose_name_plural = 'Rotas de Pagamento ASAAS'
+
+    def __str__(self):
+        return f"{self.asaas_payment_id} -> {self.get_tipo_display()} #{self.objeto_id}"
+
+    @classmethod
+    def registrar(cls, tipo, objeto_id, asaas_payment_id):
+        """Registra (ou corrige) a rota de uma cobrança recém-criada no Asaas"""
+        if not asaas_payment_id or not objeto_id:
+            return None
+        rota, _ = cls.objects.update_or_create(
+            asaas_payment_id=asaas_payment_id,
+            defaults={'tipo': tipo, 'objeto_id': objeto_id},
+        )
+        return rota
+
+    @classmethod
+    def resolver(cls, asaas_payment_id):
+        """
+        Retorna (tipo, pk) do pagamento ou None.
+
+        Sem rota (cobrança criada antes da tabela ou fora dos pontos que registram),
+        procura nas tabelas de origem uma única vez e grava a rota encontrada.
+        """
+        if not asaas_payment_id:
+            return None
+
+        rota = cls.objects.filter(asaas_payment_id=asaas_payment_id).values_list('tipo', 'objeto_id').first()
+        if rota:
+            return rota
+
+        from vendas.models import EntradaVenda
+
+        origens = [
+            ('PIX_LEVANTAMENTO', PixLevantamento.objects.filter(asaas_payment_id=asaas_payment_id)),
+            ('PIX_ENTRADA', PixEntrada.objects.filter(asaas_payment_id=asaas_payment_id)),
+            ('PARCELA', Parcela.objects.filter(id_asaas=asaas_payment_id)),
+            ('ENTRADA_VENDA', EntradaVenda.objects.filter(asaas_payment_id=asaas_payment_id)),
+        ]
+        for tipo, queryset in origens:
+            objeto_id = queryset.values_list('pk', flat=True).first()
+            if objeto_id:
+                cls.registrar(tipo, objeto_id, asaas_payment_id)
+                return tipo, objeto_id
+        return None
+
+
+class HistoricoStatusParcela(models.Model):
+    """
+    Auditoria das transições de status de parcelas feitas em lote
+    (ex.: `marcar_parcelas_vencidas`, que não passa pelo save() das parcelas).
+    """
+    parcela = models.ForeignKey(Parcela, on_delete=models.CASCADE, related_name='historico_status')
+    status_anterior = models.CharField(max_length=20)
+    status_novo = models.CharField(max_length=20)
+    origem = models.CharField(max_length=50, help_text='Rotina que fez a transição')
+    data = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Histórico de Status da Parcela'
+        verbose_name_plural = 'Históricos de Status das Parcelas'
+        ordering = ['-data']
+
+    def __str__(self):
+        return f"Parcela #{self.parcela_id}: {self.status_anterior} -> {self.status_novo} ({self.origem})"
+
+
 class Renegociacao(models.Model):
     """
     Histórico de renegociações de dívidas
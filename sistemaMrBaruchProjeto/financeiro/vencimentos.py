@@ -0,0 +1,60 @@
+"""
+Transição diária de parcelas vencidas
+O status 'vencida' chegava só pelo webhook PAYMENT_OVERDUE (parcelas sem cobrança
+no Asaas, ou com o webhook perdido, ficavam 'aberta' para sempre). A rotina marca
+como 'vencida' as parcelas 'aberta' com vencimento anterior à data de referência:
+um UPDATE por lote (linhas bloqueadas, o webhook de pagamento espera ou é esperado)
+e o HistoricoStatusParcela de cada transição no mesmo lote.
+
+Depois disso, status='vencida' basta para os relatórios (índice status + vencimento).
+Usado pelo comando `marcar_parcelas_vencidas` (cron diário).
+"""
+import logging
+from django.db import transaction
+from django.utils import timezone
+from core.cache_relatorios import invalidar_apos_commit
+from .models import Parcela, HistoricoStatusParcela
+
+logger = logging.getLogger(__name__)
+
+
+ORIGEM = 'marcar_parcelas_vencidas'
+
+
+def parcelas_a_vencer(data_referencia=None):
+    """Parcelas em aberto com vencimento anterior a data_referencia (padrão: hoje)"""
+    data_referencia = data_referencia or timezone.localdate()
+    return Parcela.objects.filter(status='aberta', data_vencimento__lt=data_referencia)
+
+
+def marcar_parcelas_vencidas(data_referencia=None, lote=1000, simular=False):
+    """
+    Marca como 'vencida' as parcelas em aberto já vencidas.
+
+    Returns:
+        quantidade de parcelas marcadas (ou que seriam marcadas, em simulação)
+    """
+    pendentes = parcelas_a_vencer(data_referencia)
+    if simular:
+        return pendentes.count()
+
+    total = 0
+    while True:
+        with transaction.atomic():
+            # skip_locked: parcela presa por um webhook em andamento fica para o próximo lote/execução
+            ids = list(
+                pendentes.select_for_update(skip_locked=True).order_by('id').values_list('id', flat=True)[:lote]
+            )
+            if not ids:
+                break
+            Parcela.objects.filter(pk__in=ids).update(status='vencida')
+            HistoricoStatusParcela.objects.bulk_create([
+                HistoricoStatusParcela(parcela_id=pk, status_anterior='aberta', status_novo='vencida', origem=ORIGEM)
+                for pk in ids
+            ])
+        total += len(ids)
+
+    if total:
+        invalidar_apos_commit('parcela')  # O UPDATE não dispara post_save
+        logger.info(f"📅 {total} parcelas marcadas como vencidas")
+    return total
@@ -13,6 +13,7 @@ from financeiro.models import (
 )
 from vendas.models import Venda
 from core.asaas_service import asaas_service
+from core.cache_relatorios import obter_relatorio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,6 +22,13 @@ logger = logging.getLogger(__name__)
 @login_required
 def dashboard_financeiro(request):
     """Dashboard principal do módulo Financeiro/Retenção"""
+    context = obter_relatorio('dashboard_financeiro', {}, ('parcela', 'renegociacao'), _dados_dashboard_financeiro)
+    
+    return render(request, 'financeiro/dashboard.html', context)
+
+
+def _dados_dashboard_financeiro():
+    """Números do dashboard financeiro (em cache: obter_relatorio)"""
     hoje = timezone.now().date()
     
     # Estatísticas Gerais
@@ -54,7 +62,7 @@ def dashboard_financeiro(request):
         'renegociacoes_ativas': renegociacoes_ativas,
     }
     
-    return render(request, 'financeiro/dashboard.html', context)
+    return context
 
 
 @login_required
@@ -637,35 +645,28 @@ def relatorio_inadimplencia(request):
     """Relatório consolidado de inadimplência"""
     hoje = timezone.now().date()
     
-    # Inadimplência por período
-    inadimplencia_3_7 = Parcela.objects.filter(
-        status='vencida',
-        data_vencimento__gte=hoje - timedelta(days=7),
-        data_vencimento__lt=hoje - timedelta(days=3)
-    ).aggregate(total=Sum('valor'), qtd=Count('id'))
-    
-    inadimplencia_8_15 = Parcela.objects.filter(
-        status='vencida',
-        data_vencimento__gte=hoje - timedelta(days=15),
-        data_vencimento__lt=hoje - timedelta(days=7)
-    ).aggregate(total=Sum('valor'), qtd=Count('id'))
-    
-    inadimplencia_16_30 = Parcela.objects.filter(
-        status='vencida',
-        data_vencimento__gte=hoje - timedelta(days=30),
-        data_vencimento__lt=hoje - timedelta(days=15)
-    ).aggregate(total=Sum('valor'), qtd=Count('id'))
-    
-    inadimplencia_mais_30 = Parcela.objects.filter(
-        status='vencida',
-        data_vencimento__lt=hoje - timedelta(days=30)
-    ).aggregate(total=Sum('valor'), qtd=Count('id'))
+    # Inadimplência por período (uma passada; 'vencida' é mantido pelo marcar_parcelas_vencidas)
+    faixas = {
+        '3_7': Q(data_vencimento__gte=hoje - timedelta(days=7), data_vencimento__lt=hoje - timedelta(days=3)),
+        '8_15': Q(data_vencimento__gte=hoje - timedelta(days=15), data_vencimento__lt=hoje - timedelta(days=7)),
+        '16_30': Q(data_vencimento__gte=hoje - timedelta(days=30), data_vencimento__lt=hoje - timedelta(days=15)),
+        'mais_30': Q(data_vencimento__lt=hoje - timedelta(days=30)),
+    }
+    agregados = {}
+    for faixa, filtro in faixas.items():
+        agregados[f'total_{faixa}'] = Sum('valor', filter=filtro)
+        agregados[f'qtd_{faixa}'] = Count('id', filter=filtro)
+    resultado = Parcela.objects.filter(status='vencida').aggregate(**agregados)
+    inadimplencia = {
+        faixa: {'total': resultado[f'total_{faixa}'], 'qtd': resultado[f'qtd_{faixa}']}
+        for faixa in faixas
+    }
     
     context = {
-        'inadimplencia_3_7': inadimplencia_3_7,
-        'inadimplencia_8_15': inadimplencia_8_15,
-        'inadimplencia_16_30': inadimplencia_16_30,
-        'inadimplencia_mais_30': inadimplencia_mais_30,
+        'inadimplencia_3_7': inadimplencia['3_7'],
+        'inadimplencia_8_15': inadimplencia['8_15'],
+        'inadimplencia_16_30': inadimplencia['16_30'],
+        'inadimplencia_mais_30': inadimplencia['mais_30'],
     }
     
     return render(request, 'financeiro/relatorios/inadimplencia.html', context)
@@ -12,7 +12,6 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistemaMrBaruchProjeto.settings')
 django.setup()
 
-import requests
 from core.asaas_webhook_manager import AsaasWebhookManager
 
 def fix_webhook_url():
@@ -62,19 +61,13 @@ def fix_webhook_url():
         return
     
     # Atualizar webhook
-    url = f"{manager.base_url}/webhooks/{webhook_id}"
     dados = {
         "url": nova_url,
         "enabled": True
     }
     
     try:
-        response = requests.put(
-            url,
-            headers=manager.headers,
-            json=dados,
-            timeout=30
-        )
+        response = manager.client.put(f'webhooks/{webhook_id}', json=dados)
         
         if response.status_code == 200:
             print("\n" + "="*60)
@@ -1,14 +1,16 @@
 """
 SCRIPT 2: Importar JSON para o banco de dados
-Uso: python importar_json_banco.py <arquivo.json>
+Uso: python importar_json_banco.py <arquivo.ndjson|arquivo.json>
 Exemplo:
-  python importar_json_banco.py asaas_principal_20251117_193000.json
+  python importar_json_banco.py asaas_principal_20251117_193000.ndjson
+
+Arquivos .ndjson (gerados pelo baixar_asaas_json.py) são lidos linha a linha,
+sem carregar o arquivo inteiro em memória. O .json antigo continua aceito.
 """
 import os
 import sys
 import django
 import json
-from decimal import Decimal
 from datetime import datetime
 
 # Configurar encoding UTF-8 para Windows
@@ -22,6 +24,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistemaMrBaruchProjeto.settings
 django.setup()
 
 from django.utils import timezone
+from asaas_sync.upsert_lote import UpsertEmLote, mapear_cliente, mapear_cobranca
 from asaas_sync.models import AsaasClienteSyncronizado, AsaasCobrancaSyncronizada, AsaasSyncronizacaoLog
 
 
@@ -30,6 +33,26 @@ class ImportadorJSON:
         self.arquivo_json = arquivo_json
         self.dados = None
         self.modo_limpeza = modo_limpeza  # Se True, exclui dados locais que não estão no Asaas
+        self.eh_ndjson = arquivo_json.endswith('.ndjson') or arquivo_json.endswith('.ndjson.parcial')
+        if modo_limpeza and arquivo_json.endswith('.parcial'):
+            # Download incompleto: limpar excluiria registros que apenas não foram baixados
+            raise ValueError("Modo limpeza não é permitido com arquivo .parcial (download incompleto)")
+    
+    def _ler_ndjson(self, tipos):
+        """Gera os registros do NDJSON dos tipos informados, uma linha por vez"""
+        prefixos = tuple(f'{{"tipo": "{tipo}"' for tipo in tipos)
+        with open(self.arquivo_json, 'r', encoding='utf-8') as f:
+            for linha in f:
+                if linha.startswith(prefixos):
+                    yield json.loads(linha)
+    
+    def _iterar(self, tipo, chave_json):
+        """Clientes/cobranças do arquivo: streaming no NDJSON, lista no JSON antigo"""
+        if self.eh_ndjson:
+            for registro in self._ler_ndjson((tipo,)):
+                yield registro['dados']
+        else:
+            yield from self.dados.get(chave_json, [])
         
     def carregar_json(self):
         """Carrega arquivo JSON"""
@@ -44,8 +67,15 @@ class ImportadorJSON:
         print(f"[PAGINA] Arquivo: {self.arquivo_json}")
         print(f"[STATS] Tamanho: {tamanho_mb:.2f} MB")
         
-        with open(self.arquivo_json, 'r', encoding='utf-8') as f:
-            self.dados = json.load(f)
+        if self.eh_ndjson:
+            # Só cabeçalho e resumo; clientes e cobranças são lidos em streaming na importação
+            self.dados = {}
+            for registro in self._ler_ndjson(('cabecalho', 'resumo')):
+                registro.pop('tipo', None)
+                self.dados.update(registro)
+        else:
+            with open(self.arquivo_json, 'r', encoding='utf-8') as f:
+                self.dados = json.load(f)
         
         print(f"[OK] JSON carregado!")
         print(f"[STATS] Conta: {self.dados.get('conta', 'N/A')}")
@@ -76,60 +106,22 @@ class ImportadorJSON:
         print("[SALVANDO] IMPORTANDO CLIENTES")
         print("="*80)
         
-        clientes_data = self.dados.get('clientes', [])
+        clientes_data = self._iterar('cliente', 'clientes')
         stats = {'total': 0, 'novos': 0, 'atualizados': 0, 'erros': 0, 'excluidos': 0}
         
         # IDs dos clientes no Asaas
         asaas_customer_ids = set()
         
-        for i, cliente_data in enumerate(clientes_data, 1):
-            try:
-                asaas_id = cliente_data.get('id')
-                
-                if not asaas_id:
-                    stats['erros'] += 1
-                    continue
-                
-                # Guardar ID para validação posterior
-                asaas_customer_ids.add(asaas_id)
-                
-                # Salvar ou atualizar
-                cliente, created = AsaasClienteSyncronizado.objects.update_or_create(
-                    asaas_customer_id=asaas_id,
-                    defaults={
-                        'nome': cliente_data.get('name', ''),
-                        'cpf_cnpj': cliente_data.get('cpfCnpj', ''),
-                        'email': cliente_data.get('email', ''),
-                        'telefone': cliente_data.get('phone', ''),
-                        'celular': cliente_data.get('mobilePhone', ''),
-                        'cep': cliente_data.get('postalCode', ''),
-                        'endereco': cliente_data.get('address', ''),
-                        'numero': cliente_data.get('addressNumber', ''),
-                        'complemento': cliente_data.get('complement', ''),
-                        'bairro': cliente_data.get('province', ''),
-                        'cidade': cliente_data.get('city', ''),
-                        'estado': cliente_data.get('state', ''),
-                        'inscricao_municipal': cliente_data.get('municipalInscription', ''),
-                        'inscricao_estadual': cliente_data.get('stateInscription', ''),
-                        'observacoes': cliente_data.get('observations', ''),
-                        'external_reference': cliente_data.get('externalReference', ''),
-                        'notificacoes_desabilitadas': cliente_data.get('notificationDisabled', False),
-                        'data_criacao_asaas': self._parse_datetime(cliente_data.get('dateCreated')),
-                    }
-                )
-                
-                stats['total'] += 1
-                if created:
-                    stats['novos'] += 1
-                else:
-                    stats['atualizados'] += 1
-                
-                if i % 100 == 0:
-                    print(f"  [STATS] Progresso: {i}/{len(clientes_data)} ({(i/len(clientes_data)*100):.1f}%)")
-                    
-            except Exception as e:
-                stats['erros'] += 1
-                print(f"  [ERRO] Erro no cliente {cliente_data.get('id', 'N/A')}: {str(e)}")
+        # IDs guardados para o modo limpeza; gravação em lotes de ASAAS_SYNC_CHUNK_SIZE
+        def registros():
+            for cliente_data in clientes_data:
+                if cliente_data.get('id'):
+                    asaas_customer_ids.add(cliente_data['id'])
+                yield mapear_cliente(cliente_data)
+        
+        resultado = UpsertEmLote(AsaasClienteSyncronizado, 'asaas_customer_id').executar(registros())
+        stats.update({chave: resultado[chave] for chave in ('total', 'novos', 'atualizados', 'erros')})
+        print(f"  [STATS] {resultado['inalterados']} clientes sem alteração (ignorados)")
         
         # 🔥 MODO LIMPEZA: Excluir clientes locais que não estão no Asaas
         if self.modo_limpeza:
@@ -179,17 +171,21 @@ class ImportadorJSON:
         print("[SALVANDO] IMPORTANDO COBRANÇAS")
         print("="*80)
         
-        cobrancas_data = self.dados.get('cobrancas', [])
+        cobrancas_data = self._iterar('cobranca', 'cobrancas')
         stats = {'total': 0, 'novas': 0, 'atualizadas': 0, 'erros': 0, 'sem_cliente': 0, 'excluidas': 0}
         
         # IDs das cobranças no Asaas
         asaas_payment_ids = set()
         
-        for i, cobranca_data in enumerate(cobrancas_data, 1):
-            try:
+        # Join local: um único SELECT (asaas_customer_id → pk) em vez de um .get() por cobrança
+        clientes_por_asaas_id = dict(
+            AsaasClienteSyncronizado.objects.values_list('asaas_customer_id', 'id')
+        )
+        
+        # Gerador: as cobranças vão para o banco em lotes conforme são lidas
+        def registros():
+            for cobranca_data in cobrancas_data:
                 asaas_payment_id = cobranca_data.get('id')
-                customer_id = cobranca_data.get('_customer_id') or cobranca_data.get('customer')
-                
                 if not asaas_payment_id:
                     stats['erros'] += 1
                     continue
@@ -197,48 +193,24 @@ class ImportadorJSON:
                 # Guardar ID para validação posterior
                 asaas_payment_ids.add(asaas_payment_id)
                 
-                # Buscar cliente no banco
-                try:
-                    cliente = AsaasClienteSyncronizado.objects.get(asaas_customer_id=customer_id)
-                except AsaasClienteSyncronizado.DoesNotExist:
+                customer_id = cobranca_data.get('_customer_id') or cobranca_data.get('customer')
+                cliente_id = clientes_por_asaas_id.get(customer_id)
+                if cliente_id is None:
                     stats['sem_cliente'] += 1
                     continue
                 
-                # Salvar ou atualizar cobrança
-                cobranca, created = AsaasCobrancaSyncronizada.objects.update_or_create(
-                    asaas_payment_id=asaas_payment_id,
-                    defaults={
-                        'cliente': cliente,
-                        'tipo_cobranca': cobranca_data.get('billingType', 'UNDEFINED'),
-                        'status': cobranca_data.get('status', 'PENDING'),
-                        'valor': Decimal(str(cobranca_data.get('value', 0))),
-                        'valor_liquido': Decimal(str(cobranca_data.get('netValue', 0))) if cobranca_data.get('netValue') else None,
-                        'descricao': cobranca_data.get('description', ''),
-                        'data_vencimento': self._parse_date(cobranca_data.get('dueDate')),
-                        'data_pagamento': self._parse_date(cobranca_data.get('paymentDate')),
-                        'data_criacao_asaas': self._parse_datetime(cobranca_data.get('dateCreated')),
-                        'invoice_url': cobranca_data.get('invoiceUrl', ''),
-                        'bank_slip_url': cobranca_data.get('bankSlipUrl', ''),
-                        'pix_qrcode_url': cobranca_data.get('pixQrCodeUrl', ''),
-                        'pix_copy_paste': cobranca_data.get('pixCopyAndPaste', ''),
-                        'numero_parcela': cobranca_data.get('installmentNumber'),
-                        'total_parcelas': cobranca_data.get('installmentCount'),
-                        'external_reference': cobranca_data.get('externalReference', ''),
-                    }
-                )
-                
-                stats['total'] += 1
-                if created:
-                    stats['novas'] += 1
-                else:
-                    stats['atualizadas'] += 1
-                
-                if i % 500 == 0:
-                    print(f"  [STATS] Progresso: {i}/{len(cobrancas_data)} ({(i/len(cobrancas_data)*100):.1f}%)")
-                    
-            except Exception as e:
-                stats['erros'] += 1
-                print(f"  [ERRO] Erro na cobrança {cobranca_data.get('id', 'N/A')}: {str(e)}")
+                registro = mapear_cobranca(cobranca_data, cliente_id)
+                if registro['data_vencimento'] is None:
+                    stats['erros'] += 1
+                    continue
+                yield registro
+        
+        resultado = UpsertEmLote(AsaasCobrancaSyncronizada, 'asaas_payment_id').executar(registros())
+        stats['total'] = resultado['total']
+        stats['novas'] = resultado['novos']
+        stats['atualizadas'] = resultado['atualizados']
+        stats['erros'] += resultado['erros']
+        print(f"  [STATS] {resultado['inalterados']} cobranças sem alteração (ignoradas)")
         
         # 🔥 MODO LIMPEZA: Excluir cobranças locais que não estão no Asaas
         if self.modo_limpeza:
@@ -370,7 +342,7 @@ class ImportadorJSON:
 if __name__ == '__main__':
     # Verificar argumentos
     if len(sys.argv) < 2:
-        print("[ERRO] Uso: python importar_json_banco.py <arquivo.json> [--limpar] [--auto-confirm]")
+        print("[ERRO] Uso: python importar_json_banco.py <arquivo.ndjson|arquivo.json> [--limpar] [--auto-confirm]")
         print("\nOpções:")
         print("  --limpar         Exclui do banco local clientes e cobranças que não existem mais no Asaas")
         print("  --auto-confirm   Executa sem pedir confirmação (para uso via Django)")
@@ -402,9 +374,8 @@ if __name__ == '__main__':
         print("[AVISO]  Modo automático ativado - executando sem confirmação")
     
     # Executar
-    importador = ImportadorJSON(arquivo, modo_limpeza=modo_limpeza)
-    
     try:
+        importador = ImportadorJSON(arquivo, modo_limpeza=modo_limpeza)
         importador.executar()
         print("\n[OK] Sucesso!")
     except KeyboardInterrupt:
@@ -25,6 +25,7 @@ from .models import Contrato, DocumentoLegal
 from vendas.models import Venda
 from clientes.models import Cliente
 from financeiro.models import Parcela
+from financeiro.envio_parcelas import enviar_parcelas_asaas
 
 
 # Configuração de locale para formatação de datas
@@ -240,8 +241,9 @@ def baixar_todos_boletos(request, contrato_id):
     temp_zip.close()
     
     try:
-        # Cria o ZIP
-        with zipfile.ZipFile(temp_zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        # Cria o ZIP (Session própria, sem o access_token da API: as URLs dos boletos
+        # são downloads comuns e não consomem a cota do limitador)
+        with zipfile.ZipFile(temp_zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file, requests.Session() as sessao_boletos:
             contador = 0
             for parcela in parcelas:
                 # Se já tem URL salva, usa direto
@@ -267,7 +269,7 @@ def baixar_todos_boletos(request, contrato_id):
                 if url_boleto:
                     try:
                         logger.info(f"Baixando boleto da parcela {parcela.numero_parcela}")
-                        response = requests.get(url_boleto, timeout=30)
+                        response = sessao_boletos.get(url_boleto, timeout=30)
                         if response.status_code == 200 and len(response.content) > 0:
                             # Nome do arquivo
                             vencimento = parcela.data_vencimento.strftime('%d%m%Y')
@@ -759,138 +761,6 @@ def atualizar_status_contrato(request, contrato_id):
     return redirect('juridico:detalhes_contrato', contrato_id=contrato_id)
 
 
-def enviar_parcelas_asaas(venda):
-    """
-    Envia todas as parcelas pendentes de uma venda para o ASAAS.
-    Retorna dict com estatísticas do envio.
-    """
-    from core.asaas_service import AsaasService
-    from core.services import LogService
-    
-    print(f"\n=== INICIANDO ENVIO DE PARCELAS PARA ASAAS ===")
-    print(f"Venda ID: {venda.id}")
-    
-    asaas = AsaasService()
-    resultado = {
-        'sucesso': True,
-        'total_enviadas': 0,
-        'total_erros': 0,
-        'erros': []
-    }
-    
-    # Buscar parcelas que ainda não foram enviadas ao ASAAS (verificando id_asaas)
-    parcelas_pendentes = Parcela.objects.filter(
-        venda=venda
-    ).filter(
-        Q(id_asaas__isnull=True) | Q(id_asaas='') | Q(id_asaas='None')
-    ).order_by('numero_parcela')
-    
-    print(f"Parcelas pendentes encontradas: {parcelas_pendentes.count()}")
-    
-    if not parcelas_pendentes.exists():
-        resultado['mensagem'] = 'Nenhuma parcela pendente para enviar'
-        print("❌ Nenhuma parcela pendente!")
-        return resultado
-    
-    # Buscar/criar cliente no ASAAS
-    try:
-        cliente = venda.cliente
-        lead = cliente.lead
-        
-        print(f"\n  Criando/Buscando cliente no ASAAS...")
-        print(f"  - Nome: {lead.nome_completo}")
-        print(f"  - CPF/CNPJ: {getattr(lead, 'cpf_cnpj', None) or 'Não informado'}")
-        print(f"  - Email: {lead.email}")
-        print(f"  - Telefone: {lead.telefone}")
-        
-        asaas_customer = asaas.criar_cliente({
-            'nome': lead.nome_completo,
-            'cpf_cnpj': getattr(lead, 'cpf_cnpj', None) or '',
-            'email': lead.email,
-            'telefone': lead.telefone,
-            'cep': cliente.cep or '',
-            'endereco': cliente.rua or '',
-            'numero': cliente.numero or '',
-            'bairro': cliente.bairro or '',
-            'id_cliente': str(cliente.id),
-        })
-        
-        customer_id = asaas_customer.get('id')
-        print(f"  ✅ Cliente ASAAS criado/encontrado: {customer_id}")
-        
-        if not customer_id:
-            raise Exception("ASAAS não retornou ID do cliente")
-        
-    except Exception as e:
-        resultado['sucesso'] = False
-        resultado['erros'].append(f'Erro ao criar/buscar cliente no ASAAS: {str(e)}')
-        try:
-            LogService.log_error(
-                'ASAAS_ERRO_CLIENTE',
-                f'Erro ao criar cliente no ASAAS para venda #{venda.id}: {str(e)}'
-            )
-        except:
-            pass
-        return resultado
-    
-    # Enviar cada parcela
-    for parcela in parcelas_pendentes:
-        try:
-            print(f"\n  Enviando parcela {parcela.numero_parcela}...")
-            print(f"  - Valor: R$ {parcela.valor}")
-            print(f"  - Vencimento: {parcela.data_vencimento}")
-            
-            cobranca = asaas.criar_cobranca({
-                'customer_id': customer_id,  # Corrigido: era 'customer', deve ser 'customer_id'
-                'billing_type': venda.forma_pagamento,  # Corrigido: era 'billingType'
-                'value': float(parcela.valor),
-                'due_date': parcela.data_vencimento.isoformat(),  # Corrigido: era 'dueDate'
-                'description': f'Parcela {parcela.numero_parcela}/{parcelas_pendentes.count()} - Venda #{venda.id} - {venda.servico.nome}',
-                'external_reference': f'venda_{venda.id}_parcela_{parcela.numero_parcela}',  # Corrigido: era 'externalReference'
-            })
-            
-            print(f"  ✅ Cobrança criada no ASAAS: {cobranca.get('id', '')}")
-            
-            # Atualizar parcela com dados do ASAAS
-            parcela.id_asaas = cobranca.get('id', '')
-            parcela.url_boleto = cobranca.get('bankSlipUrl', '')
-            parcela.codigo_barras = cobranca.get('identificationField', '')
-            parcela.enviado_asaas = True
-            parcela.data_envio_asaas = timezone.now()
-            parcela.status = 'aberta'  # Garantir que status seja 'aberta' (pendente)
-            parcela.save()
-            
-            resultado['total_enviadas'] += 1
-            
-            # Log de sucesso
-            try:
-                LogService.log_info(
-                    'PARCELA_ENVIADA_ASAAS',
-                    f'Parcela {parcela.numero_parcela} da venda #{venda.id} enviada ao ASAAS (ID: {parcela.id_asaas})'
-                )
-            except:
-                pass
-            
-        except Exception as e:
-            resultado['sucesso'] = False
-            resultado['total_erros'] += 1
-            erro_msg = f'Parcela {parcela.numero_parcela}: {str(e)}'
-            resultado['erros'].append(erro_msg)
-            
-            # Log de erro
-            try:
-                LogService.log_error(
-                    'ASAAS_ERRO_PARCELA',
-                    f'Erro ao enviar parcela {parcela.numero_parcela} da venda #{venda.id} ao ASAAS: {str(e)}'
-                )
-            except:
-                pass
-    
-    # Ajustar o retorno para ser compatível
-    resultado['sucesso'] = resultado['total_enviadas']
-    return resultado
-
-
 @login_required
 @user_passes_test(is_compliance_or_juridico)
 def painel_contratos_enviados(request):
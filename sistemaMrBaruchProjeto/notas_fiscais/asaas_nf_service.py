@@ -7,6 +7,7 @@ from django.conf import settings
 from django.utils import timezone
 from decimal import Decimal
 import logging
+from core.asaas_client import AsaasClient
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +38,8 @@ class AsaasNFService:
             'access_token': self.api_key,
             'Content-Type': 'application/json'
         }
+        # Session compartilhada por token (keep-alive) + limitador da conta
+        self.client = AsaasClient(self.api_key, base_url=self.base_url, timeout=30)
         
         print(f"[AsaasNF] Inicializado - Base URL: {self.base_url}")
         print(f"[AsaasNF] API Key (primeiros 20 chars): {self.api_key[:20]}...")
@@ -246,12 +249,7 @@ class AsaasNFService:
             logger.info(f"[AsaasNF] Enviando requisição para {url}")
             logger.debug(f"[AsaasNF] Payload: {payload}")
             
-            response = requests.post(
-                url,
-                json=payload,
-                headers=self.headers,
-                timeout=30
-            )
+            response = self.client.post('invoices', json=payload)
             
             logger.info(f"[AsaasNF] Status da resposta: {response.status_code}")
             
@@ -320,14 +318,8 @@ class AsaasNFService:
         Returns:
             dict: Resultado da consulta
         """
-        url = f"{self.base_url}/invoices/{id_nf_asaas}"
-        
         try:
-            response = requests.get(
-                url,
-                headers=self.headers,
-                timeout=30
-            )
+            response = self.client.get(f'invoices/{id_nf_asaas}')
             
             if response.status_code == 200:
                 data = response.json()
@@ -360,19 +352,12 @@ class AsaasNFService:
         Returns:
             dict: Resultado do cancelamento
         """
-        url = f"{self.base_url}/invoices/{id_nf_asaas}"
-        
         payload = {
             "cancelDescription": motivo
         }
         
         try:
-            response = requests.delete(
-                url,
-                json=payload,
-                headers=self.headers,
-                timeout=30
-            )
+            response = self.client.delete(f'invoices/{id_nf_asaas}', json=payload)
             
             if response.status_code in [200, 204]:
                 logger.info(f"[AsaasNF] Nota {id_nf_asaas} cancelada com sucesso")
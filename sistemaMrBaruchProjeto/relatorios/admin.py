@@ -1,3 +1,16 @@
 from django.contrib import admin
+from .models import FatoLeadMensal, FatoReceitaMensal
 
-# Register your models here.
+
+@admin.register(FatoLeadMensal)
+class FatoLeadMensalAdmin(admin.ModelAdmin):
+    list_display = ('mes', 'status', 'origem', 'captador', 'quantidade')
+    list_filter = ('mes', 'status', 'origem')
+    raw_id_fields = ('captador',)
+
+
+@admin.register(FatoReceitaMensal)
+class FatoReceitaMensalAdmin(admin.ModelAdmin):
+    list_display = ('mes', 'consultor', 'vendas', 'parcelas_pagas', 'receita')
+    list_filter = ('mes',)
+    raw_id_fields = ('consultor',)
@@ -0,0 +1,113 @@
+"""
+Agregação condicional em uma passada para os relatórios
+Em vez de um aggregate()/count() por status (cada um varrendo o mesmo queryset),
+todos os números de um queryset saem de um único aggregate() com filter=Q(...):
+
+    resumo = resumo_status(
+        comissoes, 'valor_comissao',
+        pagas=Q(status='paga'), pendentes=Q(status='pendente'),
+        chave_cache=('comissoes', 'captadores', periodo, status, usuario_id),
+    )
+    resumo['total'], resumo['pagas'], resumo['qtd_pendentes'], ...
+
+Com `chave_cache`, o resultado fica no cache do Django por RELATORIOS_CACHE_TTL
+segundos (padrão 60). A chave deve identificar os filtros que montaram o queryset
+(período, status, usuário...), não o queryset em si.
+
+totais_por_grupo() faz o mesmo agrupado (uma linha por usuário, por exemplo), para
+juntar em memória a listas já montadas em vez de um aggregate por linha.
+"""
+import hashlib
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+CACHE_PREFIXO = 'relatorios:agregacao:'
+
+
+def ttl_cache():
+    return int(getattr(settings, 'RELATORIOS_CACHE_TTL', 60))
+
+
+def _chave(partes):
+    texto = ':'.join(str(parte) for parte in partes)
+    return CACHE_PREFIXO + hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+def em_cache(chave_cache, calcular, ttl=None):
+    """Resultado de calcular() guardado no cache sob as partes de chave_cache"""
+    chave = _chave(chave_cache)
+    resultado = cache.get(chave)
+    if resultado is None:
+        resultado = calcular()
+        cache.set(chave, resultado, ttl if ttl is not None else ttl_cache())
+    return resultado
+
+
+def agregar(queryset, metricas, chave_cache=None, ttl=None):
+    """
+    Executa `metricas` ({nome: Aggregate}) em um único aggregate() do queryset.
+
+    Args:
+        queryset: queryset já filtrado
+        metricas: dict nome -> Sum/Count/... (com filter=Q(...) quando condicional)
+        chave_cache: partes da chave do cache (tupla); None desativa o cache
+        ttl: segundos no cache (padrão: RELATORIOS_CACHE_TTL)
+
+    Returns:
+        dict nome -> valor (None quando não há linhas)
+    """
+    def calcular():
+        return queryset.order_by().aggregate(**metricas)
+
+    if chave_cache is None:
+        return calcular()
+    return em_cache(chave_cache, calcular, ttl)
+
+
+def resumo_status(queryset, campo_valor, pagas, pendentes, chave_cache=None, ttl=None):
+    """
+    Total, pagas e pendentes (valor e quantidade) de um queryset em uma consulta.
+
+    Args:
+        campo_valor: campo somado (ex.: 'valor_comissao')
+        pagas / pendentes: Q que define cada situação
+
+    Returns:
+        dict com total, pagas, pendentes (Decimal) e qtd, qtd_pagas, qtd_pendentes (int)
+    """
+    resultado = agregar(queryset, {
+        'total': Sum(campo_valor),
+        'pagas': Sum(campo_valor, filter=pagas),
+        'pendentes': Sum(campo_valor, filter=pendentes),
+        'qtd': Count('pk'),
+        'qtd_pagas': Count('pk', filter=pagas),
+        'qtd_pendentes': Count('pk', filter=pendentes),
+    }, chave_cache=chave_cache, ttl=ttl)
+    return {
+        nome: (valor if valor is not None else (Decimal('0') if not nome.startswith('qtd') else 0))
+        for nome, valor in resultado.items()
+    }
+
+
+def totais_por_grupo(queryset, campo_grupo, campo_valor, pagas, pendentes):
+    """
+    Total, pagas e pendentes (valores) por `campo_grupo`, em uma consulta agrupada.
+
+    Returns:
+        dict grupo -> {'total', 'pagas', 'pendentes'} (Decimal); grupos sem linhas não aparecem
+    """
+    linhas = queryset.order_by().values(campo_grupo).annotate(
+        total=Sum(campo_valor),
+        pagas=Sum(campo_valor, filter=pagas),
+        pendentes=Sum(campo_valor, filter=pendentes),
+    )
+    return {
+        linha[campo_grupo]: {
+            'total': linha['total'] or Decimal('0'),
+            'pagas': linha['pagas'] or Decimal('0'),
+            'pendentes': linha['pendentes'] or Decimal('0'),
+        }
+        for linha in linhas
+    }
@@ -0,0 +1,250 @@
+"""
+Fatos mensais dos dashboards de relatórios
+FatoLeadMensal (mês × status × origem × captador) e FatoReceitaMensal
+(mês × consultor: vendas fechadas, parcelas pagas e receita) são mantidos:
+- pelos signals de Lead, Venda e Parcela (save/delete), com o delta entre o
+  estado anterior e o novo de cada registro
+- pela reconstrução noturna (`python manage.py reconstruir_fatos_mensais`), que
+  corrige o que os signals não veem (.update(), bulk_update, edição direta no banco)
+
+Os dashboards leem as séries de 12 meses daqui (uma consulta agrupada) em vez de
+contar Lead e somar Parcela mês a mês.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from marketing.models import Lead
+from vendas.models import Venda
+from financeiro.models import Parcela
+from .models import FatoLeadMensal, FatoReceitaMensal
+
+logger = logging.getLogger(__name__)
+
+
+def mes_referencia(data):
+    """Primeiro dia do mês (local) de uma data/datetime"""
+    if data is None:
+        return None
+    if isinstance(data, datetime):
+        if timezone.is_aware(data):
+            data = timezone.localtime(data)
+        data = data.date()
+    return data.replace(day=1)
+
+
+def ultimos_meses(quantidade=12, referencia=None):
+    """Primeiros dias dos últimos `quantidade` meses, do mais antigo ao atual"""
+    mes = mes_referencia(referencia or timezone.now())
+    meses = [mes]
+    for _ in range(quantidade - 1):
+        mes = (mes - timedelta(days=1)).replace(day=1)
+        meses.append(mes)
+    return list(reversed(meses))
+
+
+def _inicio_mes(mes):
+    """datetime (aware, se USE_TZ) do início do mês, para filtrar DateTimeField"""
+    inicio = datetime.combine(mes, time.min)
+    return timezone.make_aware(inicio) if getattr(settings, 'USE_TZ', False) else inicio
+
+
+# =============================================================================
+# Deltas
+# =============================================================================
+
+def _aplicar_deltas(modelo, dimensoes, deltas):
+    """
+    Soma os deltas {chave: {campo: valor}} nas linhas de `modelo`.
+    `chave` segue a ordem de `dimensoes` (nomes dos campos de dimensão).
+    """
+    for chave, valores in deltas.items():
+        if not any(valores.values()):
+            continue
+        filtro = dict(zip(dimensoes, chave))
+        incremento = {campo: F(campo) + valor for campo, valor in valores.items()}
+        if modelo.objects.filter(**filtro).update(**incremento):
+            continue
+        try:
+            with transaction.atomic():
+                modelo.objects.create(**filtro, **valores)
+        except IntegrityError:
+            # Outro processo criou a linha entre o UPDATE e o INSERT
+            modelo.objects.filter(**filtro).update(**incremento)
+
+
+DIMENSOES_LEAD = ('mes', 'status', 'origem_id', 'captador_id')
+DIMENSOES_RECEITA = ('mes', 'consultor_id')
+
+
+def chave_lead(lead):
+    if lead is None or lead.get('data_cadastro') is None:
+        return None
+    return (mes_referencia(lead['data_cadastro']), lead['status'], lead['origem_id'], lead['captador_id'])
+
+
+def estado_lead(lead):
+    return {
+        'data_cadastro': lead.data_cadastro, 'status': lead.status,
+        'origem_id': lead.origem_id, 'captador_id': lead.captador_id,
+    }
+
+
+def aplicar_lead(anterior, atual):
+    """Move um lead da linha do estado anterior para a do atual (None = inexistente)"""
+    antiga, nova = chave_lead(anterior), chave_lead(atual)
+    if antiga == nova:
+        return
+    deltas = defaultdict(lambda: {'quantidade': 0})
+    if antiga:
+        deltas[antiga]['quantidade'] -= 1
+    if nova:
+        deltas[nova]['quantidade'] += 1
+    _aplicar_deltas(FatoLeadMensal, DIMENSOES_LEAD, deltas)
+
+
+def contribuicoes_venda(venda):
+    """{chave: valores} de uma venda (estado dict com data_venda e consultor_id)"""
+    if venda is None or venda.get('data_venda') is None:
+        return {}
+    return {(mes_referencia(venda['data_venda']), venda['consultor_id']): {'vendas': 1}}
+
+
+def contribuicoes_parcela(parcela):
+    """{chave: valores} de uma parcela (estado dict com status, data_pagamento, valor, consultor_id)"""
+    if parcela is None or parcela.get('status') != 'paga' or parcela.get('data_pagamento') is None:
+        return {}
+    chave = (mes_referencia(parcela['data_pagamento']), parcela['consultor_id'])
+    return {chave: {'parcelas_pagas': 1, 'receita': Decimal(parcela['valor'] or 0)}}
+
+
+def aplicar_receita(anteriores, atuais):
+    """Aplica a diferença entre as contribuições anteriores e as atuais"""
+    deltas = defaultdict(lambda: {'vendas': 0, 'parcelas_pagas': 0, 'receita': Decimal('0')})
+    for chave, valores in anteriores.items():
+        for campo, valor in valores.items():
+            deltas[chave][campo] -= valor
+    for chave, valores in atuais.items():
+        for campo, valor in valores.items():
+            deltas[chave][campo] += valor
+    _aplicar_deltas(FatoReceitaMensal, DIMENSOES_RECEITA, deltas)
+
+
+# =============================================================================
+# Reconstrução
+# =============================================================================
+
+def reconstruir(desde=None):
+    """
+    Reconstrói os fatos a partir das tabelas de origem (tudo ou a partir do mês de `desde`).
+
+    Returns:
+        dict com a quantidade de linhas gravadas em cada tabela
+    """
+    leads = Lead.objects.order_by()
+    vendas = Venda.objects.order_by()
+    parcelas = Parcela.objects.filter(status='paga', data_pagamento__isnull=False).order_by()
+    fatos_lead = FatoLeadMensal.objects.all()
+    fatos_receita = FatoReceitaMensal.objects.all()
+
+    if desde is not None:
+        desde = mes_referencia(desde)
+        leads = leads.filter(data_cadastro__gte=_inicio_mes(desde))
+        vendas = vendas.filter(data_venda__gte=desde)
+        parcelas = parcelas.filter(data_pagamento__gte=desde)
+        fatos_lead = fatos_lead.filter(mes__gte=desde)
+        fatos_receita = fatos_receita.filter(mes__gte=desde)
+
+    linhas_lead = defaultdict(int)
+    for linha in (
+        leads.annotate(mes_cadastro=TruncMonth('data_cadastro'))
+        .values('mes_cadastro', 'status', 'origem_id', 'captador_id')
+        .annotate(quantidade=Count('id'))
+    ):
+        chave = (mes_referencia(linha['mes_cadastro']), linha['status'], linha['origem_id'], linha['captador_id'])
+        linhas_lead[chave] += linha['quantidade']
+
+    linhas_receita = defaultdict(lambda: {'vendas': 0, 'parcelas_pagas': 0, 'receita': Decimal('0')})
+    for linha in (
+        vendas.annotate(mes_venda=TruncMonth('data_venda'))
+        .values('mes_venda', 'consultor_id')
+        .annotate(quantidade=Count('id'))
+    ):
+        linhas_receita[(mes_referencia(linha['mes_venda']), linha['consultor_id'])]['vendas'] += linha['quantidade']
+    for linha in (
+        parcelas.annotate(mes_pagamento=TruncMonth('data_pagamento'))
+        .values('mes_pagamento', 'venda__consultor_id')
+        .annotate(quantidade=Count('id'), total=Sum('valor'))
+    ):
+        valores = linhas_receita[(mes_referencia(linha['mes_pagamento']), linha['venda__consultor_id'])]
+        valores['parcelas_pagas'] += linha['quantidade']
+        valores['receita'] += linha['total'] or Decimal('0')
+
+    with transaction.atomic():
+        fatos_lead.delete()
+        fatos_receita.delete()
+        FatoLeadMensal.objects.bulk_create([
+            FatoLeadMensal(mes=mes, status=status, origem_id=origem_id, captador_id=captador_id, quantidade=quantidade)
+            for (mes, status, origem_id, captador_id), quantidade in linhas_lead.items()
+        ], batch_size=1000)
+        FatoReceitaMensal.objects.bulk_create([
+            FatoReceitaMensal(mes=mes, consultor_id=consultor_id, **valores)
+            for (mes, consultor_id), valores in linhas_receita.items()
+        ], batch_size=1000)
+
+    stats = {'leads': len(linhas_lead), 'receita': len(linhas_receita)}
+    logger.info(f"📊 Fatos mensais reconstruídos: {stats}")
+    return stats
+
+
+# =============================================================================
+# Consultas dos dashboards
+# =============================================================================
+
+def series_mensais(meses):
+    """
+    Séries alinhadas a `meses` (lista de primeiros dias de mês).
+
+    Returns:
+        dict com leads, vendas, parcelas_pagas e receita (listas, uma posição por mês)
+    """
+    inicio = meses[0]
+    leads = dict(
+        FatoLeadMensal.objects.filter(mes__gte=inicio).order_by()
+        .values('mes').annotate(total=Sum('quantidade')).values_list('mes', 'total')
+    )
+    receita = {
+        linha['mes']: linha
+        for linha in FatoReceitaMensal.objects.filter(mes__gte=inicio).order_by()
+        .values('mes').annotate(vendas_mes=Sum('vendas'), parcelas_mes=Sum('parcelas_pagas'), receita_mes=Sum('receita'))
+    }
+    return {
+        'leads': [leads.get(mes) or 0 for mes in meses],
+        'vendas': [(receita.get(mes) or {}).get('vendas_mes') or 0 for mes in meses],
+        'parcelas_pagas': [(receita.get(mes) or {}).get('parcelas_mes') or 0 for mes in meses],
+        'receita': [float((receita.get(mes) or {}).get('receita_mes') or 0) for mes in meses],
+    }
+
+
+def totais_leads():
+    """Total geral de leads e total por status (todo o histórico)"""
+    por_status = dict(
+        FatoLeadMensal.objects.order_by().values('status')
+        .annotate(total=Sum('quantidade')).values_list('status', 'total')
+    )
+    return sum(por_status.values()), por_status
+
+
+def leads_por_dimensao(campo, limite=None, filtro=None):
+    """[{campo..., 'total'}] somando os fatos agrupados por `campo` (ex.: 'origem__nome')"""
+    campos = campo if isinstance(campo, (list, tuple)) else [campo]
+    consulta = FatoLeadMensal.objects.order_by()
+    if filtro is not None:
+        consulta = consulta.filter(filtro)
+    consulta = consulta.values(*campos).annotate(total=Sum('quantidade')).filter(total__gt=0).order_by('-total')
+    return list(consulta[:limite] if limite else consulta)
@@ -0,0 +1,34 @@
+"""
+Reconstrói os fatos mensais dos dashboards (FatoLeadMensal / FatoReceitaMensal)
+Rodar toda noite (cron), ex.: 30 2 * * * python manage.py reconstruir_fatos_mensais --meses 3
+Sem --meses/--desde reconstrói todo o histórico (carga inicial após o migrate).
+"""
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from relatorios.fatos import reconstruir, ultimos_meses
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os fatos mensais de leads e receita (todo o histórico ou os últimos meses)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, help='Reconstrói só os últimos N meses (inclui o atual)')
+        parser.add_argument('--desde', help='Reconstrói a partir do mês desta data (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            try:
+                desde = datetime.strptime(options['desde'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f"Data inválida: {options['desde']} (use YYYY-MM-DD)")
+        elif options['meses']:
+            if options['meses'] < 1:
+                raise CommandError('--meses deve ser maior que zero')
+            desde = ultimos_meses(options['meses'])[0]
+
+        self.stdout.write(f"📊 Reconstruindo fatos mensais{f' desde {desde:%m/%Y}' if desde else ''}...")
+        stats = reconstruir(desde)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {stats['leads']} linhas de leads e {stats['receita']} linhas de receita gravadas"
+        ))
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('marketing', '0013_lead_data_nascimento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FatoLeadMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(verbose_name='Mês')),
+                ('status', models.CharField(max_length=25, verbose_name='Status')),
+                ('quantidade', models.IntegerField(default=0, verbose_name='Quantidade')),
+                ('captador', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('origem', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='marketing.origemlead')),
+            ],
+            options={
+                'verbose_name': 'Fato Mensal de Leads',
+                'verbose_name_plural': 'Fatos Mensais de Leads',
+                'db_table': 'relatorios_fato_lead_mensal',
+                'ordering': ['-mes'],
+                'unique_together': {('mes', 'status', 'origem', 'captador')},
+            },
+        ),
+        migrations.CreateModel(
+            name='FatoReceitaMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(verbose_name='Mês')),
+                ('vendas', models.IntegerField(default=0, verbose_name='Vendas')),
+                ('parcelas_pagas', models.IntegerField(default=0, verbose_name='Parcelas Pagas')),
+                ('receita', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Receita')),
+                ('consultor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Fato Mensal de Receita',
+                'verbose_name_plural': 'Fatos Mensais de Receita',
+                'db_table': 'relatorios_fato_receita_mensal',
+                'ordering': ['-mes'],
+                'unique_together': {('mes', 'consultor')},
+            },
+        ),
+    ]
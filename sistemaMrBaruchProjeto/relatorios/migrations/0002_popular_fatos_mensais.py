@@ -0,0 +1,80 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:10
+
+from django.db import migrations
+
+
+def popular_fatos(apps, schema_editor):
+    """Carga inicial dos fatos mensais (mesma agregação de relatorios.fatos.reconstruir)"""
+    from collections import defaultdict
+    from datetime import datetime
+    from decimal import Decimal
+    from django.db.models import Count, Sum
+    from django.db.models.functions import TruncMonth
+    from django.utils import timezone
+
+    Lead = apps.get_model('marketing', 'Lead')
+    Venda = apps.get_model('vendas', 'Venda')
+    Parcela = apps.get_model('financeiro', 'Parcela')
+    FatoLeadMensal = apps.get_model('relatorios', 'FatoLeadMensal')
+    FatoReceitaMensal = apps.get_model('relatorios', 'FatoReceitaMensal')
+
+    def mes(data):
+        if isinstance(data, datetime):
+            if timezone.is_aware(data):
+                data = timezone.localtime(data)
+            data = data.date()
+        return data.replace(day=1)
+
+    linhas_lead = defaultdict(int)
+    for linha in (
+        Lead.objects.order_by().annotate(mes_cadastro=TruncMonth('data_cadastro'))
+        .values('mes_cadastro', 'status', 'origem_id', 'captador_id')
+        .annotate(quantidade=Count('id'))
+    ):
+        if linha['mes_cadastro'] is None:
+            continue
+        linhas_lead[(mes(linha['mes_cadastro']), linha['status'], linha['origem_id'], linha['captador_id'])] += linha['quantidade']
+
+    linhas_receita = defaultdict(lambda: {'vendas': 0, 'parcelas_pagas': 0, 'receita': Decimal('0')})
+    for linha in (
+        Venda.objects.order_by().annotate(mes_venda=TruncMonth('data_venda'))
+        .values('mes_venda', 'consultor_id')
+        .annotate(quantidade=Count('id'))
+    ):
+        if linha['mes_venda'] is None:
+            continue
+        linhas_receita[(mes(linha['mes_venda']), linha['consultor_id'])]['vendas'] += linha['quantidade']
+    for linha in (
+        Parcela.objects.filter(status='paga', data_pagamento__isnull=False).order_by()
+        .annotate(mes_pagamento=TruncMonth('data_pagamento'))
+        .values('mes_pagamento', 'venda__consultor_id')
+        .annotate(quantidade=Count('id'), total=Sum('valor'))
+    ):
+        valores = linhas_receita[(mes(linha['mes_pagamento']), linha['venda__consultor_id'])]
+        valores['parcelas_pagas'] += linha['quantidade']
+        valores['receita'] += linha['total'] or Decimal('0')
+
+    FatoLeadMensal.objects.all().delete()
+    FatoReceitaMensal.objects.all().delete()
+    FatoLeadMensal.objects.bulk_create([
+        FatoLeadMensal(mes=mes_fato, status=status, origem_id=origem_id, captador_id=captador_id, quantidade=quantidade)
+        for (mes_fato, status, origem_id, captador_id), quantidade in linhas_lead.items()
+    ], batch_size=1000)
+    FatoReceitaMensal.objects.bulk_create([
+        FatoReceitaMensal(mes=mes_fato, consultor_id=consultor_id, **valores)
+        for (mes_fato, consultor_id), valores in linhas_receita.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relatorios', '0001_initial'),
+        ('marketing', '0013_lead_data_nascimento'),
+        ('vendas', '0013_entradaprevenda'),
+        ('financeiro', '0010_parcela_status_index_historicostatusparcela'),
+    ]
+
+    operations = [
+        migrations.RunPython(popular_fatos, migrations.RunPython.noop),
+    ]
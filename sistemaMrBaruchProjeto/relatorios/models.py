@@ -1,3 +1,68 @@
 from django.db import models
+from django.conf import settings
 
-# Create your models here.
+
+class FatoLeadMensal(models.Model):
+    """
+    Leads cadastrados por mês × status × origem × captador
+    Mantido pelos signals de Lead (relatorios.fatos) e reconstruído toda noite
+    por `reconstruir_fatos_mensais`; os dashboards somam estas linhas em vez de
+    contar Lead mês a mês.
+    """
+
+    mes = models.DateField('Mês')  # Primeiro dia do mês (data local de cadastro)
+    status = models.CharField('Status', max_length=25)
+    origem = models.ForeignKey(
+        'marketing.OrigemLead',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    captador = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    quantidade = models.IntegerField('Quantidade', default=0)
+
+    class Meta:
+        db_table = 'relatorios_fato_lead_mensal'
+        verbose_name = 'Fato Mensal de Leads'
+        verbose_name_plural = 'Fatos Mensais de Leads'
+        ordering = ['-mes']
+        unique_together = ['mes', 'status', 'origem', 'captador']
+
+    def __str__(self):
+        return f"{self.mes:%m/%Y} - {self.status}: {self.quantidade}"
+
+
+class FatoReceitaMensal(models.Model):
+    """
+    Vendas fechadas (por data_venda) e parcelas pagas (por data_pagamento)
+    por mês × consultor. Mesma manutenção de FatoLeadMensal.
+    """
+
+    mes = models.DateField('Mês')
+    consultor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    vendas = models.IntegerField('Vendas', default=0)
+    parcelas_pagas = models.IntegerField('Parcelas Pagas', default=0)
+    receita = models.DecimalField('Receita', max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'relatorios_fato_receita_mensal'
+        verbose_name = 'Fato Mensal de Receita'
+        verbose_name_plural = 'Fatos Mensais de Receita'
+        ordering = ['-mes']
+        unique_together = ['mes', 'consultor']
+
+    def __str__(self):
+        return f"{self.mes:%m/%Y} - consultor #{self.consultor_id}: R$ {self.receita}"
@@ -0,0 +1,152 @@
+"""
+Manutenção incremental dos fatos mensais (relatorios.fatos)
+pre_save guarda o estado gravado do registro; post_save/post_delete aplicam a
+diferença. Erros aqui nunca impedem o save: a reconstrução noturna corrige.
+"""
+import logging
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from marketing.models import Lead
+from vendas.models import Venda
+from financeiro.models import Parcela
+from . import fatos
+
+logger = logging.getLogger(__name__)
+
+
+def _estado_anterior(modelo, instance, campos):
+    if instance.pk is None:
+        return None
+    return modelo.objects.filter(pk=instance.pk).values(*campos).first()
+
+
+# ========== LEAD ==========
+
+CAMPOS_LEAD = ('data_cadastro', 'status', 'origem_id', 'captador_id')
+
+
+@receiver(pre_save, sender=Lead)
+def guardar_estado_lead(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        instance._fato_anterior = _estado_anterior(Lead, instance, CAMPOS_LEAD)
+    except Exception as e:
+        logger.error(f"[Fatos] ❌ Erro ao ler estado do lead #{instance.pk}: {e}")
+        instance._fato_anterior = False
+
+
+@receiver(post_save, sender=Lead)
+def atualizar_fato_lead(sender, instance, raw=False, **kwargs):
+    anterior = getattr(instance, '_fato_anterior', False)
+    if raw or anterior is False:
+        return
+    try:
+        fatos.aplicar_lead(anterior, fatos.estado_lead(instance))
+    except Exception as e:
+        logger.error(f"[Fatos] ❌ Erro ao atualizar fato do lead #{instance.pk}: {e}")
+    instance._fato_anterior = False
+
+
+@receiver(post_delete, sender=Lead)
+def remover_fato_lead(sender, instance, **kwargs):
+    try:
+        fatos.aplicar_lead(fatos.estado_lead(instance), None)
+    except Exception as e:
+        logger.error(f"[Fatos] ❌ Erro ao remover fato do lead #{instance.pk}: {e}")
+
+
+# ========== VENDA ==========
+
+CAMPOS_VENDA = ('data_venda', 'consultor_id')
+
+
+@receiver(pre_save, sender=Venda)
+def guardar_estado_venda(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        instance._fato_anterior = _estado_anterior(Venda, instance, CAMPOS_VENDA)
+    except Exception as e:
+        logger.error(f"[Fatos] ❌ Erro ao ler estado da venda #{instance.pk}: {e}")
+        instance._fato_anterior = False
+
+
+@receiver(post_save, sender=Venda)
+def atualizar_fato_venda(sender, instance, raw=False, **kwargs):
+    anterior = getattr(instance, '_fato_anterior', False)
+    if raw or anterior is False:
+        return
+    try:
+        atual = {'data_venda': instance.data_venda, 'consultor_id': instance.consultor_id}
+        fatos.aplicar_receita(fatos.contribuicoes_venda(anterior), fatos.contribuicoes_venda(atual))
+    except Exception as e:
+        logger.error(f"[Fatos] ❌ Erro ao atualizar fato da venda #{instance.pk}: {e}")
+    instance._fato_anterior = False
+
+
+@receiver(post_delete, sender=Venda)
+def remover_fato_venda(sender, instance, **kwargs):
+    try:
+        atual = {'data_venda': instance.data_venda, 'consultor_id': instance.consultor_id}
+        fatos.aplicar_receita(fatos.contribuicoes_venda(atual), {})
+    except Exception as e:
+        logger.error(f"[Fatos] ❌ Erro ao remover fato da venda #{instance.pk}: {e}")
+
+
+# ========== PARCELA ==========
+
+CAMPOS_PARCELA = ('status', 'data_pagamento', 'valor', 'venda__consultor_id')
+
+
+def _estado_parcela(instance, consultor_id):
+    return {
+        'status': instance.status, 'data_pagamento': instance.data_pagamento,
+        'valor': instance.valor, 'consultor_id': consultor_id,
+    }
+
+
+def _consultor_parcela(instance, anterior):
+    if anterior:
+        return anterior['consultor_id']
+    return Venda.objects.filter(pk=instance.venda_id).values_list('consultor_id', flat=True).first()
+
+
+@receiver(pre_save, sender=Parcela)
+def guardar_estado_parcela(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        anterior = _estado_anterior(Parcela, instance, CAMPOS_PARCELA)
+        if anterior:
+            anterior['consultor_id'] = anterior.pop('venda__consultor_id')
+        instance._fato_anterior = anterior
+    except Exception as e:
+        logger.error(f"[Fatos] ❌ Erro ao ler estado da parcela #{instance.pk}: {e}")
+        instance._fato_anterior = False
+
+
+@receiver(post_save, sender=Parcela)
+def atualizar_fato_parcela(sender, instance, raw=False, **kwargs):
+    anterior = getattr(instance, '_fato_anterior', False)
+    if raw or anterior is False:
+        return
+    try:
+        anteriores = fatos.contribuicoes_parcela(anterior)
+        if anteriores or (instance.status == 'paga' and instance.data_pagamento):
+            atual = _estado_parcela(instance, _consultor_parcela(instance, anterior))
+            fatos.aplicar_receita(anteriores, fatos.contribuicoes_parcela(atual))
+    except Exception as e:
+        logger.error(f"[Fatos] ❌ Erro ao atualizar fato da parcela #{instance.pk}: {e}")
+    instance._fato_anterior = False
+
+
+@receiver(post_delete, sender=Parcela)
+def remover_fato_parcela(sender, instance, **kwargs):
+    if instance.status != 'paga' or not instance.data_pagamento:
+        return
+    try:
+        atual = _estado_parcela(instance, _consultor_parcela(instance, None))
+        fatos.aplicar_receita(fatos.contribuicoes_parcela(atual), {})
+    except Exception as e:
+        logger.error(f"[Fatos] ❌ Erro ao remover fato da parcela #{instance.pk}: {e}")
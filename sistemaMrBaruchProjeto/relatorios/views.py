@@ -13,6 +13,9 @@ from marketing.models import Lead
 from comissoes.models import ComissaoLead
 from vendas.models import Venda, PreVenda
 from financeiro.models import Parcela, PixLevantamento
+from .fatos import series_mensais, ultimos_meses, totais_leads, leads_por_dimensao
+from .agregacao import resumo_status, em_cache, totais_por_grupo
+from core.cache_relatorios import obter_relatorio
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -23,20 +26,31 @@ def painel_relatorios(request):
     """
     Painel principal de relatórios com resumo geral e acesso aos relatórios específicos.
     """
+    context = obter_relatorio('painel_relatorios', {}, ('lead', 'comissao_lead'), _dados_painel_relatorios)
+    
+    return render(request, 'relatorios/painel_relatorios.html', context)
+
+
+def _dados_painel_relatorios():
+    """Números do painel de relatórios (em cache: obter_relatorio)"""
     # Período padrão: últimos 30 dias
     data_inicio = timezone.now() - timedelta(days=30)
     data_fim = timezone.now()
     
-    # Estatísticas gerais
-    total_leads = Lead.objects.count()
+    # Estatísticas gerais (totais lidos dos fatos mensais)
+    total_leads, leads_por_status = totais_leads()
     leads_periodo = Lead.objects.filter(data_cadastro__gte=data_inicio).count()
-    leads_pagos = Lead.objects.filter(status='PAGO').count()
+    leads_pagos = leads_por_status.get('PAGO', 0)
     taxa_conversao = (leads_pagos / total_leads * 100) if total_leads > 0 else 0
     
     # Comissões
-    total_comissoes = ComissaoLead.objects.aggregate(total=Sum('valor'))['total'] or 0
-    comissoes_pagas = ComissaoLead.objects.filter(status='PAGO').aggregate(total=Sum('valor'))['total'] or 0
-    comissoes_pendentes = ComissaoLead.objects.filter(status__in=['DISPONIVEL', 'AUTORIZADO']).aggregate(total=Sum('valor'))['total'] or 0
+    resumo_comissoes = resumo_status(
+        ComissaoLead.objects.all(), 'valor',
+        pagas=Q(status='PAGO'), pendentes=Q(status__in=['DISPONIVEL', 'AUTORIZADO'])
+    )
+    total_comissoes = resumo_comissoes['total']
+    comissoes_pagas = resumo_comissoes['pagas']
+    comissoes_pendentes = resumo_comissoes['pendentes']
     
     # Top atendentes
     top_atendentes = ComissaoLead.objects.values(
@@ -59,7 +73,7 @@ def painel_relatorios(request):
         'top_atendentes': top_atendentes,
     }
     
-    return render(request, 'relatorios/painel_relatorios.html', context)
+    return context
 
 
 @login_required
@@ -225,29 +239,35 @@ def relatorio_comissoes(request):
     page_atendentes = request.GET.get('page_atendentes', 1)
     atendentes_paginadas = paginator_atendentes.get_page(page_atendentes)
     
-    # ========== ESTATÍSTICAS CAPTADORES ==========
-    total_captadores = comissoes_captadores.aggregate(total=Sum('valor_comissao'))['total'] or 0
-    total_captadores_pagas = comissoes_captadores.filter(status='paga').aggregate(total=Sum('valor_comissao'))['total'] or 0
-    total_captadores_pendentes = comissoes_captadores.filter(status='pendente').aggregate(total=Sum('valor_comissao'))['total'] or 0
-    qtd_captadores = comissoes_captadores.count()
-    qtd_captadores_pagas = comissoes_captadores.filter(status='paga').count()
-    qtd_captadores_pendentes = comissoes_captadores.filter(status='pendente').count()
-    
-    # ========== ESTATÍSTICAS CONSULTORES ==========
-    total_consultores = comissoes_consultores.aggregate(total=Sum('valor_comissao'))['total'] or 0
-    total_consultores_pagas = comissoes_consultores.filter(status='paga').aggregate(total=Sum('valor_comissao'))['total'] or 0
-    total_consultores_pendentes = comissoes_consultores.filter(status='pendente').aggregate(total=Sum('valor_comissao'))['total'] or 0
-    qtd_consultores = comissoes_consultores.count()
-    qtd_consultores_pagas = comissoes_consultores.filter(status='PAGO').count()
-    qtd_consultores_pendentes = comissoes_consultores.filter(status__in=['DISPONIVEL', 'AUTORIZADO']).count()
-    
-    # ========== ESTATÍSTICAS ATENDENTES ==========
-    total_atendentes = comissoes_atendentes.aggregate(total=Sum('valor'))['total'] or 0
-    total_atendentes_pagas = comissoes_atendentes.filter(status='PAGO').aggregate(total=Sum('valor'))['total'] or 0
-    total_atendentes_pendentes = comissoes_atendentes.filter(status__in=['DISPONIVEL', 'AUTORIZADO']).aggregate(total=Sum('valor'))['total'] or 0
-    qtd_atendentes = comissoes_atendentes.count()
-    qtd_atendentes_pagas = comissoes_atendentes.filter(status='PAGO').count()
-    qtd_atendentes_pendentes = comissoes_atendentes.filter(status__in=['DISPONIVEL', 'AUTORIZADO']).count()
+    # ========== ESTATÍSTICAS (um aggregate por grupo, cache curto) ==========
+    chave_filtros = ('comissoes', periodo, status_filter, usuario_id or '')
+    resumo_captadores = resumo_status(
+        comissoes_captadores, 'valor_comissao',
+        pagas=Q(status='paga'), pendentes=Q(status='pendente'),
+        chave_cache=chave_filtros + ('captadores',)
+    )
+    resumo_consultores = resumo_status(
+        comissoes_consultores, 'valor_comissao',
+        pagas=Q(status='paga'), pendentes=Q(status='pendente'),
+        chave_cache=chave_filtros + ('consultores',)
+    )
+    resumo_atendentes = resumo_status(
+        comissoes_atendentes, 'valor',
+        pagas=Q(status='PAGO'), pendentes=Q(status__in=['DISPONIVEL', 'AUTORIZADO']),
+        chave_cache=chave_filtros + ('atendentes',)
+    )
+    
+    total_captadores = resumo_captadores['total']
+    total_captadores_pagas = resumo_captadores['pagas']
+    total_captadores_pendentes = resumo_captadores['pendentes']
+    
+    total_consultores = resumo_consultores['total']
+    total_consultores_pagas = resumo_consultores['pagas']
+    total_consultores_pendentes = resumo_consultores['pendentes']
+    
+    total_atendentes = resumo_atendentes['total']
+    total_atendentes_pagas = resumo_atendentes['pagas']
+    total_atendentes_pendentes = resumo_atendentes['pendentes']
     
     # ========== TOTAL GERAL ==========
     total_geral = float(total_captadores) + float(total_consultores) + float(total_atendentes)
@@ -301,25 +321,25 @@ def relatorio_comissoes(request):
         'total_captadores': total_captadores,
         'total_captadores_pagas': total_captadores_pagas,
         'total_captadores_pendentes': total_captadores_pendentes,
-        'qtd_captadores': qtd_captadores,
-        'qtd_captadores_pagas': qtd_captadores_pagas,
-        'qtd_captadores_pendentes': qtd_captadores_pendentes,
+        'qtd_captadores': resumo_captadores['qtd'],
+        'qtd_captadores_pagas': resumo_captadores['qtd_pagas'],
+        'qtd_captadores_pendentes': resumo_captadores['qtd_pendentes'],
         
         # Estatísticas Consultores
         'total_consultores': total_consultores,
         'total_consultores_pagas': total_consultores_pagas,
         'total_consultores_pendentes': total_consultores_pendentes,
-        'qtd_consultores': qtd_consultores,
-        'qtd_consultores_pagas': qtd_consultores_pagas,
-        'qtd_consultores_pendentes': qtd_consultores_pendentes,
+        'qtd_consultores': resumo_consultores['qtd'],
+        'qtd_consultores_pagas': resumo_consultores['qtd_pagas'],
+        'qtd_consultores_pendentes': resumo_consultores['qtd_pendentes'],
         
         # Estatísticas Atendentes
         'total_atendentes': total_atendentes,
         'total_atendentes_pagas': total_atendentes_pagas,
         'total_atendentes_pendentes': total_atendentes_pendentes,
-        'qtd_atendentes': qtd_atendentes,
-        'qtd_atendentes_pagas': qtd_atendentes_pagas,
-        'qtd_atendentes_pendentes': qtd_atendentes_pendentes,
+        'qtd_atendentes': resumo_atendentes['qtd'],
+        'qtd_atendentes_pagas': resumo_atendentes['qtd_pagas'],
+        'qtd_atendentes_pendentes': resumo_atendentes['qtd_pendentes'],
         
         # Total Geral
         'total_geral': total_geral,
@@ -419,50 +439,31 @@ def dashboard_graficos(request):
     hoje = timezone.now()
     data_inicio = hoje - timedelta(days=365)
     
+    # Séries mensais e totais de leads vêm dos fatos mensais (relatorios.fatos)
+    meses = ultimos_meses(12)
+    series = series_mensais(meses)
+    total_leads, leads_por_status = totais_leads()
+    
     # ========== GRÁFICO 1: LEADS POR MÊS (Linha) ==========
-    leads_por_mes = []
-    labels_meses = []
-    
-    for i in range(11, -1, -1):
-        mes_data = hoje - timedelta(days=30*i)
-        inicio_mes = mes_data.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        if mes_data.month == 12:
-            fim_mes = inicio_mes.replace(year=inicio_mes.year + 1, month=1)
-        else:
-            fim_mes = inicio_mes.replace(month=inicio_mes.month + 1)
-        
-        count = Lead.objects.filter(
-            data_cadastro__gte=inicio_mes,
-            data_cadastro__lt=fim_mes
-        ).count()
-        
-        leads_por_mes.append(count)
-        labels_meses.append(inicio_mes.strftime('%b/%y'))
+    leads_por_mes = series['leads']
+    labels_meses = [mes.strftime('%b/%y') for mes in meses]
     
     # ========== GRÁFICO 2: LEADS POR STATUS (Pizza) ==========
-    status_counts = Lead.objects.values('status').annotate(
-        count=Count('id')
-    ).order_by('-count')
+    status_counts = sorted(leads_por_status.items(), key=lambda item: item[1], reverse=True)
     
-    status_labels = [item['status'] for item in status_counts]
-    status_values = [item['count'] for item in status_counts]
+    status_labels = [status for status, _ in status_counts]
+    status_values = [count for _, count in status_counts]
     
     # ========== GRÁFICO 3: LEADS POR ORIGEM (Doughnut) ==========
-    origem_counts = Lead.objects.values('origem').annotate(
-        count=Count('id')
-    ).order_by('-count')[:10]
+    origem_counts = leads_por_dimensao('origem_id', limite=10)
     
-    origem_labels = [item['origem'] for item in origem_counts]
-    origem_values = [item['count'] for item in origem_counts]
+    origem_labels = [item['origem_id'] for item in origem_counts]
+    origem_values = [item['total'] for item in origem_counts]
     
     # ========== GRÁFICO 4: TOP 10 CAPTADORES (Barra Horizontal) ==========
-    top_captadores = Lead.objects.filter(
-        captador__isnull=False
-    ).values(
-        'captador__first_name', 'captador__last_name'
-    ).annotate(
-        total=Count('id')
-    ).order_by('-total')[:10]
+    top_captadores = leads_por_dimensao(
+        ['captador__first_name', 'captador__last_name'], limite=10, filtro=Q(captador__isnull=False)
+    )
     
     captadores_labels = [
         f"{item['captador__first_name']} {item['captador__last_name']}" 
@@ -486,9 +487,8 @@ def dashboard_graficos(request):
     atendentes_values = [item['total'] for item in top_atendentes]
     
     # ========== GRÁFICO 6: FUNIL DE CONVERSÃO (Funil) ==========
-    total_leads = Lead.objects.count()
     leads_levantamento = Lead.objects.filter(fez_levantamento=True).count()
-    leads_pix_pago = Lead.objects.filter(status='LEVANTAMENTO_PAGO').count()
+    leads_pix_pago = leads_por_status.get('LEVANTAMENTO_PAGO', 0)
     pre_vendas = PreVenda.objects.count()
     vendas_fechadas = Venda.objects.count()
     
@@ -504,23 +504,7 @@ def dashboard_graficos(request):
     pix_values = [item['count'] for item in pix_status]
     
     # ========== GRÁFICO 8: RECEITA POR MÊS (Barra) ==========
-    receita_por_mes = []
-    
-    for i in range(11, -1, -1):
-        mes_data = hoje - timedelta(days=30*i)
-        inicio_mes = mes_data.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        if mes_data.month == 12:
-            fim_mes = inicio_mes.replace(year=inicio_mes.year + 1, month=1)
-        else:
-            fim_mes = inicio_mes.replace(month=inicio_mes.month + 1)
-        
-        receita = Parcela.objects.filter(
-            status='paga',
-            data_pagamento__gte=inicio_mes.date(),
-            data_pagamento__lt=fim_mes.date()
-        ).aggregate(total=Sum('valor'))['total'] or 0
-        
-        receita_por_mes.append(float(receita))
+    receita_por_mes = series['receita']
     
     # ========== GRÁFICO 9: PARCELAS POR STATUS (Doughnut) ==========
     parcelas_status = Parcela.objects.values('status').annotate(
@@ -553,22 +537,7 @@ def dashboard_graficos(request):
         leads_por_dia.append(count)
     
     # ========== GRÁFICO 12: VENDAS POR MÊS (Barra) ==========
-    vendas_por_mes = []
-    
-    for i in range(11, -1, -1):
-        mes_data = hoje - timedelta(days=30*i)
-        inicio_mes = mes_data.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        if mes_data.month == 12:
-            fim_mes = inicio_mes.replace(year=inicio_mes.year + 1, month=1)
-        else:
-            fim_mes = inicio_mes.replace(month=inicio_mes.month + 1)
-        
-        count = Venda.objects.filter(
-            data_venda__gte=inicio_mes,
-            data_venda__lt=fim_mes
-        ).count()
-        
-        vendas_por_mes.append(count)
+    vendas_por_mes = series['vendas']
     
     # ========== KPIs PRINCIPAIS ==========
     kpis = {
@@ -653,45 +622,17 @@ def grafico_evolucao_leads(request):
     data_inicio = hoje - timedelta(days=365)
     
     # ========== GRÁFICO: LEADS POR MÊS (Linha) ==========
-    leads_por_mes = []
-    labels_meses = []
-    
-    for i in range(11, -1, -1):
-        mes_data = hoje - timedelta(days=30*i)
-        inicio_mes = mes_data.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        if mes_data.month == 12:
-            fim_mes = inicio_mes.replace(year=inicio_mes.year + 1, month=1)
-        else:
-            fim_mes = inicio_mes.replace(month=inicio_mes.month + 1)
-        
-        count = Lead.objects.filter(
-            data_cadastro__gte=inicio_mes,
-            data_cadastro__lt=fim_mes
-        ).count()
-        
-        leads_por_mes.append(count)
-        labels_meses.append(inicio_mes.strftime('%b/%y'))
+    # Séries lidas dos fatos mensais (relatorios.fatos)
+    meses = ultimos_meses(12)
+    series = series_mensais(meses)
+    leads_por_mes = series['leads']
+    labels_meses = [mes.strftime('%b/%y') for mes in meses]
     
     # ========== CÁLCULOS DE RECEITA ==========
-    receita_total = 0
-    for i in range(11, -1, -1):
-        mes_data = hoje - timedelta(days=30*i)
-        inicio_mes = mes_data.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        if mes_data.month == 12:
-            fim_mes = inicio_mes.replace(year=inicio_mes.year + 1, month=1)
-        else:
-            fim_mes = inicio_mes.replace(month=inicio_mes.month + 1)
-        
-        receita = Parcela.objects.filter(
-            status='paga',
-            data_pagamento__gte=inicio_mes.date(),
-            data_pagamento__lt=fim_mes.date()
-        ).aggregate(total=Sum('valor'))['total'] or 0
-        
-        receita_total += float(receita)
+    receita_total = sum(series['receita'])
     
     # ========== KPIs ==========
-    total_leads = Lead.objects.count()
+    total_leads, _ = totais_leads()
     vendas_fechadas = Venda.objects.count()
     taxa_conversao = round((vendas_fechadas / total_leads * 100) if total_leads > 0 else 0, 2)
     ticket_medio = round(receita_total / vendas_fechadas if vendas_fechadas > 0 else 0, 2)
@@ -729,11 +670,28 @@ def dashboard_kpis_comercial2(request):
     Dashboard com KPIs e métricas do Comercial 2
     Migrado de vendas para relatórios
     """
+    context = kpis_comercial2(request.GET.get('periodo', '30'))  # Default 30 dias
+    
+    return render(request, 'relatorios/dashboard_kpis_comercial2.html', context)
+
+
+def kpis_comercial2(periodo):
+    """
+    KPIs do Comercial 2 (em cache: obter_relatorio)
+    Usado também pelo dashboard antigo em vendas (dashboard_comercial2_kpis)
+    """
+    return obter_relatorio(
+        'dashboard_kpis_comercial2', {'periodo': periodo}, ('repescagem',),
+        lambda: _dados_dashboard_kpis_comercial2(periodo)
+    )
+
+
+def _dados_dashboard_kpis_comercial2(periodo):
+    """KPIs do Comercial 2 para o período (em cache: obter_relatorio)"""
     from vendas.models import RepescagemLead
-    from django.db.models import Count, Avg, Q, F
+    from django.db.models import Count, Avg, Q, F, ExpressionWrapper, DurationField
     
     # Filtros de período
-    periodo = request.GET.get('periodo', '30')  # Default 30 dias
     try:
         dias = int(periodo)
     except:
@@ -742,24 +700,31 @@ def dashboard_kpis_comercial2(request):
     data_inicio = timezone.now() - timedelta(days=dias)
     
     # === ESTATÍSTICAS GERAIS ===
-    total_repescagens = RepescagemLead.objects.count()
-    repescagens_periodo = RepescagemLead.objects.filter(data_criacao__gte=data_inicio)
+    # Uma consulta agrupada por status (geral e no período) alimenta os cards,
+    # as taxas e o gráfico de pizza
+    por_status = list(
+        RepescagemLead.objects.order_by().values('status').annotate(
+            total=Count('id'),
+            total_periodo=Count('id', filter=Q(data_criacao__gte=data_inicio)),
+        )
+    )
+    geral = {linha['status']: linha['total'] for linha in por_status}
+    periodo_status = {linha['status']: linha['total_periodo'] for linha in por_status}
+    finalizados = ('CONVERTIDO', 'SEM_INTERESSE', 'LEAD_LIXO')
     
     stats = {
-        'total_geral': total_repescagens,
-        'total_periodo': repescagens_periodo.count(),
-        'pendentes': RepescagemLead.objects.filter(status='PENDENTE').count(),
-        'em_contato': RepescagemLead.objects.filter(status='EM_CONTATO').count(),
-        'convertidos': RepescagemLead.objects.filter(status='CONVERTIDO').count(),
-        'convertidos_periodo': repescagens_periodo.filter(status='CONVERTIDO').count(),
-        'sem_interesse': RepescagemLead.objects.filter(status='SEM_INTERESSE').count(),
-        'lead_lixo': RepescagemLead.objects.filter(status='LEAD_LIXO').count(),
+        'total_geral': sum(geral.values()),
+        'total_periodo': sum(periodo_status.values()),
+        'pendentes': geral.get('PENDENTE', 0),
+        'em_contato': geral.get('EM_CONTATO', 0),
+        'convertidos': geral.get('CONVERTIDO', 0),
+        'convertidos_periodo': periodo_status.get('CONVERTIDO', 0),
+        'sem_interesse': geral.get('SEM_INTERESSE', 0),
+        'lead_lixo': geral.get('LEAD_LIXO', 0),
     }
     
     # === TAXA DE CONVERSÃO ===
-    total_finalizados = RepescagemLead.objects.filter(
-        Q(status='CONVERTIDO') | Q(status='SEM_INTERESSE') | Q(status='LEAD_LIXO')
-    ).count()
+    total_finalizados = sum(geral.get(status, 0) for status in finalizados)
     
     if total_finalizados > 0:
         stats['taxa_conversao'] = round((stats['convertidos'] / total_finalizados) * 100, 1)
@@ -767,9 +732,7 @@ def dashboard_kpis_comercial2(request):
         stats['taxa_conversao'] = 0
     
     # Taxa de conversão no período
-    total_finalizados_periodo = repescagens_periodo.filter(
-        Q(status='CONVERTIDO') | Q(status='SEM_INTERESSE') | Q(status='LEAD_LIXO')
-    ).count()
+    total_finalizados_periodo = sum(periodo_status.get(status, 0) for status in finalizados)
     
     if total_finalizados_periodo > 0:
         stats['taxa_conversao_periodo'] = round(
@@ -779,23 +742,19 @@ def dashboard_kpis_comercial2(request):
         stats['taxa_conversao_periodo'] = 0
     
     # === TEMPO MÉDIO DE REPESCAGEM ===
-    repescagens_concluidas = RepescagemLead.objects.filter(
+    # Média calculada no banco (sem carregar as repescagens concluídas)
+    tempo_medio = RepescagemLead.objects.filter(
         data_conclusao__isnull=False
-    )
-    
-    if repescagens_concluidas.exists():
-        tempos = []
-        for r in repescagens_concluidas:
-            delta = r.data_conclusao - r.data_criacao
-            tempos.append(delta.total_seconds() / 86400)  # Converter para dias
-        stats['tempo_medio_dias'] = round(sum(tempos) / len(tempos), 1)
-    else:
-        stats['tempo_medio_dias'] = 0
+    ).order_by().aggregate(
+        media=Avg(ExpressionWrapper(F('data_conclusao') - F('data_criacao'), output_field=DurationField()))
+    )['media']
+    stats['tempo_medio_dias'] = round(tempo_medio.total_seconds() / 86400, 1) if tempo_medio else 0
     
     # === DISTRIBUIÇÃO POR STATUS (para gráfico de pizza) ===
-    distribuicao_status = RepescagemLead.objects.values('status').annotate(
-        total=Count('id')
-    ).order_by('-total')
+    distribuicao_status = sorted(
+        ({'status': linha['status'], 'total': linha['total']} for linha in por_status),
+        key=lambda linha: -linha['total']
+    )
     
     # === TOP 5 MOTIVOS DE RECUSA QUE MAIS CONVERTEM ===
     motivos_conversao = RepescagemLead.objects.filter(
@@ -836,14 +795,14 @@ def dashboard_kpis_comercial2(request):
     
     context = {
         'stats': stats,
-        'distribuicao_status': json.dumps(list(distribuicao_status)),
+        'distribuicao_status': json.dumps(distribuicao_status),
         'motivos_conversao': json.dumps(list(motivos_conversao)),
         'motivos_gerais': list(motivos_gerais),
         'performance_consultores': list(performance_consultores),
         'periodo_dias': dias,
     }
     
-    return render(request, 'relatorios/dashboard_kpis_comercial2.html', context)
+    return context
 
 
 @login_required
@@ -852,9 +811,6 @@ def ranking_geral(request):
     Página de Ranking Geral: Atendentes, Consultores e Captadores
     Com estatísticas detalhadas e comparativos
     """
-    from decimal import Decimal
-    from financeiro.models import Comissao
-    
     # Período de análise (padrão: 30 dias)
     periodo = request.GET.get('periodo', '30')
     try:
@@ -862,10 +818,42 @@ def ranking_geral(request):
     except ValueError:
         dias = 30
     
+    # Número constante de consultas (3 rankings + 3 somas de comissão agrupadas), em cache por período
+    rankings = em_cache(('ranking_geral', dias), lambda: _montar_rankings(dias))
+    
+    context = {
+        'ranking_atendentes': rankings['atendentes'],
+        'ranking_consultores': rankings['consultores'],
+        'ranking_captadores': rankings['captadores'],
+        'total_atendentes': len(rankings['atendentes']),
+        'total_consultores': len(rankings['consultores']),
+        'total_captadores': len(rankings['captadores']),
+        'periodo': periodo,
+        'periodo_dias': dias,
+    }
+    
+    return render(request, 'relatorios/ranking_geral.html', context)
+
+
+def _juntar_comissoes(ranking, campo_id, comissoes):
+    """Copia total/pagas/pendentes de comissão (totais_por_grupo) para as linhas do ranking"""
+    from decimal import Decimal
+    
+    for linha in ranking:
+        valores = comissoes.get(linha[campo_id], {})
+        linha['total_comissao'] = valores.get('total', Decimal('0'))
+        linha['comissoes_pagas'] = valores.get('pagas', Decimal('0'))
+        linha['comissoes_pendentes'] = valores.get('pendentes', Decimal('0'))
+
+
+def _montar_rankings(dias):
+    """Rankings de atendentes, consultores e captadores dos últimos `dias` dias"""
+    from financeiro.models import Comissao
+    
     data_inicio = timezone.now() - timedelta(days=dias)
     
     # ========== RANKING DE ATENDENTES (Por Leads Levantados) ==========
-    ranking_atendentes = Lead.objects.filter(
+    ranking_atendentes = list(Lead.objects.filter(
         atendente__isnull=False,
         data_cadastro__gte=data_inicio
     ).values(
@@ -877,24 +865,19 @@ def ranking_geral(request):
         total_leads=Count('id'),
         leads_pagos=Count('id', filter=Q(status='LEVANTAMENTO_PAGO')),
         leads_fez_levantamento=Count('id', filter=Q(fez_levantamento=True))
-    ).order_by('-total_leads')[:20]
+    ).order_by('-total_leads')[:20])
     
-    # Calcular comissões dos atendentes
-    for atendente in ranking_atendentes:
-        atendente_id = atendente['atendente__id']
-        comissoes = ComissaoLead.objects.filter(
-            atendente_id=atendente_id,
+    # Comissões dos atendentes (uma consulta agrupada)
+    _juntar_comissoes(ranking_atendentes, 'atendente__id', totais_por_grupo(
+        ComissaoLead.objects.filter(
+            atendente_id__in=[atendente['atendente__id'] for atendente in ranking_atendentes],
             data_criacao__gte=data_inicio
-        ).aggregate(
-            total_comissao=Sum('valor'),
-            comissoes_pagas=Sum('valor', filter=Q(status='PAGO')),
-            comissoes_pendentes=Sum('valor', filter=Q(status__in=['DISPONIVEL', 'AUTORIZADO']))
-        )
-        
-        atendente['total_comissao'] = comissoes['total_comissao'] or Decimal('0')
-        atendente['comissoes_pagas'] = comissoes['comissoes_pagas'] or Decimal('0')
-        atendente['comissoes_pendentes'] = comissoes['comissoes_pendentes'] or Decimal('0')
-        
+        ),
+        'atendente_id', 'valor',
+        pagas=Q(status='PAGO'), pendentes=Q(status__in=['DISPONIVEL', 'AUTORIZADO'])
+    ))
+    
+    for atendente in ranking_atendentes:
         # Taxa de conversão para levantamento
         if atendente['total_leads'] > 0:
             atendente['taxa_conversao'] = round(
@@ -904,7 +887,7 @@ def ranking_geral(request):
             atendente['taxa_conversao'] = 0
     
     # ========== RANKING DE CONSULTORES (Por Vendas) ==========
-    ranking_consultores = Venda.objects.filter(
+    ranking_consultores = list(Venda.objects.filter(
         consultor__isnull=False,
         data_criacao__gte=data_inicio
     ).values(
@@ -916,25 +899,20 @@ def ranking_geral(request):
         total_vendas=Count('id'),
         valor_total_vendas=Sum('valor_total'),
         valor_total_entradas=Sum('valor_entrada')
-    ).order_by('-total_vendas')[:20]
+    ).order_by('-total_vendas')[:20])
     
-    # Calcular comissões dos consultores
-    for consultor in ranking_consultores:
-        consultor_id = consultor['consultor__id']
-        comissoes = Comissao.objects.filter(
-            usuario_id=consultor_id,
+    # Comissões dos consultores (uma consulta agrupada)
+    _juntar_comissoes(ranking_consultores, 'consultor__id', totais_por_grupo(
+        Comissao.objects.filter(
+            usuario_id__in=[consultor['consultor__id'] for consultor in ranking_consultores],
             tipo_comissao__in=['CONSULTOR_ENTRADA', 'CONSULTOR_PARCELA'],
             data_calculada__gte=data_inicio
-        ).aggregate(
-            total_comissao=Sum('valor_comissao'),
-            comissoes_pagas=Sum('valor_comissao', filter=Q(status='paga')),
-            comissoes_pendentes=Sum('valor_comissao', filter=Q(status='pendente'))
-        )
-        
-        consultor['total_comissao'] = comissoes['total_comissao'] or Decimal('0')
-        consultor['comissoes_pagas'] = comissoes['comissoes_pagas'] or Decimal('0')
-        consultor['comissoes_pendentes'] = comissoes['comissoes_pendentes'] or Decimal('0')
-        
+        ),
+        'usuario_id', 'valor_comissao',
+        pagas=Q(status='paga'), pendentes=Q(status='pendente')
+    ))
+    
+    for consultor in ranking_consultores:
         # Ticket médio
         if consultor['total_vendas'] > 0:
             consultor['ticket_medio'] = round(
@@ -944,7 +922,7 @@ def ranking_geral(request):
             consultor['ticket_medio'] = 0
     
     # ========== RANKING DE CAPTADORES (Por Indicações) ==========
-    ranking_captadores = Venda.objects.filter(
+    ranking_captadores = list(Venda.objects.filter(
         captador__isnull=False,
         data_criacao__gte=data_inicio
     ).values(
@@ -955,25 +933,20 @@ def ranking_geral(request):
     ).annotate(
         total_indicacoes=Count('id'),
         valor_total_indicacoes=Sum('valor_total')
-    ).order_by('-total_indicacoes')[:20]
+    ).order_by('-total_indicacoes')[:20])
     
-    # Calcular comissões dos captadores
-    for captador in ranking_captadores:
-        captador_id = captador['captador__id']
-        comissoes = Comissao.objects.filter(
-            usuario_id=captador_id,
+    # Comissões dos captadores (uma consulta agrupada)
+    _juntar_comissoes(ranking_captadores, 'captador__id', totais_por_grupo(
+        Comissao.objects.filter(
+            usuario_id__in=[captador['captador__id'] for captador in ranking_captadores],
             tipo_comissao__in=['CAPTADOR_ENTRADA', 'CAPTADOR_PARCELA'],
             data_calculada__gte=data_inicio
-        ).aggregate(
-            total_comissao=Sum('valor_comissao'),
-            comissoes_pagas=Sum('valor_comissao', filter=Q(status='paga')),
-            comissoes_pendentes=Sum('valor_comissao', filter=Q(status='pendente'))
-        )
-        
-        captador['total_comissao'] = comissoes['total_comissao'] or Decimal('0')
-        captador['comissoes_pagas'] = comissoes['comissoes_pagas'] or Decimal('0')
-        captador['comissoes_pendentes'] = comissoes['comissoes_pendentes'] or Decimal('0')
-        
+        ),
+        'usuario_id', 'valor_comissao',
+        pagas=Q(status='paga'), pendentes=Q(status='pendente')
+    ))
+    
+    for captador in ranking_captadores:
         # Ticket médio por indicação
         if captador['total_indicacoes'] > 0:
             captador['ticket_medio'] = round(
@@ -982,23 +955,11 @@ def ranking_geral(request):
         else:
             captador['ticket_medio'] = 0
     
-    # KPIs Gerais
-    total_atendentes = len(ranking_atendentes)
-    total_consultores = len(ranking_consultores)
-    total_captadores = len(ranking_captadores)
-    
-    context = {
-        'ranking_atendentes': ranking_atendentes,
-        'ranking_consultores': ranking_consultores,
-        'ranking_captadores': ranking_captadores,
-        'total_atendentes': total_atendentes,
-        'total_consultores': total_consultores,
-        'total_captadores': total_captadores,
-        'periodo': periodo,
-        'periodo_dias': dias,
+    return {
+        'atendentes': ranking_atendentes,
+        'consultores': ranking_consultores,
+        'captadores': ranking_captadores,
     }
-    
-    return render(request, 'relatorios/ranking_geral.html', context)
 
 
 @login_required
@@ -1007,12 +968,22 @@ def relatorio_consultores(request):
     Relatório detalhado de performance dos consultores (Comercial 1).
     Mostra vendas, pré-vendas, conversões e comissões.
     """
-    from decimal import Decimal
+    filtros = {
+        'periodo': request.GET.get('periodo', '30'),  # dias
+        'consultor_id': request.GET.get('consultor'),
+        'status_filtro': request.GET.get('status', 'todos'),
+    }
+    context = obter_relatorio(
+        'relatorio_consultores', filtros, ('venda', 'pre_venda', 'comissao'),
+        lambda: _dados_relatorio_consultores(**filtros)
+    )
     
-    # Filtros
-    periodo = request.GET.get('periodo', '30')  # dias
-    consultor_id = request.GET.get('consultor')
-    status_filtro = request.GET.get('status', 'todos')
+    return render(request, 'relatorios/relatorio_consultores.html', context)
+
+
+def _dados_relatorio_consultores(periodo, consultor_id, status_filtro):
+    """Números do relatório de consultores para os filtros (em cache: obter_relatorio)"""
+    from decimal import Decimal
     
     # Data inicial baseada no período
     if periodo == 'todos':
@@ -1177,7 +1148,7 @@ def relatorio_consultores(request):
         'consultor_selecionado': consultor_id,
     }
     
-    return render(request, 'relatorios/relatorio_consultores.html', context)
+    return context
 
 
 @login_required
@@ -1186,15 +1157,25 @@ def relatorio_compliance(request):
     Relatório completo do setor de Compliance.
     Análises, aprovações, reprovações, tempo médio, etc.
     """
+    filtros = {
+        'periodo': request.GET.get('periodo', '30'),
+        'status_filtro': request.GET.get('status', 'todos'),
+        'classificacao_filtro': request.GET.get('classificacao', 'todas'),
+        'analista_id': request.GET.get('analista', ''),
+    }
+    context = obter_relatorio(
+        'relatorio_compliance', filtros, ('compliance', 'lead'),
+        lambda: _dados_relatorio_compliance(**filtros)
+    )
+    
+    return render(request, 'relatorios/relatorio_compliance.html', context)
+
+
+def _dados_relatorio_compliance(periodo, status_filtro, classificacao_filtro, analista_id):
+    """Números do relatório de compliance para os filtros (em cache: obter_relatorio)"""
     from compliance.models import AnaliseCompliance, StatusAnaliseCompliance, ClassificacaoLead
     from decimal import Decimal
     
-    # Filtros
-    periodo = request.GET.get('periodo', '30')
-    status_filtro = request.GET.get('status', 'todos')
-    classificacao_filtro = request.GET.get('classificacao', 'todas')
-    analista_id = request.GET.get('analista', '')
-    
     # Filtra por período
     if periodo != 'todos':
         dias = int(periodo)
@@ -1334,5 +1315,5 @@ def relatorio_compliance(request):
         'analista_selecionado': analista_id,
     }
     
-    return render(request, 'relatorios/relatorio_compliance.html', context)
+    return context
 
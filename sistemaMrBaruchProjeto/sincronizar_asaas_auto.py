@@ -11,7 +11,6 @@ import time
 import requests
 import logging
 from datetime import datetime
-from decimal import Decimal
 
 # Configurar logging detalhado
 # Usar /tmp/ para evitar problema de permissões com Gunicorn
@@ -40,15 +39,19 @@ from django.utils import timezone
 from asaas_sync.models import (
     AsaasClienteSyncronizado, AsaasCobrancaSyncronizada,
     AsaasClienteSyncronizado2, AsaasCobrancaSyncronizada2,
-    AsaasSyncronizacaoLog
+    AsaasSyncronizacaoLog, AsaasSyncProgresso
 )
+from asaas_sync.sync_completo import gerar_janelas_data
+from core.asaas_client import AsaasClient
+from asaas_sync.upsert_lote import UpsertEmLote, mapear_cliente, mapear_cobranca
 
 
 class SincronizadorAsaas100Porcento:
     """Sincronizador que garante 100% dos dados"""
     
-    def __init__(self, conta="principal"):
+    def __init__(self, conta="principal", modo_global=True, retomar=False):
         self.conta = conta
+        self.modo_global = modo_global
         
         # Definir token e models baseado na conta
         if conta == "alternativo":
@@ -63,11 +66,9 @@ class SincronizadorAsaas100Porcento:
             self.tipo_sync = 'COMPLETO_100P'
         
         self.base_url = getattr(settings, 'ASAAS_API_URL', 'https://api.asaas.com/v3')
-        self.headers = {
-            'Content-Type': 'application/json',
-            'access_token': self.api_token
-        }
         self.timeout = 120
+        # Session compartilhada (keep-alive) + limitador da conta
+        self.client = AsaasClient(self.api_token, base_url=self.base_url, timeout=self.timeout, conta=conta)
         
         # Controle de rate limiting aprimorado
         self.requests_count = 0
@@ -77,17 +78,87 @@ class SincronizadorAsaas100Porcento:
         # Estatísticas detalhadas
         self.stats = {
             'clientes': {'total_esperado': 0, 'total_baixados': 0, 'novos': 0, 'atualizados': 0, 'excluidos': 0, 'erros': 0},
-            'cobrancas': {'total_baixadas': 0, 'novas': 0, 'atualizadas': 0, 'excluidas': 0, 'erros': 0, 'sem_cliente': 0}
+            'cobrancas': {'total_baixadas': 0, 'novas': 0, 'atualizadas': 0, 'excluidas': 0, 'erros': 0, 'sem_cliente': 0},
+            'falhas_download': 0
         }
         
-        # Criar log
-        self.log = AsaasSyncronizacaoLog.objects.create(
+        # Checkpoint persistido a cada página (cria o log ou reaproveita o da execução interrompida)
+        self.retomado = False
+        self.progresso = self._carregar_progresso(retomar)
+        self.log = self.progresso.log
+        
+        logger.info(f"✅ Sincronizador 100% iniciado - Conta: {conta}")
+    
+    def _carregar_progresso(self, retomar):
+        """
+        Com retomar=True continua a execução interrompida desta conta: mesmo log,
+        mesmos offsets e estatísticas acumuladas. Sem execução pendente (ou sem
+        retomar), começa do zero e descarta o checkpoint anterior.
+        """
+        progresso = AsaasSyncProgresso.objects.filter(conta=self.conta).select_related('log').first()
+        
+        if retomar and progresso and progresso.pode_retomar:
+            if progresso.modo_global != self.modo_global:
+                logger.warning("⚠️  Modo diferente da execução interrompida - mantendo o modo original")
+                self.modo_global = progresso.modo_global
+            
+            for secao, valores in (progresso.stats or {}).items():
+                if isinstance(valores, dict):
+                    self.stats[secao].update(valores)
+                else:
+                    self.stats[secao] = valores
+            
+            if progresso.log is None:
+                progresso.log = AsaasSyncronizacaoLog.objects.create(
+                    tipo_sincronizacao=self.tipo_sync,
+                    status='EM_ANDAMENTO',
+                    usuario='Sistema 100%'
+                )
+            else:
+                progresso.log.status = 'EM_ANDAMENTO'
+                progresso.log.data_fim = None
+                progresso.log.mensagem = f'Retomando sincronização 100% ({progresso.get_etapa_display()})...'
+                progresso.log.save(update_fields=['status', 'data_fim', 'mensagem'])
+            
+            self.retomado = True
+            logger.info(f"♻️  Retomando execução de {timezone.localtime(progresso.iniciado_em):%d/%m/%Y %H:%M} - "
+                        f"etapa {progresso.etapa} | offset clientes {progresso.offset_clientes} | "
+                        f"janela {progresso.janela_atual} | cliente {progresso.cliente_em_andamento or progresso.ultimo_cliente_concluido or '-'} | "
+                        f"offset cobranças {progresso.offset_cobrancas}")
+            return progresso
+        
+        if retomar:
+            logger.info(f"ℹ️  Nenhuma execução interrompida para a conta {self.conta} - iniciando do zero")
+        
+        log = AsaasSyncronizacaoLog.objects.create(
             tipo_sincronizacao=self.tipo_sync,
             status='EM_ANDAMENTO',
             usuario='Sistema 100%'
         )
-        
-        logger.info(f"✅ Sincronizador 100% iniciado - Conta: {conta}")
+        progresso, _ = AsaasSyncProgresso.objects.update_or_create(
+            conta=self.conta,
+            defaults={
+                'modo_global': self.modo_global,
+                'etapa': 'CLIENTES',
+                'log': log,
+                'iniciado_em': timezone.now(),
+                'offset_clientes': 0,
+                'total_clientes_esperado': None,
+                'ultimo_cliente_concluido': None,
+                'cliente_em_andamento': None,
+                'janela_atual': 0,
+                'offset_cobrancas': 0,
+                'stats': {},
+            }
+        )
+        return progresso
+    
+    def _salvar_progresso(self, **campos):
+        """Grava o checkpoint (campos informados + estatísticas acumuladas)"""
+        for campo, valor in campos.items():
+            setattr(self.progresso, campo, valor)
+        self.progresso.stats = self.stats
+        self.progresso.save(update_fields=[*campos, 'stats', 'atualizado_em'])
     
     def controlar_rate_limit_rigoroso(self):
         """Controle RIGOROSO de rate limiting"""
@@ -109,14 +180,12 @@ class SincronizadorAsaas100Porcento:
     
     def fazer_requisicao_100porcento(self, endpoint, params=None):
         """Faz requisição com garantia de sucesso"""
-        url = f"{self.base_url}/{endpoint}"
-        
         for tentativa in range(1, 6):  # 5 tentativas
             try:
                 self.controlar_rate_limit_rigoroso()
                 
                 logger.debug(f"🔁 Tentativa {tentativa}/5: {endpoint}")
-                response = requests.get(url, headers=self.headers, params=params, timeout=self.timeout)
+                response = self.client.get(endpoint, params=params)
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -179,16 +248,19 @@ class SincronizadorAsaas100Porcento:
         return None
     
     def baixar_clientes_100porcento(self):
-        """Garante 100% dos clientes"""
+        """
+        Garante 100% dos clientes.
+        Cada página é gravada no banco assim que chega e o offset seguinte vai
+        para o checkpoint: uma retomada continua da próxima página.
+        """
         logger.info("\n" + "="*80)
         logger.info("👥 BAIXANDO 100% DOS CLIENTES")
         logger.info("="*80)
         
-        clientes_asaas = []
-        offset = 0
+        offset = self.progresso.offset_clientes
         limit = 100
-        total_esperado = None
-        pagina = 1
+        total_esperado = self.progresso.total_clientes_esperado
+        pagina = offset // limit + 1
         falhas_consecutivas = 0
         
         while True:
@@ -202,8 +274,9 @@ class SincronizadorAsaas100Porcento:
                 logger.error(f"❌ Falha na página {pagina} (falhas consecutivas: {falhas_consecutivas})")
                 
                 if falhas_consecutivas >= 3:
-                    logger.error("💥 Muitas falhas consecutivas - abortando")
-                    break
+                    # Sem a lista completa a exclusão de obsoletos apagaria clientes válidos:
+                    # aborta e deixa o checkpoint nesta página para o --resume
+                    raise Exception(f"💥 Muitas falhas consecutivas nos clientes (offset {offset}) - use --resume para continuar")
                 
                 # Tenta continuar do mesmo ponto
                 time.sleep(10)
@@ -224,50 +297,60 @@ class SincronizadorAsaas100Porcento:
                 self.stats['clientes']['total_esperado'] = total_esperado
                 logger.info(f"📊 Total esperado: {total_esperado} clientes")
             
-            clientes_asaas.extend(clientes_pagina)
-            self.stats['clientes']['total_baixados'] = len(clientes_asaas)
+            self.gravar_pagina_clientes(clientes_pagina)
+            total_baixados = self.stats['clientes']['total_baixados']
+            
+            offset += limit
+            pagina += 1
+            self._salvar_progresso(offset_clientes=offset, total_clientes_esperado=total_esperado)
             
-            progresso = (len(clientes_asaas) / total_esperado * 100) if total_esperado else 0
-            logger.info(f"📥 Progresso: {len(clientes_asaas)}/{total_esperado} ({progresso:.1f}%)")
+            progresso = (total_baixados / total_esperado * 100) if total_esperado else 0
+            logger.info(f"📥 Progresso: {total_baixados}/{total_esperado} ({progresso:.1f}%)")
             
             # VALIDAÇÃO: Verificar se atingiu o total esperado
-            if total_esperado and len(clientes_asaas) >= total_esperado:
-                logger.info(f"🎯 TOTAL ALCANÇADO: {len(clientes_asaas)} clientes")
+            if total_esperado and total_baixados >= total_esperado:
+                logger.info(f"🎯 TOTAL ALCANÇADO: {total_baixados} clientes")
                 break
             
             # Verificar hasMore
             if not response.get('hasMore', False):
                 logger.info("✅ API informou fim da paginação (hasMore=false)")
                 break
-            
-            offset += limit
-            pagina += 1
         
         # VALIDAÇÃO FINAL CRÍTICA
         logger.info("\n" + "="*80)
         logger.info("🔍 VALIDAÇÃO FINAL CLIENTES")
         logger.info("="*80)
         
+        total_baixados = self.stats['clientes']['total_baixados']
         if total_esperado:
-            if len(clientes_asaas) == total_esperado:
-                logger.info(f"✅ SUCESSO ABSOLUTO: {len(clientes_asaas)}/{total_esperado} (100%)")
+            if total_baixados == total_esperado:
+                logger.info(f"✅ SUCESSO ABSOLUTO: {total_baixados}/{total_esperado} (100%)")
             else:
-                faltam = total_esperado - len(clientes_asaas)
-                percentual = (len(clientes_asaas) / total_esperado) * 100
-                logger.error(f"❌ FALHA: {len(clientes_asaas)}/{total_esperado} ({percentual:.1f}%) - FALTAM {faltam}")
+                faltam = total_esperado - total_baixados
+                percentual = (total_baixados / total_esperado) * 100
+                logger.error(f"❌ FALHA: {total_baixados}/{total_esperado} ({percentual:.1f}%) - FALTAM {faltam}")
                 self.stats['clientes']['erros'] = faltam
         else:
-            logger.info(f"📊 Total baixado: {len(clientes_asaas)} clientes")
+            logger.info(f"📊 Total baixado: {total_baixados} clientes")
         
-        return clientes_asaas
+        return total_baixados
     
-    def baixar_cobrancas_100porcento(self, clientes_ids):
-        """Garante 100% das cobranças"""
+    def baixar_cobrancas_100porcento(self):
+        """
+        Garante 100% das cobranças (GET payments?customer= para cada cliente).
+        Os clientes vêm do banco (gravados nesta execução), em ordem de
+        asaas_customer_id: o checkpoint guarda o último cliente concluído e o
+        offset do cliente em andamento.
+        """
         logger.info("\n" + "="*80)
         logger.info("💰 BAIXANDO 100% DAS COBRANÇAS")
         logger.info("="*80)
         
-        cobrancas_asaas = []
+        clientes = self.ModelCliente.objects.filter(sincronizado_em__gte=self.progresso.iniciado_em)
+        if self.progresso.ultimo_cliente_concluido:
+            clientes = clientes.filter(asaas_customer_id__gt=self.progresso.ultimo_cliente_concluido)
+        clientes_ids = list(clientes.order_by('asaas_customer_id').values_list('asaas_customer_id', flat=True))
         total_clientes = len(clientes_ids)
         clientes_com_erro = []
         
@@ -275,10 +358,11 @@ class SincronizadorAsaas100Porcento:
             if i % 5 == 0:  # Log a cada 5 clientes
                 logger.info(f"📊 Progresso: {i}/{total_clientes} clientes ({i/total_clientes*100:.1f}%)")
             
-            cobrancas_cliente = []
-            offset = 0
+            # Cliente interrompido no meio: continua do offset salvo
+            offset = self.progresso.offset_cobrancas if customer_id == self.progresso.cliente_em_andamento else 0
             limit = 100
-            pagina = 1
+            pagina = offset // limit + 1
+            baixadas_cliente = offset
             total_cobrancas_esperado = None
             falhas_cliente = 0
             
@@ -298,6 +382,7 @@ class SincronizadorAsaas100Porcento:
                     if falhas_cliente >= 2:
                         logger.error(f"❌ Muitas falhas no cliente {customer_id} - pulando")
                         clientes_com_erro.append(customer_id)
+                        self.stats['falhas_download'] += 1
                         break
                     
                     time.sleep(5)
@@ -312,91 +397,181 @@ class SincronizadorAsaas100Porcento:
                 for cobranca in cobrancas_pagina:
                     cobranca['_customer_id'] = customer_id
                 
-                cobrancas_cliente.extend(cobrancas_pagina)
+                self.gravar_pagina_cobrancas(cobrancas_pagina)
+                baixadas_cliente += len(cobrancas_pagina)
+                offset += limit
+                pagina += 1
+                self._salvar_progresso(cliente_em_andamento=customer_id, offset_cobrancas=offset)
                 
                 # Guardar totalCount do primeiro request
                 if total_cobrancas_esperado is None:
                     total_cobrancas_esperado = response.get('totalCount', 0)
                 
                 # Verificar se atingiu o total
-                if total_cobrancas_esperado and len(cobrancas_cliente) >= total_cobrancas_esperado:
+                if total_cobrancas_esperado and baixadas_cliente >= total_cobrancas_esperado:
                     break
                 
                 # Verificar hasMore
                 if not response.get('hasMore', False):
                     break
-                
-                offset += limit
-                pagina += 1
             
-            cobrancas_asaas.extend(cobrancas_cliente)
-            self.stats['cobrancas']['total_baixadas'] = len(cobrancas_asaas)
+            self._salvar_progresso(ultimo_cliente_concluido=customer_id, cliente_em_andamento=None, offset_cobrancas=0)
             
-            if cobrancas_cliente:
-                logger.debug(f"✅ Cliente {i}: {len(cobrancas_cliente)} cobranças")
+            if baixadas_cliente:
+                logger.debug(f"✅ Cliente {i}: {baixadas_cliente} cobranças")
             else:
                 logger.debug(f"ℹ️  Cliente {i}: 0 cobranças")
         
-        logger.info(f"\n📊 TOTAL COBRANÇAS: {len(cobrancas_asaas)}")
+        logger.info(f"\n📊 TOTAL COBRANÇAS: {self.stats['cobrancas']['total_baixadas']}")
         if clientes_com_erro:
             logger.warning(f"⚠️  Clientes com erro: {len(clientes_com_erro)}")
-        
-        return cobrancas_asaas
     
-    def sincronizar_clientes(self, clientes_asaas):
-        """Sincroniza clientes com o banco"""
+    def baixar_cobrancas_globais_100porcento(self):
+        """
+        Garante 100% das cobranças pela listagem global de payments.
+        Percorre janelas de dateCreated paginadas por offset: o número de
+        requisições depende do número de cobranças, não do número de clientes.
+        As janelas são calculadas até a data de início da execução, então o
+        índice da janela salvo no checkpoint continua válido numa retomada.
+        """
         logger.info("\n" + "="*80)
-        logger.info("💾 SINCRONIZANDO CLIENTES NO BANCO")
+        logger.info("💰 BAIXANDO 100% DAS COBRANÇAS (LISTAGEM GLOBAL)")
         logger.info("="*80)
         
-        # IDs dos clientes no Asaas
-        asaas_customer_ids = set(c['id'] for c in clientes_asaas if c.get('id'))
+        data_inicial = self._parse_date(getattr(settings, 'ASAAS_SYNC_DATA_INICIAL', '2020-01-01')) or datetime(2020, 1, 1).date()
+        janelas = gerar_janelas_data(
+            data_inicial,
+            data_final=timezone.localtime(self.progresso.iniciado_em).date(),
+            dias=int(getattr(settings, 'ASAAS_SYNC_JANELA_DIAS', 30))
+        )
         
-        # Processar cada cliente do Asaas
-        for i, cliente_data in enumerate(clientes_asaas, 1):
-            asaas_id = cliente_data.get('id')
-            if not asaas_id:
-                continue
+        janelas_com_erro = []
+        janela_inicial = self.progresso.janela_atual
+        
+        for i, (inicio, fim) in enumerate(janelas[janela_inicial:], janela_inicial):
+            offset = self.progresso.offset_cobrancas if i == janela_inicial else 0
+            limit = 100
+            total_esperado = None
+            baixadas_janela = offset
+            falhas = 0
             
-            try:
-                # Buscar ou criar cliente
-                cliente, criado = self.ModelCliente.objects.update_or_create(
-                    asaas_customer_id=asaas_id,
-                    defaults={
-                        'nome': cliente_data.get('name', ''),
-                        'cpf_cnpj': cliente_data.get('cpfCnpj', ''),
-                        'email': cliente_data.get('email', ''),
-                        'telefone': cliente_data.get('phone', ''),
-                        'celular': cliente_data.get('mobilePhone', ''),
-                        'cep': cliente_data.get('postalCode', ''),
-                        'endereco': cliente_data.get('address', ''),
-                        'numero': cliente_data.get('addressNumber', ''),
-                        'complemento': cliente_data.get('complement', ''),
-                        'bairro': cliente_data.get('province', ''),
-                        'cidade': cliente_data.get('city', ''),
-                        'estado': cliente_data.get('state', ''),
-                        'inscricao_municipal': cliente_data.get('municipalInscription', ''),
-                        'inscricao_estadual': cliente_data.get('stateInscription', ''),
-                        'observacoes': cliente_data.get('observations', ''),
-                        'external_reference': cliente_data.get('externalReference', ''),
-                        'notificacoes_desabilitadas': cliente_data.get('notificationDisabled', False),
-                    }
-                )
+            while True:
+                params = {'offset': offset, 'limit': limit}
+                if inicio:
+                    params['dateCreated[ge]'] = inicio.isoformat()
+                if fim:
+                    params['dateCreated[le]'] = fim.isoformat()
                 
-                if criado:
-                    self.stats['clientes']['novos'] += 1
-                else:
-                    self.stats['clientes']['atualizados'] += 1
+                response = self.fazer_requisicao_100porcento('payments', params)
                 
-                if i % 100 == 0:
-                    logger.info(f"📦 Progresso clientes: {i}/{len(clientes_asaas)}")
-                    
-            except Exception as e:
-                self.stats['clientes']['erros'] += 1
-                logger.error(f"❌ Erro cliente {asaas_id}: {str(e)}")
+                if not response:
+                    falhas += 1
+                    if falhas >= 2:
+                        logger.error(f"❌ Muitas falhas na janela {inicio} → {fim} - pulando")
+                        janelas_com_erro.append((inicio, fim))
+                        self.stats['falhas_download'] += 1
+                        break
+                    time.sleep(5)
+                    continue
+                
+                if total_esperado is None:
+                    total_esperado = response.get('totalCount', 0)
+                
+                cobrancas_pagina = response.get('data', [])
+                if not cobrancas_pagina:
+                    break
+                
+                self.gravar_pagina_cobrancas(cobrancas_pagina)
+                baixadas_janela += len(cobrancas_pagina)
+                offset += limit
+                self._salvar_progresso(janela_atual=i, offset_cobrancas=offset)
+                
+                if total_esperado and baixadas_janela >= total_esperado:
+                    break
+                if not response.get('hasMore', False):
+                    break
+            
+            self._salvar_progresso(janela_atual=i + 1, offset_cobrancas=0)
+            logger.info(f"📊 Janela {i + 1}/{len(janelas)} ({inicio} → {fim}): {baixadas_janela} cobranças "
+                        f"| acumulado {self.stats['cobrancas']['total_baixadas']}")
+        
+        logger.info(f"\n📊 TOTAL COBRANÇAS: {self.stats['cobrancas']['total_baixadas']}")
+        if janelas_com_erro:
+            logger.warning(f"⚠️  Janelas com erro: {len(janelas_com_erro)}")
+    
+    def gravar_pagina_clientes(self, clientes_asaas):
+        """Grava uma página de clientes no banco assim que ela chega"""
+        # Gravar em lotes (clientes sem alteração desde a última execução são ignorados)
+        resultado = UpsertEmLote(self.ModelCliente, 'asaas_customer_id').executar(
+            mapear_cliente(cliente_data) for cliente_data in clientes_asaas
+        )
+        self.stats['clientes']['total_baixados'] += len(clientes_asaas)
+        self.stats['clientes']['novos'] += resultado['novos']
+        self.stats['clientes']['atualizados'] += resultado['atualizados']
+        self.stats['clientes']['erros'] += resultado['erros']
+        
+        # Marca como vistos nesta execução (inclusive os inalterados): base da exclusão de obsoletos
+        ids_pagina = [c['id'] for c in clientes_asaas if c.get('id')]
+        self.ModelCliente.objects.filter(asaas_customer_id__in=ids_pagina).update(sincronizado_em=timezone.now())
+    
+    def gravar_pagina_cobrancas(self, cobrancas_asaas):
+        """Grava uma página de cobranças no banco assim que ela chega"""
+        self.stats['cobrancas']['total_baixadas'] += len(cobrancas_asaas)
+        
+        # Join local só com os clientes desta página: um SELECT em vez de um .get() por cobrança
+        customer_ids = {c.get('_customer_id') or c.get('customer') for c in cobrancas_asaas} - {None, ''}
+        clientes_por_asaas_id = dict(
+            self.ModelCliente.objects.filter(asaas_customer_id__in=customer_ids)
+            .values_list('asaas_customer_id', 'id')
+        )
+        
+        registros = []
+        for cobranca_data in cobrancas_asaas:
+            asaas_id = cobranca_data.get('id')
+            customer_id = cobranca_data.get('_customer_id') or cobranca_data.get('customer')
+            
+            if not asaas_id or not customer_id:
+                continue
+            
+            cliente_id = clientes_por_asaas_id.get(customer_id)
+            if cliente_id is None:
+                self.stats['cobrancas']['sem_cliente'] += 1
+                logger.warning(f"⚠️  Cliente {customer_id} não encontrado para cobrança {asaas_id}")
+                continue
+            
+            registro = mapear_cobranca(cobranca_data, cliente_id)
+            if registro['data_vencimento'] is None:
+                self.stats['cobrancas']['erros'] += 1
+                logger.error(f"❌ Erro cobrança {asaas_id}: sem data de vencimento")
+                continue
+            registros.append(registro)
+        
+        resultado = UpsertEmLote(self.ModelCobranca, 'asaas_payment_id').executar(registros)
+        self.stats['cobrancas']['novas'] += resultado['novos']
+        self.stats['cobrancas']['atualizadas'] += resultado['atualizados']
+        self.stats['cobrancas']['erros'] += resultado['erros']
+        
+        ids_pagina = [c['id'] for c in cobrancas_asaas if c.get('id')]
+        self.ModelCobranca.objects.filter(asaas_payment_id__in=ids_pagina).update(sincronizado_em=timezone.now())
+    
+    def excluir_obsoletos(self):
+        """
+        Exclui clientes e cobranças locais que não existem mais no Asaas:
+        tudo que não foi visto desde o início da execução (sincronizado_em).
+        Com falhas de download a lista está incompleta e nada é excluído.
+        """
+        logger.info("\n" + "="*80)
+        logger.info("🗑️  EXCLUINDO REGISTROS OBSOLETOS")
+        logger.info("="*80)
+        
+        if self.stats['falhas_download']:
+            logger.warning(f"⚠️  {self.stats['falhas_download']} falhas de download - exclusão de obsoletos ignorada")
+            return
+        
+        iniciado_em = self.progresso.iniciado_em
         
         # Excluir clientes locais que não existem mais no Asaas
-        clientes_para_excluir = self.ModelCliente.objects.exclude(asaas_customer_id__in=asaas_customer_ids)
+        clientes_para_excluir = self.ModelCliente.objects.filter(sincronizado_em__lt=iniciado_em)
         qtd_excluir = clientes_para_excluir.count()
         
         if qtd_excluir > 0:
@@ -413,83 +588,23 @@ class SincronizadorAsaas100Porcento:
             clientes_para_excluir.delete()
             self.stats['clientes']['excluidos'] = qtd_excluir
         
-        logger.info(f"\n✅ CLIENTES SINCRONIZADOS:")
-        logger.info(f"   📊 Total: {self.stats['clientes']['total_baixados']}")
-        logger.info(f"   🆕 Novos: {self.stats['clientes']['novos']}")
-        logger.info(f"   🔄 Atualizados: {self.stats['clientes']['atualizados']}")
-        logger.info(f"   🗑️  Excluídos: {self.stats['clientes']['excluidos']}")
-        logger.info(f"   ❌ Erros: {self.stats['clientes']['erros']}")
-    
-    def sincronizar_cobrancas(self, cobrancas_asaas):
-        """Sincroniza cobranças com o banco"""
-        logger.info("\n" + "="*80)
-        logger.info("💾 SINCRONIZANDO COBRANÇAS NO BANCO")
-        logger.info("="*80)
-        
-        # IDs das cobranças no Asaas
-        asaas_payment_ids = set(c['id'] for c in cobrancas_asaas if c.get('id'))
-        
-        # Processar cada cobrança do Asaas
-        for i, cobranca_data in enumerate(cobrancas_asaas, 1):
-            asaas_id = cobranca_data.get('id')
-            customer_id = cobranca_data.get('_customer_id') or cobranca_data.get('customer')
-            
-            if not asaas_id or not customer_id:
-                continue
-            
-            try:
-                # Buscar cliente
-                try:
-                    cliente = self.ModelCliente.objects.get(asaas_customer_id=customer_id)
-                except self.ModelCliente.DoesNotExist:
-                    self.stats['cobrancas']['sem_cliente'] += 1
-                    logger.warning(f"⚠️  Cliente {customer_id} não encontrado para cobrança {asaas_id}")
-                    continue
-                
-                # Determinar tipo de cobrança
-                billing_type = cobranca_data.get('billingType', 'UNDEFINED')
-                tipo_cobranca = billing_type if billing_type in ['BOLETO', 'CREDIT_CARD', 'PIX'] else 'UNDEFINED'
-                
-                # Buscar ou criar cobrança
-                cobranca, criada = self.ModelCobranca.objects.update_or_create(
-                    asaas_payment_id=asaas_id,
-                    defaults={
-                        'cliente': cliente,
-                        'tipo_cobranca': tipo_cobranca,
-                        'status': cobranca_data.get('status', 'PENDING'),
-                        'valor': Decimal(str(cobranca_data.get('value', 0))),
-                        'valor_liquido': Decimal(str(cobranca_data.get('netValue', 0))) if cobranca_data.get('netValue') else None,
-                        'descricao': cobranca_data.get('description', ''),
-                        'data_vencimento': self._parse_date(cobranca_data.get('dueDate')),
-                        'data_pagamento': self._parse_date(cobranca_data.get('paymentDate')),
-                        'invoice_url': cobranca_data.get('invoiceUrl', ''),
-                        'bank_slip_url': cobranca_data.get('bankSlipUrl', ''),
-                        'pix_qrcode_url': cobranca_data.get('pixQrCodeUrl', ''),
-                        'pix_copy_paste': cobranca_data.get('pixCopyPaste', ''),
-                        'external_reference': cobranca_data.get('externalReference', ''),
-                    }
-                )
-                
-                if criada:
-                    self.stats['cobrancas']['novas'] += 1
-                else:
-                    self.stats['cobrancas']['atualizadas'] += 1
-                
-                if i % 500 == 0:
-                    logger.info(f"📦 Progresso cobranças: {i}/{len(cobrancas_asaas)}")
-                    
-            except Exception as e:
-                self.stats['cobrancas']['erros'] += 1
-                logger.error(f"❌ Erro cobrança {asaas_id}: {str(e)}")
-        
         # Excluir cobranças locais que não existem mais no Asaas
-        cobrancas_para_excluir = self.ModelCobranca.objects.exclude(asaas_payment_id__in=asaas_payment_ids)
+        cobrancas_para_excluir = self.ModelCobranca.objects.filter(sincronizado_em__lt=iniciado_em)
         qtd_excluir = cobrancas_para_excluir.count()
         
         if qtd_excluir > 0:
             logger.info(f"🗑️  Excluindo {qtd_excluir} cobranças obsoletas...")
             cobrancas_para_excluir.delete()
             self.stats['cobrancas']['excluidas'] = qtd_excluir
+    
+    def _registrar_resumo(self):
+        """Resumo da gravação no banco (mesmo formato de antes da gravação por página)"""
+        logger.info(f"\n✅ CLIENTES SINCRONIZADOS:")
+        logger.info(f"   📊 Total: {self.stats['clientes']['total_baixados']}")
+        logger.info(f"   🆕 Novos: {self.stats['clientes']['novos']}")
+        logger.info(f"   🔄 Atualizados: {self.stats['clientes']['atualizados']}")
+        logger.info(f"   🗑️  Excluídos: {self.stats['clientes']['excluidos']}")
+        logger.info(f"   ❌ Erros: {self.stats['clientes']['erros']}")
         
         logger.info(f"\n✅ COBRANÇAS SINCRONIZADAS:")
         logger.info(f"   📊 Total: {self.stats['cobrancas']['total_baixadas']}")
@@ -509,34 +624,40 @@ class SincronizadorAsaas100Porcento:
             return None
     
     def executar_sincronizacao_100porcento(self):
-        """Executa sincronização com garantia de 100%"""
+        """
+        Executa sincronização com garantia de 100%.
+        Cada etapa concluída avança o checkpoint; numa retomada as etapas já
+        concluídas são puladas e a etapa interrompida continua do último offset.
+        """
         logger.info("\n" + "🎯"*40)
-        logger.info(f"SINCRONIZAÇÃO 100% - ASAAS {self.conta.upper()}")
+        logger.info(f"SINCRONIZAÇÃO 100% - ASAAS {self.conta.upper()}{' (RETOMADA)' if self.retomado else ''}")
         logger.info("🎯"*40)
         
         inicio = time.time()
         
         try:
-            # 1. Baixar 100% dos clientes
-            clientes_asaas = self.baixar_clientes_100porcento()
-            
-            if not clientes_asaas:
-                raise Exception("❌ CRÍTICO: Nenhum cliente baixado")
+            # 1. Baixar e gravar 100% dos clientes
+            if self.progresso.etapa == 'CLIENTES':
+                if not self.baixar_clientes_100porcento():
+                    raise Exception("❌ CRÍTICO: Nenhum cliente baixado")
+                self._salvar_progresso(etapa='COBRANCAS', offset_cobrancas=0)
             
-            # 2. Extrair IDs dos clientes
-            clientes_ids = [c['id'] for c in clientes_asaas if c.get('id')]
-            logger.info(f"✅ {len(clientes_ids)} IDs de clientes extraídos")
-            
-            # 3. Baixar 100% das cobranças
-            cobrancas_asaas = self.baixar_cobrancas_100porcento(clientes_ids)
+            # 2. Baixar e gravar 100% das cobranças
+            if self.progresso.etapa == 'COBRANCAS':
+                if self.modo_global:
+                    self.baixar_cobrancas_globais_100porcento()
+                else:
+                    self.baixar_cobrancas_100porcento()
+                self._salvar_progresso(etapa='LIMPEZA')
             
-            # 4. Sincronizar no banco
-            self.sincronizar_clientes(clientes_asaas)
-            self.sincronizar_cobrancas(cobrancas_asaas)
+            # 3. Excluir o que não existe mais no Asaas
+            self.excluir_obsoletos()
+            self._registrar_resumo()
             
-            # 5. Relatório final
+            # 4. Relatório final
             duracao = time.time() - inicio
             self.gerar_relatorio_final(duracao)
+            self._salvar_progresso(etapa='CONCLUIDO')
             
             return True
             
@@ -582,7 +703,7 @@ class SincronizadorAsaas100Porcento:
 ⏰ Duração: {duracao:.0f}s ({duracao/60:.1f}min)
 📊 Requests realizados: {self.requests_count}
 
-🎯 STATUS: {"100% COMPLETO" if self.stats['clientes']['erros'] == 0 else "COM FALHAS PARCIAIS"}"""
+🎯 STATUS: {"100% COMPLETO" if self.stats['clientes']['erros'] == 0 and not self.stats['falhas_download'] else "COM FALHAS PARCIAIS"}"""
 
         self.log.mensagem = mensagem
         self.log.save()
@@ -598,6 +719,7 @@ class SincronizadorAsaas100Porcento:
         self.log.data_fim = timezone.now()
         self.log.duracao_segundos = int(duracao)
         self.log.erros = str(erro)
+        self.log.mensagem = f'[ERRO] {str(erro)}\n\nProgresso salvo (etapa {self.progresso.etapa}). Use --resume para continuar.'
         self.log.save()
 
 
@@ -615,9 +737,15 @@ if __name__ == '__main__':
     else:
         conta = 'principal'
     
-    logger.info(f"🚀 Iniciando sincronização 100% - conta: {conta}")
+    # --por-cliente: modo antigo (GET payments?customer= para cada cliente)
+    modo_global = '--por-cliente' not in sys.argv
+    # --resume: continua a última execução interrompida desta conta
+    retomar = '--resume' in sys.argv
+    
+    logger.info(f"🚀 Iniciando sincronização 100% - conta: {conta} - modo: {'global' if modo_global else 'por cliente'}"
+                f"{' - retomando' if retomar else ''}")
     
-    sincronizador = SincronizadorAsaas100Porcento(conta=conta)
+    sincronizador = SincronizadorAsaas100Porcento(conta=conta, modo_global=modo_global, retomar=retomar)
     
     try:
         sucesso = sincronizador.executar_sincronizacao_100porcento()
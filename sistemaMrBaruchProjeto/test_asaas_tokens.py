@@ -8,8 +8,8 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistemaMrBaruchProjeto.settings')
 django.setup()
 
-import requests
 from django.conf import settings
+from core.asaas_client import AsaasClient
 
 def testar_token(token, nome):
     """Testa um token ASAAS fazendo uma requisição simples"""
@@ -18,15 +18,11 @@ def testar_token(token, nome):
     print(f"Token: {token[:20]}...")
     print(f"{'='*60}")
     
-    url = "https://api.asaas.com/v3/customers"
-    headers = {
-        'Content-Type': 'application/json',
-        'access_token': token
-    }
+    cliente = AsaasClient(token, base_url="https://api.asaas.com/v3", timeout=10)
     params = {'limit': 1, 'offset': 0}
     
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        response = cliente.get('customers', params=params)
         
         print(f"Status Code: {response.status_code}")
         print(f"Response Headers: {dict(response.headers)}")
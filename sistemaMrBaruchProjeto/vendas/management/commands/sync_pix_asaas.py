@@ -4,7 +4,7 @@ Comando para sincronizar PIX de entrada do ASAAS que não foram salvos no banco
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from vendas.models import Venda
-from financeiro.models import PixEntrada, ClienteAsaas
+from financeiro.models import PixEntrada, ClienteAsaas, RotaPagamentoAsaas
 from core.asaas_service import AsaasService
 
 
@@ -91,6 +91,7 @@ class Command(BaseCommand):
                                     pix_qr_code_url=pix_qr_url,
                                     status_pagamento='pendente'
                                 )
+                                RotaPagamentoAsaas.registrar('PIX_ENTRADA', pix_entrada.pk, pix_entrada.asaas_payment_id)
                                 
                                 self.stdout.write(self.style.SUCCESS(
                                     f"   ✅ PIX salvo no banco: ID={pix_entrada.id}"
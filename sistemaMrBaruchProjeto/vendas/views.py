@@ -213,31 +213,25 @@ def painel_metricas_consultor(request):
     else:
         parcelas = FinanceiroParcela.objects.filter(venda__consultor=usuario)
     
-    # Boletos pagos (clientes)
-    boletos_pagos = parcelas.filter(status='paga').count()
-    valor_boletos_pagos = parcelas.filter(status='paga').aggregate(
-        total=django_models.Sum('valor')
-    )['total'] or Decimal('0')
-    
-    # Boletos vencidos (clientes)
-    boletos_vencidos = parcelas.filter(
-        status='vencida',
-        data_vencimento__lt=hoje
-    ).count()
-    valor_boletos_vencidos = parcelas.filter(
-        status='vencida',
-        data_vencimento__lt=hoje
-    ).aggregate(total=django_models.Sum('valor'))['total'] or Decimal('0')
-    
-    # Boletos a vencer
-    boletos_a_vencer = parcelas.filter(
-        status='aberta',
-        data_vencimento__gte=hoje
-    ).count()
-    valor_boletos_a_vencer = parcelas.filter(
-        status='aberta',
-        data_vencimento__gte=hoje
-    ).aggregate(total=django_models.Sum('valor'))['total'] or Decimal('0')
+    # Boletos pagos / vencidos / a vencer numa passada
+    # ('vencida' é mantido diariamente pelo marcar_parcelas_vencidas)
+    filtro_pagos = django_models.Q(status='paga')
+    filtro_vencidos = django_models.Q(status='vencida')
+    filtro_a_vencer = django_models.Q(status='aberta', data_vencimento__gte=hoje)
+    boletos = parcelas.aggregate(
+        boletos_pagos=django_models.Count('id', filter=filtro_pagos),
+        valor_boletos_pagos=django_models.Sum('valor', filter=filtro_pagos),
+        boletos_vencidos=django_models.Count('id', filter=filtro_vencidos),
+        valor_boletos_vencidos=django_models.Sum('valor', filter=filtro_vencidos),
+        boletos_a_vencer=django_models.Count('id', filter=filtro_a_vencer),
+        valor_boletos_a_vencer=django_models.Sum('valor', filter=filtro_a_vencer),
+    )
+    boletos_pagos = boletos['boletos_pagos']
+    valor_boletos_pagos = boletos['valor_boletos_pagos'] or Decimal('0')
+    boletos_vencidos = boletos['boletos_vencidos']
+    valor_boletos_vencidos = boletos['valor_boletos_vencidos'] or Decimal('0')
+    boletos_a_vencer = boletos['boletos_a_vencer']
+    valor_boletos_a_vencer = boletos['valor_boletos_a_vencer'] or Decimal('0')
     
     # Próximo vencimento
     proxima_parcela = parcelas.filter(
@@ -456,7 +450,7 @@ def gerar_orcamento_pre_venda_pdf(request, pre_venda_id):
 
 from marketing.models import Lead, MotivoContato
 from clientes.models import Cliente
-from financeiro.models import PixLevantamento, Parcela as FinanceiroParcela, Comissao
+from financeiro.models import PixLevantamento, Parcela as FinanceiroParcela, Comissao, RotaPagamentoAsaas
 from core.asaas_service import AsaasService
 from core.commission_service import CommissionService
 from core.services import LogService
@@ -1187,6 +1181,7 @@ def cadastro_venda_direta(request):
                                 entradas_pagas.append(entrada.numero_entrada)
                             
                             entrada.save()
+                            RotaPagamentoAsaas.registrar('ENTRADA_VENDA', entrada.pk, entrada.asaas_payment_id)
                             
                             try:
                                 LogService.log_info(
@@ -1858,6 +1853,7 @@ def cadastro_venda(request, pre_venda_id):
                                             entrada.pix_qr_code_url = cobranca.get('bankSlipUrl', cobranca.get('invoiceUrl', ''))
                                         
                                         entrada.save()
+                                        RotaPagamentoAsaas.registrar('ENTRADA_VENDA', entrada.pk, entrada.asaas_payment_id)
                                         entradas_com_sucesso += 1
                                         print(f"      ✅ Entrada {entrada.numero_entrada} sincronizada com ASAAS: {entrada.asaas_payment_id}")
                                         
@@ -2928,122 +2924,11 @@ def excluir_estrategia_repescagem(request, estrategia_id):
 def dashboard_comercial2_kpis(request):
     """
     Dashboard com KPIs e métricas do Comercial 2
+    Os números vêm de relatorios.views.kpis_comercial2 (o mesmo do dashboard de relatórios)
     """
-    from .models import RepescagemLead, MotivoRecusa
-    from django.db.models import Count, Avg, Q, F
-    from datetime import timedelta
-    import json
-    
-    # Filtros de período
-    periodo = request.GET.get('periodo', '30')  # Default 30 dias
-    try:
-        dias = int(periodo)
-    except:
-        dias = 30
-    
-    data_inicio = timezone.now() - timedelta(days=dias)
-    
-    # === ESTATÍSTICAS GERAIS ===
-    total_repescagens = RepescagemLead.objects.count()
-    repescagens_periodo = RepescagemLead.objects.filter(data_criacao__gte=data_inicio)
-    
-    stats = {
-        'total_geral': total_repescagens,
-        'total_periodo': repescagens_periodo.count(),
-        'pendentes': RepescagemLead.objects.filter(status='PENDENTE').count(),
-        'em_contato': RepescagemLead.objects.filter(status='EM_CONTATO').count(),
-        'convertidos': RepescagemLead.objects.filter(status='CONVERTIDO').count(),
-        'convertidos_periodo': repescagens_periodo.filter(status='CONVERTIDO').count(),
-        'sem_interesse': RepescagemLead.objects.filter(status='SEM_INTERESSE').count(),
-        'lead_lixo': RepescagemLead.objects.filter(status='LEAD_LIXO').count(),
-    }
-    
-    # === TAXA DE CONVERSÃO ===
-    total_finalizados = RepescagemLead.objects.filter(
-        Q(status='CONVERTIDO') | Q(status='SEM_INTERESSE') | Q(status='LEAD_LIXO')
-    ).count()
+    from relatorios.views import kpis_comercial2
     
-    if total_finalizados > 0:
-        stats['taxa_conversao'] = round((stats['convertidos'] / total_finalizados) * 100, 1)
-    else:
-        stats['taxa_conversao'] = 0
-    
-    # Taxa de conversão no período
-    total_finalizados_periodo = repescagens_periodo.filter(
-        Q(status='CONVERTIDO') | Q(status='SEM_INTERESSE') | Q(status='LEAD_LIXO')
-    ).count()
-    
-    if total_finalizados_periodo > 0:
-        stats['taxa_conversao_periodo'] = round(
-            (stats['convertidos_periodo'] / total_finalizados_periodo) * 100, 1
-        )
-    else:
-        stats['taxa_conversao_periodo'] = 0
-    
-    # === TEMPO MÉDIO DE REPESCAGEM ===
-    repescagens_concluidas = RepescagemLead.objects.filter(
-        data_conclusao__isnull=False
-    )
-    
-    if repescagens_concluidas.exists():
-        tempos = []
-        for r in repescagens_concluidas:
-            delta = r.data_conclusao - r.data_criacao
-            tempos.append(delta.total_seconds() / 86400)  # Converter para dias
-        stats['tempo_medio_dias'] = round(sum(tempos) / len(tempos), 1)
-    else:
-        stats['tempo_medio_dias'] = 0
-    
-    # === DISTRIBUIÇÃO POR STATUS (para gráfico de pizza) ===
-    distribuicao_status = RepescagemLead.objects.values('status').annotate(
-        total=Count('id')
-    ).order_by('-total')
-    
-    # === TOP 5 MOTIVOS DE RECUSA QUE MAIS CONVERTEM ===
-    motivos_conversao = RepescagemLead.objects.filter(
-        status='CONVERTIDO'
-    ).values(
-        'motivo_recusa__nome'
-    ).annotate(
-        total_conversoes=Count('id')
-    ).order_by('-total_conversoes')[:5]
-    
-    # === TOP 5 MOTIVOS DE RECUSA GERAIS ===
-    motivos_gerais = RepescagemLead.objects.values(
-        'motivo_recusa__nome'
-    ).annotate(
-        total=Count('id')
-    ).order_by('-total')[:5]
-    
-    # === PERFORMANCE POR CONSULTOR ===
-    performance_consultores = RepescagemLead.objects.filter(
-        consultor_repescagem__isnull=False
-    ).values(
-        'consultor_repescagem__username',
-        'consultor_repescagem__first_name',
-        'consultor_repescagem__last_name'
-    ).annotate(
-        total_atendimentos=Count('id'),
-        total_convertidos=Count('id', filter=Q(status='CONVERTIDO')),
-    ).order_by('-total_convertidos')
-    
-    # Calcular taxa de conversão por consultor
-    for perf in performance_consultores:
-        if perf['total_atendimentos'] > 0:
-            perf['taxa_conversao'] = round(
-                (perf['total_convertidos'] / perf['total_atendimentos']) * 100, 1
-            )
-        else:
-            perf['taxa_conversao'] = 0
-    
-    context = {
-        'stats': stats,
-        'distribuicao_status': json.dumps(list(distribuicao_status)),
-        'motivos_conversao': json.dumps(list(motivos_conversao)),
-        'motivos_gerais': list(motivos_gerais),
-        'performance_consultores': list(performance_consultores),
-        'periodo_dias': dias,
-    }
+    context = kpis_comercial2(request.GET.get('periodo', '30'))  # Default 30 dias
     
     return render(request, 'vendas/comercial2/dashboard_kpis.html', context)
 